@@ -0,0 +1,243 @@
+"""
+Benchmark: token-aware chunking (plan_translation_chunks, split_html_into_chunks) against the previous
+page-count / character-window splitting, on a corpus of synthetic documents.
+
+Translator corpus: page images with OCR text ("--- Page N ---" markers) of varying density, one with
+"---" rules inside the text, and a long text-only document. Layout / proofreader corpus: the same
+documents as translated HTML with tables and page-break divs (both quote styles).
+
+Reports per document: API calls, the heaviest chunk against the mean (balance), chunks whose estimated
+output is over max_tokens (the reply would be cut off), the calls needed once those are continued,
+chunks whose source text does not belong to their page images, and tables split across chunks.
+Asserts that the new plans never split a table or misalign text, never exceed max_tokens with more
+than one page, and need no more calls in total than the old ones once cut-off replies are counted.
+
+Run from the backend directory:
+    python -m benchmarks.chunking
+    python -m benchmarks.chunking --seed 7
+"""
+
+import os
+import math
+import random
+import argparse
+
+# server.py needs these at import time; the benchmark never touches MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server
+
+MAX_TOKENS = 16384  # max_tokens of the translator / layout / proofreader calls
+WORDS = ("certidão nascimento registro civil cartório oficial município estado república federativa brasil "
+         "nome pai mãe avós data local matrícula livro folha termo averbação observações").split()
+
+
+def legacy_translator_chunks(page_images: list, original_text: str) -> list:
+    """run_ai_translator_stage chunking before the token-aware planner (10 pages, text split on "---")"""
+    max_pages_per_chunk = 10
+    total_pages = len(page_images) if page_images else 1
+    if total_pages <= max_pages_per_chunk:
+        return [{"images": page_images, "text": original_text}]
+    num_chunks = math.ceil(total_pages / max_pages_per_chunk)
+    if original_text and ("--- PAGE" in original_text or "---" in original_text):
+        text_parts = [p.strip() for p in original_text.split("---") if p.strip() and "PAGE" not in p.upper()]
+        text_chunks = []
+        for i in range(num_chunks):
+            start = i * max_pages_per_chunk
+            end = min((i + 1) * max_pages_per_chunk, len(text_parts))
+            text_chunks.append("\n\n".join(text_parts[start:end]) if start < len(text_parts) else "")
+    else:
+        text_chunks = [original_text if i == 0 else "" for i in range(num_chunks)]
+    return [{"images": page_images[i * max_pages_per_chunk:(i + 1) * max_pages_per_chunk], "text": text_chunks[i]}
+            for i in range(num_chunks)]
+
+
+def legacy_split_html_into_chunks(html_content: str, max_chunk_size: int = 50000) -> list:
+    """split_html_into_chunks before the token-aware version (page breaks, then 50 000-character windows)"""
+    import re
+    page_break_pattern = r'<div[^>]*class="[^"]*page-break[^"]*"[^>]*>.*?</div>'
+    breaks = list(re.finditer(page_break_pattern, html_content, re.DOTALL | re.IGNORECASE))
+    if breaks:
+        chunks = []
+        last_end = 0
+        current_chunk = ""
+        for match in breaks:
+            section = html_content[last_end:match.end()]
+            if len(current_chunk) + len(section) > max_chunk_size and current_chunk:
+                chunks.append(current_chunk)
+                current_chunk = section
+            else:
+                current_chunk += section
+            last_end = match.end()
+        remaining = html_content[last_end:]
+        if remaining.strip():
+            if len(current_chunk) + len(remaining) > max_chunk_size and current_chunk:
+                chunks.append(current_chunk)
+                chunks.append(remaining)
+            else:
+                current_chunk += remaining
+                chunks.append(current_chunk)
+        elif current_chunk:
+            chunks.append(current_chunk)
+        return chunks if chunks else [html_content]
+    if len(html_content) <= max_chunk_size:
+        return [html_content]
+    chunks = []
+    current_pos = 0
+    while current_pos < len(html_content):
+        end_pos = min(current_pos + max_chunk_size, len(html_content))
+        if end_pos < len(html_content):
+            search_start = max(current_pos, end_pos - 1000)
+            search_text = html_content[search_start:end_pos]
+            for pattern in ['</div>', '</p>', '</table>', '<br']:
+                last_break = search_text.rfind(pattern)
+                if last_break != -1:
+                    end_pos = search_start + last_break + len(pattern)
+                    break
+        chunks.append(html_content[current_pos:end_pos])
+        current_pos = end_pos
+    return chunks
+
+
+def words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def build_document(rng: random.Random, densities: list, rules_in_text: bool = False) -> dict:
+    """Page images plus OCR text; every page's text carries a [[pN]] tag to check alignment"""
+    pages = []
+    texts = []
+    for number, density in enumerate(densities, 1):
+        pages.append({"page": number, "data": "", "media_type": "image/jpeg", "width": 1224, "height": 1584})
+        body = f"[[p{number}]] {words(rng, density)}"
+        if rules_in_text:
+            body = body.replace(" registro ", "\n---\nregistro ", 2)
+        texts.append(f"--- Page {number} ---\n{body}\n")
+    return {"pages": pages, "text": "".join(texts)}
+
+
+def build_html(rng: random.Random, densities: list, page_breaks: bool = True) -> str:
+    """Translated HTML: one section per page with paragraphs and a table, page-break divs between pages"""
+    sections = []
+    for number, density in enumerate(densities, 1):
+        rows = "".join(f"<tr><td>{words(rng, 4)}</td><td>{words(rng, 6)}</td></tr>\n" for _ in range(max(2, density // 40)))
+        paragraphs = "".join(f"<p>{words(rng, 60)}</p>\n\n" for _ in range(max(1, density // 60)))
+        sections.append(f"<div class=\"page\"><h2>Page {number}</h2>\n{paragraphs}<table>\n{rows}</table>\n</div>")
+    breaks = ['<div class="page-break" style="page-break-before: always;"></div>',
+              "<div class='page-break' style='page-break-before: always;'></div>"]
+    body = "".join(section + (breaks[index % 2] if page_breaks and index < len(sections) - 1 else "")
+                   for index, section in enumerate(sections))
+    return f"<!DOCTYPE html><html><head><style>\n\ntable {{ width: 100%; }}\n\n</style></head><body>\n{body}\n</body></html>"
+
+
+def misaligned(chunk: dict) -> bool:
+    if not chunk["images"]:
+        return False
+    image_pages = {page["page"] for page in chunk["images"]}
+    text_pages = {int(tag) for tag in server.re.findall(r"\[\[p(\d+)\]\]", chunk["text"])}
+    return bool(text_pages) and text_pages != image_pages
+
+
+def translator_stats(chunks: list) -> dict:
+    loads = [sum(server.estimate_translation_output_tokens(page_text) for page_text in
+                 [part for _, part in server.split_text_pages(chunk["text"])] or [chunk["text"]])
+             if not chunk["images"] else
+             sum(server.estimate_translation_output_tokens(page_text) for page_text in per_page_texts(chunk))
+             for chunk in chunks]
+    return summarize(loads, chunks, misaligned_count=sum(misaligned(chunk) for chunk in chunks))
+
+
+def per_page_texts(chunk: dict) -> list:
+    """The chunk's source text attributed to its pages through the [[pN]] tags"""
+    texts = {page["page"]: "" for page in chunk["images"]}
+    for number, page_text in server.split_text_pages(chunk["text"]) or [(None, chunk["text"])]:
+        tags = server.re.findall(r"\[\[p(\d+)\]\]", page_text)
+        if tags and int(tags[0]) in texts:
+            texts[int(tags[0])] += page_text
+    return list(texts.values())
+
+
+def html_stats(chunks: list) -> dict:
+    loads = [server.estimate_claude_text_tokens(chunk) for chunk in chunks]
+    tables_split = sum(1 for chunk in chunks if chunk.count("<table") != chunk.count("</table>"))
+    return summarize(loads, chunks, tables_split=tables_split)
+
+
+def summarize(loads: list, chunks: list, misaligned_count: int = 0, tables_split: int = 0) -> dict:
+    over = [load for load in loads if load > MAX_TOKENS]
+    return {
+        "calls": len(chunks),
+        "balance": max(loads) / (sum(loads) / len(loads)),
+        "max_load": max(loads),
+        "over": len(over),
+        "effective_calls": len(chunks) + sum(math.ceil(load / MAX_TOKENS) - 1 for load in over),
+        "misaligned": misaligned_count,
+        "tables_split": tables_split
+    }
+
+
+def print_row(name: str, old: dict, new: dict):
+    def cells(stats):
+        return (f"{stats['calls']:>5} {stats['balance']:>5.2f} {stats['max_load']:>7} {stats['over']:>4} "
+                f"{stats['effective_calls']:>5} {stats['misaligned'] + stats['tables_split']:>5}")
+    print(f"{name:40} | {cells(old)} | {cells(new)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    corpus = {
+        "certificates_23p_sparse": [rng.randint(40, 120) for _ in range(23)],
+        "contract_30p_dense": [rng.randint(450, 700) for _ in range(30)],
+        "mixed_40p": [rng.choice([60, 90, 650, 900]) for _ in range(40)],
+        "school_records_60p": [rng.randint(120, 260) for _ in range(60)],
+        "short_8p": [rng.randint(100, 400) for _ in range(8)],
+    }
+    documents = {name: build_document(rng, densities) for name, densities in corpus.items()}
+    documents["report_12p_with_rules"] = build_document(rng, [rng.randint(150, 300) for _ in range(12)], rules_in_text=True)
+    documents["scanned_25p_no_text"] = {"pages": build_document(rng, [0] * 25)["pages"], "text": ""}
+    documents["text_only_45p"] = {"pages": [], "text": build_document(rng, [rng.randint(300, 600) for _ in range(45)])["text"]}
+
+    header = f"{'':40} | {'calls':>5} {'bal':>5} {'max tok':>7} {'over':>4} {'eff':>5} {'bad':>5}"
+    print("translator chunks (old | new); bad = chunks with text from other pages")
+    print(f"{header} | {'calls':>5} {'bal':>5} {'max tok':>7} {'over':>4} {'eff':>5} {'bad':>5}")
+    totals = {"old": 0, "new": 0}
+    for name, document in documents.items():
+        old = translator_stats(legacy_translator_chunks(document["pages"], document["text"]))
+        new_chunks = server.plan_translation_chunks(document["pages"], document["text"])
+        new = translator_stats(new_chunks)
+        print_row(name, old, new)
+        totals["old"] += old["effective_calls"]
+        totals["new"] += new["effective_calls"]
+        assert new["misaligned"] == 0, f"{name}: a chunk carries text of other pages"
+        assert all(chunk["estimated_output_tokens"] <= MAX_TOKENS or len(chunk["pages"]) == 1 for chunk in new_chunks), \
+            f"{name}: a multi-page chunk is over max_tokens"
+        assert [page["page"] for chunk in new_chunks for page in chunk["images"]] == [page["page"] for page in document["pages"]]
+        if len(new_chunks) > 1:
+            assert "".join(chunk["text"] for chunk in new_chunks) in (document["text"], ""), f"{name}: text lost or reordered"
+
+    print("\nlayout / proofreader HTML chunks (old | new); bad = tables split across chunks")
+    print(f"{header} | {'calls':>5} {'bal':>5} {'max tok':>7} {'over':>4} {'eff':>5} {'bad':>5}")
+    html_corpus = {name: build_html(rng, densities) for name, densities in corpus.items()}
+    html_corpus["contract_30p_without_page_breaks"] = build_html(rng, corpus["contract_30p_dense"], page_breaks=False)
+    for name, html in html_corpus.items():
+        old = html_stats(legacy_split_html_into_chunks(html))
+        new_chunks = server.split_html_into_chunks(html)
+        new = html_stats(new_chunks)
+        print_row(f"{name} ({len(html) // 1000}k chars)", old, new)
+        totals["old"] += old["effective_calls"]
+        totals["new"] += new["effective_calls"]
+        assert "".join(new_chunks) == html, f"{name}: chunks do not join back to the original HTML"
+        assert new["tables_split"] == 0, f"{name}: a table was split"
+        assert new["over"] == 0, f"{name}: a chunk is over max_tokens"
+
+    print(f"\ncalls including continuations of cut-off replies: {totals['old']} -> {totals['new']}")
+    assert totals["new"] <= totals["old"], "token-aware chunking should not need more calls overall"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Benchmark: compress_image_for_claude_api (predictive quality / scale search) against the previous
+fixed ladder (4 JPEG qualities, then 4 scales x 3 qualities), and PDF pages rendered at the zoom
+their byte budget needs (render_pdf_pages_for_claude) against render-at-2x-then-compress.
+
+Uses the images in --images DIR (*.jpg, *.jpeg, *.png) and PDFs in --pdfs DIR when given. Without
+them it generates scan-like pages (paper noise, text strokes, a photo) at 2x and 300 dpi letter size
+and phone-photo size, and a PDF of such scans.
+
+Reports full JPEG encodes, CPU time and output size per budget, and asserts that the new output
+fits the budget whenever the old one did, that no input needs more than one extra encode (the old
+ladder wins when one of its fixed qualities happens to be the answer), and that the total encode
+count and CPU time over all inputs and budgets go down.
+
+Run from the backend directory:
+    python -m benchmarks.image_compression
+    python -m benchmarks.image_compression --images /path/to/scans --budgets 5242880,1572864
+"""
+
+import io
+import os
+import time
+import random
+import logging
+import argparse
+from pathlib import Path
+
+# server.py needs these at import time; the benchmark never touches MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import fitz
+from PIL import Image, ImageDraw, ImageFilter
+
+import server
+import ocr_engine
+
+
+class EncodeCounter:
+    """Counts JPEG encodes made through PIL while active"""
+
+    def __init__(self):
+        self.count = 0
+        self._save = Image.Image.save
+
+    def __enter__(self):
+        counter = self
+
+        def save(image, fp, format=None, **params):
+            if (format or "").upper() == "JPEG":
+                counter.count += 1
+            return counter._save(image, fp, format, **params)
+
+        Image.Image.save = save
+        return self
+
+    def __exit__(self, *exc):
+        Image.Image.save = self._save
+
+
+def legacy_compress_image_for_claude_api(img_bytes: bytes, media_type: str = "image/jpeg", max_size: int = 5 * 1024 * 1024,
+                                         max_dimension: int = 7900) -> tuple:
+    """compress_image_for_claude_api before the predictive search (reference for size and timing)"""
+    img = Image.open(io.BytesIO(img_bytes))
+    if img.width > max_dimension or img.height > max_dimension:
+        if img.mode in ('RGBA', 'P', 'LA'):
+            img = img.convert('RGB')
+        ratio = min(max_dimension / img.width, max_dimension / img.height)
+        img = img.resize((int(img.width * ratio), int(img.height * ratio)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=85, optimize=True)
+        img_bytes = buffer.getvalue()
+        media_type = "image/jpeg"
+        if len(img_bytes) <= max_size:
+            return img_bytes, media_type
+    else:
+        if len(img_bytes) <= max_size:
+            return img_bytes, media_type
+        if img.mode in ('RGBA', 'P', 'LA'):
+            img = img.convert('RGB')
+
+    for quality in [85, 70, 55, 40]:
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=quality, optimize=True)
+        compressed_bytes = buffer.getvalue()
+        if len(compressed_bytes) <= max_size:
+            return compressed_bytes, "image/jpeg"
+
+    original_size = img.size
+    for scale in [0.75, 0.5, 0.35, 0.25]:
+        resized_img = img.resize((int(original_size[0] * scale), int(original_size[1] * scale)), Image.LANCZOS)
+        for quality in [70, 50, 35]:
+            buffer = io.BytesIO()
+            resized_img.save(buffer, format='JPEG', quality=quality, optimize=True)
+            compressed_bytes = buffer.getvalue()
+            if len(compressed_bytes) <= max_size:
+                return compressed_bytes, "image/jpeg"
+    return compressed_bytes, "image/jpeg"
+
+
+def legacy_render_pdf_pages(content: bytes, max_size: int) -> list:
+    """Previous page pipeline: render every page at 2x as JPEG, then compress the bytes"""
+    pages = []
+    for rendered in ocr_engine.render_pdf_pages(content, 2.0, None, "jpeg"):
+        data, media_type = legacy_compress_image_for_claude_api(rendered["data"], "image/jpeg", max_size)
+        pages.append({"page": rendered["page"], "data": data, "media_type": media_type})
+    return pages
+
+
+def build_scan(width: int, height: int, seed: int = 3) -> Image.Image:
+    """Scan-like page: textured paper, dark text strokes, a stamp and a photo block"""
+    rng = random.Random(seed)
+    noise = Image.effect_noise((width, height), 28).convert("RGB")
+    page = Image.blend(Image.new("RGB", (width, height), (236, 232, 220)), noise, 0.25)
+    draw = ImageDraw.Draw(page)
+    line_height = max(12, height // 60)
+    for top in range(line_height * 3, height - line_height * 3, line_height):
+        left = width // 12
+        while left < width * 11 // 12:
+            word = rng.randint(line_height, line_height * 5)
+            draw.rectangle([left, top, left + word, top + line_height // 3], fill=(rng.randint(10, 60),) * 3)
+            left += word + line_height // 2
+    draw.ellipse([width * 2 // 3, height * 3 // 4, width * 2 // 3 + width // 5, height * 3 // 4 + width // 5],
+                 outline=(40, 60, 160), width=max(2, width // 200))
+    photo = Image.effect_noise((width // 4, height // 6), 90).convert("RGB").filter(ImageFilter.GaussianBlur(1))
+    page.paste(photo, (width // 12, height // 12))
+    return page
+
+
+def image_bytes(img: Image.Image, image_format: str = "JPEG", quality: int = 95) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format, **({"quality": quality} if image_format == "JPEG" else {}))
+    return buffer.getvalue()
+
+
+def build_pdf(pages: int) -> bytes:
+    document = fitz.open()
+    for number in range(pages):
+        scan = image_bytes(build_scan(2550, 3300, seed=number), "JPEG", 92)
+        page = document.new_page(width=612, height=792)
+        page.insert_image(page.rect, stream=scan)
+    content = document.tobytes()
+    document.close()
+    return content
+
+
+def measure(fn, *args):
+    with EncodeCounter() as counter:
+        started = time.process_time()
+        result = fn(*args)
+        cpu_ms = (time.process_time() - started) * 1000
+    return result, counter.count, cpu_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of page images (*.jpg, *.jpeg, *.png)")
+    parser.add_argument("--pdfs", help="Directory of PDFs")
+    parser.add_argument("--budgets", default="5242880,1572864,524288", help="Comma-separated byte budgets")
+    args = parser.parse_args()
+    budgets = [int(budget) for budget in args.budgets.split(",")]
+    logging.getLogger("server").setLevel(logging.WARNING)
+
+    if args.images:
+        images = {path.name: (path.read_bytes(), "image/png" if path.suffix.lower() == ".png" else "image/jpeg")
+                  for path in sorted(Path(args.images).iterdir()) if path.suffix.lower() in (".jpg", ".jpeg", ".png")}
+    else:
+        images = {
+            "scan_2x_letter.png": (image_bytes(build_scan(1224, 1584), "PNG"), "image/png"),
+            "scan_300dpi_letter.jpg": (image_bytes(build_scan(2550, 3300)), "image/jpeg"),
+            "scan_300dpi_letter.png": (image_bytes(build_scan(2550, 3300), "PNG"), "image/png"),
+            "phone_photo_4032x3024.jpg": (image_bytes(build_scan(4032, 3024, seed=5)), "image/jpeg"),
+            "oversized_9000x6000.jpg": (image_bytes(build_scan(9000, 6000, seed=9), "JPEG", 80), "image/jpeg"),
+        }
+    if args.pdfs:
+        pdfs = {path.name: path.read_bytes() for path in sorted(Path(args.pdfs).glob("*.pdf"))}
+    else:
+        pdfs = {"scanned_3_pages.pdf": build_pdf(3)}
+
+    print(f"{'input':28} {'budget':>8} {'input KB':>9} | {'old enc':>7} {'old ms':>8} {'old KB':>8} | "
+          f"{'new enc':>7} {'new ms':>8} {'new KB':>8}")
+    totals = {"old_encodes": 0, "new_encodes": 0, "old_ms": 0.0, "new_ms": 0.0}
+    for name, (content, media_type) in images.items():
+        for budget in budgets:
+            (old_data, _), old_encodes, old_ms = measure(legacy_compress_image_for_claude_api, content, media_type, budget)
+            (new_data, _), new_encodes, new_ms = measure(server.compress_image_for_claude_api, content, media_type, budget)
+            print(f"{name:28} {budget // 1024:>6}KB {len(content) // 1024:>9} | {old_encodes:>7} {old_ms:>8.0f} "
+                  f"{len(old_data) // 1024:>8} | {new_encodes:>7} {new_ms:>8.0f} {len(new_data) // 1024:>8}")
+            totals["old_encodes"] += old_encodes
+            totals["new_encodes"] += new_encodes
+            totals["old_ms"] += old_ms
+            totals["new_ms"] += new_ms
+            if len(old_data) <= budget:
+                assert len(new_data) <= budget, f"{name} @ {budget}: new output is over the budget"
+            assert new_encodes <= old_encodes + 1, f"{name} @ {budget}: {new_encodes} encodes, before {old_encodes}"
+
+    for name, content in pdfs.items():
+        for budget in budgets:
+            old_pages, old_encodes, old_ms = measure(legacy_render_pdf_pages, content, budget)
+            new_pages, new_encodes, new_ms = measure(ocr_engine.render_pdf_pages_for_claude, content, 2.0, "jpeg", budget)
+            old_kb = sum(len(page["data"]) for page in old_pages) // 1024
+            new_kb = sum(len(page["data"]) for page in new_pages) // 1024
+            print(f"{name + ' (render)':28} {budget // 1024:>6}KB {len(content) // 1024:>9} | {old_encodes:>7} {old_ms:>8.0f} "
+                  f"{old_kb:>8} | {new_encodes:>7} {new_ms:>8.0f} {new_kb:>8}")
+            assert all(len(page["data"]) <= budget for page in new_pages), f"{name} @ {budget}: a page is over the budget"
+
+    print(f"\nimages total: {totals['old_encodes']} -> {totals['new_encodes']} encodes, "
+          f"{totals['old_ms']:.0f}ms -> {totals['new_ms']:.0f}ms CPU")
+    assert totals["new_encodes"] < totals["old_encodes"], "the predictive search should need fewer encodes overall"
+    assert totals["new_ms"] < totals["old_ms"], "the predictive search should use less CPU overall"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark: adaptive Tesseract PSM selection vs the brute-force five-config search.
+Reports time, chars/sec, Tesseract calls and accuracy (similarity to ground truth)
+per fixture and in total. Needs the tesseract binary installed.
+
+The built-in corpus is generated (single column, two columns, sparse form, table-like
+grid). Real fixtures can be added with --fixtures DIR, where every image has a
+ground-truth .txt file with the same stem (e.g. birth_cert.png + birth_cert.txt).
+
+Run from the backend directory:
+    python -m benchmarks.tesseract_strategy [--fixtures DIR]
+"""
+
+import time
+import difflib
+import argparse
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont
+
+from ocr_engine import (
+    TESSERACT_CONFIGS, preprocess_image_for_ocr, tesseract_ocr_multi_config, adaptive_tesseract_ocr
+)
+
+SAMPLE_WORDS = ("certificate registry birth name father mother date place municipality "
+                "civil official record number book page witness declaration state country").split()
+
+
+def _font(size: int = 28):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def _line(seed: int, words: int) -> str:
+    return " ".join(SAMPLE_WORDS[(seed * 7 + i * 3) % len(SAMPLE_WORDS)] for i in range(words))
+
+
+def generated_corpus() -> list:
+    font = _font()
+    corpus = []
+
+    # Single column letter
+    image = Image.new("RGB", (1700, 2200), "white")
+    draw = ImageDraw.Draw(image)
+    lines = [_line(i, 9) for i in range(45)]
+    for i, text in enumerate(lines):
+        draw.text((120, 120 + i * 42), text, fill="black", font=font)
+    corpus.append(("single_column", image, "\n".join(lines)))
+
+    # Two columns
+    image = Image.new("RGB", (1700, 2200), "white")
+    draw = ImageDraw.Draw(image)
+    left = [_line(i, 4) for i in range(40)]
+    right = [_line(i + 50, 4) for i in range(40)]
+    for i in range(40):
+        draw.text((80, 120 + i * 46), left[i], fill="black", font=font)
+        draw.text((920, 120 + i * 46), right[i], fill="black", font=font)
+    corpus.append(("two_columns", image, "\n".join(left + right)))
+
+    # Sparse form (ID-card style)
+    image = Image.new("RGB", (1700, 1100), "white")
+    draw = ImageDraw.Draw(image)
+    fields = ["NAME JOHN SMITH", "DATE OF BIRTH 01 02 1990", "DOCUMENT 123456789", "ISSUED BY STATE REGISTRY"]
+    for i, text in enumerate(fields):
+        draw.text((150 + (i % 2) * 700, 150 + (i // 2) * 450), text, fill="black", font=font)
+    corpus.append(("sparse_form", image, "\n".join(fields)))
+
+    # Grid / table-like
+    image = Image.new("RGB", (1700, 2200), "white")
+    draw = ImageDraw.Draw(image)
+    cells = []
+    for row in range(20):
+        for col in range(3):
+            text = _line(row * 3 + col, 2)
+            cells.append(text)
+            draw.rectangle([100 + col * 500, 150 + row * 90, 600 + col * 500, 240 + row * 90], outline="black")
+            draw.text((120 + col * 500, 180 + row * 90), text, fill="black", font=font)
+    corpus.append(("table_grid", image, "\n".join(cells)))
+
+    return corpus
+
+
+def fixture_corpus(directory: Path) -> list:
+    corpus = []
+    for image_path in sorted(directory.iterdir()):
+        truth_path = image_path.with_suffix(".txt")
+        if image_path.suffix.lower() in (".png", ".jpg", ".jpeg", ".tif", ".tiff") and truth_path.exists():
+            corpus.append((image_path.stem, Image.open(image_path), truth_path.read_text(encoding="utf-8")))
+    return corpus
+
+
+def accuracy(text: str, truth: str) -> float:
+    normalize = lambda value: " ".join(value.split()).lower()
+    return difflib.SequenceMatcher(None, normalize(text), normalize(truth)).ratio()
+
+
+def main(fixtures: Path = None):
+    corpus = generated_corpus()
+    if fixtures:
+        corpus += fixture_corpus(fixtures)
+
+    totals = {"brute_force": [0.0, 0, 0, 0.0], "adaptive": [0.0, 0, 0, 0.0]}  # time, chars, calls, accuracy sum
+
+    print(f"{'fixture':<18}{'strategy':<13}{'time s':>8}{'chars/s':>10}{'calls':>7}{'accuracy':>10}")
+    for name, image, truth in corpus:
+        image = preprocess_image_for_ocr(image)
+
+        started = time.perf_counter()
+        text = tesseract_ocr_multi_config(image)
+        elapsed = time.perf_counter() - started
+        runs = {"brute_force": (text, elapsed, len(TESSERACT_CONFIGS))}
+
+        started = time.perf_counter()
+        result = adaptive_tesseract_ocr(image)
+        elapsed = time.perf_counter() - started
+        runs["adaptive"] = (result["text"], elapsed, result["attempts"])
+
+        for strategy, (text, elapsed, calls) in runs.items():
+            score = accuracy(text, truth)
+            totals[strategy][0] += elapsed
+            totals[strategy][1] += len(text)
+            totals[strategy][2] += calls
+            totals[strategy][3] += score
+            print(f"{name:<18}{strategy:<13}{elapsed:>8.2f}{len(text) / max(elapsed, 1e-9):>10.0f}{calls:>7}{score:>10.3f}")
+
+    print()
+    for strategy, (elapsed, chars, calls, score_sum) in totals.items():
+        print(f"{'TOTAL':<18}{strategy:<13}{elapsed:>8.2f}{chars / max(elapsed, 1e-9):>10.0f}{calls:>7}{score_sum / len(corpus):>10.3f}")
+    print(f"\nSpeedup: {totals['brute_force'][0] / max(totals['adaptive'][0], 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, help="directory of images with matching .txt ground truth")
+    args = parser.parse_args()
+    main(args.fixtures)
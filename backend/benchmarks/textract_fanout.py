@@ -0,0 +1,72 @@
+"""
+Benchmark: serial vs page-parallel Textract on a multi-page PDF, fully offline.
+Uses StubTextractClient (simulated round-trip latency) instead of AWS.
+
+Run from the backend directory:
+    python -m benchmarks.textract_fanout --pages 15 --latency 0.8 --concurrency 4
+"""
+
+import os
+import time
+import asyncio
+import argparse
+
+# server.py needs these at import time; the benchmark never touches MongoDB or AWS
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+os.environ["TEXTRACT_STUB"] = "1"
+
+import fitz  # PyMuPDF
+
+import server
+from ocr_engine import StubTextractClient, ocr_executor, render_pdf_pages_for_textract
+
+
+def build_pdf(pages: int) -> bytes:
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        for line in range(40):
+            page.insert_text((50, 50 + line * 18), f"Page {page_num + 1} line {line + 1} - sample contract text")
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+async def run(pages: int, latency: float, concurrency: int, fail_every: int):
+    content = build_pdf(pages)
+    rendered = render_pdf_pages_for_textract(content)
+
+    # Serial baseline (the previous behaviour)
+    server.textract_client = StubTextractClient(latency=latency, fail_every=fail_every)
+    started = time.perf_counter()
+    serial = server.textract_rendered_pdf_pages(rendered)
+    serial_time = time.perf_counter() - started
+
+    # Page-parallel fan-out
+    stub = StubTextractClient(latency=latency, fail_every=fail_every)
+    started = time.perf_counter()
+    parallel = await server.textract_pdf_pages_parallel(rendered, max_concurrency=concurrency, client=stub)
+    parallel_time = time.perf_counter() - started
+
+    def describe(result):
+        return "failed" if result is None else f"{len(result['text'])} chars"
+
+    print(f"Pages: {pages}  simulated latency: {latency:.2f}s  concurrency: {concurrency}")
+    print(f"  serial:   {serial_time:6.2f}s  result: {describe(serial)}")
+    print(f"  parallel: {parallel_time:6.2f}s  result: {describe(parallel)}  failed pages: {(parallel or {}).get('failed_pages', [])}")
+    if serial and parallel and not fail_every:
+        print(f"  identical output: {serial['text'] == parallel['text']}")
+    print(f"  speedup:  {serial_time / parallel_time:.1f}x")
+
+    ocr_executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=15)
+    parser.add_argument("--latency", type=float, default=0.8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--fail-every", type=int, default=0, help="make every Nth stub call fail")
+    args = parser.parse_args()
+    asyncio.run(run(args.pages, args.latency, args.concurrency, args.fail_every))
@@ -0,0 +1,267 @@
+"""
+Benchmark: Textract layout reconstruction (text, HTML and table renderers) on Textract JSON.
+
+Uses recorded analyze_document responses from --fixtures DIR (*.json, each either a full
+response with "Blocks" or a bare block list). Without fixtures it generates dense synthetic
+forms (hundreds of LINE blocks, many TABLEs) so the old O(lines x tables) behaviour shows up.
+--write-fixtures DIR saves the generated pages so later runs use identical input.
+
+Compares the shared TextractBlockIndex renderers against the previous per-renderer scans
+(legacy_reconstruct_layout_text below) and asserts identical text output.
+
+Run from the backend directory:
+    python -m benchmarks.textract_layout
+    python -m benchmarks.textract_layout --fixtures /path/to/textract_json --repeat 10
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+# server.py needs these at import time; the benchmark never touches MongoDB or AWS
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server
+
+
+def build_blocks(lines: int, tables: int, rows: int = 6, cols: int = 4, with_layout: bool = False, seed: int = 11) -> list:
+    """Synthetic analyze_document blocks: a dense form with free text lines and small tables"""
+    rng = random.Random(seed)
+    blocks = []
+    next_id = [0]
+
+    def new_id():
+        next_id[0] += 1
+        return f"b{next_id[0]}"
+
+    def bbox(top, left, width, height):
+        return {"BoundingBox": {"Top": top, "Left": left, "Width": width, "Height": height}}
+
+    def word_blocks(text, top, left):
+        ids = []
+        for offset, word in enumerate(text.split()):
+            word_id = new_id()
+            blocks.append({"Id": word_id, "BlockType": "WORD", "Text": word,
+                           "Geometry": bbox(top, left + offset * 0.05, 0.04, 0.01)})
+            ids.append(word_id)
+        return ids
+
+    line_ids = []
+    for line_number in range(lines):
+        top = rng.random() * 0.98
+        left = rng.choice([0.05, 0.1, 0.3, 0.55, 0.7])
+        text = f"Field {line_number} value {rng.randint(1000, 9999)} nome do titular"
+        line_id = new_id()
+        child_ids = word_blocks(text, top, left)
+        blocks.append({"Id": line_id, "BlockType": "LINE", "Text": text, "Confidence": 99.0,
+                       "Geometry": bbox(top, left, 0.3, 0.01),
+                       "Relationships": [{"Type": "CHILD", "Ids": child_ids}]})
+        line_ids.append(line_id)
+
+    for table_number in range(tables):
+        top = rng.random() * 0.9
+        left = rng.choice([0.05, 0.5])
+        cell_ids = []
+        for row in range(1, rows + 1):
+            for col in range(1, cols + 1):
+                cell_id = new_id()
+                child_ids = word_blocks(f"T{table_number} r{row} c{col}", top + row * 0.01, left + col * 0.1)
+                blocks.append({"Id": cell_id, "BlockType": "CELL", "RowIndex": row, "ColumnIndex": col,
+                               "RowSpan": 1, "ColumnSpan": 1, "Geometry": bbox(top + row * 0.01, left + col * 0.1, 0.1, 0.01),
+                               "Relationships": [{"Type": "CHILD", "Ids": child_ids}]})
+                cell_ids.append(cell_id)
+        blocks.append({"Id": new_id(), "BlockType": "TABLE", "Geometry": bbox(top, left, 0.45, rows * 0.012),
+                       "Relationships": [{"Type": "CHILD", "Ids": cell_ids}]})
+        if with_layout:
+            blocks.append({"Id": new_id(), "BlockType": "LAYOUT_TABLE", "Geometry": bbox(top, left, 0.45, rows * 0.012),
+                           "Relationships": [{"Type": "CHILD", "Ids": []}]})
+
+    if with_layout:
+        for chunk_start in range(0, len(line_ids), 5):
+            layout_top = rng.random() * 0.98
+            blocks.append({"Id": new_id(), "BlockType": "LAYOUT_TEXT", "Geometry": bbox(layout_top, 0.05, 0.9, 0.05),
+                           "Relationships": [{"Type": "CHILD", "Ids": line_ids[chunk_start:chunk_start + 5]}]})
+
+    rng.shuffle(blocks)
+    return blocks
+
+
+def legacy_reconstruct_layout_text(blocks: list, page_width_chars: int = 100) -> str:
+    """reconstruct_layout_text_from_textract before the shared block index (reference for parity and timing)"""
+    block_map = {block['Id']: block for block in blocks if 'Id' in block}
+
+    table_regions = []
+    for block in blocks:
+        if block['BlockType'] == 'TABLE':
+            bbox = block.get('Geometry', {}).get('BoundingBox', {})
+            if bbox:
+                table_regions.append({
+                    'top': bbox.get('Top', 0), 'left': bbox.get('Left', 0),
+                    'bottom': bbox.get('Top', 0) + bbox.get('Height', 0),
+                    'right': bbox.get('Left', 0) + bbox.get('Width', 0)
+                })
+
+    def is_in_table(top, left):
+        for tr in table_regions:
+            if (tr['top'] - 0.01 <= top <= tr['bottom'] + 0.01 and
+                    tr['left'] - 0.01 <= left <= tr['right'] + 0.01):
+                return True
+        return False
+
+    lines = []
+    for block in blocks:
+        if block['BlockType'] == 'LINE' and 'Geometry' in block:
+            bbox = block['Geometry']['BoundingBox']
+            top = bbox.get('Top', 0)
+            left = bbox.get('Left', 0)
+            if not is_in_table(top, left):
+                lines.append({'text': block.get('Text', ''), 'top': top, 'left': left})
+
+    tables = []
+    for block in blocks:
+        if block['BlockType'] == 'TABLE':
+            bbox = block.get('Geometry', {}).get('BoundingBox', {})
+            cells = []
+            for rel in block.get('Relationships', []):
+                if rel['Type'] == 'CHILD':
+                    for child_id in rel['Ids']:
+                        child_block = block_map.get(child_id)
+                        if child_block and child_block['BlockType'] == 'CELL':
+                            cells.append(child_block)
+            if cells:
+                max_row = max(cell.get('RowIndex', 1) for cell in cells)
+                max_col = max(cell.get('ColumnIndex', 1) for cell in cells)
+                col_widths = [15] * max_col
+                table_grid = [['' for _ in range(max_col)] for _ in range(max_row)]
+                for cell in cells:
+                    row_idx = cell.get('RowIndex', 1) - 1
+                    col_idx = cell.get('ColumnIndex', 1) - 1
+                    cell_text = ''
+                    for rel in cell.get('Relationships', []):
+                        if rel['Type'] == 'CHILD':
+                            for child_id in rel['Ids']:
+                                child_block = block_map.get(child_id)
+                                if child_block and child_block['BlockType'] == 'WORD':
+                                    cell_text += child_block.get('Text', '') + ' '
+                    cell_text = cell_text.strip()
+                    if row_idx < max_row and col_idx < max_col:
+                        table_grid[row_idx][col_idx] = cell_text
+                        col_widths[col_idx] = max(col_widths[col_idx], len(cell_text) + 2)
+                table_lines = []
+                separator = '+' + '+'.join(['-' * w for w in col_widths]) + '+'
+                table_lines.append(separator)
+                for row_idx, row in enumerate(table_grid):
+                    row_text = '|'
+                    for col_idx, cell_text in enumerate(row):
+                        row_text += cell_text.ljust(col_widths[col_idx]) + '|'
+                    table_lines.append(row_text)
+                    if row_idx == 0:
+                        table_lines.append(separator)
+                table_lines.append(separator)
+                tables.append({'text': '\n'.join(table_lines), 'top': bbox.get('Top', 0)})
+
+    all_elements = [{'type': 'line', 'top': line['top'], 'left': line['left'], 'text': line['text']} for line in lines]
+    all_elements += [{'type': 'table', 'top': table['top'], 'left': 0, 'text': table['text']} for table in tables]
+    all_elements.sort(key=lambda x: (round(x['top'], 2), x['left']))
+
+    row_threshold = 0.015
+    output_rows = []
+    current_row_elements = []
+    current_top = None
+    for elem in all_elements:
+        if elem['type'] == 'table':
+            if current_row_elements:
+                output_rows.append({'elements': current_row_elements, 'is_table': False})
+                current_row_elements = []
+                current_top = None
+            output_rows.append({'elements': [elem], 'is_table': True})
+        elif current_top is None:
+            current_top = elem['top']
+            current_row_elements = [elem]
+        elif abs(elem['top'] - current_top) <= row_threshold:
+            current_row_elements.append(elem)
+        else:
+            if current_row_elements:
+                output_rows.append({'elements': current_row_elements, 'is_table': False})
+            current_row_elements = [elem]
+            current_top = elem['top']
+    if current_row_elements:
+        output_rows.append({'elements': current_row_elements, 'is_table': False})
+
+    output_lines = []
+    for row in output_rows:
+        if row['is_table']:
+            output_lines.append(row['elements'][0]['text'])
+        else:
+            elements = sorted(row['elements'], key=lambda x: x['left'])
+            if len(elements) == 1:
+                output_lines.append(' ' * min(int(elements[0]['left'] * page_width_chars), 50) + elements[0]['text'])
+            else:
+                line_chars = [' '] * page_width_chars
+                for elem in elements:
+                    start_pos = int(elem['left'] * page_width_chars)
+                    for i, char in enumerate(elem['text']):
+                        if start_pos + i < page_width_chars:
+                            line_chars[start_pos + i] = char
+                output_lines.append(''.join(line_chars).rstrip())
+    return '\n'.join(output_lines)
+
+
+def load_fixtures(directory: str) -> dict:
+    fixtures = {}
+    for path in sorted(Path(directory).glob("*.json")):
+        data = json.loads(path.read_text())
+        fixtures[path.stem] = data["Blocks"] if isinstance(data, dict) else data
+    return fixtures
+
+
+def timed(fn, repeat: int):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="Directory of recorded Textract JSON responses")
+    parser.add_argument("--write-fixtures", help="Save the generated pages as JSON fixtures into this directory")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = {
+            "form_200_lines_10_tables": build_blocks(200, 10),
+            "form_600_lines_60_tables": build_blocks(600, 60),
+            "form_1500_lines_200_tables": build_blocks(1500, 200, rows=4, cols=3),
+            "layout_600_lines_60_tables": build_blocks(600, 60, with_layout=True),
+        }
+        if args.write_fixtures:
+            os.makedirs(args.write_fixtures, exist_ok=True)
+            for name, blocks in fixtures.items():
+                Path(args.write_fixtures, f"{name}.json").write_text(json.dumps({"Blocks": blocks}))
+
+    print(f"{'fixture':32} {'blocks':>7} {'legacy text':>12} {'index':>8} {'text':>8} {'html':>8} {'page total':>11}  parity")
+    for name, blocks in fixtures.items():
+        legacy_text, legacy_ms = timed(lambda: legacy_reconstruct_layout_text(blocks), args.repeat)
+        index, index_ms = timed(lambda: server.TextractBlockIndex(blocks), args.repeat)
+        text, text_ms = timed(lambda: server.reconstruct_layout_text_from_textract(index), args.repeat)
+        _, html_ms = timed(lambda: server.reconstruct_layout_html_from_textract(index), args.repeat)
+        parity = text == legacy_text
+        print(f"{name:32} {len(blocks):>7} {legacy_ms:>10.2f}ms {index_ms:>6.2f}ms {text_ms:>6.2f}ms {html_ms:>6.2f}ms "
+              f"{index_ms + text_ms + html_ms:>9.2f}ms  {'OK' if parity else 'MISMATCH'}")
+        assert parity, f"{name}: text output differs from the previous implementation"
+
+
+if __name__ == "__main__":
+    main()
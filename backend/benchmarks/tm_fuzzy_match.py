@@ -0,0 +1,171 @@
+"""
+Benchmark: fuzzy translation memory lookups (tm_index.TMPairIndex) at 100k+ entries.
+
+Uses the source segments of --csv FILE (first column, or the "source" column when there is a
+header) when given. Without it it generates certificate/transcript-like segments over a Zipf
+distributed vocabulary, so a few words are very common and most are rare, as in real TMs.
+
+Queries are TM segments with 0-3 words replaced or dropped plus unrelated segments. Reports
+index build time and memory per entry, lookup latency (mean / p95 / max per segment) and, on
+a smaller sample, recall of the index against a brute-force edit-distance scan of every entry.
+Asserts mean lookup latency stays under --max-ms and recall of >= min-match neighbours is high.
+
+Run from the backend directory:
+    python -m benchmarks.tm_fuzzy_match
+    python -m benchmarks.tm_fuzzy_match --entries 250000 --queries 2000
+    python -m benchmarks.tm_fuzzy_match --csv /path/to/tm_export.csv
+"""
+
+import csv
+import time
+import random
+import argparse
+import tracemalloc
+from difflib import SequenceMatcher
+
+from tm_index import TMPairIndex, normalize_segment, match_percent
+
+SYLLABLES = ["ca", "de", "ra", "to", "mi", "sa", "li", "no", "pe", "ri", "ção", "ta", "ma", "lo", "ve", "ni", "co", "bra", "ten", "dor",
+             "gu", "fe", "xi", "zu", "vol", "pre", "mun", "cer", "ti", "ju", "ral", "bo", "nes", "fal", "gra", "que"]
+FUNCTION_WORDS = ["de", "da", "do", "e", "a", "o", "em", "para", "no", "na", "com", "que", "por", "os", "as"]
+
+
+def build_vocabulary(size: int, rng: random.Random) -> list:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def build_segments(count: int, seed: int = 21) -> list:
+    """Synthetic TM sources: function words plus Zipf-distributed content words and numbers"""
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(20000, rng)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    segments = []
+    for _ in range(count):
+        length = rng.randint(3, 18)
+        content = rng.choices(vocabulary, weights, k=length)
+        words = []
+        for word in content:
+            words.append(word)
+            if rng.random() < 0.35:
+                words.append(rng.choice(FUNCTION_WORDS))
+        if rng.random() < 0.3:
+            words.append(str(rng.randint(1, 99999)))
+        segments.append(" ".join(words).capitalize() + rng.choice(["", ".", ":"]))
+    return segments, vocabulary
+
+
+def load_csv(path: str) -> list:
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        rows = list(csv.reader(handle))
+    column = 0
+    if rows and any("source" in cell.lower() for cell in rows[0]):
+        column = next(i for i, cell in enumerate(rows[0]) if "source" in cell.lower())
+        rows = rows[1:]
+    return [row[column] for row in rows if len(row) > column and row[column].strip()]
+
+
+def build_queries(segments: list, vocabulary: list, count: int, seed: int = 7) -> list:
+    """Edited copies of TM segments (0-3 words replaced or dropped) and unrelated segments"""
+    rng = random.Random(seed)
+    queries = []
+    for number in range(count):
+        if number % 5 == 4:
+            queries.append(" ".join(rng.choice(vocabulary) for _ in range(rng.randint(4, 12))))
+            continue
+        words = rng.choice(segments).split()
+        for _ in range(rng.randint(0, min(3, len(words) // 4))):
+            position = rng.randrange(len(words))
+            if rng.random() < 0.5:
+                words[position] = rng.choice(vocabulary)
+            else:
+                del words[position]
+        queries.append(" ".join(words))
+    return queries
+
+
+def build_index(segments: list) -> TMPairIndex:
+    index = TMPairIndex()
+    for number, source in enumerate(segments):
+        index.add(str(number), source, f"target {number}", score=100 if number % 3 == 0 else 90)
+    return index
+
+
+def brute_force(sources: list, query: str, min_match: int) -> set:
+    """Ids of every entry whose edit-distance match reaches min_match (quick ratios bound it from above)"""
+    normalized = normalize_segment(query)
+    expected = set()
+    for number, source in enumerate(sources):
+        matcher = SequenceMatcher(None, normalized, source, autojunk=False)
+        if matcher.real_quick_ratio() * 100 >= min_match and matcher.quick_ratio() * 100 >= min_match \
+                and match_percent(normalized, source) >= min_match:
+            expected.add(str(number))
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="CSV export of a translation memory (source segments)")
+    parser.add_argument("--entries", type=int, default=100000, help="Synthetic TM size")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--min-match", type=int, default=70)
+    parser.add_argument("--recall-entries", type=int, default=2000, help="TM size for the brute-force recall check")
+    parser.add_argument("--max-ms", type=float, default=3.0, help="Mean lookup latency budget per segment")
+    args = parser.parse_args()
+
+    if args.csv:
+        segments = load_csv(args.csv)
+        vocabulary = sorted({word for segment in segments[:20000] for word in segment.split()})
+    else:
+        segments, vocabulary = build_segments(args.entries)
+
+    started = time.perf_counter()
+    index = build_index(segments)
+    build_s = time.perf_counter() - started
+    tracemalloc.start()
+    sized = build_index(segments[:10000])
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del sized
+    stats = index.stats()
+    print(f"index: {stats['entries']} entries, {stats['ngrams']} bigrams, built in {build_s:.1f}s "
+          f"({build_s / max(1, len(segments)) * 1e6:.0f}us per insert), ~{memory / min(10000, max(1, len(segments))):.0f} bytes per entry")
+
+    queries = build_queries(segments, vocabulary, args.queries)
+    timings = []
+    found = 0
+    for query in queries:
+        started = time.perf_counter()
+        matches = index.lookup(query, min_match=args.min_match)
+        timings.append((time.perf_counter() - started) * 1000)
+        found += bool(matches)
+    timings.sort()
+    mean_ms = sum(timings) / len(timings)
+    print(f"lookups: {len(queries)} segments, {found} with a >= {args.min_match}% match | "
+          f"mean {mean_ms:.2f}ms  p95 {timings[int(len(timings) * 0.95)]:.2f}ms  max {timings[-1]:.2f}ms")
+
+    sample = segments[:args.recall_entries]
+    sample_index = build_index(sample)
+    normalized_sample = [normalize_segment(source) for source in sample]
+    sample_queries = build_queries(sample, vocabulary, min(100, args.queries), seed=11)
+    expected_total = 0
+    recalled = 0
+    for query in sample_queries:
+        expected = brute_force(normalized_sample, query, args.min_match)
+        best = {match["id"] for match in sample_index.lookup(query, limit=len(expected) or 1, min_match=args.min_match)}
+        expected_total += len(expected)
+        recalled += len(expected & best)
+    recall = recalled / expected_total if expected_total else 1.0
+    print(f"recall vs brute force ({len(sample)} entries, {len(sample_queries)} queries): "
+          f"{recalled}/{expected_total} = {recall:.1%}")
+
+    assert mean_ms <= args.max_ms, f"mean lookup {mean_ms:.2f}ms is over {args.max_ms}ms"
+    assert recall >= 0.9, f"recall {recall:.1%} is too low"
+
+
+if __name__ == "__main__":
+    main()
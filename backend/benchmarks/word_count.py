@@ -0,0 +1,135 @@
+"""
+Benchmark: count_words throughput and parity with the previous implementation.
+Builds a ~1 MB mixed pt/en/es text (OCR-like noise: punctuation, page numbers, dates,
+accented words, table separators) unless --fixture is given, then asserts:
+  - exact parity with the previous count_words on the whole text and on every line
+    (page separator lines, which count_words skips, are removed before the previous one counts)
+  - throughput of at least --min-mb-per-sec
+
+Run from the backend directory:
+    python -m benchmarks.word_count
+    python -m benchmarks.word_count --fixture /path/to/ocr_output.txt --min-mb-per-sec 5
+"""
+
+import os
+import re
+import time
+import random
+import logging
+import argparse
+
+# server.py needs these at import time; the benchmark never touches MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server
+
+WORDS = [
+    "certidão", "nascimento", "registro", "civil", "cartório", "declaração", "the", "certificate",
+    "of", "birth", "and", "to", "in", "de", "da", "do", "em", "um", "a", "o", "e", "el", "la", "y",
+    "acta", "matrimonio", "República", "Federativa", "Brasil", "São", "Paulo", "nº", "CPF:",
+    "(assinatura)", "—", "...", "|", "I", "II", "Dr.", "Sr.ª", "x", "ok", "it's", "l'État", "e-mail",
+]
+
+
+def build_text(size_bytes: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size_bytes:
+        tokens = []
+        for _ in range(rng.randint(3, 18)):
+            roll = rng.random()
+            if roll < 0.08:
+                tokens.append(str(rng.randint(0, 99999)))
+            elif roll < 0.12:
+                tokens.append(f"{rng.randint(1, 31):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2025)}")
+            elif roll < 0.15:
+                tokens.append(rng.choice(["-", "--", "***", "§", "•", ":", "(", ")"]))
+            else:
+                word = rng.choice(WORDS)
+                tokens.append(word.upper() if roll > 0.97 else word)
+        line = rng.choice([" ", "  ", "\t"]).join(tokens)
+        lines.append(line)
+        total += len(line.encode("utf-8")) + 1
+    return "\n".join(lines)
+
+
+def legacy_count_words(text: str) -> int:
+    """count_words as it was before the single-pass tokenizer (reference for parity)"""
+    if not text or not text.strip():
+        return 0
+    cleaned_text = re.sub(r'\s+', ' ', text.strip())
+    words = [word.strip() for word in cleaned_text.split() if word.strip()]
+    common_short_words = {
+        'a', 'an', 'the', 'of', 'to', 'in', 'on', 'at', 'by', 'for', 'is', 'as',
+        'or', 'if', 'it', 'be', 'we', 'he', 'me', 'my', 'no', 'so', 'up', 'do', 'go',
+        'i', 'am', 'us', 'vs',
+        'de', 'da', 'do', 'em', 'um', 'se', 'ao', 'os', 'as', 'no', 'na', 'ou',
+        'eu', 'tu', 'me', 'te', 'lhe', 'nos', 'vos', 'ja', 'e', 'o', 'a', 'que',
+        'por', 'para', 'com', 'sem', 'sob', 'mais', 'menos', 'mas', 'nem',
+        'el', 'la', 'en', 'un', 'una', 'es', 'de', 'del', 'al', 'lo', 'los', 'las',
+        'y', 'que', 'su', 'sus', 'mi', 'tu', 'se', 'si', 'por', 'para', 'con', 'sin'
+    }
+    filtered_words = []
+    for word in words:
+        cleaned_word = re.sub(r'^[^\w]+|[^\w]+$', '', word)
+        if not cleaned_word:
+            continue
+        if cleaned_word.isdigit() and len(cleaned_word) < 4:
+            continue
+        if len(cleaned_word) > 2 or cleaned_word.lower() in common_short_words:
+            filtered_words.append(word)
+    return len(filtered_words)
+
+
+def best_of(fn, text: str, repeat: int) -> tuple:
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", help="Text file to count instead of the generated 1 MB corpus")
+    parser.add_argument("--size-mb", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-mb-per-sec", type=float, default=2.0)
+    args = parser.parse_args()
+
+    # count_words logs every call; keep the timing loop quiet
+    server.logger.setLevel(logging.WARNING)
+
+    if args.fixture:
+        with open(args.fixture, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = build_text(int(args.size_mb * 1024 * 1024))
+    size_mb = len(text.encode("utf-8")) / (1024 * 1024)
+
+    legacy_text = server.PAGE_MARKER_PATTERN.sub('', text)
+    legacy, legacy_time = best_of(legacy_count_words, legacy_text, args.repeat)
+    current, current_time = best_of(server.count_words, text, args.repeat)
+
+    mismatched_lines = [line for line in text.splitlines()
+                        if legacy_count_words(server.PAGE_MARKER_PATTERN.sub('', line)) != server.count_words(line)]
+
+    print(f"Text: {size_mb:.2f} MB, best of {args.repeat}")
+    print(f"  previous:  {legacy:>8} words  {legacy_time * 1000:8.1f} ms  {size_mb / legacy_time:6.1f} MB/s")
+    print(f"  current:   {current:>8} words  {current_time * 1000:8.1f} ms  {size_mb / current_time:6.1f} MB/s")
+    print(f"  speedup:   {legacy_time / current_time:.1f}x")
+
+    assert current == legacy, f"word count mismatch: {current} != {legacy}"
+    assert not mismatched_lines, f"{len(mismatched_lines)} lines differ, first: {mismatched_lines[0]!r}"
+    assert size_mb / current_time >= args.min_mb_per_sec, \
+        f"throughput {size_mb / current_time:.1f} MB/s below {args.min_mb_per_sec} MB/s"
+    print("  parity and throughput OK")
+
+
+if __name__ == "__main__":
+    main()
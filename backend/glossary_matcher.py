@@ -0,0 +1,124 @@
+"""
+Glossary Term Matcher
+Finds which glossary terms occur in a source text, so prompts only carry the terms the document
+actually uses (in the order it uses them) instead of the first N terms of every glossary:
+- the source terms of a glossary selection are compiled once into an Aho-Corasick automaton
+  (trie + failure links); server.py keeps compiled automata until a glossary changes
+- a scan is one linear pass over the text, independent of the number of terms
+- matching ignores case and collapses runs of whitespace (OCR line breaks inside a term),
+  honours word boundaries ("ato" does not match inside "contato") and prefers the longest term
+  when terms overlap ("certidão de nascimento" over "certidão")
+
+Pure Python, no MongoDB access.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_term_text(text: str) -> str:
+    """Lowercase with single spaces; applied to terms and scanned text alike"""
+    return _WHITESPACE.sub(" ", (text or "").lower()).strip()
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class GlossaryAutomaton:
+    """Aho-Corasick automaton over glossary source terms"""
+
+    def __init__(self, terms: List[dict]):
+        """
+        terms: [{source, target, ...}] in priority order; a later term whose source repeats an
+        earlier one (ignoring case and spacing) is dropped, as in the prompt builders.
+        """
+        self.terms: List[dict] = []
+        self._keys: List[str] = []              # normalized source of each term
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]    # term indexes ending at each node (own + via failure links)
+
+        seen = set()
+        for term in terms:
+            source = normalize_term_text(term.get("source"))
+            if not source or not term.get("target") or source in seen:
+                continue
+            seen.add(source)
+            self._insert(source, len(self.terms))
+            self.terms.append(term)
+            self._keys.append(source)
+        self._link()
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _insert(self, key: str, term_index: int):
+        node = 0
+        for char in key:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(term_index)
+
+    def _link(self):
+        """Breadth-first failure links; each node also inherits the outputs of its failure node"""
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fallback = self._goto[fail].get(char, 0)
+                self._fail[child] = fallback if fallback != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def _occurrences(self, text: str) -> List[Tuple[int, int, int]]:
+        """(start, end, term index) of every whole-word occurrence, in one pass over text"""
+        goto, fail, output, keys = self._goto, self._fail, self._output, self._keys
+        found = []
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for term_index in output[node]:
+                key = keys[term_index]
+                end = position + 1
+                start = end - len(key)
+                if _is_word_char(key[0]) and start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if _is_word_char(key[-1]) and end < len(text) and _is_word_char(text[end]):
+                    continue
+                found.append((start, end, term_index))
+        return found
+
+    def find(self, text: str) -> List[dict]:
+        """
+        Terms occurring in text, each once, in order of first occurrence; overlapping
+        occurrences resolve to the leftmost, then longest, term.
+        """
+        if not self.terms or not text:
+            return []
+        occurrences = sorted(self._occurrences(normalize_term_text(text)), key=lambda item: (item[0], item[0] - item[1]))
+        matched, seen = [], set()
+        covered_until = 0
+        for start, end, term_index in occurrences:
+            if start < covered_until:
+                continue
+            covered_until = end
+            if term_index not in seen:
+                seen.add(term_index)
+                matched.append(self.terms[term_index])
+        return matched
@@ -0,0 +1,339 @@
+"""
+Durable Job Queue
+Background jobs stored in the MongoDB `jobs` collection, so long-running work (AI pipeline
+stages, large TM and glossary imports) runs outside HTTP requests and survives restarts:
+- enqueue() inserts a queued job and returns its id immediately
+- workers claim jobs atomically (find_one_and_update) and hold a lease on them; a heartbeat
+  extends the lease while the handler runs
+- a job whose lease expires (worker crashed, was killed or redeployed) is claimed again by
+  any other worker
+- failures are retried with exponential backoff up to max_attempts; after the last attempt
+  (or a JobFailed error) the job is marked failed and the handler's on_failure hook runs
+- handlers can record their progress on the job (report_progress) for status endpoints
+- secrets (API keys) passed to enqueue() are kept out of public views and removed from the
+  job once it finishes
+
+Workers run inside the API process (JOB_WORKER_IN_PROCESS) and/or as separate processes
+(python worker.py); they all share the same collection, so throughput scales with the
+number of workers independently of API replicas.
+
+Configuration (environment variables):
+- JOB_WORKER_CONCURRENCY: jobs one worker runs at the same time (default: 2)
+- JOB_LEASE_SECONDS: lease length; a job is re-claimed this long after its last heartbeat (default: 120)
+- JOB_HEARTBEAT_SECONDS: how often a running job renews its lease (default: 30)
+- JOB_POLL_SECONDS: idle wait between claim attempts (default: 2)
+- JOB_MAX_ATTEMPTS: default attempts per job, including the first (default: 3)
+- JOB_RETRY_BACKOFF_SECONDS: delay before the first retry, doubled on each further one (default: 30)
+- JOB_RETENTION_DAYS: finished jobs are deleted this long after completion (default: 14)
+"""
+
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKER_CONCURRENCY = int(os.environ.get("JOB_WORKER_CONCURRENCY", "2"))
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_SECONDS = int(os.environ.get("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF_SECONDS = int(os.environ.get("JOB_RETRY_BACKOFF_SECONDS", "30"))
+JOB_RETENTION_DAYS = int(os.environ.get("JOB_RETENTION_DAYS", "14"))
+
+JobHandler = Callable[[dict], Awaitable[Any]]
+FailureHook = Callable[[dict, str], Awaitable[None]]
+
+
+class JobFailed(Exception):
+    """Raised by a handler for errors that retrying cannot fix (missing records, bad input)"""
+
+
+class JobQueue:
+    """Job storage, handler registry and the claim / complete / retry state machine"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.handlers: Dict[str, dict] = {}
+        self.stats = {"enqueued": 0, "claimed": 0, "completed": 0, "retried": 0, "failed": 0, "recovered": 0}
+        self._wakeup = asyncio.Event()
+
+    def register(self, job_type: str, max_attempts: int = None, on_failure: FailureHook = None):
+        """Decorator: run `job_type` jobs with the decorated coroutine (it receives the job document)"""
+        def decorator(handler: JobHandler) -> JobHandler:
+            self.handlers[job_type] = {
+                "handler": handler,
+                "max_attempts": max_attempts or JOB_MAX_ATTEMPTS,
+                "on_failure": on_failure
+            }
+            return handler
+        return decorator
+
+    async def enqueue(self, job_type: str, payload: dict = None, secrets: dict = None,
+                      run_at: datetime = None, max_attempts: int = None) -> str:
+        """Queue a job and return its id"""
+        registered = self.handlers.get(job_type, {})
+        now = datetime.utcnow()
+        job = {
+            "id": str(uuid.uuid4()),
+            "type": job_type,
+            "payload": payload or {},
+            "secrets": secrets or {},
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": max_attempts or registered.get("max_attempts") or JOB_MAX_ATTEMPTS,
+            "run_at": run_at or now,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "last_error": None,
+            "result": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        await self.collection.insert_one(job)
+        self.stats["enqueued"] += 1
+        self._wakeup.set()
+        logger.info(f"Job {job['id']} queued: {job_type}")
+        return job["id"]
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await self.collection.find_one({"id": job_id}, {"_id": 0, "secrets": 0})
+        return job
+
+    async def claim(self, worker_id: str) -> Optional[dict]:
+        """Atomically take the next due job (or one whose lease expired) for this worker"""
+        if not self.handlers:
+            return None
+        now = datetime.utcnow()
+        claimed = {
+            "status": "running",
+            "lease_owner": worker_id,
+            "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+            "heartbeat_at": now,
+            "started_at": now,
+            "updated_at": now
+        }
+        previous = await self.collection.find_one_and_update(
+            {
+                "type": {"$in": list(self.handlers)},
+                "$or": [
+                    {"status": "queued", "run_at": {"$lte": now}},
+                    {"status": "running", "lease_expires_at": {"$lt": now}}
+                ]
+            },
+            {"$set": claimed, "$inc": {"attempts": 1}},
+            sort=[("run_at", 1)],
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous is None:
+            return None
+
+        self.stats["claimed"] += 1
+        if previous["status"] == "running":
+            self.stats["recovered"] += 1
+            logger.warning(f"Job {previous['id']} ({previous['type']}) re-claimed from {previous.get('lease_owner')} "
+                           f"after its lease expired")
+        return {**previous, **claimed, "attempts": previous["attempts"] + 1}
+
+    async def heartbeat(self, job: dict, worker_id: str) -> bool:
+        """Extend the lease; False when the job is no longer ours (lease lost to another worker)"""
+        now = datetime.utcnow()
+        result = await self.collection.update_one(
+            {"id": job["id"], "status": "running", "lease_owner": worker_id},
+            {"$set": {"lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS), "heartbeat_at": now}}
+        )
+        return result.matched_count == 1
+
+    async def report_progress(self, job: dict, progress: dict):
+        """Record how far a running job has got; shown by get() until the job finishes"""
+        await self.collection.update_one(
+            {"id": job["id"], "lease_owner": job.get("lease_owner")},
+            {"$set": {"progress": progress, "updated_at": datetime.utcnow()}}
+        )
+
+    async def complete(self, job: dict, worker_id: str, result: Any = None):
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"id": job["id"], "lease_owner": worker_id},
+            {"$set": {
+                "status": "completed",
+                "result": result,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "completed_at": now,
+                "updated_at": now
+            }, "$unset": {"secrets": ""}}
+        )
+        self.stats["completed"] += 1
+
+    async def fail(self, job: dict, worker_id: str, error: str, retryable: bool = True):
+        """Schedule a retry with backoff, or mark the job failed and run its on_failure hook"""
+        now = datetime.utcnow()
+        if retryable and job["attempts"] < job["max_attempts"]:
+            delay = JOB_RETRY_BACKOFF_SECONDS * (2 ** (job["attempts"] - 1))
+            await self.collection.update_one(
+                {"id": job["id"], "lease_owner": worker_id},
+                {"$set": {
+                    "status": "queued",
+                    "run_at": now + timedelta(seconds=delay),
+                    "last_error": error,
+                    "lease_owner": None,
+                    "lease_expires_at": None,
+                    "updated_at": now
+                }}
+            )
+            self.stats["retried"] += 1
+            logger.warning(f"Job {job['id']} ({job['type']}) attempt {job['attempts']}/{job['max_attempts']} failed, "
+                           f"retrying in {delay}s: {error}")
+            return
+
+        await self.collection.update_one(
+            {"id": job["id"], "lease_owner": worker_id},
+            {"$set": {
+                "status": "failed",
+                "last_error": error,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "completed_at": now,
+                "updated_at": now
+            }, "$unset": {"secrets": ""}}
+        )
+        self.stats["failed"] += 1
+        logger.error(f"Job {job['id']} ({job['type']}) failed after {job['attempts']} attempt(s): {error}")
+
+        on_failure = self.handlers.get(job["type"], {}).get("on_failure")
+        if on_failure:
+            try:
+                await on_failure(job, error)
+            except Exception as e:
+                logger.error(f"Job {job['id']} on_failure hook error: {e}")
+
+    async def release(self, job: dict, worker_id: str):
+        """Hand a job back untouched (worker shutting down): it is claimed again without losing an attempt"""
+        await self.collection.update_one(
+            {"id": job["id"], "lease_owner": worker_id, "status": "running"},
+            {"$set": {"status": "queued", "lease_owner": None, "lease_expires_at": None, "updated_at": datetime.utcnow()},
+             "$inc": {"attempts": -1}}
+        )
+
+    async def wait_for_work(self, timeout: float):
+        """Sleep until a job is enqueued in this process or the poll interval elapses"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def metrics(self) -> dict:
+        counts = {}
+        try:
+            async for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+                counts[row["_id"]] = row["count"]
+        except Exception as e:
+            logger.warning(f"Job metrics query failed: {e}")
+        return {"by_status": counts, **self.stats}
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("id", unique=True)
+        await self.collection.create_index([("status", 1), ("run_at", 1)])
+        await self.collection.create_index([("status", 1), ("lease_expires_at", 1)])
+        # Finished jobs only: queued/running jobs have no completed_at and are never expired
+        await self.collection.create_index("completed_at", expireAfterSeconds=JOB_RETENTION_DAYS * 24 * 3600)
+
+
+class JobWorker:
+    """Claims and runs jobs from a JobQueue with bounded concurrency until stop() is called"""
+
+    def __init__(self, queue: JobQueue, concurrency: int = JOB_WORKER_CONCURRENCY, worker_id: str = None):
+        self.queue = queue
+        self.concurrency = max(concurrency, 1)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        logger.info(f"Job worker {self.worker_id} started (concurrency {self.concurrency}, "
+                    f"job types: {', '.join(self.queue.handlers) or 'none'})")
+        slots = asyncio.Semaphore(self.concurrency)
+        while not self._stopping.is_set():
+            await slots.acquire()
+            if self._stopping.is_set():
+                slots.release()
+                break
+            try:
+                job = await self.queue.claim(self.worker_id)
+            except Exception as e:
+                logger.error(f"Job worker {self.worker_id}: claim failed: {e}")
+                job = None
+            if job is None:
+                slots.release()
+                await self.queue.wait_for_work(JOB_POLL_SECONDS)
+                continue
+
+            task = asyncio.create_task(self._execute(job))
+            self._running[job["id"]] = task
+
+            def finished(_task, job_id=job["id"]):
+                self._running.pop(job_id, None)
+                slots.release()
+
+            task.add_done_callback(finished)
+
+        # Hand unfinished jobs back so another worker picks them up immediately
+        for task in list(self._running.values()):
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+        logger.info(f"Job worker {self.worker_id} stopped")
+
+    def stop(self):
+        self._stopping.set()
+        self.queue._wakeup.set()
+
+    async def _execute(self, job: dict):
+        registered = self.queue.handlers[job["type"]]
+
+        if job["attempts"] > job["max_attempts"]:
+            # Lease expired on the final attempt (e.g. the job keeps crashing its worker)
+            await self.queue.fail(job, self.worker_id, job.get("last_error") or "Lease expired on the last attempt", retryable=False)
+            return
+
+        handler_task = asyncio.create_task(registered["handler"](job))
+        heartbeat_task = asyncio.create_task(self._heartbeat(job, handler_task))
+        try:
+            result = await handler_task
+        except asyncio.CancelledError:
+            if not handler_task.done():
+                handler_task.cancel()
+            if self._stopping.is_set():
+                await self.queue.release(job, self.worker_id)
+                logger.info(f"Job {job['id']} released on shutdown")
+            else:
+                logger.warning(f"Job {job['id']} cancelled: lease lost to another worker")
+            return
+        except JobFailed as e:
+            await self.queue.fail(job, self.worker_id, str(e), retryable=False)
+        except Exception as e:
+            await self.queue.fail(job, self.worker_id, str(e) or type(e).__name__)
+        else:
+            await self.queue.complete(job, self.worker_id, result)
+        finally:
+            heartbeat_task.cancel()
+
+    async def _heartbeat(self, job: dict, handler_task: asyncio.Task):
+        while not handler_task.done():
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                still_ours = await self.queue.heartbeat(job, self.worker_id)
+            except Exception as e:
+                logger.warning(f"Job {job['id']} heartbeat failed: {e}")
+                continue
+            if not still_ours:
+                handler_task.cancel()
+                return
@@ -0,0 +1,829 @@
+"""
+OCR Execution Engine
+Keeps OCR work off the FastAPI event loop:
+- CPU-bound work (Tesseract, PyMuPDF text-layer routing and rasterization) runs in a process pool
+- Blocking network OCR calls (AWS Textract via boto3) run in a thread pool
+
+Every pool tracks queue depth and latency so the worker counts can be sized per container.
+
+Configuration (environment variables):
+- OCR_PROCESS_WORKERS: CPU pool size (default: CPU count; 0 runs CPU work in threads instead)
+- OCR_THREAD_WORKERS: I/O pool size for Textract calls (default: 8)
+- OCR_PROCESS_START_METHOD: multiprocessing start method for CPU workers (default: spawn)
+- OCR_TESSERACT_MODE: "adaptive" (default) or "brute_force" (try every PSM, keep the longest text)
+- OCR_TESSERACT_MIN_CONFIDENCE: mean word confidence that stops the adaptive search early (default: 75)
+"""
+
+import os
+import io
+import math
+import time
+import asyncio
+import logging
+import hashlib
+import functools
+import threading
+import multiprocessing
+from collections import deque, Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, List, Union
+
+import numpy as np
+import pytesseract
+import fitz  # PyMuPDF
+from PIL import Image, ImageEnhance, ImageFilter
+
+logger = logging.getLogger(__name__)
+
+# Worker processes import this module on their own, so the Tesseract path is set here too
+pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
+
+TESSERACT_CONFIGS = [
+    r'--oem 3 --psm 6',   # Uniform text block (default)
+    r'--oem 3 --psm 3',   # Fully automatic
+    r'--oem 3 --psm 4',   # Single column
+    r'--oem 3 --psm 1',   # Auto with OSD
+    r'--oem 3 --psm 12',  # Sparse text
+]
+
+TEXTRACT_MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB max for Textract
+CLAUDE_MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB per image for the Claude API
+CLAUDE_MAX_IMAGE_DIMENSION = 7900  # API limit is 8000px per side
+
+JPEG_MAX_QUALITY = 85
+JPEG_MIN_QUALITY = 40
+JPEG_SCALED_QUALITY = 70  # quality used once an image has to be downscaled
+JPEG_BUDGET_MARGIN = 0.92  # aim scaled encodes a little under the budget so one attempt usually fits
+JPEG_SIZE_SLOPE = 0.03  # typical d(ln bytes)/d(quality) for scanned pages and photos around quality 55-85
+
+FileSource = Union[bytes, str]  # File bytes or a path on local disk
+
+TESSERACT_MODE = os.environ.get("OCR_TESSERACT_MODE", "adaptive")
+TESSERACT_MIN_CONFIDENCE = float(os.environ.get("OCR_TESSERACT_MIN_CONFIDENCE", "75"))
+TESSERACT_MIN_CHARS = 20  # An "accepted" result must also contain some actual text
+
+PDF_PAGE_MIN_TEXT_CHARS = 25  # Fewer characters than this in a page's text layer means it needs OCR
+PDF_SCANNED_PAGE_MIN_TEXT_CHARS = 200  # A page mostly covered by an image needs this much text to skip OCR
+
+
+# ==================== WORKER FUNCTIONS (run inside the pools) ====================
+# These must stay module-level and take/return plain bytes/str so they can be pickled.
+# "content" may be the file bytes or the path of a spooled upload (avoids pickling large files).
+
+def _binary_source(content):
+    """Bytes -> in-memory stream; a file path is passed through unchanged"""
+    if isinstance(content, (bytes, bytearray)):
+        return io.BytesIO(content)
+    return content
+
+
+def _open_pdf(content):
+    if isinstance(content, (bytes, bytearray)):
+        return fitz.open(stream=content, filetype="pdf")
+    return fitz.open(content, filetype="pdf")
+
+
+def preprocess_image_for_ocr(image):
+    """Preprocess image for better OCR results"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Enhance contrast
+    enhancer = ImageEnhance.Contrast(image)
+    image = enhancer.enhance(2.0)
+
+    # Sharpen
+    image = image.filter(ImageFilter.SHARPEN)
+
+    # Resize if too small
+    width, height = image.size
+    if width < 1000 or height < 1000:
+        scale_factor = max(1000/width, 1000/height)
+        new_width = int(width * scale_factor)
+        new_height = int(height * scale_factor)
+        image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+
+    return image
+
+
+def tesseract_ocr_multi_config(image) -> str:
+    """Try multiple Tesseract configurations and return best result"""
+    best_text = ""
+    for config in TESSERACT_CONFIGS:
+        try:
+            text = pytesseract.image_to_string(image, config=config)
+            if len(text.strip()) > len(best_text.strip()):
+                best_text = text
+                logger.info(f"Tesseract config {config} extracted {len(text)} chars")
+        except Exception as e:
+            logger.warning(f"Tesseract config {config} failed: {str(e)}")
+            continue
+
+    return best_text
+
+
+def _psm_config(psm: int) -> str:
+    return f'--oem 3 --psm {psm}'
+
+
+TESSERACT_PSM_ORDER = [int(config.split()[-1]) for config in TESSERACT_CONFIGS]
+
+
+def analyze_image_layout(image) -> Dict[str, Any]:
+    """
+    Cheap layout statistics used to pick a Tesseract PSM before running OCR:
+    ink density, share of rows containing text, and whether there is a
+    vertical gutter splitting the page into columns.
+    """
+    gray = image.convert('L')
+    if gray.width > 800:
+        gray = gray.resize((800, max(1, int(gray.height * 800 / gray.width))))
+
+    pixels = np.asarray(gray, dtype=np.uint8)
+    ink = pixels < min(160, int(pixels.mean() * 0.75))
+
+    ink_density = float(ink.mean())
+    row_has_ink = ink.any(axis=1)
+    row_coverage = float(row_has_ink.mean())
+
+    # Column detection: a run of (almost) empty columns in the middle of the text rows
+    multi_column = False
+    if row_has_ink.any():
+        column_ink = ink[row_has_ink].mean(axis=0)
+        width = column_ink.shape[0]
+        middle = column_ink[int(width * 0.25):int(width * 0.75)]
+        empty = middle < 0.002
+        longest_gap = run = 0
+        for is_empty in empty:
+            run = run + 1 if is_empty else 0
+            longest_gap = max(longest_gap, run)
+        text_columns = column_ink > 0.01
+        multi_column = bool(longest_gap >= width * 0.03 and text_columns[:int(width * 0.25)].any() and text_columns[int(width * 0.75):].any())
+
+    return {
+        "ink_density": ink_density,
+        "row_coverage": row_coverage,
+        "multi_column": multi_column,
+        "landscape": image.width > image.height * 1.2,
+    }
+
+
+def choose_tesseract_psm(stats: Dict[str, Any]) -> int:
+    """Map layout statistics to the most likely PSM"""
+    if stats["ink_density"] < 0.01 or stats["row_coverage"] < 0.15:
+        return 12  # Sparse text (IDs, stamps, forms with few fields)
+    if stats["multi_column"]:
+        return 3   # Fully automatic page segmentation handles columns
+    return 6       # Uniform text block
+
+
+def _correct_orientation(image):
+    """Use Tesseract OSD to undo 90/180/270 degree rotation (only worth it for landscape scans)"""
+    try:
+        osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+        rotate = int(osd.get("rotate", 0))
+        if rotate:
+            logger.info(f"Tesseract OSD: rotating image by {rotate} degrees")
+            return image.rotate(-rotate, expand=True)
+    except Exception as e:
+        logger.warning(f"Tesseract OSD failed: {str(e)}")
+    return image
+
+
+def _tesseract_data_to_text(data: dict) -> tuple:
+    """Rebuild text from image_to_data output. Returns (text, mean word confidence)."""
+    lines = []
+    paragraphs = []
+    current_key = None
+    current_paragraph = None
+    confidences = []
+
+    for i, word in enumerate(data.get("text", [])):
+        word = (word or "").strip()
+        if not word:
+            continue
+
+        try:
+            confidence = float(data["conf"][i])
+        except (TypeError, ValueError):
+            confidence = -1
+        if confidence >= 0:
+            confidences.append(confidence)
+
+        paragraph_key = (data["block_num"][i], data["par_num"][i])
+        line_key = paragraph_key + (data["line_num"][i],)
+
+        if paragraph_key != current_paragraph:
+            if lines:
+                paragraphs.append("\n".join(lines))
+            lines = []
+            current_paragraph = paragraph_key
+            current_key = None
+
+        if line_key != current_key:
+            lines.append(word)
+            current_key = line_key
+        else:
+            lines[-1] += " " + word
+
+    if lines:
+        paragraphs.append("\n".join(lines))
+
+    mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return "\n\n".join(paragraphs), mean_confidence
+
+
+def adaptive_tesseract_ocr(image, preferred_psm: Optional[int] = None, min_confidence: float = None) -> Dict[str, Any]:
+    """
+    Adaptive alternative to tesseract_ocr_multi_config.
+    Tries the most likely PSM first (cached winner for this document type, then the
+    PSM predicted from layout statistics) and stops as soon as the mean word
+    confidence reaches min_confidence. Only low-confidence pages fall through to
+    the remaining configs; the longest text wins then, as in the brute-force search.
+
+    Returns {'text', 'psm', 'confidence', 'attempts'}.
+    """
+    min_confidence = TESSERACT_MIN_CONFIDENCE if min_confidence is None else min_confidence
+
+    stats = analyze_image_layout(image)
+    if stats["landscape"]:
+        image = _correct_orientation(image)
+
+    predicted_psm = choose_tesseract_psm(stats)
+    candidates = []
+    for psm in [preferred_psm, predicted_psm] + TESSERACT_PSM_ORDER:
+        if psm is not None and psm not in candidates:
+            candidates.append(psm)
+
+    best = {"text": "", "psm": predicted_psm, "confidence": 0.0, "attempts": 0}
+    for attempts, psm in enumerate(candidates, start=1):
+        try:
+            data = pytesseract.image_to_data(image, config=_psm_config(psm), output_type=pytesseract.Output.DICT)
+        except Exception as e:
+            logger.warning(f"Tesseract config {_psm_config(psm)} failed: {str(e)}")
+            best["attempts"] = attempts
+            continue
+
+        text, confidence = _tesseract_data_to_text(data)
+        if len(text.strip()) > len(best["text"].strip()):
+            best.update({"text": text, "psm": psm, "confidence": confidence})
+        best["attempts"] = attempts
+
+        if confidence >= min_confidence and len(text.strip()) >= TESSERACT_MIN_CHARS:
+            best.update({"text": text, "psm": psm, "confidence": confidence})
+            break
+
+    logger.info(f"Adaptive Tesseract: psm {best['psm']} after {best['attempts']} attempt(s), "
+                f"{len(best['text'])} chars, confidence {best['confidence']:.0f}")
+    return best
+
+
+def _ocr_preprocessed_image(image, preferred_psm: Optional[int] = None) -> Dict[str, Any]:
+    if TESSERACT_MODE == "brute_force":
+        return {"text": tesseract_ocr_multi_config(image), "psm": None, "confidence": None, "attempts": len(TESSERACT_CONFIGS)}
+    return adaptive_tesseract_ocr(image, preferred_psm)
+
+
+def ocr_image_bytes(content: FileSource, preferred_psm: Optional[int] = None) -> Dict[str, Any]:
+    """Preprocess an image file and OCR it with Tesseract. Returns {'text', 'psm', 'confidence', 'attempts'}."""
+    image = Image.open(_binary_source(content))
+    image = preprocess_image_for_ocr(image)
+    return _ocr_preprocessed_image(image, preferred_psm)
+
+
+def _selected_page_indexes(page_count: int, max_pages: Optional[int], page_numbers: Optional[List[int]]) -> List[int]:
+    """0-based page indexes to process: the given 1-based page_numbers (or every page), capped at max_pages"""
+    if page_numbers is None:
+        indexes = list(range(page_count))
+    else:
+        indexes = [number - 1 for number in page_numbers if 1 <= number <= page_count]
+    return indexes if max_pages is None else indexes[:max_pages]
+
+
+def ocr_pdf_bytes(content: FileSource, max_pages: int = 10, zoom: float = 2.0, preferred_psm: Optional[int] = None,
+                  page_numbers: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Render PDF pages (all, or only page_numbers) and OCR each one with Tesseract.
+    Each page starts from the PSM that won on the previous page.
+    Returns {'text', 'page_texts': {page_number: text}, 'psm' (most common winner), 'attempts'}.
+    """
+    text = ""
+    page_texts = {}
+    winners = Counter()
+    attempts = 0
+    pdf_document = _open_pdf(content)
+    try:
+        for page_num in _selected_page_indexes(pdf_document.page_count, max_pages, page_numbers):
+            page = pdf_document[page_num]
+            # Higher resolution for better OCR (2x zoom)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            image = Image.open(io.BytesIO(pix.tobytes("png")))
+            image = preprocess_image_for_ocr(image)
+            page_result = _ocr_preprocessed_image(image, preferred_psm)
+            attempts += page_result["attempts"]
+            if page_result["psm"] is not None:
+                winners[page_result["psm"]] += 1
+                preferred_psm = page_result["psm"]
+            if page_result["text"].strip():
+                text += page_result["text"] + "\n"
+                page_texts[page_num + 1] = page_result["text"]
+    finally:
+        pdf_document.close()
+
+    return {"text": text, "page_texts": page_texts, "psm": winners.most_common(1)[0][0] if winners else None, "attempts": attempts}
+
+
+def _classify_pdf_page(page) -> Dict[str, Any]:
+    """
+    Decide whether one PDF page has a usable text layer. Pages without font resources are
+    routed to OCR without extracting anything; otherwise the text blocks are read once and
+    used both for the decision (text/image coverage) and as the page text.
+    """
+    if not page.get_fonts():
+        return {"route": "ocr", "text": "", "reason": "no_fonts"}
+
+    page_area = (page.rect.width * page.rect.height) or 1.0
+    text_parts = []
+    text_area = 0.0
+    for x0, y0, x1, y1, block_text, _block_no, block_type in page.get_text("blocks"):
+        if block_type == 0 and block_text.strip():
+            text_parts.append(block_text)
+            text_area += (x1 - x0) * (y1 - y0)
+    text = "".join(text_parts)
+    chars = len(text.strip())
+
+    image_area = 0.0
+    for info in page.get_image_info():
+        clipped = fitz.Rect(info["bbox"]) & page.rect
+        if not clipped.is_empty:
+            image_area += clipped.width * clipped.height
+
+    text_coverage = min(1.0, text_area / page_area)
+    image_coverage = min(1.0, image_area / page_area)
+
+    if chars < PDF_PAGE_MIN_TEXT_CHARS:
+        return {"route": "ocr", "text": "", "reason": "no_text"}
+    # Scanned page with only a stamped header/footer in the text layer
+    if image_coverage >= 0.5 and text_coverage < 0.05 and chars < PDF_SCANNED_PAGE_MIN_TEXT_CHARS:
+        return {"route": "ocr", "text": "", "reason": "scanned"}
+    return {"route": "text", "text": text, "reason": "text_layer"}
+
+
+def route_pdf_pages(content: FileSource) -> Dict[str, Any]:
+    """
+    Single cheap pass over a PDF that routes every page independently: pages with a usable
+    text layer get their text extracted here, the rest are listed for OCR (mixed PDFs only
+    OCR their image pages).
+    Returns {'page_count', 'text_pages': {page_number: text}, 'ocr_pages': [page_number, ...]}.
+    """
+    text_pages = {}
+    ocr_pages = []
+    pdf_document = _open_pdf(content)
+    try:
+        for page_num in range(pdf_document.page_count):
+            try:
+                page_route = _classify_pdf_page(pdf_document[page_num])
+            except Exception as e:
+                logger.warning(f"Page {page_num + 1} text-layer check failed, routing to OCR: {e}")
+                page_route = {"route": "ocr", "text": ""}
+
+            if page_route["route"] == "text":
+                text_pages[page_num + 1] = page_route["text"]
+            else:
+                ocr_pages.append(page_num + 1)
+        page_count = pdf_document.page_count
+    finally:
+        pdf_document.close()
+
+    return {"page_count": page_count, "text_pages": text_pages, "ocr_pages": ocr_pages}
+
+
+def render_pdf_pages(content: FileSource, zoom: float = 2.0, max_pages: Optional[int] = None, image_format: str = "png",
+                     page_numbers: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """Rasterize PDF pages (all, or only page_numbers). Returns [{'page', 'data', 'width', 'height'}] with raw image bytes."""
+    pages = []
+    pdf_document = _open_pdf(content)
+    try:
+        for page_num in _selected_page_indexes(pdf_document.page_count, max_pages, page_numbers):
+            pix = pdf_document[page_num].get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+            pages.append({
+                "page": page_num + 1,
+                "data": pix.tobytes(image_format),
+                "width": pix.width,
+                "height": pix.height
+            })
+    finally:
+        pdf_document.close()
+    return pages
+
+
+def render_pdf_pages_for_textract(content: FileSource, max_pages: int = 15, max_size: int = TEXTRACT_MAX_IMAGE_SIZE,
+                                  page_numbers: Optional[List[int]] = None) -> Dict[str, Any]:
+    """
+    Rasterize PDF pages (all, or only page_numbers) under the Textract size limit,
+    stepping the zoom down and falling back to JPEG when a PNG is too large.
+    Returns {'page_count': N, 'pages': [(page_number, image_bytes or None), ...]}.
+    """
+    pages = []
+    pdf_document = _open_pdf(content)
+    try:
+        for page_num in _selected_page_indexes(pdf_document.page_count, max_pages, page_numbers):
+            page = pdf_document[page_num]
+
+            # Try different zoom levels to stay under 5MB limit
+            img_data = None
+            for zoom in [2.0, 1.5, 1.0, 0.75]:
+                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+                img_data = pix.tobytes("png")
+
+                # If PNG is too large, try JPEG (much smaller)
+                if len(img_data) > max_size:
+                    img = Image.open(io.BytesIO(img_data))
+                    jpeg_buffer = io.BytesIO()
+                    img.convert('RGB').save(jpeg_buffer, format='JPEG', quality=85)
+                    img_data = jpeg_buffer.getvalue()
+
+                if len(img_data) <= max_size:
+                    break
+
+            if len(img_data) > max_size:
+                logger.warning(f"Page {page_num + 1} image too large ({len(img_data)} bytes), skipping")
+                img_data = None
+
+            pages.append((page_num + 1, img_data))
+
+        page_count = pdf_document.page_count
+    finally:
+        pdf_document.close()
+
+    return {"page_count": page_count, "pages": pages}
+
+
+def _jpeg_bytes(img: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def fit_image_to_budget(img: Image.Image, max_size: int, rescale=None) -> Dict[str, Any]:
+    """
+    JPEG-encode img under max_size bytes with as few full encodes as possible.
+    JPEG size falls roughly exponentially with quality, so after one trial at JPEG_MAX_QUALITY the
+    highest fitting quality (5-step grid) is predicted from the log-size slope, which is re-fitted from
+    every encode; the search stops as soon as the next step up is predicted not to fit.
+    If no quality down to JPEG_MIN_QUALITY is predicted to fit, the pixel count is cut straight to the
+    budget (JPEG size is roughly proportional to pixels) and encoded at JPEG_SCALED_QUALITY.
+    rescale(scale) returns the image at that scale (PDF pages re-render at a lower zoom instead of resampling).
+    Returns {'data', 'quality', 'scale', 'encodes'}.
+    """
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    data = _jpeg_bytes(img, JPEG_MAX_QUALITY)
+    encodes = 1
+    if len(data) <= max_size:
+        return {"data": data, "quality": JPEG_MAX_QUALITY, "scale": 1.0, "encodes": encodes}
+
+    sizes = {JPEG_MAX_QUALITY: len(data)}
+    slope = JPEG_SIZE_SLOPE
+    too_big = JPEG_MAX_QUALITY  # lowest quality known to be over the budget
+    fit_quality, fit_data = None, None
+    while True:
+        quality = int((too_big + math.log(max_size / sizes[too_big]) / slope) // 5 * 5)
+        quality = min(quality, too_big - 5)
+        if fit_quality is not None:
+            quality = max(quality, fit_quality + 5)
+            if quality >= too_big:
+                break
+        if quality < JPEG_MIN_QUALITY:
+            break
+
+        data = _jpeg_bytes(img, quality)
+        encodes += 1
+        sizes[quality] = len(data)
+        if len(data) <= max_size:
+            fit_quality, fit_data = quality, data
+        else:
+            too_big = quality
+        if fit_quality is not None:
+            # Re-fit the slope between the closest fitting and too-big encodes
+            slope = max(math.log(sizes[too_big] / sizes[fit_quality]) / (too_big - fit_quality), 1e-3)
+            if fit_quality + 5 >= too_big or sizes[fit_quality] * math.exp(slope * 5) > max_size:
+                break
+        elif len(sizes) > 1:
+            lowest = min(sizes)
+            slope = max(math.log(sizes[JPEG_MAX_QUALITY] / sizes[lowest]) / (JPEG_MAX_QUALITY - lowest), 1e-3)
+
+    if fit_quality is not None:
+        return {"data": fit_data, "quality": fit_quality, "scale": 1.0, "encodes": encodes}
+
+    if rescale is None:
+        def rescale(scale):
+            return img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS)
+
+    # Predicted size of the full image at the scaled quality, from the lowest-quality encode so far
+    lowest = min(sizes)
+    size_at_scale = sizes[lowest] * math.exp(slope * (JPEG_SCALED_QUALITY - lowest))
+    scale = 1.0
+    for _ in range(4):
+        scale *= min(0.95, math.sqrt(max_size * JPEG_BUDGET_MARGIN / size_at_scale))
+        scaled = rescale(scale)
+        data = _jpeg_bytes(scaled, JPEG_SCALED_QUALITY)
+        encodes += 1
+        if len(data) <= max_size or min(scaled.size) <= 16:
+            break
+        size_at_scale = len(data)
+    return {"data": data, "quality": JPEG_SCALED_QUALITY, "scale": round(scale, 4), "encodes": encodes}
+
+
+def render_pdf_pages_for_claude(content: FileSource, zoom: float = 2.0, image_format: str = "jpeg",
+                                max_size: int = CLAUDE_MAX_IMAGE_SIZE, max_pages: Optional[int] = None,
+                                page_numbers: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Rasterize PDF pages ready to send to Claude: each page is rendered at the zoom that fits the API
+    dimension limit, and a page over max_size is re-rendered at the zoom its byte budget needs
+    (fit_image_to_budget) instead of being decoded and downscaled.
+    Returns [{'page', 'data', 'media_type', 'width', 'height'}] with raw image bytes.
+    """
+    pages = []
+    pdf_document = _open_pdf(content)
+    try:
+        for page_num in _selected_page_indexes(pdf_document.page_count, max_pages, page_numbers):
+            page = pdf_document[page_num]
+            page_zoom = min(zoom, CLAUDE_MAX_IMAGE_DIMENSION / max(page.rect.width, page.rect.height, 1))
+            pix = page.get_pixmap(matrix=fitz.Matrix(page_zoom, page_zoom))
+            data = pix.tobytes(image_format)
+            media_type = f"image/{image_format}"
+            width, height = pix.width, pix.height
+
+            if len(data) > max_size:
+                def render_at(scale, page=page, page_zoom=page_zoom):
+                    scaled_pix = page.get_pixmap(matrix=fitz.Matrix(page_zoom * scale, page_zoom * scale))
+                    return Image.frombytes("RGB", (scaled_pix.width, scaled_pix.height), scaled_pix.samples)
+
+                fitted = fit_image_to_budget(Image.frombytes("RGB", (width, height), pix.samples), max_size, rescale=render_at)
+                data, media_type = fitted["data"], "image/jpeg"
+                width, height = int(width * fitted["scale"]), int(height * fitted["scale"])
+
+            pages.append({
+                "page": page_num + 1,
+                "data": data,
+                "media_type": media_type,
+                "width": width,
+                "height": height
+            })
+    finally:
+        pdf_document.close()
+    return pages
+
+
+def count_pdf_pages(content: FileSource) -> int:
+    """Open a PDF and return its page count"""
+    doc = _open_pdf(content)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+class StubTextractClient:
+    """
+    Offline stand-in for the boto3 Textract client (same call shape).
+    Sleeps to simulate the network round trip and returns synthetic LINE/WORD blocks,
+    so the page fan-out can be exercised and benchmarked without AWS credentials.
+    """
+
+    def __init__(self, latency: float = 0.8, lines_per_page: int = 30, fail_every: int = 0):
+        self.latency = latency
+        self.lines_per_page = lines_per_page
+        self.fail_every = fail_every  # Fail every Nth call (0 = never) to exercise partial results
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _respond(self, image_bytes: bytes) -> dict:
+        with self._lock:
+            self.calls += 1
+            call_number = self.calls
+
+        time.sleep(self.latency)
+
+        if self.fail_every and call_number % self.fail_every == 0:
+            raise RuntimeError(f"Stub Textract failure on call {call_number}")
+
+        digest = hashlib.sha256(image_bytes).hexdigest()[:8]
+        blocks = []
+        for i in range(self.lines_per_page):
+            text = f"Stub line {i + 1} of image {digest}"
+            top = 0.05 + i * (0.9 / max(1, self.lines_per_page))
+            word_ids = []
+            for j, word in enumerate(text.split()):
+                word_id = f"{digest}-w{i}-{j}"
+                word_ids.append(word_id)
+                blocks.append({
+                    'Id': word_id, 'BlockType': 'WORD', 'Text': word, 'Confidence': 99.0,
+                    'Geometry': {'BoundingBox': {'Top': top, 'Left': 0.1 + j * 0.08, 'Width': 0.07, 'Height': 0.02}}
+                })
+            blocks.append({
+                'Id': f"{digest}-l{i}", 'BlockType': 'LINE', 'Text': text, 'Confidence': 99.0,
+                'Geometry': {'BoundingBox': {'Top': top, 'Left': 0.1, 'Width': 0.6, 'Height': 0.02}},
+                'Relationships': [{'Type': 'CHILD', 'Ids': word_ids}]
+            })
+        return {'Blocks': blocks}
+
+    def analyze_document(self, Document: dict, FeatureTypes: list = None) -> dict:
+        return self._respond(Document['Bytes'])
+
+    def detect_document_text(self, Document: dict) -> dict:
+        return self._respond(Document['Bytes'])
+
+
+def _timed_call(fn, args, kwargs):
+    """Run fn inside the worker and report when it actually started (for queue-wait metrics)"""
+    started_at = time.time()
+    return started_at, fn(*args, **kwargs)
+
+
+# ==================== EXECUTION ENGINE ====================
+
+class _PoolStats:
+    """Rolling counters and latency samples for one pool"""
+
+    def __init__(self, name: str, max_workers: int, backend: str):
+        self.name = name
+        self.max_workers = max_workers
+        self.backend = backend
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.latencies = deque(maxlen=500)
+        self.queue_waits = deque(maxlen=500)
+
+    @staticmethod
+    def _percentile(samples, pct: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        latencies = list(self.latencies)
+        waits = list(self.queue_waits)
+        return {
+            "backend": self.backend,
+            "max_workers": self.max_workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.max_workers),
+            "peak_in_flight": self.peak_in_flight,
+            "latency_avg_ms": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+            "latency_p95_ms": round(1000 * self._percentile(latencies, 0.95), 1),
+            "latency_max_ms": round(1000 * max(latencies), 1) if latencies else 0.0,
+            "queue_wait_avg_ms": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+            "queue_wait_p95_ms": round(1000 * self._percentile(waits, 0.95), 1),
+        }
+
+
+class OCRExecutionEngine:
+    """Process pool for CPU-bound OCR and thread pool for blocking OCR API calls"""
+
+    def __init__(self, process_workers: int = None, thread_workers: int = None, start_method: str = None):
+        if process_workers is None:
+            process_workers = int(os.environ.get("OCR_PROCESS_WORKERS", os.cpu_count() or 2))
+        if thread_workers is None:
+            thread_workers = int(os.environ.get("OCR_THREAD_WORKERS", 8))
+
+        self.process_workers = max(0, process_workers)
+        self.thread_workers = max(1, thread_workers)
+        self.start_method = start_method or os.environ.get("OCR_PROCESS_START_METHOD", "spawn")
+
+        self._process_pool = None
+        self._thread_pool = None
+        self._use_processes = self.process_workers > 0
+
+        cpu_backend = "process" if self._use_processes else "thread"
+        self.stats = {
+            "cpu": _PoolStats("cpu", self.process_workers or self.thread_workers, cpu_backend),
+            "io": _PoolStats("io", self.thread_workers, "thread"),
+        }
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="ocr-io")
+        return self._thread_pool
+
+    def _get_cpu_pool(self):
+        if not self._use_processes:
+            return self._get_thread_pool()
+
+        if self._process_pool is None:
+            try:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context(self.start_method)
+                )
+                logger.info(f"OCR engine: started {self.process_workers} CPU worker processes ({self.start_method})")
+            except (OSError, NotImplementedError, ValueError) as e:
+                # Serverless runtimes (e.g. no /dev/shm) cannot host a process pool
+                logger.warning(f"OCR engine: process pool unavailable ({e}), running CPU work in threads")
+                self._use_processes = False
+                self.stats["cpu"].backend = "thread"
+                self.stats["cpu"].max_workers = self.thread_workers
+                return self._get_thread_pool()
+
+        return self._process_pool
+
+    async def _run(self, pool_name: str, executor, fn, *args, **kwargs):
+        stats = self.stats[pool_name]
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+
+        stats.submitted += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            started_at, result = await loop.run_in_executor(
+                executor, functools.partial(_timed_call, fn, args, kwargs)
+            )
+        except BrokenProcessPool:
+            stats.failed += 1
+            # A crashed worker (e.g. OOM on a huge page) poisons the pool - start a fresh one next time
+            logger.error("OCR engine: CPU worker process died, recycling the process pool")
+            self._process_pool = None
+            raise
+        except Exception:
+            stats.failed += 1
+            raise
+        else:
+            stats.completed += 1
+            stats.queue_waits.append(max(0.0, started_at - submitted_at))
+            stats.latencies.append(time.time() - submitted_at)
+            return result
+        finally:
+            stats.in_flight -= 1
+
+    async def run_cpu(self, fn, *args, **kwargs):
+        """Run a CPU-bound, picklable function in the process pool"""
+        return await self._run("cpu", self._get_cpu_pool(), fn, *args, **kwargs)
+
+    async def run_io(self, fn, *args, **kwargs):
+        """Run a blocking I/O function (e.g. a boto3 call) in the thread pool"""
+        return await self._run("io", self._get_thread_pool(), fn, *args, **kwargs)
+
+    def metrics(self) -> dict:
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+    def shutdown(self):
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+
+
+# Shared engine used by every OCR entry point
+ocr_executor = OCRExecutionEngine()
+
+
+class TesseractStrategyCache:
+    """Remembers which PSM wins per document type so the next document starts with it"""
+
+    def __init__(self):
+        self._winners: Dict[str, Counter] = {}
+
+    def preferred(self, document_type: str) -> Optional[int]:
+        winners = self._winners.get(document_type)
+        return winners.most_common(1)[0][0] if winners else None
+
+    def record(self, document_type: str, psm: Optional[int]):
+        if psm is not None:
+            self._winners.setdefault(document_type, Counter())[psm] += 1
+
+    def snapshot(self) -> dict:
+        return {doc_type: dict(winners) for doc_type, winners in self._winners.items()}
+
+
+# Lives in the API process; workers receive the preferred PSM as an argument
+tesseract_psm_cache = TesseractStrategyCache()
+
+
+async def tesseract_ocr_image(content: FileSource, document_type: str = "image") -> str:
+    """OCR an image in the CPU pool, starting from the cached winning PSM for this document type"""
+    result = await ocr_executor.run_cpu(ocr_image_bytes, content, tesseract_psm_cache.preferred(document_type))
+    tesseract_psm_cache.record(document_type, result["psm"])
+    return result["text"]
+
+
+async def tesseract_ocr_pdf_pages(content: FileSource, page_numbers: List[int], document_type: str = "pdf") -> Dict[int, str]:
+    """OCR only the given (1-based) PDF pages in the CPU pool. Returns {page_number: text} for pages with text."""
+    result = await ocr_executor.run_cpu(
+        ocr_pdf_bytes, content, None, 2.0, tesseract_psm_cache.preferred(document_type), page_numbers
+    )
+    tesseract_psm_cache.record(document_type, result["psm"])
+    return result["page_texts"]
@@ -0,0 +1,370 @@
+"""
+Lightweight Page Counter
+Counts PDF pages for quotes (WhatsApp bot /bot/calculate-quote) without decoding or
+downloading the whole document:
+- base64 input is decoded window by window (4 base64 chars = 3 bytes, so any byte range
+  can be decoded on its own)
+- URLs are read with HTTP range requests through one shared, pooled httpx client
+- the page count comes from the linearization dictionary (/N) when present, otherwise from
+  trailer /Root -> catalog /Pages -> /Count, following the classic xref table
+
+PDFs the fast path cannot resolve (cross-reference streams, objects inside object streams,
+broken xref tables) fall back to a full PyMuPDF parse in the OCR process pool.
+Non-PDF documents (images) count as 1 page.
+
+Configuration (environment variables):
+- PAGE_COUNT_CACHE_SIZE: URL results kept in memory (default: 1024)
+- PAGE_COUNT_CACHE_TTL_SECONDS: lifetime of a cached URL result (default: 3600)
+"""
+
+import os
+import re
+import time
+import base64
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+import httpx
+
+from ocr_engine import ocr_executor, count_pdf_pages
+
+logger = logging.getLogger(__name__)
+
+PAGE_COUNT_CACHE_SIZE = int(os.environ.get("PAGE_COUNT_CACHE_SIZE", "1024"))
+PAGE_COUNT_CACHE_TTL_SECONDS = int(os.environ.get("PAGE_COUNT_CACHE_TTL_SECONDS", "3600"))
+
+HEAD_WINDOW = 2048     # Header + linearization dictionary
+TAIL_WINDOW = 16384    # startxref + trailer (plus, often, the catalog and page tree)
+OBJECT_WINDOW = 4096   # One indirect object (catalog or page tree root)
+MAX_XREF_SECTIONS = 64  # Subsection headers walked per xref table before giving up
+MAX_PREV_XREFS = 8      # Incremental updates followed through /Prev
+
+_LINEARIZED_RE = re.compile(rb'/Linearized\s[^>]*?/N\s+(\d+)', re.S)
+_LINEARIZED_LENGTH_RE = re.compile(rb'/Linearized\s[^>]*?/L\s+(\d+)', re.S)
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)')
+_ROOT_RE = re.compile(rb'/Root\s+(\d+)\s+(\d+)\s+R')
+_PAGES_RE = re.compile(rb'/Pages\s+(\d+)\s+(\d+)\s+R')
+_COUNT_RE = re.compile(rb'/Count\s+(\d+)\b(?!\s+\d+\s+R)')
+_PREV_RE = re.compile(rb'/Prev\s+(\d+)')
+_XREF_SECTION_RE = re.compile(rb'\s*(\d+)\s+(\d+)\s*?(?:\r\n|\r|\n| )')
+_XREF_ENTRY_RE = re.compile(rb'(\d{10})\s(\d{5})\s([nf])')
+_WHITESPACE_RE = re.compile(r'\s')
+
+
+class PageCountUnavailable(Exception):
+    """The fast path could not resolve /Count; the caller falls back to a full parse"""
+
+
+class _Base64Source:
+    """Random-access reads over a base64 string without decoding all of it"""
+
+    def __init__(self, data: str):
+        # Remove data URI prefix if present
+        if ',' in data:
+            data = data.split(',', 1)[1]
+        if _WHITESPACE_RE.search(data):
+            data = ''.join(data.split())
+        self.data = data
+        padding = len(data) - len(data.rstrip('='))
+        self.size = len(data) // 4 * 3 - padding
+        self.requests = 0
+
+    async def read(self, start: int, length: int) -> bytes:
+        start = max(0, start)
+        end = min(self.size, start + length)
+        if start >= end:
+            return b""
+        first_quantum = start // 3
+        last_quantum = -(-end // 3)
+        self.requests += 1
+        chunk = base64.b64decode(self.data[first_quantum * 4:last_quantum * 4])
+        offset = start - first_quantum * 3
+        return chunk[offset:offset + (end - start)]
+
+    async def read_all(self) -> bytes:
+        return base64.b64decode(self.data)
+
+
+class _HTTPRangeSource:
+    """Random-access reads over a URL with HTTP range requests; falls back to the full body"""
+
+    def __init__(self, client: httpx.AsyncClient, url: str):
+        self.client = client
+        self.url = url
+        self.size = None
+        self.etag = None
+        self.last_modified = None
+        self.not_modified = False
+        self.full_body = None
+        self.requests = 0
+        self._windows: Dict[int, bytes] = {}
+
+    async def open(self, cached: Dict[str, Any] = None) -> bytes:
+        """
+        First request: the head window, conditional on the cached validators.
+        Sets size/etag, or full_body if the server does not support Range.
+        """
+        headers = {"Range": f"bytes=0-{HEAD_WINDOW - 1}"}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        elif cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        self.requests += 1
+        async with self.client.stream("GET", self.url, headers=headers) as response:
+            if response.status_code == 304:
+                self.not_modified = True
+                return b""
+            response.raise_for_status()
+            self.etag = response.headers.get("etag")
+            self.last_modified = response.headers.get("last-modified")
+
+            if response.status_code == 206:
+                content_range = response.headers.get("content-range", "")
+                total = content_range.rsplit("/", 1)[-1]
+                head = await response.aread()
+                if not total.isdigit():
+                    raise PageCountUnavailable("Range response without total size")
+                self.size = int(total)
+                self._windows[0] = head
+                return head
+
+            # 200: the server ignored Range and is sending the whole document
+            self.full_body = await response.aread()
+            self.size = len(self.full_body)
+            return self.full_body[:HEAD_WINDOW]
+
+    async def read(self, start: int, length: int) -> bytes:
+        start = max(0, start)
+        end = min(self.size, start + length)
+        if start >= end:
+            return b""
+        if self.full_body is not None:
+            return self.full_body[start:end]
+        for window_start, window in self._windows.items():
+            if window_start <= start and end <= window_start + len(window):
+                return window[start - window_start:end - window_start]
+
+        self.requests += 1
+        response = await self.client.get(self.url, headers={"Range": f"bytes={start}-{end - 1}"})
+        response.raise_for_status()
+        if response.status_code != 206:
+            # Range support disappeared mid-way; keep the body we were given
+            self.full_body = response.content
+            return self.full_body[start:end]
+        self._windows[start] = response.content
+        return response.content
+
+    async def read_all(self) -> bytes:
+        if self.full_body is None:
+            self.requests += 1
+            response = await self.client.get(self.url)
+            response.raise_for_status()
+            self.full_body = response.content
+        return self.full_body
+
+
+async def _find_xref_entry(source, xref_offset: int, object_number: int) -> Optional[int]:
+    """Byte offset of an object from the classic xref table chain starting at xref_offset"""
+    for _ in range(MAX_PREV_XREFS):
+        chunk = await source.read(xref_offset, 64)
+        stripped = chunk.lstrip()
+        if not stripped.startswith(b"xref"):
+            raise PageCountUnavailable("cross-reference stream")
+        position = xref_offset + (len(chunk) - len(stripped)) + 4
+
+        for _ in range(MAX_XREF_SECTIONS):
+            header = await source.read(position, 64)
+            if header.lstrip().startswith(b"trailer"):
+                break
+            match = _XREF_SECTION_RE.match(header)
+            if not match:
+                raise PageCountUnavailable("malformed xref subsection")
+            first, count = int(match.group(1)), int(match.group(2))
+            entries_start = position + match.end()
+            if first <= object_number < first + count:
+                entry = await source.read(entries_start + (object_number - first) * 20, 20)
+                entry_match = _XREF_ENTRY_RE.match(entry)
+                if not entry_match:
+                    raise PageCountUnavailable("malformed xref entry")
+                if entry_match.group(3) == b"n":
+                    return int(entry_match.group(1))
+                return None
+            position = entries_start + count * 20
+        else:
+            raise PageCountUnavailable("too many xref subsections")
+
+        trailer = await source.read(position, 1024)
+        prev = _PREV_RE.search(trailer.split(b"startxref", 1)[0])
+        if not prev:
+            return None
+        xref_offset = int(prev.group(1))
+    return None
+
+
+async def _read_object(source, object_number: int, generation: int, startxref: int, known: bytes) -> bytes:
+    """Body of an indirect object: from an already-read window if it is there, else via the xref table"""
+    marker = re.compile(rb'(?<!\d)%d\s+%d\s+obj\b' % (object_number, generation))
+    matches = list(marker.finditer(known))
+    if matches:
+        body = known[matches[-1].end():]
+        if b"endobj" in body:
+            return body.split(b"endobj", 1)[0]
+
+    offset = await _find_xref_entry(source, startxref, object_number)
+    if offset is None:
+        raise PageCountUnavailable(f"object {object_number} not in xref")
+    chunk = await source.read(offset, OBJECT_WINDOW)
+    match = marker.match(chunk.lstrip())
+    if not match:
+        raise PageCountUnavailable(f"object {object_number} not at its xref offset")
+    return chunk.lstrip()[match.end():].split(b"endobj", 1)[0]
+
+
+async def count_pdf_pages_fast(source, head: bytes) -> int:
+    """
+    Page count from the linearization dictionary or trailer -> /Root -> /Pages -> /Count,
+    reading only a few small windows of the file. Raises PageCountUnavailable otherwise.
+    """
+    linearized = _LINEARIZED_RE.search(head)
+    linearized_length = _LINEARIZED_LENGTH_RE.search(head)
+    # /N is only trustworthy if nothing was appended since linearization (/L == file size)
+    if linearized and linearized_length and int(linearized_length.group(1)) == source.size:
+        return int(linearized.group(1))
+
+    tail = await source.read(source.size - TAIL_WINDOW, TAIL_WINDOW)
+    startxref_matches = _STARTXREF_RE.findall(tail)
+    if not startxref_matches:
+        raise PageCountUnavailable("no startxref")
+    startxref = int(startxref_matches[-1])
+
+    root_matches = _ROOT_RE.findall(tail)
+    if not root_matches:
+        # Cross-reference stream: its dictionary (with /Root) sits at startxref, uncompressed
+        root_matches = _ROOT_RE.findall(await source.read(startxref, OBJECT_WINDOW))
+    if not root_matches:
+        raise PageCountUnavailable("no /Root in trailer")
+    root_number, root_generation = (int(value) for value in root_matches[-1])
+
+    known = head + tail
+    catalog = await _read_object(source, root_number, root_generation, startxref, known)
+    pages_match = _PAGES_RE.search(catalog)
+    if not pages_match:
+        raise PageCountUnavailable("no /Pages in catalog")
+
+    page_tree = await _read_object(source, int(pages_match.group(1)), int(pages_match.group(2)), startxref, known)
+    count_match = _COUNT_RE.search(page_tree.split(b"stream", 1)[0])
+    if not count_match:
+        raise PageCountUnavailable("no direct /Count in page tree root")
+    return int(count_match.group(1))
+
+
+class PageCountCache:
+    """In-memory LRU of URL page counts, revalidated with the ETag/Last-Modified the server sent"""
+
+    def __init__(self, max_entries: int = PAGE_COUNT_CACHE_SIZE, ttl_seconds: int = PAGE_COUNT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(url)
+        if entry is None:
+            return None
+        if time.time() - entry["stored_at"] > self.ttl_seconds:
+            del self._entries[url]
+            return None
+        self._entries.move_to_end(url)
+        return entry
+
+    def put(self, url: str, page_count: int, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self._entries[url] = {"page_count": page_count, "etag": etag, "last_modified": last_modified, "stored_at": time.time()}
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+page_count_cache = PageCountCache()
+
+_stats = {"fast_path": 0, "full_parse": 0, "not_pdf": 0, "cache_hits": 0, "revalidated": 0}
+_http_client: Optional[httpx.AsyncClient] = None
+_http_client_lock = asyncio.Lock()
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """Shared pooled client for document downloads (created on first use)"""
+    global _http_client
+    if _http_client is None:
+        async with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(30.0, connect=10.0),
+                    limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+                    follow_redirects=True
+                )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def _count_source_pages(source, head: bytes) -> int:
+    if not head.startswith(b"%PDF"):
+        _stats["not_pdf"] += 1
+        return 1
+    try:
+        page_count = await count_pdf_pages_fast(source, head)
+        _stats["fast_path"] += 1
+    except PageCountUnavailable as e:
+        logger.info(f"Page counter: fast path unavailable ({e}), parsing the full PDF")
+        page_count = await ocr_executor.run_cpu(count_pdf_pages, await source.read_all())
+        _stats["full_parse"] += 1
+    return max(1, page_count)
+
+
+async def count_pages_from_base64(document_base64: str) -> int:
+    """Page count of a base64 (or data URI) document, decoding only the windows it reads"""
+    source = _Base64Source(document_base64)
+    if source.size <= 0:
+        return 1
+    page_count = await _count_source_pages(source, await source.read(0, HEAD_WINDOW))
+    logger.info(f"Page counter: {page_count} pages from base64 ({source.size} bytes, {source.requests} window decodes)")
+    return page_count
+
+
+async def count_pages_from_url(document_url: str) -> int:
+    """
+    Page count of a remote document using range requests. Cached per URL: entries with an
+    ETag/Last-Modified are revalidated with a conditional request, others are served until they expire.
+    """
+    cached = page_count_cache.get(document_url)
+    if cached is not None and not (cached["etag"] or cached["last_modified"]):
+        _stats["cache_hits"] += 1
+        return cached["page_count"]
+
+    source = _HTTPRangeSource(await get_http_client(), document_url)
+    head = await source.open(cached)
+    if source.not_modified:
+        _stats["cache_hits"] += 1
+        _stats["revalidated"] += 1
+        return cached["page_count"]
+    if not source.size:
+        return 1
+
+    page_count = await _count_source_pages(source, head)
+    page_count_cache.put(document_url, page_count, source.etag, source.last_modified)
+    logger.info(f"Page counter: {page_count} pages from URL ({source.size} bytes, {source.requests} requests)")
+    return page_count
+
+
+def metrics() -> dict:
+    return {**_stats, "cached_urls": len(page_count_cache)}
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, APIRouter, File, UploadFile, Form, HTTPException, Request, BackgroundTasks, Depends, Body, Header
-from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -16,22 +16,29 @@ import aiofiles
 import pytesseract
 from PIL import Image
 import PyPDF2
-import pdfplumber
-import fitz  # PyMuPDF
 from docx import Document
 import io
 import tempfile
 import re
 import math
 import httpx
+import anthropic
 from contextlib import asynccontextmanager
 import asyncio
+import time
 import stripe
 import json
 import hashlib
+import importlib.util
 import secrets
 import zipfile
+import itertools
+import zlib
+import csv
+from xml.sax.saxutils import escape as xml_escape
 import shutil
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
 
 # Set Tesseract path
 pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
@@ -49,6 +56,24 @@ import resend
 # QuickBooks Integration
 from quickbooks import QuickBooksClient, get_quickbooks_client
 
+# OCR execution engine (keeps Tesseract/PyMuPDF/Textract work off the event loop)
+from ocr_engine import (
+    ocr_executor, tesseract_ocr_image, tesseract_ocr_pdf_pages, route_pdf_pages,
+    render_pdf_pages, render_pdf_pages_for_textract, render_pdf_pages_for_claude, fit_image_to_budget,
+    count_pdf_pages, StubTextractClient, tesseract_psm_cache
+)
+
+# Page counts for quotes without decoding/downloading whole documents
+import page_counter
+from job_queue import JobQueue, JobWorker, JobFailed
+# Fuzzy translation memory matching
+from tm_index import TMPairIndex, split_source_segments
+from glossary_matcher import GlossaryAutomaton
+# Streaming TM / glossary file readers for uploads
+from tm_import import ImportFileError, import_format, read_rows, batches as import_batches, source_hash
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
@@ -126,6 +151,33 @@ async def get_file_base64_from_gridfs(file_id: str) -> str:
     file_bytes, _, _ = await retrieve_file_from_gridfs(file_id)
     return base64.b64encode(file_bytes).decode('utf-8')
 
+async def store_local_file_in_gridfs(path: str, filename: str, content_type: str, metadata: dict = None) -> str:
+    """Stream a file from local disk into GridFS (no base64, no full copy in memory) and return the file_id"""
+    file_metadata = {
+        "filename": filename,
+        "content_type": content_type,
+        "uploaded_at": datetime.utcnow()
+    }
+    if metadata:
+        file_metadata.update(metadata)
+
+    try:
+        with open(path, 'rb') as source:
+            file_id = await fs_bucket.upload_from_stream(filename, source, metadata=file_metadata)
+        return str(file_id)
+    except Exception as e:
+        logger.error(f"Error storing file in GridFS: {str(e)}")
+        raise
+
+async def get_document_file_base64(document: dict) -> Optional[str]:
+    """Return a stored document's content as base64 - from GridFS when stored there, else the inline field"""
+    if document.get("gridfs_id"):
+        try:
+            return await get_file_base64_from_gridfs(document["gridfs_id"])
+        except Exception as e:
+            logger.error(f"Error retrieving from GridFS: {str(e)}")
+    return document.get("file_data") or document.get("data")
+
 # Size threshold for using GridFS - use GridFS for ALL document uploads
 # GridFS has no practical size limit (up to 16TB per file)
 # Setting to 0 means ALL documents use GridFS for maximum reliability
@@ -284,7 +336,12 @@ try:
     aws_secret = os.environ.get('AWS_SECRET_ACCESS_KEY')
     aws_region = os.environ.get('AWS_REGION', 'us-east-1')
 
-    if aws_key_id and aws_secret:
+    if os.environ.get('TEXTRACT_STUB', '').lower() in ('1', 'true', 'yes'):
+        # Offline stub (local development / benchmarks) - no AWS calls are made
+        textract_client = StubTextractClient(latency=float(os.environ.get('TEXTRACT_STUB_LATENCY', '0.8')))
+        aws_credentials_status = "stub"
+        logger.info("AWS Textract: using local stub client (TEXTRACT_STUB is set)")
+    elif aws_key_id and aws_secret:
         # Log masked credentials for debugging
         masked_key = f"{aws_key_id[:4]}...{aws_key_id[-4:]}" if len(aws_key_id) > 8 else "***"
         masked_secret = f"{aws_secret[:4]}...{aws_secret[-4:]}" if len(aws_secret) > 8 else "***"
@@ -2490,41 +2547,21 @@ class BotQuoteResponse(BaseModel):
     quote_link: Optional[str] = None
 
 async def count_document_pages(document_base64: str = None, document_url: str = None) -> int:
-    """Count pages in a PDF or count images as 1 page each"""
+    """
+    Count pages in a PDF or count images as 1 page each.
+    Only the parts of the file needed to find the page count are decoded/downloaded (see page_counter).
+    """
     try:
-        content = None
-
-        # Get content from base64 or URL
         if document_base64:
-            # Remove data URI prefix if present
-            if ',' in document_base64:
-                document_base64 = document_base64.split(',')[1]
-            content = base64.b64decode(document_base64)
+            page_count = await page_counter.count_pages_from_base64(document_base64)
         elif document_url:
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.get(document_url, timeout=30)
-                content = response.content
-
-        if not content:
-            return 1
-
-        # Check if PDF
-        if content[:4] == b'%PDF':
-            try:
-                doc = fitz.open(stream=content, filetype="pdf")
-                page_count = doc.page_count
-                doc.close()
-                logger.info(f"Bot: PDF has {page_count} pages")
-                return max(1, page_count)
-            except Exception as e:
-                logger.error(f"Bot: Failed to read PDF pages: {e}")
-                return 1
+            page_count = await page_counter.count_pages_from_url(document_url)
         else:
-            # Image = 1 page
-            logger.info("Bot: Document is image, counting as 1 page")
             return 1
 
+        logger.info(f"Bot: Document has {page_count} pages")
+        return page_count
+
     except Exception as e:
         logger.error(f"Bot: Error counting pages: {e}")
         return 1
@@ -2980,8 +3017,11 @@ class AIPipeline(BaseModel):
     reviewed_by_id: Optional[str] = None
     reviewed_by_name: Optional[str] = None
     # AI usage tracking
-    total_tokens_used: int = 0
+    total_tokens_used: int = 0  # includes prompt-cache reads and writes
+    prompt_cache: Optional[dict] = None  # hits / misses / cached input tokens / input_tokens_saved
     claude_api_key_used: Optional[str] = None  # Masked for security
+    # Background job currently running (or last run) for this pipeline
+    job_id: Optional[str] = None
 
 class AIPipelineCreate(BaseModel):
     """Request to start AI translation pipeline"""
@@ -3490,53 +3530,81 @@ async def validate_admin_or_user_token(admin_key: str) -> dict:
     return None
 
 # Utility functions
-def count_words(text: str) -> int:
-    """Count words in text with improved accuracy"""
-    if not text or not text.strip():
-        return 0
-
-    # Clean the text: remove extra whitespace, normalize line breaks
-    cleaned_text = re.sub(r'\s+', ' ', text.strip())
-
-    # Split by whitespace and filter out empty strings
-    words = [word.strip() for word in cleaned_text.split() if word.strip()]
-
-    # Common short words in English and Portuguese (2 chars or less)
-    common_short_words = {
-        # English
-        'a', 'an', 'the', 'of', 'to', 'in', 'on', 'at', 'by', 'for', 'is', 'as',
-        'or', 'if', 'it', 'be', 'we', 'he', 'me', 'my', 'no', 'so', 'up', 'do', 'go',
-        'i', 'am', 'us', 'vs',
-        # Portuguese
+# ==================== WORD COUNT ====================
+# Billable word = a whitespace-separated token whose core (token minus leading/trailing
+# punctuation) is not a short number (< 4 digits) and is either longer than 2 characters
+# or a known short word of the document's language. Page separator lines the extraction adds
+# ("--- Page 3 ---", PAGE_MARKER_PATTERN) are not part of the document and are not counted.
+
+# One match per whitespace-separated token that contains a word character; group 1 is the core
+_WORD_CORE_RE = re.compile(r'[^\w\s]*(\w(?:\S*\w)?)[^\w\s]*')
+
+# Short words (2 chars or less) that count as billable words, per language
+SHORT_WORDS_BY_LANGUAGE = {
+    'en': frozenset({
+        'a', 'an', 'of', 'to', 'in', 'on', 'at', 'by', 'is', 'as', 'or', 'if', 'it',
+        'be', 'we', 'he', 'me', 'my', 'no', 'so', 'up', 'do', 'go', 'i', 'am', 'us', 'vs'
+    }),
+    'pt': frozenset({
         'de', 'da', 'do', 'em', 'um', 'se', 'ao', 'os', 'as', 'no', 'na', 'ou',
-        'eu', 'tu', 'me', 'te', 'lhe', 'nos', 'vos', 'ja', 'e', 'o', 'a', 'que',
-        'por', 'para', 'com', 'sem', 'sob', 'mais', 'menos', 'mas', 'nem',
-        # Spanish
-        'el', 'la', 'en', 'un', 'una', 'es', 'de', 'del', 'al', 'lo', 'los', 'las',
-        'y', 'que', 'su', 'sus', 'mi', 'tu', 'se', 'si', 'por', 'para', 'con', 'sin'
-    }
-
-    # Filter out PDF artifacts and noise
-    filtered_words = []
-    for word in words:
-        # Remove leading/trailing punctuation for checking
-        cleaned_word = re.sub(r'^[^\w]+|[^\w]+$', '', word)
-
-        # Skip empty after cleaning or words that are only punctuation/numbers
-        if not cleaned_word:
-            continue
+        'eu', 'tu', 'me', 'te', 'ja', 'e', 'o', 'a'
+    }),
+    'es': frozenset({
+        'el', 'la', 'en', 'un', 'es', 'de', 'al', 'lo', 'y', 'su', 'mi', 'tu', 'se', 'si'
+    }),
+    'fr': frozenset({
+        'a', 'à', 'y', 'en', 'le', 'la', 'de', 'du', 'un', 'il', 'je', 'tu', 'on',
+        'et', 'ou', 'où', 'ne', 'se', 'ce', 'me', 'te', 'sa', 'ta', 'ma', 'va', 'au'
+    }),
+    'de': frozenset({
+        'ob', 'zu', 'im', 'in', 'an', 'am', 'er', 'es', 'du', 'wo', 'so', 'um',
+        'ab', 'da', 'ja', 'wir', 'ihr'
+    }),
+    'it': frozenset({
+        'il', 'lo', 'la', 'i', 'e', 'è', 'a', 'di', 'da', 'in', 'su', 'un', 'o',
+        'ma', 'se', 'ci', 'mi', 'ti', 'si', 'ne', 'tu', 'io', 'lì', 'là', 'ed', 'ad'
+    }),
+}
 
-        # Skip if it's just numbers (like page numbers, dates, etc.)
-        if cleaned_word.isdigit() and len(cleaned_word) < 4:
-            continue
+# Default table (no language given): English + Portuguese + Spanish, the historical behaviour
+DEFAULT_SHORT_WORDS = SHORT_WORDS_BY_LANGUAGE['en'] | SHORT_WORDS_BY_LANGUAGE['pt'] | SHORT_WORDS_BY_LANGUAGE['es']
 
-        # Keep the word if it's longer than 2 chars OR it's a common short word
-        if len(cleaned_word) > 2 or cleaned_word.lower() in common_short_words:
-            filtered_words.append(word)
 
-    word_count = len(filtered_words)
-    logger.info(f"Word count: {word_count} (original split: {len(words)}, after filter: {len(filtered_words)})")
+def get_short_words(language: str = None) -> frozenset:
+    """
+    Short-word table for a language code or name ('pt', 'pt-BR', 'portuguese', 'Portuguese (Brazil)');
+    default table if unknown
+    """
+    match = re.match(r'[^\W\d_]+', (language or '').strip().lower())
+    if not match:
+        return DEFAULT_SHORT_WORDS
+    code = match.group(0)
+    code = {'english': 'en', 'portuguese': 'pt', 'português': 'pt', 'spanish': 'es', 'español': 'es',
+            'french': 'fr', 'français': 'fr', 'german': 'de', 'deutsch': 'de',
+            'italian': 'it', 'italiano': 'it'}.get(code, code)
+    return SHORT_WORDS_BY_LANGUAGE.get(code, DEFAULT_SHORT_WORDS)
+
+
+def count_words(text: str, language: str = None) -> int:
+    """Count billable words in one regex pass (see WORD COUNT above)"""
+    if not text:
+        return 0
 
+    text = PAGE_MARKER_PATTERN.sub('', text)
+    short_words = get_short_words(language)
+    word_count = 0
+    for core in _WORD_CORE_RE.findall(text):
+        length = len(core)
+        if length > 3:
+            word_count += 1
+        elif length == 3:
+            # Skip short numbers (page numbers, day/month, etc.)
+            if not core.isdigit():
+                word_count += 1
+        elif core.lower() in short_words:
+            word_count += 1
+
+    logger.info(f"Word count: {word_count}")
     return word_count
 
 def calculate_price(word_count: int, service_type: str, urgency: str) -> tuple[float, float, float]:
@@ -3937,101 +4005,180 @@ def get_estimated_delivery(urgency: str, source_type: str = "website") -> str:
     formatted_date = delivery_date.strftime("%A, %B %d")
     return f"{formatted_date} ({days_text}) EST"
 
-def extract_tables_from_textract(blocks: list) -> list:
+# ==================== TEXTRACT LAYOUT RECONSTRUCTION ====================
+
+class TextractBlockIndex:
     """
-    Extract tables from Textract blocks and convert to HTML format.
-    Returns a list of HTML table strings with their positions.
+    Single pass over a Textract response: id -> block, parent -> children, blocks by type and
+    a spatial index over TABLE regions (horizontal bands for point-in-table checks, table anchors
+    sorted by Top for range lookups). The text, HTML and table renderers all share one index
+    instead of re-scanning the block list per table or per line.
     """
-    tables = []
-    block_map = {block['Id']: block for block in blocks if 'Id' in block}
-
-    for block in blocks:
-        if block['BlockType'] == 'TABLE':
-            table_id = block['Id']
-            bbox = block.get('Geometry', {}).get('BoundingBox', {})
-
-            # Find all cells for this table
-            cells = []
-            if 'Relationships' in block:
-                for rel in block['Relationships']:
-                    if rel['Type'] == 'CHILD':
-                        for child_id in rel['Ids']:
-                            child_block = block_map.get(child_id)
-                            if child_block and child_block['BlockType'] == 'CELL':
-                                cells.append(child_block)
-
-            if not cells:
-                continue
 
-            # Determine table dimensions
-            max_row = max(cell.get('RowIndex', 1) for cell in cells)
-            max_col = max(cell.get('ColumnIndex', 1) for cell in cells)
+    BANDS = 64  # Horizontal bands over the page height for point-in-table checks
+    MAX_TOLERANCE = 0.02  # Largest tolerance a point-in-table query may use
+
+    def __init__(self, blocks: list):
+        self.blocks = blocks
+        self.by_id = {}
+        self.by_type = {}
+        self._cell_text = {}
+
+        by_id = self.by_id
+        by_type = self.by_type
+        for block in blocks:
+            same_type = by_type.get(block['BlockType'])
+            if same_type is None:
+                same_type = by_type[block['BlockType']] = []
+            same_type.append(block)
+            if 'Id' in block:
+                by_id[block['Id']] = block
+
+        self.tables = by_type.get('TABLE', [])
+        self.lines = by_type.get('LINE', [])
+        # LAYOUT_* blocks in their original (cross-type) order
+        self.layout_blocks = []
+        if any(block_type.startswith('LAYOUT_') for block_type in by_type):
+            self.layout_blocks = [block for block in blocks if block['BlockType'].startswith('LAYOUT_')]
+
+        # Table regions per band they overlap (only tables with a bounding box, as the renderers require)
+        self._table_bands = {}
+        for table in self.tables:
+            bbox = table.get('Geometry', {}).get('BoundingBox', {})
+            if not bbox:
+                continue
+            region = (bbox.get('Top', 0), bbox.get('Left', 0),
+                      bbox.get('Top', 0) + bbox.get('Height', 0), bbox.get('Left', 0) + bbox.get('Width', 0))
+            for band in range(self._band(region[0] - self.MAX_TOLERANCE), self._band(region[2] + self.MAX_TOLERANCE) + 1):
+                self._table_bands.setdefault(band, []).append(region)
+
+        # Table anchors (Top, Left) sorted by Top, with the table's position in the block list
+        anchors = []
+        for position, table in enumerate(self.tables):
+            bbox = table.get('Geometry', {}).get('BoundingBox', {})
+            anchors.append((bbox.get('Top', 0), position, bbox.get('Left', 0), table))
+        anchors.sort(key=lambda anchor: anchor[0])
+        self._anchor_tops = [anchor[0] for anchor in anchors]
+        self._anchors = anchors
+
+    @classmethod
+    def of(cls, blocks) -> 'TextractBlockIndex':
+        """Accept either a raw block list or an already built index"""
+        return blocks if isinstance(blocks, cls) else cls(blocks)
+
+    def _band(self, top: float) -> int:
+        return min(self.BANDS - 1, max(0, int(top * self.BANDS)))
+
+    def children(self, block: dict, block_type: str = None) -> list:
+        """CHILD blocks of a block, in relationship order, optionally filtered by type"""
+        children = []
+        for rel in block.get('Relationships', ()):
+            if rel['Type'] != 'CHILD':
+                continue
+            for child_id in rel['Ids']:
+                child_block = self.by_id.get(child_id)
+                if child_block and (block_type is None or child_block['BlockType'] == block_type):
+                    children.append(child_block)
+        return children
+
+    def cell_text(self, cell: dict) -> str:
+        """Text of a table CELL (its WORD children), computed once per cell"""
+        cell_id = cell.get('Id')
+        if cell_id not in self._cell_text:
+            self._cell_text[cell_id] = ''.join(word.get('Text', '') + ' ' for word in self.children(cell, 'WORD')).strip()
+        return self._cell_text[cell_id]
+
+    def in_table_region(self, top: float, left: float, tolerance: float = 0.0) -> bool:
+        """Whether a point lies inside any TABLE bounding box (grown by tolerance)"""
+        if tolerance > self.MAX_TOLERANCE:
+            raise ValueError(f"tolerance above {self.MAX_TOLERANCE} is not indexed")
+        for region_top, region_left, region_bottom, region_right in self._table_bands.get(self._band(top), ()):
+            if (region_top - tolerance <= top <= region_bottom + tolerance and
+                    region_left - tolerance <= left <= region_right + tolerance):
+                return True
+        return False
 
-            # Create table grid
-            table_grid = [['' for _ in range(max_col)] for _ in range(max_row)]
+    def first_table_anchored_in(self, top: float, bottom: float, left: float, right: float):
+        """First TABLE (in block order) whose top-left corner lies in the given rectangle"""
+        best = None
+        for table_top, position, table_left, table in self._anchors[bisect_left(self._anchor_tops, top):bisect_right(self._anchor_tops, bottom)]:
+            if left <= table_left <= right and (best is None or position < best[0]):
+                best = (position, table)
+        return best[1] if best else None
 
-            for cell in cells:
-                row_idx = cell.get('RowIndex', 1) - 1
-                col_idx = cell.get('ColumnIndex', 1) - 1
 
-                # Get cell text
-                cell_text = ''
-                if 'Relationships' in cell:
-                    for rel in cell['Relationships']:
-                        if rel['Type'] == 'CHILD':
-                            for child_id in rel['Ids']:
-                                child_block = block_map.get(child_id)
-                                if child_block and child_block['BlockType'] == 'WORD':
-                                    cell_text += child_block.get('Text', '') + ' '
+def extract_tables_from_textract(blocks) -> list:
+    """
+    Extract tables from Textract blocks and convert to HTML format.
+    Returns a list of HTML table strings with their positions.
+    """
+    index = TextractBlockIndex.of(blocks)
+    tables = []
 
-                if row_idx < max_row and col_idx < max_col:
-                    table_grid[row_idx][col_idx] = cell_text.strip()
+    for block in index.tables:
+        bbox = block.get('Geometry', {}).get('BoundingBox', {})
 
-            # Build HTML table
-            html = '<table style="border-collapse: collapse; width: 100%; max-width: 100%; margin: 10px 0; table-layout: fixed;">\n'
-            for row_idx, row in enumerate(table_grid):
-                html += '  <tr>\n'
-                for col_idx, cell_text in enumerate(row):
-                    tag = 'th' if row_idx == 0 else 'td'
-                    style = 'border: 1px solid #333; padding: 4px 6px; font-size: 9pt; text-align: left; vertical-align: top; word-wrap: break-word; overflow-wrap: break-word; overflow: hidden; line-height: 1.3;'
-                    if row_idx == 0:
-                        style += ' background-color: #f0f0f0; font-weight: bold;'
-                    html += f'    <{tag} style="{style}">{cell_text}</{tag}>\n'
-                html += '  </tr>\n'
-            html += '</table>\n'
+        # Find all cells for this table
+        cells = index.children(block, 'CELL')
+        if not cells:
+            continue
 
-            tables.append({
-                'html': html,
-                'top': bbox.get('Top', 0),
-                'left': bbox.get('Left', 0)
-            })
+        # Determine table dimensions
+        max_row = max(cell.get('RowIndex', 1) for cell in cells)
+        max_col = max(cell.get('ColumnIndex', 1) for cell in cells)
+
+        # Create table grid
+        table_grid = [['' for _ in range(max_col)] for _ in range(max_row)]
+
+        for cell in cells:
+            row_idx = cell.get('RowIndex', 1) - 1
+            col_idx = cell.get('ColumnIndex', 1) - 1
+            if row_idx < max_row and col_idx < max_col:
+                table_grid[row_idx][col_idx] = index.cell_text(cell)
+
+        # Build HTML table
+        html = '<table style="border-collapse: collapse; width: 100%; max-width: 100%; margin: 10px 0; table-layout: fixed;">\n'
+        for row_idx, row in enumerate(table_grid):
+            html += '  <tr>\n'
+            for col_idx, cell_text in enumerate(row):
+                tag = 'th' if row_idx == 0 else 'td'
+                style = 'border: 1px solid #333; padding: 4px 6px; font-size: 9pt; text-align: left; vertical-align: top; word-wrap: break-word; overflow-wrap: break-word; overflow: hidden; line-height: 1.3;'
+                if row_idx == 0:
+                    style += ' background-color: #f0f0f0; font-weight: bold;'
+                html += f'    <{tag} style="{style}">{cell_text}</{tag}>\n'
+            html += '  </tr>\n'
+        html += '</table>\n'
+
+        tables.append({
+            'html': html,
+            'top': bbox.get('Top', 0),
+            'left': bbox.get('Left', 0)
+        })
 
     return tables
 
 
-def reconstruct_layout_html_from_textract(blocks: list, page_width: int = 800, page_height: int = 1100) -> str:
+def reconstruct_layout_html_from_textract(blocks, page_width: int = 800, page_height: int = 1100) -> str:
     """
     Reconstruct the original page layout from Textract blocks using HTML.
     Uses LAYOUT blocks (when available) for better structure preservation.
     Falls back to LINE/TABLE blocks for older Textract responses.
+    blocks may be the raw block list or a TextractBlockIndex.
 
     Returns HTML that visually represents the document layout.
     """
-    block_map = {block['Id']: block for block in blocks if 'Id' in block}
+    index = TextractBlockIndex.of(blocks)
 
     # Check if we have LAYOUT blocks (newer Textract LAYOUT feature)
-    layout_blocks = [b for b in blocks if b['BlockType'].startswith('LAYOUT_')]
-    has_layout = len(layout_blocks) > 0
-
-    if has_layout:
+    if index.layout_blocks:
         # Use LAYOUT blocks for better structure (reading order preserved)
-        return _reconstruct_from_layout_blocks(blocks, block_map, page_width, page_height)
+        return _reconstruct_from_layout_blocks(index, page_width, page_height)
     else:
         # Fall back to LINE/TABLE reconstruction
-        return _reconstruct_from_line_blocks(blocks, block_map, page_width, page_height)
+        return _reconstruct_from_line_blocks(index, page_width, page_height)
 
 
-def _reconstruct_from_layout_blocks(blocks: list, block_map: dict, page_width: int, page_height: int) -> str:
+def _reconstruct_from_layout_blocks(index: TextractBlockIndex, page_width: int, page_height: int) -> str:
     """
     Reconstruct HTML using LAYOUT blocks which preserve reading order and semantic structure.
     LAYOUT blocks include: LAYOUT_TITLE, LAYOUT_HEADER, LAYOUT_TEXT, LAYOUT_TABLE,
@@ -4042,17 +4189,16 @@ def _reconstruct_from_layout_blocks(blocks: list, block_map: dict, page_width: i
 
     # Get LAYOUT blocks sorted by reading order (Top position as fallback)
     layout_blocks = []
-    for block in blocks:
-        if block['BlockType'].startswith('LAYOUT_'):
-            bbox = block.get('Geometry', {}).get('BoundingBox', {})
-            layout_blocks.append({
-                'block': block,
-                'type': block['BlockType'],
-                'top': bbox.get('Top', 0),
-                'left': bbox.get('Left', 0),
-                'width': bbox.get('Width', 1),
-                'height': bbox.get('Height', 0)
-            })
+    for block in index.layout_blocks:
+        bbox = block.get('Geometry', {}).get('BoundingBox', {})
+        layout_blocks.append({
+            'block': block,
+            'type': block['BlockType'],
+            'top': bbox.get('Top', 0),
+            'left': bbox.get('Left', 0),
+            'width': bbox.get('Width', 1),
+            'height': bbox.get('Height', 0)
+        })
 
     # Sort by top position (reading order)
     layout_blocks.sort(key=lambda x: (x['top'], x['left']))
@@ -4063,7 +4209,7 @@ def _reconstruct_from_layout_blocks(blocks: list, block_map: dict, page_width: i
         block_type = layout['type']
 
         # Get text content from child blocks
-        content_text = _get_layout_block_text(block, block_map)
+        content_text = _get_layout_block_text(block, index)
 
         if not content_text.strip():
             continue
@@ -4083,7 +4229,7 @@ def _reconstruct_from_layout_blocks(blocks: list, block_map: dict, page_width: i
 
         elif block_type == 'LAYOUT_TABLE':
             # For tables, find the corresponding TABLE block and render it
-            table_html = _find_and_render_table(block, blocks, block_map)
+            table_html = _find_and_render_table(block, index)
             if table_html:
                 html_parts.append(f'<div style="margin: 10px 0; overflow-x: auto;">{table_html}</div>')
             else:
@@ -4118,27 +4264,20 @@ def _reconstruct_from_layout_blocks(blocks: list, block_map: dict, page_width: i
     return '\n'.join(html_parts)
 
 
-def _get_layout_block_text(block: dict, block_map: dict) -> str:
+def _get_layout_block_text(block: dict, index: TextractBlockIndex) -> str:
     """Extract text content from a LAYOUT block by traversing its children."""
     text_parts = []
 
-    if 'Relationships' in block:
-        for rel in block['Relationships']:
-            if rel['Type'] == 'CHILD':
-                for child_id in rel['Ids']:
-                    child_block = block_map.get(child_id)
-                    if child_block:
-                        if child_block['BlockType'] == 'LINE':
-                            text_parts.append(child_block.get('Text', ''))
-                        elif child_block['BlockType'] == 'WORD':
-                            text_parts.append(child_block.get('Text', ''))
-                        elif 'Text' in child_block:
-                            text_parts.append(child_block['Text'])
+    for child_block in index.children(block):
+        if child_block['BlockType'] in ('LINE', 'WORD'):
+            text_parts.append(child_block.get('Text', ''))
+        elif 'Text' in child_block:
+            text_parts.append(child_block['Text'])
 
     return '\n'.join(text_parts) if text_parts else ''
 
 
-def _find_and_render_table(layout_block: dict, blocks: list, block_map: dict) -> str:
+def _find_and_render_table(layout_block: dict, index: TextractBlockIndex) -> str:
     """Find TABLE block that overlaps with LAYOUT_TABLE and render it as HTML."""
     layout_bbox = layout_block.get('Geometry', {}).get('BoundingBox', {})
     layout_top = layout_bbox.get('Top', 0)
@@ -4146,31 +4285,18 @@ def _find_and_render_table(layout_block: dict, blocks: list, block_map: dict) ->
     layout_bottom = layout_top + layout_bbox.get('Height', 0)
     layout_right = layout_left + layout_bbox.get('Width', 0)
 
-    # Find TABLE block that overlaps
-    for block in blocks:
-        if block['BlockType'] == 'TABLE':
-            table_bbox = block.get('Geometry', {}).get('BoundingBox', {})
-            table_top = table_bbox.get('Top', 0)
-            table_left = table_bbox.get('Left', 0)
-
-            # Check if table is within layout region (with tolerance)
-            if (layout_top - 0.02 <= table_top <= layout_bottom + 0.02 and
-                layout_left - 0.02 <= table_left <= layout_right + 0.02):
-                return _render_table_block(block, block_map)
+    # Find TABLE block whose top-left corner is within the layout region (with tolerance)
+    table_block = index.first_table_anchored_in(layout_top - 0.02, layout_bottom + 0.02,
+                                                layout_left - 0.02, layout_right + 0.02)
+    if table_block is not None:
+        return _render_table_block(table_block, index)
 
     return None
 
 
-def _render_table_block(table_block: dict, block_map: dict) -> str:
+def _render_table_block(table_block: dict, index: TextractBlockIndex) -> str:
     """Render a TABLE block as HTML table."""
-    cells = []
-    if 'Relationships' in table_block:
-        for rel in table_block['Relationships']:
-            if rel['Type'] == 'CHILD':
-                for child_id in rel['Ids']:
-                    child_block = block_map.get(child_id)
-                    if child_block and child_block['BlockType'] == 'CELL':
-                        cells.append(child_block)
+    cells = index.children(table_block, 'CELL')
 
     if not cells:
         return None
@@ -4188,19 +4314,9 @@ def _render_table_block(table_block: dict, block_map: dict) -> str:
         row_span = cell.get('RowSpan', 1)
         col_span = cell.get('ColumnSpan', 1)
 
-        # Get cell text
-        cell_text = ''
-        if 'Relationships' in cell:
-            for rel in cell['Relationships']:
-                if rel['Type'] == 'CHILD':
-                    for child_id in rel['Ids']:
-                        child_block = block_map.get(child_id)
-                        if child_block and child_block['BlockType'] == 'WORD':
-                            cell_text += child_block.get('Text', '') + ' '
-
         if row_idx < max_row and col_idx < max_col:
             table_grid[row_idx][col_idx] = {
-                'text': cell_text.strip(),
+                'text': index.cell_text(cell),
                 'rowspan': row_span,
                 'colspan': col_span,
                 'skip': False
@@ -4239,70 +4355,48 @@ def _render_table_block(table_block: dict, block_map: dict) -> str:
     return table_html
 
 
-def _reconstruct_from_line_blocks(blocks: list, block_map: dict, page_width: int, page_height: int) -> str:
+def _reconstruct_from_line_blocks(index: TextractBlockIndex, page_width: int, page_height: int) -> str:
     """
     Fallback reconstruction using LINE and TABLE blocks (original method).
     Used when LAYOUT feature is not available.
     """
     elements = []
-    table_regions = []
-
-    # First, identify table regions
-    for block in blocks:
-        if block['BlockType'] == 'TABLE':
-            bbox = block.get('Geometry', {}).get('BoundingBox', {})
-            if bbox:
-                table_regions.append({
-                    'top': bbox.get('Top', 0),
-                    'left': bbox.get('Left', 0),
-                    'width': bbox.get('Width', 0),
-                    'height': bbox.get('Height', 0),
-                    'bottom': bbox.get('Top', 0) + bbox.get('Height', 0),
-                    'right': bbox.get('Left', 0) + bbox.get('Width', 0)
-                })
-
-    def is_in_table_region(top, left):
-        for tr in table_regions:
-            if (tr['top'] <= top <= tr['bottom'] and
-                tr['left'] <= left <= tr['right']):
-                return True
-        return False
 
-    # Process LINE blocks for text
-    for block in blocks:
-        if block['BlockType'] == 'LINE' and 'Geometry' in block:
-            bbox = block['Geometry']['BoundingBox']
-            top = bbox.get('Top', 0)
-            left = bbox.get('Left', 0)
+    # Process LINE blocks for text (lines inside a table region are rendered by the table)
+    for block in index.lines:
+        if 'Geometry' not in block:
+            continue
+        bbox = block['Geometry']['BoundingBox']
+        top = bbox.get('Top', 0)
+        left = bbox.get('Left', 0)
 
-            if is_in_table_region(top, left):
-                continue
+        if index.in_table_region(top, left):
+            continue
 
-            elements.append({
-                'type': 'text',
-                'text': block.get('Text', ''),
-                'top': top,
-                'left': left,
-                'width': bbox.get('Width', 0),
-                'height': bbox.get('Height', 0),
-                'confidence': block.get('Confidence', 100)
-            })
+        elements.append({
+            'type': 'text',
+            'text': block.get('Text', ''),
+            'top': top,
+            'left': left,
+            'width': bbox.get('Width', 0),
+            'height': bbox.get('Height', 0),
+            'confidence': block.get('Confidence', 100)
+        })
 
     # Process TABLE blocks
-    for block in blocks:
-        if block['BlockType'] == 'TABLE':
-            bbox = block.get('Geometry', {}).get('BoundingBox', {})
-            table_html = _render_table_block(block, block_map)
+    for block in index.tables:
+        bbox = block.get('Geometry', {}).get('BoundingBox', {})
+        table_html = _render_table_block(block, index)
 
-            if table_html:
-                elements.append({
-                    'type': 'table',
-                    'html': table_html,
-                    'top': bbox.get('Top', 0),
-                    'left': bbox.get('Left', 0),
-                    'width': bbox.get('Width', 1),
-                    'height': bbox.get('Height', 0)
-                })
+        if table_html:
+            elements.append({
+                'type': 'table',
+                'html': table_html,
+                'top': bbox.get('Top', 0),
+                'left': bbox.get('Left', 0),
+                'width': bbox.get('Width', 1),
+                'height': bbox.get('Height', 0)
+            })
 
     # Sort elements by vertical position then horizontal
     elements.sort(key=lambda x: (x['top'], x['left']))
@@ -4331,109 +4425,73 @@ def _reconstruct_from_line_blocks(blocks: list, block_map: dict, page_width: int
     return '\n'.join(html_parts)
 
 
-def reconstruct_layout_text_from_textract(blocks: list, page_width_chars: int = 100) -> str:
+def reconstruct_layout_text_from_textract(blocks, page_width_chars: int = 100) -> str:
     """
     Reconstruct the original page layout from Textract blocks as plain text.
     Uses bounding box coordinates to preserve spatial positioning with spaces.
     Better for text-only output with maintained positioning.
+    blocks may be the raw block list or a TextractBlockIndex.
     """
-    block_map = {block['Id']: block for block in blocks if 'Id' in block}
-
-    # Collect table regions to avoid duplicating text
-    table_regions = []
-    for block in blocks:
-        if block['BlockType'] == 'TABLE':
-            bbox = block.get('Geometry', {}).get('BoundingBox', {})
-            if bbox:
-                table_regions.append({
-                    'top': bbox.get('Top', 0),
-                    'left': bbox.get('Left', 0),
-                    'bottom': bbox.get('Top', 0) + bbox.get('Height', 0),
-                    'right': bbox.get('Left', 0) + bbox.get('Width', 0)
-                })
-
-    def is_in_table(top, left):
-        for tr in table_regions:
-            if (tr['top'] - 0.01 <= top <= tr['bottom'] + 0.01 and
-                tr['left'] - 0.01 <= left <= tr['right'] + 0.01):
-                return True
-        return False
+    index = TextractBlockIndex.of(blocks)
 
-    # Collect all lines with positions
+    # Collect all lines with positions (lines inside a table region would duplicate table text)
     lines = []
-    for block in blocks:
-        if block['BlockType'] == 'LINE' and 'Geometry' in block:
-            bbox = block['Geometry']['BoundingBox']
-            top = bbox.get('Top', 0)
-            left = bbox.get('Left', 0)
-
-            if not is_in_table(top, left):
-                lines.append({
-                    'text': block.get('Text', ''),
-                    'top': top,
-                    'left': left
-                })
+    for block in index.lines:
+        if 'Geometry' not in block:
+            continue
+        bbox = block['Geometry']['BoundingBox']
+        top = bbox.get('Top', 0)
+        left = bbox.get('Left', 0)
+
+        if not index.in_table_region(top, left, 0.01):
+            lines.append({
+                'text': block.get('Text', ''),
+                'top': top,
+                'left': left
+            })
 
     # Collect tables
     tables = []
-    for block in blocks:
-        if block['BlockType'] == 'TABLE':
-            bbox = block.get('Geometry', {}).get('BoundingBox', {})
-
-            cells = []
-            if 'Relationships' in block:
-                for rel in block['Relationships']:
-                    if rel['Type'] == 'CHILD':
-                        for child_id in rel['Ids']:
-                            child_block = block_map.get(child_id)
-                            if child_block and child_block['BlockType'] == 'CELL':
-                                cells.append(child_block)
-
-            if cells:
-                max_row = max(cell.get('RowIndex', 1) for cell in cells)
-                max_col = max(cell.get('ColumnIndex', 1) for cell in cells)
-
-                # Calculate column widths
-                col_widths = [15] * max_col  # Default width
-                table_grid = [['' for _ in range(max_col)] for _ in range(max_row)]
-
-                for cell in cells:
-                    row_idx = cell.get('RowIndex', 1) - 1
-                    col_idx = cell.get('ColumnIndex', 1) - 1
-
-                    cell_text = ''
-                    if 'Relationships' in cell:
-                        for rel in cell['Relationships']:
-                            if rel['Type'] == 'CHILD':
-                                for child_id in rel['Ids']:
-                                    child_block = block_map.get(child_id)
-                                    if child_block and child_block['BlockType'] == 'WORD':
-                                        cell_text += child_block.get('Text', '') + ' '
-
-                    cell_text = cell_text.strip()
-                    if row_idx < max_row and col_idx < max_col:
-                        table_grid[row_idx][col_idx] = cell_text
-                        col_widths[col_idx] = max(col_widths[col_idx], len(cell_text) + 2)
-
-                # Build text table
-                table_lines = []
-                separator = '+' + '+'.join(['-' * w for w in col_widths]) + '+'
-                table_lines.append(separator)
-
-                for row_idx, row in enumerate(table_grid):
-                    row_text = '|'
-                    for col_idx, cell_text in enumerate(row):
-                        row_text += cell_text.ljust(col_widths[col_idx]) + '|'
-                    table_lines.append(row_text)
-                    if row_idx == 0:
-                        table_lines.append(separator)
-
-                table_lines.append(separator)
-
-                tables.append({
-                    'text': '\n'.join(table_lines),
-                    'top': bbox.get('Top', 0)
-                })
+    for block in index.tables:
+        bbox = block.get('Geometry', {}).get('BoundingBox', {})
+
+        cells = index.children(block, 'CELL')
+        if cells:
+            max_row = max(cell.get('RowIndex', 1) for cell in cells)
+            max_col = max(cell.get('ColumnIndex', 1) for cell in cells)
+
+            # Calculate column widths
+            col_widths = [15] * max_col  # Default width
+            table_grid = [['' for _ in range(max_col)] for _ in range(max_row)]
+
+            for cell in cells:
+                row_idx = cell.get('RowIndex', 1) - 1
+                col_idx = cell.get('ColumnIndex', 1) - 1
+
+                cell_text = index.cell_text(cell)
+                if row_idx < max_row and col_idx < max_col:
+                    table_grid[row_idx][col_idx] = cell_text
+                    col_widths[col_idx] = max(col_widths[col_idx], len(cell_text) + 2)
+
+            # Build text table
+            table_lines = []
+            separator = '+' + '+'.join(['-' * w for w in col_widths]) + '+'
+            table_lines.append(separator)
+
+            for row_idx, row in enumerate(table_grid):
+                row_text = '|'
+                for col_idx, cell_text in enumerate(row):
+                    row_text += cell_text.ljust(col_widths[col_idx]) + '|'
+                table_lines.append(row_text)
+                if row_idx == 0:
+                    table_lines.append(separator)
+
+            table_lines.append(separator)
+
+            tables.append({
+                'text': '\n'.join(table_lines),
+                'top': bbox.get('Top', 0)
+            })
 
     # Sort all elements by position
     all_elements = []
@@ -4497,45 +4555,41 @@ def reconstruct_layout_text_from_textract(blocks: list, page_width_chars: int =
     return '\n'.join(output_lines)
 
 
-def reconstruct_layout_from_textract(blocks: list, page_width_chars: int = 120, include_tables: bool = True) -> str:
+def reconstruct_layout_from_textract(blocks, page_width_chars: int = 120, include_tables: bool = True) -> str:
     """
     Reconstruct the original page layout from Textract blocks using geometry.
     Uses bounding box coordinates to preserve spatial positioning.
     Now also supports tables when include_tables is True.
+    blocks may be the raw block list or a TextractBlockIndex.
     """
+    index = TextractBlockIndex.of(blocks)
+
     # Extract tables first if enabled
-    tables_html = []
-    table_positions = set()
-    if include_tables:
-        tables = extract_tables_from_textract(blocks)
-        for table in tables:
-            tables_html.append(table)
-            # Mark the vertical position of tables to avoid duplicating text
-            table_positions.add(round(table['top'], 2))
+    tables_html = extract_tables_from_textract(index) if include_tables else []
+
+    # Rounded table tops, sorted, to skip lines within 0.1 of a table with two bisects per line
+    table_tops = sorted(round(table['top'], 2) for table in tables_html)
 
     # Extract LINE blocks with their geometry (excluding lines inside tables)
     lines = []
-    for block in blocks:
-        if block['BlockType'] == 'LINE' and 'Geometry' in block:
-            bbox = block['Geometry']['BoundingBox']
-            line_top = round(bbox['Top'], 2)
-
-            # Skip lines that are inside table regions
-            is_in_table = False
-            for table in tables_html:
-                table_top = table['top']
-                if abs(line_top - round(table_top, 2)) < 0.1:  # Within table region
-                    is_in_table = True
-                    break
+    for block in index.lines:
+        if 'Geometry' not in block:
+            continue
+        bbox = block['Geometry']['BoundingBox']
+        line_top = round(bbox['Top'], 2)
 
-            if not is_in_table:
-                lines.append({
-                    'text': block['Text'],
-                    'left': bbox['Left'],
-                    'top': bbox['Top'],
-                    'width': bbox['Width'],
-                    'height': bbox['Height']
-                })
+        # Skip lines that are inside table regions
+        nearby = table_tops[bisect_left(table_tops, line_top - 0.1):bisect_right(table_tops, line_top + 0.1)]
+        if any(abs(line_top - table_top) < 0.1 for table_top in nearby):
+            continue
+
+        lines.append({
+            'text': block['Text'],
+            'left': bbox['Left'],
+            'top': bbox['Top'],
+            'width': bbox['Width'],
+            'height': bbox['Height']
+        })
 
     # Sort lines by vertical position (top), then by horizontal position (left)
     lines.sort(key=lambda x: (round(x['top'], 2), x['left']))
@@ -4643,23 +4697,20 @@ def extract_text_with_textract(content: bytes, file_extension: str, preserve_lay
                     Document={'Bytes': content}
                 )
 
-            blocks = response.get('Blocks', [])
+            # One index shared by the HTML and text renderers
+            index = TextractBlockIndex(response.get('Blocks', []))
 
             # Generate HTML with visual layout (best for preserving document appearance)
-            html = reconstruct_layout_html_from_textract(blocks)
+            html = reconstruct_layout_html_from_textract(index)
 
             # Generate plain text with layout preservation
             text = ""
             if preserve_layout:
-                text = reconstruct_layout_text_from_textract(blocks)
+                text = reconstruct_layout_text_from_textract(index)
 
             # Fallback to simple extraction if layout reconstruction returned empty
             if not text or len(text.strip()) < 10:
-                text_parts = []
-                for block in blocks:
-                    if block['BlockType'] == 'LINE':
-                        text_parts.append(block['Text'])
-                text = '\n'.join(text_parts)
+                text = '\n'.join(block['Text'] for block in index.lines)
                 logger.info(f"AWS Textract: layout reconstruction empty, using simple extraction")
 
             logger.info(f"AWS Textract extracted {len(text)} characters from image (tables: {detect_tables})")
@@ -4667,79 +4718,106 @@ def extract_text_with_textract(content: bytes, file_extension: str, preserve_lay
 
         # For PDFs, convert pages to images first
         elif file_extension == 'pdf':
-            all_pages_text = []
-            all_pages_html = []
-            TEXTRACT_MAX_SIZE = 5 * 1024 * 1024  # 5MB max for Textract
             try:
-                pdf_document = fitz.open(stream=content, filetype="pdf")
-
-                for page_num in range(min(pdf_document.page_count, 15)):  # Limit to 15 pages
-                    page = pdf_document[page_num]
-
-                    # Try different zoom levels to stay under 5MB limit
-                    img_data = None
-                    for zoom in [2.0, 1.5, 1.0, 0.75]:
-                        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
-                        img_data = pix.tobytes("png")
-
-                        # If PNG is too large, try JPEG (much smaller)
-                        if len(img_data) > TEXTRACT_MAX_SIZE:
-                            # Convert to JPEG using PIL
-                            img = Image.open(io.BytesIO(img_data))
-                            jpeg_buffer = io.BytesIO()
-                            img.convert('RGB').save(jpeg_buffer, format='JPEG', quality=85)
-                            img_data = jpeg_buffer.getvalue()
-
-                        if len(img_data) <= TEXTRACT_MAX_SIZE:
-                            break
-
-                    if len(img_data) > TEXTRACT_MAX_SIZE:
-                        logger.warning(f"Page {page_num + 1} image too large ({len(img_data)} bytes), skipping")
-                        continue
+                rendered = render_pdf_pages_for_textract(content)
+            except Exception as e:
+                logger.warning(f"Textract PDF processing failed: {e}")
+                return None
+            return textract_rendered_pdf_pages(rendered, preserve_layout, detect_tables)
+
+    except ClientError as e:
+        error_code = e.response.get('Error', {}).get('Code', 'Unknown')
+        error_msg = e.response.get('Error', {}).get('Message', str(e))
+        logger.error(f"AWS Textract ClientError: Code={error_code}, Message={error_msg}")
+        return None
+    except Exception as e:
+        logger.error(f"Textract extraction failed: {type(e).__name__}: {e}")
+        return None
+
+    return None
 
-                    # Send to Textract - use analyze_document for table detection
-                    if detect_tables:
-                        response = textract_client.analyze_document(
-                            Document={'Bytes': img_data},
-                            FeatureTypes=['TABLES', 'LAYOUT']
-                        )
-                    else:
-                        response = textract_client.detect_document_text(
-                            Document={'Bytes': img_data}
-                        )
 
-                    blocks = response.get('Blocks', [])
+def analyze_page_image_with_textract(img_data: bytes, preserve_layout: bool = True, detect_tables: bool = True, client=None) -> dict:
+    """Send one rendered page image to Textract and rebuild its layout. Returns dict with 'text' and 'html'."""
+    client = client or textract_client
 
-                    # Generate HTML for this page
-                    page_html = reconstruct_layout_html_from_textract(blocks)
-                    all_pages_html.append(f'<div style="margin-bottom: 20px; border-bottom: 2px dashed #ccc; padding-bottom: 20px;"><h4 style="color: #666; margin-bottom: 10px;">--- Page {page_num + 1} ---</h4>{page_html}</div>')
+    # Send to Textract - use analyze_document for table detection
+    if detect_tables:
+        response = client.analyze_document(
+            Document={'Bytes': img_data},
+            FeatureTypes=['TABLES', 'LAYOUT']
+        )
+    else:
+        response = client.detect_document_text(
+            Document={'Bytes': img_data}
+        )
 
-                    # Generate plain text for this page
-                    page_text = ""
-                    if preserve_layout:
-                        page_text = reconstruct_layout_text_from_textract(blocks)
+    # One index shared by the HTML and text renderers
+    index = TextractBlockIndex(response.get('Blocks', []))
 
-                    # Fallback to simple extraction if layout reconstruction returned empty
-                    if not page_text or len(page_text.strip()) < 5:
-                        page_text = ""
-                        for block in blocks:
-                            if block['BlockType'] == 'LINE':
-                                page_text += block['Text'] + '\n'
+    # Generate HTML for this page
+    page_html = reconstruct_layout_html_from_textract(index)
 
-                    if page_text.strip():
-                        all_pages_text.append(f"--- Page {page_num + 1} ---\n{page_text}")
+    # Generate plain text for this page
+    page_text = ""
+    if preserve_layout:
+        page_text = reconstruct_layout_text_from_textract(index)
 
-                num_pages = pdf_document.page_count
-                pdf_document.close()
+    # Fallback to simple extraction if layout reconstruction returned empty
+    if not page_text or len(page_text.strip()) < 5:
+        page_text = ''.join(block['Text'] + '\n' for block in index.lines)
 
-                text = '\n\n'.join(all_pages_text)
-                html = '\n'.join(all_pages_html)
-                logger.info(f"AWS Textract extracted {len(text)} characters from PDF ({num_pages} pages, layout: {preserve_layout}, tables: {detect_tables})")
-                return {'text': text, 'html': html}
+    return {'text': page_text, 'html': page_html}
 
-            except Exception as e:
-                logger.warning(f"Textract PDF processing failed: {e}")
-                return None
+
+def _textract_page_html(page_number: int, page_html: str) -> str:
+    return f'<div style="margin-bottom: 20px; border-bottom: 2px dashed #ccc; padding-bottom: 20px;"><h4 style="color: #666; margin-bottom: 10px;">--- Page {page_number} ---</h4>{page_html}</div>'
+
+
+def assemble_textract_pages(page_results: list, page_count: int, preserve_layout: bool = True, detect_tables: bool = True) -> dict:
+    """
+    Join per-page Textract results into the '--- Page N ---' text and HTML, in page order.
+    page_results is a list of (page_number, {'text', 'html'} or None) - None marks a failed page.
+    """
+    all_pages_text = []
+    all_pages_html = []
+    page_texts = {}
+    failed_pages = []
+
+    for page_number, page_result in sorted(page_results, key=lambda item: item[0]):
+        if page_result is None:
+            failed_pages.append(page_number)
+            all_pages_html.append(_textract_page_html(page_number, '<p style="color: #c00;">[OCR failed for this page]</p>'))
+            continue
+
+        all_pages_html.append(_textract_page_html(page_number, page_result['html']))
+        if page_result['text'].strip():
+            page_texts[page_number] = page_result['text']
+            all_pages_text.append(f"--- Page {page_number} ---\n{page_result['text']}")
+
+    text = '\n\n'.join(all_pages_text)
+    html = '\n'.join(all_pages_html)
+    logger.info(f"AWS Textract extracted {len(text)} characters from PDF ({page_count} pages, layout: {preserve_layout}, tables: {detect_tables}, failed pages: {failed_pages or 'none'})")
+
+    result = {'text': text, 'html': html, 'page_texts': page_texts}
+    if failed_pages:
+        result['failed_pages'] = failed_pages
+    return result
+
+
+def textract_rendered_pdf_pages(rendered: dict, preserve_layout: bool = True, detect_tables: bool = True) -> dict:
+    """
+    Run Textract serially over PDF pages produced by render_pdf_pages_for_textract
+    and assemble the '--- Page N ---' text and HTML. Returns None on failure.
+    """
+    page_results = []
+    try:
+        for page_number, img_data in rendered['pages']:
+            if img_data is None:
+                continue
+            page_results.append((page_number, analyze_page_image_with_textract(img_data, preserve_layout, detect_tables)))
+
+        return assemble_textract_pages(page_results, rendered['page_count'], preserve_layout, detect_tables)
 
     except ClientError as e:
         error_code = e.response.get('Error', {}).get('Code', 'Unknown')
@@ -4747,195 +4825,702 @@ def extract_text_with_textract(content: bytes, file_extension: str, preserve_lay
         logger.error(f"AWS Textract ClientError: Code={error_code}, Message={error_msg}")
         return None
     except Exception as e:
-        logger.error(f"Textract extraction failed: {type(e).__name__}: {e}")
+        logger.warning(f"Textract PDF processing failed: {e}")
         return None
 
-    return None
 
+# Max Textract calls in flight per document (page fan-out); also bounded by OCR_THREAD_WORKERS
+TEXTRACT_PAGE_CONCURRENCY = int(os.environ.get('TEXTRACT_PAGE_CONCURRENCY', '4'))
+TEXTRACT_THROTTLE_CODES = {'ThrottlingException', 'ProvisionedThroughputExceededException', 'LimitExceededException'}
 
-async def extract_text_from_file(file: UploadFile) -> str:
-    """Extract text from uploaded file using AWS Textract (primary) or Tesseract (fallback)"""
-    content = await file.read()
-    file_extension = file.filename.split('.')[-1].lower()
 
-    def tesseract_ocr_multi_config(image):
-        """Try multiple Tesseract configurations and return best result"""
-        configs = [
-            r'--oem 3 --psm 6',   # Uniform text block (default)
-            r'--oem 3 --psm 3',   # Fully automatic
-            r'--oem 3 --psm 4',   # Single column
-            r'--oem 3 --psm 1',   # Auto with OSD
-            r'--oem 3 --psm 12',  # Sparse text
-        ]
+async def textract_pdf_pages_parallel(rendered: dict, preserve_layout: bool = True, detect_tables: bool = True,
+                                      max_concurrency: int = None, client=None) -> dict:
+    """
+    Page-parallel Textract: send every rendered page concurrently (bounded by max_concurrency),
+    then reassemble in page order. A page that still fails after a throttling retry is reported
+    in 'failed_pages' instead of failing the whole document. Returns None only if every page failed.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency or TEXTRACT_PAGE_CONCURRENCY)
 
-        best_text = ""
-        for config in configs:
-            try:
-                text = pytesseract.image_to_string(image, config=config)
-                if len(text.strip()) > len(best_text.strip()):
-                    best_text = text
-                    logger.info(f"Tesseract config {config} extracted {len(text)} chars")
-            except Exception as e:
-                logger.warning(f"Tesseract config {config} failed: {str(e)}")
-                continue
+    async def process_page(page_number: int, img_data: bytes):
+        async with semaphore:
+            for attempt in range(2):
+                try:
+                    return page_number, await ocr_executor.run_io(
+                        analyze_page_image_with_textract, img_data, preserve_layout, detect_tables, client
+                    )
+                except ClientError as e:
+                    error_code = e.response.get('Error', {}).get('Code', 'Unknown')
+                    if error_code in TEXTRACT_THROTTLE_CODES and attempt == 0:
+                        logger.warning(f"Textract throttled on page {page_number}, retrying...")
+                        await asyncio.sleep(1.0)
+                        continue
+                    logger.error(f"AWS Textract ClientError on page {page_number}: Code={error_code}")
+                except Exception as e:
+                    logger.warning(f"Textract failed on page {page_number}: {type(e).__name__}: {e}")
+                return page_number, None
 
-        return best_text
+    tasks = [process_page(page_number, img_data) for page_number, img_data in rendered['pages'] if img_data is not None]
+    page_results = await asyncio.gather(*tasks)
 
-    def preprocess_image_for_ocr(image):
-        """Preprocess image for better OCR results"""
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+    if page_results and all(page_result is None for _, page_result in page_results):
+        logger.warning("Textract failed on every page of the PDF")
+        return None
 
-        from PIL import ImageEnhance, ImageFilter
+    return assemble_textract_pages(page_results, rendered['page_count'], preserve_layout, detect_tables)
 
-        # Enhance contrast
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(2.0)
 
-        # Sharpen
-        image = image.filter(ImageFilter.SHARPEN)
+async def extract_text_with_textract_async(content: bytes, file_extension: str, preserve_layout: bool = True, detect_tables: bool = True) -> dict:
+    """
+    Non-blocking version of extract_text_with_textract for async handlers.
+    For PDFs, content may also be a local file path (spooled upload).
+    PDF pages are rasterized in the OCR process pool and sent to Textract page-parallel
+    from the OCR thread pool (see textract_pdf_pages_parallel).
+    """
+    if not textract_client:
+        return None
 
-        # Resize if too small
-        width, height = image.size
-        if width < 1000 or height < 1000:
-            scale_factor = max(1000/width, 1000/height)
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    if file_extension == 'pdf':
+        try:
+            rendered = await ocr_executor.run_cpu(render_pdf_pages_for_textract, content)
+        except Exception as e:
+            logger.warning(f"Textract PDF processing failed: {e}")
+            return None
+        return await textract_pdf_pages_parallel(rendered, preserve_layout, detect_tables)
 
-        return image
+    return await ocr_executor.run_io(extract_text_with_textract, content, file_extension, preserve_layout, detect_tables)
 
-    try:
-        # For images - try Textract first, then Tesseract
-        if file_extension in ['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'webp', 'gif']:
-            logger.info(f"Processing image file: {file_extension}, size: {len(content)} bytes")
 
-            # Try AWS Textract first (best quality)
-            if textract_client:
-                logger.info("Using AWS Textract for image OCR...")
-                textract_result = extract_text_with_textract(content, file_extension)
-                if textract_result and textract_result.get('text') and len(textract_result['text'].strip()) > 10:
-                    return textract_result['text']
-                logger.info("Textract returned insufficient text, trying Tesseract...")
-            else:
-                logger.info("AWS Textract not configured, using Tesseract directly...")
+async def extract_pdf_text_routed(source, max_ocr_pages: int = 10, preserve_layout: bool = True, detect_tables: bool = True) -> dict:
+    """
+    Per-page PDF extraction: pages with a usable text layer are read directly (route_pdf_pages),
+    only image pages are rasterized and OCR'd - Textract page-parallel first, Tesseract for the
+    pages Textract could not read. source is file bytes or a local file path.
+    Returns {'text', 'html', 'failed_pages', 'text_pages', 'ocr_pages', 'engine', 'ocr_page_limit'}; 'html'
+    is only set when every page went through Textract, 'engine' names what produced the text
+    (ocr_engine_label of text_layer / textract / tesseract) and 'ocr_page_limit' is max_ocr_pages
+    when image pages past it were skipped (None when every image page was read).
+    """
+    routing = await ocr_executor.run_cpu(route_pdf_pages, source)
+    text_pages = routing['text_pages']
+    ocr_pages = routing['ocr_pages'][:max_ocr_pages]
+    result = {'text': '', 'html': '', 'failed_pages': [], 'text_pages': sorted(text_pages), 'ocr_pages': ocr_pages,
+              'engine': ocr_engine_label(["text_layer"] if text_pages else []),
+              'ocr_page_limit': max_ocr_pages if len(routing['ocr_pages']) > max_ocr_pages else None}
+
+    if not routing['ocr_pages']:
+        result['text'] = ''.join(text_pages[page_number] + '\n' for page_number in sorted(text_pages))
+        logger.info(f"Text layer extracted {len(result['text'])} characters ({routing['page_count']} pages, no OCR needed)")
+        return result
 
-            # Fallback to Tesseract with multiple configs
-            try:
-                logger.info("Opening image with PIL...")
-                image = Image.open(io.BytesIO(content))
-                logger.info(f"Image opened: mode={image.mode}, size={image.size}")
-                image = preprocess_image_for_ocr(image)
-                logger.info(f"Image preprocessed: mode={image.mode}, size={image.size}")
-
-                # Try multiple OCR configurations and pick best result
-                text = tesseract_ocr_multi_config(image)
-                logger.info(f"Tesseract extracted {len(text)} characters from image (best result)")
+    logger.info(f"PDF routing: {len(text_pages)} text pages, {len(routing['ocr_pages'])} image pages "
+                f"(OCR on {len(ocr_pages)}) of {routing['page_count']}")
 
-                if not text or len(text.strip()) == 0:
-                    logger.warning("Tesseract returned empty text - OCR may have failed")
+    ocr_texts = {}
+    textract_failed = []
+    if textract_client and ocr_pages:
+        textract_result = None
+        try:
+            rendered = await ocr_executor.run_cpu(
+                render_pdf_pages_for_textract, source, max_ocr_pages, page_numbers=ocr_pages
+            )
+            textract_result = await textract_pdf_pages_parallel(rendered, preserve_layout, detect_tables)
+        except Exception as e:
+            logger.warning(f"Textract PDF processing failed: {e}")
+        if textract_result:
+            ocr_texts.update(textract_result['page_texts'])
+            textract_failed = textract_result.get('failed_pages', [])
+            if not text_pages:
+                result['html'] = textract_result['html']
+        else:
+            textract_failed = list(ocr_pages)
+
+    missing_pages = [page_number for page_number in ocr_pages if not ocr_texts.get(page_number, '').strip()]
+    engines = {"text_layer"} if text_pages else set()
+    if len(missing_pages) < len(ocr_pages):
+        engines.add("textract")
+    if missing_pages:
+        logger.info(f"Using Tesseract OCR for PDF pages {missing_pages}...")
+        try:
+            ocr_texts.update(await tesseract_ocr_pdf_pages(source, missing_pages))
+        except Exception as e:
+            logger.warning(f"PDF OCR extraction failed: {str(e)}")
+
+    result['failed_pages'] = [page_number for page_number in textract_failed if page_number not in ocr_texts]
+    if any(ocr_texts.get(page_number, '').strip() for page_number in missing_pages):
+        engines.add("tesseract")
+    result['engine'] = ocr_engine_label(engines)
+    if any(page_number in ocr_texts for page_number in missing_pages):
+        # Tesseract filled some pages, so the Textract-only HTML no longer matches the text
+        result['html'] = ''
+
+    page_texts = {**text_pages, **ocr_texts}
+    result['text'] = '\n\n'.join(
+        f"--- Page {page_number} ---\n{page_texts[page_number]}"
+        for page_number in sorted(page_texts) if page_texts[page_number].strip()
+    )
+    return result
 
-                return text
 
-            except Exception as e:
-                logger.error(f"Image OCR failed: {str(e)}", exc_info=True)
-                return ""
+# ==================== OCR RESULT CACHE ====================
+# Content-addressed: the key is SHA-256 of the file bytes + OCR engine + the parameters that
+# change the output, so the same bytes are never sent to Textract/Tesseract/Claude twice.
+# Standard extraction always runs with layout and tables on, so it is keyed on the engine(s)
+# that actually produced the text alone and /upload-document, workspace OCR and template
+# extraction share entries; a Tesseract fallback taken while Textract is configured (outage,
+# unreadable page) is not cached, so it is retried. Claude OCR is keyed on model + prompt
+# (claude_ocr_cache_params), with every caller using build_claude_ocr_prompt.
 
-        elif file_extension == 'pdf':
-            text = ""
+OCR_CACHE_TTL_DAYS = int(os.environ.get("OCR_CACHE_TTL_DAYS", "30"))
+OCR_CACHE_MAX_MB = int(os.environ.get("OCR_CACHE_MAX_MB", "512"))
+OCR_CACHE_LRU_SIZE = int(os.environ.get("OCR_CACHE_LRU_SIZE", "256"))
 
-            # Method 1: Try pdfplumber first (for text-based PDFs - fastest)
-            try:
-                with pdfplumber.open(io.BytesIO(content)) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-
-                if text.strip() and len(text.strip()) > 50:
-                    logger.info(f"pdfplumber extracted {len(text)} characters (text-based PDF)")
-                    return text
-            except Exception as e:
-                logger.warning(f"pdfplumber extraction failed: {str(e)}")
 
-            # Method 2: Try PyMuPDF for text
-            try:
-                pdf_document = fitz.open(stream=content, filetype="pdf")
-                for page_num in range(pdf_document.page_count):
-                    page = pdf_document[page_num]
-                    page_text = page.get_text()
-                    if page_text:
-                        text += page_text + "\n"
-                pdf_document.close()
-
-                if text.strip() and len(text.strip()) > 50:
-                    logger.info(f"PyMuPDF extracted {len(text)} characters")
-                    return text
-            except Exception as e:
-                logger.warning(f"PyMuPDF extraction failed: {str(e)}")
+def file_sha256(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
 
-            # Method 3: PDF is likely image-based - use AWS Textract (best quality)
-            if textract_client:
-                logger.info("PDF appears to be image-based. Using AWS Textract...")
-                textract_result = extract_text_with_textract(content, file_extension)
-                if textract_result and textract_result.get('text') and len(textract_result['text'].strip()) > 10:
-                    return textract_result['text']
-                logger.info("Textract returned insufficient text, trying Tesseract...")
 
-            # Method 4: Fallback to Tesseract OCR with multi-config
-            logger.info("Using Tesseract OCR for image-based PDF...")
-            try:
-                pdf_document = fitz.open(stream=content, filetype="pdf")
+def ocr_engine_label(engines) -> str:
+    """Cache engine name of a standard extraction: the engines used, e.g. 'text_layer+textract'"""
+    return "+".join(sorted(set(engines))) or "none"
 
-                for page_num in range(min(pdf_document.page_count, 10)):
-                    page = pdf_document[page_num]
-                    # Higher resolution for better OCR (2x zoom)
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                    img_data = pix.tobytes("png")
 
-                    image = Image.open(io.BytesIO(img_data))
-                    # Preprocess image for better OCR
-                    image = preprocess_image_for_ocr(image)
-                    # Try multiple configs and get best result
-                    page_text = tesseract_ocr_multi_config(image)
+def accepted_ocr_engines(file_extension: str) -> List[str]:
+    """
+    Engine labels whose cached results may be served for this file type, best first: everything
+    but Tesseract output while Textract is configured (it should get a Textract read instead)
+    """
+    if file_extension in ['pdf']:
+        engines = ["text_layer", "textract"] + ([] if textract_client else ["tesseract"])
+        labels = [ocr_engine_label(combination) for size in range(1, len(engines) + 1)
+                  for combination in itertools.combinations(engines, size)]
+        return sorted(labels, key=lambda label: "tesseract" in label)
+    if file_extension in ['docx', 'doc', 'txt']:
+        return ["text_layer"]
+    return ["textract"] + ([] if textract_client else ["tesseract"])
 
-                    if page_text.strip():
-                        text += page_text + "\n"
 
-                pdf_document.close()
+def cacheable_ocr_engine(engine: str) -> bool:
+    """False for results Tesseract produced as a fallback while Textract is configured"""
+    return engine != "none" and not (textract_client and "tesseract" in engine.split("+"))
 
-                if text.strip():
-                    logger.info(f"Tesseract extracted {len(text)} characters from image-based PDF")
-                    return text
 
-            except Exception as e:
-                logger.warning(f"PDF OCR extraction failed: {str(e)}")
+def standard_ocr_cache_entry(extraction: dict) -> dict:
+    """What the cache keeps of a standard extraction; a PDF cut at max_ocr_pages records the cut"""
+    entry = {"text": extraction["text"], "html": extraction.get("html", "")}
+    if extraction.get("ocr_page_limit"):
+        entry["ocr_page_limit"] = extraction["ocr_page_limit"]
+    return entry
 
-            return text
 
-        elif file_extension in ['docx', 'doc']:
-            doc = Document(io.BytesIO(content))
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            return text
+def standard_ocr_cache_covers(cached: Optional[dict], max_ocr_pages: int) -> bool:
+    """True if a cached standard extraction read every image page, or at least max_ocr_pages of them"""
+    return cached is not None and cached.get("ocr_page_limit", max_ocr_pages) >= max_ocr_pages
 
-        elif file_extension == 'txt':
-            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-            for encoding in encodings:
-                try:
-                    text = content.decode(encoding)
-                    return text
-                except UnicodeDecodeError:
-                    continue
-            raise HTTPException(status_code=400, detail="Unable to decode text file")
 
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error extracting text from file: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
+class OCRResultCache:
+    """In-process LRU in front of the MongoDB ocr_cache collection (TTL + size-based eviction)"""
+
+    EVICTION_CHECK_EVERY = 50  # stores between total-size checks
+
+    def __init__(self, collection, lru_size: int = OCR_CACHE_LRU_SIZE, max_bytes: int = OCR_CACHE_MAX_MB * 1024 * 1024):
+        self.collection = collection
+        self.lru_size = lru_size
+        self.max_bytes = max_bytes
+        self._lru = OrderedDict()
+        self._stores_since_check = 0
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+
+    @staticmethod
+    def make_key(file_hash: str, engine: str, params: dict = None) -> str:
+        params_json = json.dumps(params or {}, sort_keys=True, default=str)
+        return hashlib.sha256(f"{file_hash}:{engine}:{params_json}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, result: dict):
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    async def get(self, file_hash: str, engine: str, params: dict = None) -> Optional[dict]:
+        key = self.make_key(file_hash, engine, params)
+
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return self._lru[key]
+
+        try:
+            entry = await self.collection.find_one_and_update(
+                {"key": key},
+                {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+                projection={"result": 1}
+            )
+        except Exception as e:
+            logger.warning(f"OCR cache lookup failed: {e}")
+            entry = None
+
+        if entry:
+            self.stats["db_hits"] += 1
+            self._remember(key, entry["result"])
+            return entry["result"]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def get_any(self, file_hash: str, engines: List[str], params: dict = None) -> Optional[dict]:
+        """get() for the first of several engines that has an entry (one database query for all of them)"""
+        keys = [self.make_key(file_hash, engine, params) for engine in engines]
+        for key in keys:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._lru[key]
+
+        try:
+            entries = {entry["key"]: entry async for entry in self.collection.find({"key": {"$in": keys}}, {"key": 1, "result": 1})}
+        except Exception as e:
+            logger.warning(f"OCR cache lookup failed: {e}")
+            entries = {}
+
+        for key in keys:
+            if key in entries:
+                try:
+                    await self.collection.update_one({"key": key}, {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}})
+                except Exception as e:
+                    logger.warning(f"OCR cache touch failed: {e}")
+                self.stats["db_hits"] += 1
+                self._remember(key, entries[key]["result"])
+                return entries[key]["result"]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, file_hash: str, engine: str, params: dict, result: dict):
+        key = self.make_key(file_hash, engine, params)
+        self._remember(key, result)
+
+        now = datetime.utcnow()
+        size_bytes = len(json.dumps(result, default=str))
+        try:
+            await self.collection.update_one(
+                {"key": key},
+                {"$set": {
+                    "key": key,
+                    "file_hash": file_hash,
+                    "engine": engine,
+                    "params": params or {},
+                    "result": result,
+                    "size_bytes": size_bytes,
+                    "created_at": now,
+                    "last_used_at": now
+                }, "$setOnInsert": {"hits": 0}},
+                upsert=True
+            )
+            self.stats["stores"] += 1
+        except Exception as e:
+            logger.warning(f"OCR cache store failed: {e}")
+            return
+
+        self._stores_since_check += 1
+        if self._stores_since_check >= self.EVICTION_CHECK_EVERY:
+            self._stores_since_check = 0
+            await self.evict_to_budget()
+
+    async def evict_to_budget(self):
+        """Drop least-recently-used entries until the collection fits in max_bytes"""
+        try:
+            totals = await self.collection.aggregate([
+                {"$group": {"_id": None, "total": {"$sum": "$size_bytes"}}}
+            ]).to_list(1)
+            total = totals[0]["total"] if totals else 0
+            if total <= self.max_bytes:
+                return
+
+            to_free = total - self.max_bytes
+            freed = 0
+            stale_keys = []
+            async for entry in self.collection.find({}, {"key": 1, "size_bytes": 1}).sort("last_used_at", 1):
+                stale_keys.append(entry["key"])
+                freed += entry.get("size_bytes", 0)
+                if freed >= to_free:
+                    break
+
+            if stale_keys:
+                await self.collection.delete_many({"key": {"$in": stale_keys}})
+                for key in stale_keys:
+                    self._lru.pop(key, None)
+                self.stats["evicted"] += len(stale_keys)
+                logger.info(f"OCR cache: evicted {len(stale_keys)} entries ({freed} bytes)")
+        except Exception as e:
+            logger.warning(f"OCR cache eviction failed: {e}")
+
+    async def ensure_indexes(self):
+        await self.collection.create_index("key", unique=True)
+        await self.collection.create_index("last_used_at")
+        await self.collection.create_index("created_at", expireAfterSeconds=OCR_CACHE_TTL_DAYS * 24 * 3600)
+
+    def metrics(self) -> dict:
+        lookups = self.stats["memory_hits"] + self.stats["db_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["db_hits"]
+        return {
+            **self.stats,
+            "memory_entries": len(self._lru),
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+
+ocr_result_cache = OCRResultCache(db.ocr_cache)
+
+
+# ==================== PAGE RENDER CACHE ====================
+# Ready-to-send page images for Claude (rasterized, compressed to the size budget, base64-encoded),
+# keyed by document SHA-256 + page + zoom + format + byte budget. Retries and re-translations of the
+# same file skip rasterization and compression. Payloads live in GridFS with an in-process LRU in front.
+
+PAGE_RENDER_CACHE_MAX_MB = int(os.environ.get("PAGE_RENDER_CACHE_MAX_MB", "2048"))
+PAGE_RENDER_CACHE_MEMORY_MB = int(os.environ.get("PAGE_RENDER_CACHE_MEMORY_MB", "128"))
+PAGE_RENDER_CACHE_TTL_DAYS = int(os.environ.get("PAGE_RENDER_CACHE_TTL_DAYS", "14"))
+CLAUDE_MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+
+class PageRenderCache:
+    """Byte-budgeted LRU in front of the page_renders GridFS bucket (size- and age-based eviction)"""
+
+    EVICTION_CHECK_EVERY = 100  # stored pages between total-size checks
+
+    def __init__(self, database, bucket_name: str = "page_renders",
+                 memory_bytes: int = PAGE_RENDER_CACHE_MEMORY_MB * 1024 * 1024,
+                 max_bytes: int = PAGE_RENDER_CACHE_MAX_MB * 1024 * 1024):
+        self.bucket = AsyncIOMotorGridFSBucket(database, bucket_name=bucket_name)
+        self.files = database[f"{bucket_name}.files"]
+        self.chunks = database[f"{bucket_name}.chunks"]
+        self.memory_bytes = memory_bytes
+        self.max_bytes = max_bytes
+        self._lru = OrderedDict()
+        self._lru_bytes = 0
+        self._page_counts = OrderedDict()
+        self._stores_since_check = 0
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+
+    @staticmethod
+    def make_key(doc_hash: str, page: int, params: dict) -> str:
+        params_json = json.dumps(params, sort_keys=True)
+        return hashlib.sha256(f"{doc_hash}:{page}:{params_json}".encode('utf-8')).hexdigest()
+
+    def _remember(self, key: str, payload: dict):
+        if key in self._lru:
+            self._lru_bytes -= len(self._lru.pop(key)["data"])
+        self._lru[key] = payload
+        self._lru_bytes += len(payload["data"])
+        while self._lru_bytes > self.memory_bytes and len(self._lru) > 1:
+            _, evicted = self._lru.popitem(last=False)
+            self._lru_bytes -= len(evicted["data"])
+
+    async def _load(self, doc_hash: str, params: dict, page_numbers: list) -> dict:
+        """Fetch stored pages from GridFS: {page_number: payload}"""
+        found = {}
+        keys = {self.make_key(doc_hash, page, params): page for page in page_numbers}
+        try:
+            async for grid_out in self.bucket.find({"filename": {"$in": list(keys)}}):
+                page = keys[grid_out.filename]
+                if page in found:
+                    continue
+                metadata = grid_out.metadata or {}
+                found[page] = {
+                    "page": page,
+                    "data": base64.b64encode(await grid_out.read()).decode('utf-8'),
+                    "media_type": metadata.get("media_type", "image/jpeg"),
+                    "width": metadata.get("width"),
+                    "height": metadata.get("height")
+                }
+                self._remember(grid_out.filename, found[page])
+            if found:
+                await self.files.update_many(
+                    {"filename": {"$in": [key for key, page in keys.items() if page in found]}},
+                    {"$set": {"metadata.last_used_at": datetime.utcnow()}}
+                )
+        except Exception as e:
+            logger.warning(f"Page render cache lookup failed: {e}")
+        return found
+
+    async def _store(self, doc_hash: str, params: dict, payload: dict, page_count: int):
+        key = self.make_key(doc_hash, payload["page"], params)
+        self._remember(key, payload)
+        now = datetime.utcnow()
+        try:
+            await self.bucket.upload_from_stream(key, base64.b64decode(payload["data"]), metadata={
+                "doc_hash": doc_hash,
+                "page": payload["page"],
+                "page_count": page_count,
+                "params": params,
+                "media_type": payload["media_type"],
+                "width": payload["width"],
+                "height": payload["height"],
+                "last_used_at": now
+            })
+            self.stats["stores"] += 1
+        except Exception as e:
+            logger.warning(f"Page render cache store failed: {e}")
+            return
+
+        self._stores_since_check += 1
+        if self._stores_since_check >= self.EVICTION_CHECK_EVERY:
+            self._stores_since_check = 0
+            await self.evict_to_budget()
+
+    def _lookup(self, doc_hash: str, params: dict, page_numbers: list) -> dict:
+        found = {}
+        for page in page_numbers:
+            key = self.make_key(doc_hash, page, params)
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                found[page] = self._lru[key]
+        return found
+
+    async def get_pdf_pages(self, content: bytes, zoom: float = 2.0, image_format: str = "jpeg",
+                            max_bytes: int = CLAUDE_MAX_IMAGE_BYTES, max_pages: int = None) -> list:
+        """
+        Pages of a PDF as [{'page', 'data' (base64), 'media_type', 'width', 'height'}], each under
+        max_bytes. Only pages missing from the cache are rendered and fitted to the budget (OCR process pool).
+        """
+        doc_hash = file_sha256(content)
+        params = {"zoom": zoom, "format": image_format, "max_bytes": max_bytes}
+
+        page_count = self._page_counts.get(doc_hash)
+        if page_count is None:
+            page_count = await ocr_executor.run_io(count_pdf_pages, content)
+            self._page_counts[doc_hash] = page_count
+            if len(self._page_counts) > 4096:
+                self._page_counts.popitem(last=False)
+        page_numbers = list(range(1, (page_count if max_pages is None else min(page_count, max_pages)) + 1))
+
+        pages = self._lookup(doc_hash, params, page_numbers)
+        self.stats["memory_hits"] += len(pages)
+        missing = [page for page in page_numbers if page not in pages]
+        if missing:
+            loaded = await self._load(doc_hash, params, missing)
+            self.stats["db_hits"] += len(loaded)
+            pages.update(loaded)
+            missing = [page for page in page_numbers if page not in pages]
+
+        if missing:
+            self.stats["misses"] += len(missing)
+            rendered_pages = await ocr_executor.run_cpu(
+                render_pdf_pages_for_claude, content, zoom, image_format, max_bytes, page_numbers=missing
+            )
+            for rendered in rendered_pages:
+                payload = {**rendered, "data": base64.b64encode(rendered["data"]).decode('utf-8')}
+                pages[payload["page"]] = payload
+                await self._store(doc_hash, params, payload, page_count)
+
+        return [dict(pages[page]) for page in page_numbers]
+
+    async def get_image(self, content: bytes, media_type: str = "image/jpeg", max_bytes: int = CLAUDE_MAX_IMAGE_BYTES) -> dict:
+        """A single uploaded image, compressed to max_bytes, in the same payload shape as get_pdf_pages"""
+        doc_hash = file_sha256(content)
+        params = {"format": "image", "media_type": media_type, "max_bytes": max_bytes}
+
+        pages = self._lookup(doc_hash, params, [1])
+        if pages:
+            self.stats["memory_hits"] += 1
+        else:
+            pages = await self._load(doc_hash, params, [1])
+            self.stats["db_hits"] += len(pages)
+        if pages:
+            return dict(pages[1])
+
+        self.stats["misses"] += 1
+        data, final_media_type, width, height = await ocr_executor.run_io(compress_image_with_size, content, media_type, max_bytes)
+        payload = {"page": 1, "data": base64.b64encode(data).decode('utf-8'), "media_type": final_media_type,
+                   "width": width, "height": height}
+        await self._store(doc_hash, params, payload, 1)
+        return dict(payload)
+
+    async def evict_to_budget(self):
+        """Drop renders unused for PAGE_RENDER_CACHE_TTL_DAYS, then least-recently-used ones until under max_bytes"""
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=PAGE_RENDER_CACHE_TTL_DAYS)
+            stale_ids = [entry["_id"] async for entry in self.files.find({"metadata.last_used_at": {"$lt": cutoff}}, {"_id": 1})]
+
+            totals = await self.files.aggregate([
+                {"$match": {"_id": {"$nin": stale_ids}}},
+                {"$group": {"_id": None, "total": {"$sum": "$length"}}}
+            ]).to_list(1)
+            to_free = (totals[0]["total"] if totals else 0) - self.max_bytes
+            if to_free > 0:
+                freed = 0
+                async for entry in self.files.find({"_id": {"$nin": stale_ids}}, {"length": 1}).sort("metadata.last_used_at", 1):
+                    stale_ids.append(entry["_id"])
+                    freed += entry.get("length", 0)
+                    if freed >= to_free:
+                        break
+
+            if stale_ids:
+                await self.files.delete_many({"_id": {"$in": stale_ids}})
+                await self.chunks.delete_many({"files_id": {"$in": stale_ids}})
+                self.stats["evicted"] += len(stale_ids)
+                logger.info(f"Page render cache: evicted {len(stale_ids)} pages")
+        except Exception as e:
+            logger.warning(f"Page render cache eviction failed: {e}")
+
+    async def ensure_indexes(self):
+        await self.files.create_index("filename")
+        await self.files.create_index("metadata.last_used_at")
+
+    def metrics(self) -> dict:
+        lookups = self.stats["memory_hits"] + self.stats["db_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["db_hits"]
+        return {
+            **self.stats,
+            "memory_pages": len(self._lru),
+            "memory_bytes": self._lru_bytes,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+
+page_render_cache = PageRenderCache(db)
+
+
+UPLOAD_MAX_BYTES = 10 * 1024 * 1024  # /upload-document limit
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def spool_upload_to_disk(file: UploadFile, max_bytes: Optional[int] = UPLOAD_MAX_BYTES) -> dict:
+    """
+    Stream an upload into a temp file chunk by chunk, hashing as it goes and
+    stopping as soon as max_bytes is exceeded, so memory stays at one chunk.
+    Returns {'path', 'size', 'sha256'}; release it with discard_spooled_upload().
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(prefix="upload_")
+    os.close(fd)
+
+    try:
+        async with aiofiles.open(path, 'wb') as spool:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise HTTPException(status_code=400, detail=f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB.")
+                digest.update(chunk)
+                await spool.write(chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    return {"path": path, "size": size, "sha256": digest.hexdigest()}
+
+
+def discard_spooled_upload(spooled: dict):
+    try:
+        os.unlink(spooled["path"])
+    except OSError:
+        pass
+
+
+async def extract_text_from_file(file: UploadFile) -> str:
+    """Extract text from uploaded file using AWS Textract (primary) or Tesseract (fallback)"""
+    file_extension = file.filename.split('.')[-1].lower()
+
+    spooled = await spool_upload_to_disk(file, max_bytes=None)
+    try:
+        return await extract_text_cached(spooled["path"], file_extension, spooled["sha256"])
+    finally:
+        discard_spooled_upload(spooled)
+
+
+async def extract_text_cached(source, file_extension: str, file_hash: str, max_ocr_pages: int = 10) -> str:
+    """extract_text_from_source behind the OCR result cache. source is file bytes or a local file path."""
+    # Same bytes already extracted (uploaded again, OCR'd in the workspace, template extraction of an order file)
+    cached = await ocr_result_cache.get_any(file_hash, accepted_ocr_engines(file_extension))
+    if standard_ocr_cache_covers(cached, max_ocr_pages):
+        logger.info(f"OCR cache hit for {file_hash[:12]}")
+        return cached["text"]
+
+    extraction = await extract_text_from_source(source, file_extension, max_ocr_pages)
+    text = extraction["text"]
+    # Partial results (failed pages) are not cached so the next request retries them
+    if text and text.strip() and not extraction.get("failed_pages") and cacheable_ocr_engine(extraction["engine"]):
+        await ocr_result_cache.put(file_hash, extraction["engine"], None, standard_ocr_cache_entry(extraction))
+    return text
+
+
+async def read_source_bytes(source) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return source
+    async with aiofiles.open(source, 'rb') as f:
+        return await f.read()
+
+
+async def extract_text_from_source(source, file_extension: str, max_ocr_pages: int = 10) -> dict:
+    """
+    Text layer / Textract / Tesseract extraction (no caching). source is file bytes or a local file path.
+    Returns {'text', 'html', 'engine', ...} with engine as in ocr_engine_label; PDFs return the
+    extract_pdf_text_routed result (failed_pages, ocr_page_limit).
+    """
+    try:
+        # For images - try Textract first, then Tesseract
+        if file_extension in ['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'webp', 'gif']:
+            source_size = len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+            logger.info(f"Processing image file: {file_extension}, size: {source_size} bytes")
+
+            # Try AWS Textract first (best quality) - Textract takes the image bytes inline
+            if textract_client:
+                logger.info("Using AWS Textract for image OCR...")
+                textract_result = await extract_text_with_textract_async(await read_source_bytes(source), file_extension)
+                if textract_result and textract_result.get('text') and len(textract_result['text'].strip()) > 10:
+                    return {"text": textract_result['text'], "html": textract_result.get('html', ''), "engine": "textract"}
+                logger.info("Textract returned insufficient text, trying Tesseract...")
+            else:
+                logger.info("AWS Textract not configured, using Tesseract directly...")
+
+            # Fallback to Tesseract (adaptive PSM search, runs in the OCR process pool)
+            try:
+                text = await tesseract_ocr_image(source, document_type=file_extension)
+                logger.info(f"Tesseract extracted {len(text)} characters from image (best result)")
+
+                if not text or len(text.strip()) == 0:
+                    logger.warning("Tesseract returned empty text - OCR may have failed")
+
+                return {"text": text, "engine": "tesseract"}
+
+            except Exception as e:
+                logger.error(f"Image OCR failed: {str(e)}", exc_info=True)
+                return {"text": "", "engine": "none"}
+
+        elif file_extension == 'pdf':
+            # Text pages come straight from the text layer; only image pages are OCR'd
+            return await extract_pdf_text_routed(source, max_ocr_pages=max_ocr_pages)
+
+        elif file_extension in ['docx', 'doc']:
+            doc = Document(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+            return {"text": text, "engine": "text_layer"}
+
+        elif file_extension == 'txt':
+            content = await read_source_bytes(source)
+            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+            for encoding in encodings:
+                try:
+                    text = content.decode(encoding)
+                    return {"text": text, "engine": "text_layer"}
+                except UnicodeDecodeError:
+                    continue
+            raise HTTPException(status_code=400, detail="Unable to decode text file")
+
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_extension}")
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting text from file: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
 # API Routes
 @api_router.get("/")
@@ -4955,26 +5540,23 @@ async def get_status_checks():
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 @api_router.post("/upload-document", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...), token: Optional[str] = None):
+async def upload_document(file: UploadFile = File(...), token: Optional[str] = None,
+                          source_language: Optional[str] = Form(None)):
     """Upload and process document for word count extraction - also stores the document"""
 
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
 
-    # Check file size (limit to 10MB)
-    content = await file.read()
-    if len(content) > 10 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB.")
-
-    # Reset file pointer
-    await file.seek(0)
+    # Stream to a temp file (limit 10MB, hashed on the way) - the upload is never held in memory whole
+    spooled = await spool_upload_to_disk(file, max_bytes=UPLOAD_MAX_BYTES)
 
     try:
-        # Extract text from file
-        extracted_text = await extract_text_from_file(file)
+        # Extract text from the spooled file
+        file_extension = file.filename.split('.')[-1].lower()
+        extracted_text = await extract_text_cached(spooled["path"], file_extension, spooled["sha256"])
 
         # Count words
-        word_count = count_words(extracted_text)
+        word_count = count_words(extracted_text, source_language)
 
         # Get partner_id if token provided
         partner_id = None
@@ -4983,14 +5565,23 @@ async def upload_document(file: UploadFile = File(...), token: Optional[str] = N
             if partner:
                 partner_id = partner["id"]
 
-        # Store document in MongoDB
+        # Store the file bytes in GridFS straight from the spooled file
         document_id = str(uuid.uuid4())
+        content_type = file.content_type or "application/octet-stream"
+        gridfs_id = await store_local_file_in_gridfs(
+            spooled["path"], file.filename, content_type,
+            metadata={"document_id": document_id, "sha256": spooled["sha256"]}
+        )
+
+        # Store document in MongoDB
         document_data = {
             "id": document_id,
             "filename": file.filename,
-            "content_type": file.content_type or "application/octet-stream",
-            "file_data": base64.b64encode(content).decode('utf-8'),
-            "file_size": len(content),
+            "content_type": content_type,
+            "file_data": None,  # Stored in GridFS
+            "gridfs_id": gridfs_id,
+            "file_hash": spooled["sha256"],
+            "file_size": spooled["size"],
             "word_count": word_count,
             "extracted_text": extracted_text[:10000] if extracted_text else "",  # Store first 10k chars
             "partner_id": partner_id,
@@ -5002,7 +5593,7 @@ async def upload_document(file: UploadFile = File(...), token: Optional[str] = N
         return DocumentUploadResponse(
             filename=file.filename,
             word_count=word_count,
-            file_size=len(content),
+            file_size=spooled["size"],
             message=f"Successfully extracted {word_count} words from {file.filename}",
             document_id=document_id
         )
@@ -5012,6 +5603,8 @@ async def upload_document(file: UploadFile = File(...), token: Optional[str] = N
     except Exception as e:
         logger.error(f"Unexpected error processing file: {str(e)}")
         raise HTTPException(status_code=500, detail="Unexpected error processing file")
+    finally:
+        discard_spooled_upload(spooled)
 
 @api_router.post("/calculate-quote", response_model=TranslationQuote)
 async def calculate_quote(quote_data: TranslationQuoteCreate):
@@ -5078,9 +5671,9 @@ async def get_quote(quote_id: str):
     return TranslationQuote(**quote)
 
 @api_router.post("/word-count")
-async def get_word_count(text: str = Form(...)):
+async def get_word_count(text: str = Form(...), source_language: Optional[str] = Form(None)):
     """Get word count from provided text"""
-    word_count = count_words(text)
+    word_count = count_words(text, source_language)
     return {"word_count": word_count, "text_length": len(text)}
 
 # Stripe Payment Integration
@@ -20257,7 +20850,7 @@ async def download_document(document_id: str, token: str):
     return {
         "filename": document["filename"],
         "content_type": document["content_type"],
-        "file_data": document["file_data"]  # Base64 encoded
+        "file_data": await get_document_file_base64(document)  # Base64 encoded
     }
 
 
@@ -20935,196 +21528,772 @@ async def remove_page_group(order_id: str, page_group_id: str, admin_key: str):
     }
 
 
-# ==================== TRANSLATION WORKSPACE ENDPOINTS ====================
+# ==================== CLAUDE API CLIENTS ====================
+# Every Claude call goes through claude_create_message: one pooled async client per API key,
+# unified retries, per-call timeouts and metrics. One rate limiter per API key is shared by all
+# callers in this process; it holds token buckets for requests, input tokens and output tokens
+# per minute. Requests reserve an estimate up front, which is corrected with the response's
+# `usage`, and the anthropic-ratelimit-* headers resync the buckets to the real quota.
+
+CLAUDE_REQUESTS_PER_MINUTE = int(os.environ.get("CLAUDE_REQUESTS_PER_MINUTE", "50"))
+CLAUDE_INPUT_TOKENS_PER_MINUTE = int(os.environ.get("CLAUDE_INPUT_TOKENS_PER_MINUTE", "30000"))
+CLAUDE_OUTPUT_TOKENS_PER_MINUTE = int(os.environ.get("CLAUDE_OUTPUT_TOKENS_PER_MINUTE", "8000"))
+CLAUDE_MAX_CONCURRENT_CHUNKS = int(os.environ.get("CLAUDE_MAX_CONCURRENT_CHUNKS", "4"))
+CLAUDE_IMAGE_MAX_TOKENS = 1600  # Claude downscales larger images to about this many tokens
+CLAUDE_TIMEOUT_SECONDS = float(os.environ.get("CLAUDE_TIMEOUT_SECONDS", "300"))
+CLAUDE_MAX_ATTEMPTS = int(os.environ.get("CLAUDE_MAX_ATTEMPTS", "4"))
+CLAUDE_MAX_CONNECTIONS = int(os.environ.get("CLAUDE_MAX_CONNECTIONS", "50"))
+CLAUDE_KEEPALIVE_SECONDS = 60.0
+CLAUDE_RETRY_BACKOFF_SECONDS = 2.0
+CLAUDE_RETRY_BACKOFF_MAX_SECONDS = 60.0
+CLAUDE_HTTP2 = importlib.util.find_spec("h2") is not None
+_CLAUDE_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}  # 529: overloaded
+
+_CLAUDE_RATE_LIMIT_HEADERS = {
+    "requests": "anthropic-ratelimit-requests",
+    "input_tokens": "anthropic-ratelimit-input-tokens",
+    "output_tokens": "anthropic-ratelimit-output-tokens",
+}
 
-class OCRRequest(BaseModel):
-    file_base64: str
-    file_type: str
-    filename: str
-    use_claude: Optional[bool] = False
-    claude_api_key: Optional[str] = None
-    special_commands: Optional[str] = None
-    preserve_layout: Optional[bool] = True
 
-class TranslatorNoteSettings(BaseModel):
-    enabled: bool = False
-    source_currency: Optional[str] = None  # e.g., 'BRL', 'NOK'
-    target_currency: Optional[str] = None  # e.g., 'USD', 'CAD'
-    exchange_rate: Optional[float] = None  # e.g., 5.42 (BRL per 1 USD)
-    rate_date: Optional[str] = None  # e.g., '2024-12-26'
-    rate_source: Optional[str] = None  # e.g., 'https://www.xe.com/currencyconverter/'
-    convert_values: Optional[bool] = True  # Whether to convert monetary values
-    source_currency_symbol: Optional[str] = None  # e.g., 'R$'
-    target_currency_symbol: Optional[str] = None  # e.g., '$'
+class TokenBucket:
+    """Continuously refilled bucket of `capacity` units per minute; the level may go negative after corrections"""
 
-class TranslateRequest(BaseModel):
-    text: str
-    source_language: str
-    target_language: str
-    document_type: str
-    claude_api_key: str
-    action: str  # 'translate' or correction commands
-    current_translation: Optional[str] = None
-    general_instructions: Optional[str] = None  # Additional user instructions
-    preserve_layout: Optional[bool] = True  # Maintain original document layout
-    page_format: Optional[str] = 'letter'  # 'letter' or 'a4'
-    original_image: Optional[str] = None  # Base64 image for visual layout reference
-    translator_note: Optional[TranslatorNoteSettings] = None  # For financial document currency conversion
+    def __init__(self, capacity: float):
+        self.capacity = max(float(capacity), 1.0)
+        self.level = self.capacity
+        self._updated = time.monotonic()
 
-@api_router.post("/admin/ocr")
-async def admin_ocr(request: OCRRequest, admin_key: str):
-    """Perform OCR on uploaded document (admin translation workspace)"""
-    # Validate admin key OR valid token
-    is_valid = admin_key == os.environ.get("ADMIN_KEY", "legacy_admin_2024")
-    if not is_valid:
-        # Check if it's a valid user token
-        user = await get_current_admin_user(admin_key)
-        if user and user.get("role") in ["admin", "pm", "translator"]:
-            is_valid = True
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
 
-    if not is_valid:
-        raise HTTPException(status_code=401, detail="Invalid admin key")
+    def seconds_until(self, amount: float) -> float:
+        # A request larger than the whole bucket waits for a full bucket instead of forever
+        deficit = min(amount, self.capacity) - self.level
+        return max(deficit, 0) * 60.0 / self.capacity
 
-    try:
-        # Decode base64 file
-        file_content = base64.b64decode(request.file_base64)
-        file_extension = request.filename.split('.')[-1].lower() if '.' in request.filename else ''
 
-        logger.info(f"OCR request for file: {request.filename}, type: {request.file_type}, size: {len(file_content)} bytes, use_claude: {request.use_claude}")
+class ClaudeRateLimiter:
+    """Requests / input tokens / output tokens per minute for one API key"""
 
-        # Determine file type
-        is_image = request.file_type.startswith('image/') or file_extension in ['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'gif', 'webp']
-        is_pdf = request.file_type == 'application/pdf' or file_extension == 'pdf'
+    def __init__(self, requests_per_minute: int = None, input_tokens_per_minute: int = None,
+                 output_tokens_per_minute: int = None):
+        self.buckets = {
+            "requests": TokenBucket(requests_per_minute or CLAUDE_REQUESTS_PER_MINUTE),
+            "input_tokens": TokenBucket(input_tokens_per_minute or CLAUDE_INPUT_TOKENS_PER_MINUTE),
+            "output_tokens": TokenBucket(output_tokens_per_minute or CLAUDE_OUTPUT_TOKENS_PER_MINUTE),
+        }
+        self.in_flight = {name: 0 for name in self.buckets}
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self._quota_changed = asyncio.Event()
+        self.stats = {"requests": 0, "waited_seconds": 0.0, "rate_limited": 0, "input_tokens": 0, "output_tokens": 0}
+
+    async def acquire(self, input_tokens: int = 0, output_tokens: int = 0) -> dict:
+        """Wait until the estimate fits every bucket, then reserve it. Returns the reservation for record()."""
+        wanted = {"requests": 1, "input_tokens": input_tokens, "output_tokens": output_tokens}
+        started = time.monotonic()
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                for bucket in self.buckets.values():
+                    bucket.refill(now)
+                wait = max(
+                    [self._paused_until - now] +
+                    [bucket.seconds_until(wanted[name]) for name, bucket in self.buckets.items()]
+                )
+                if wait <= 0:
+                    for name, bucket in self.buckets.items():
+                        bucket.level -= wanted[name]
+                        self.in_flight[name] += wanted[name]
+                    self.stats["requests"] += 1
+                    self.stats["waited_seconds"] += now - started
+                    return wanted
+                self._quota_changed.clear()
+            # Re-check early when a response reports more quota than we assumed
+            try:
+                await asyncio.wait_for(self._quota_changed.wait(), timeout=min(max(wait, 0.05), 60.0))
+            except asyncio.TimeoutError:
+                pass
 
-        text = ""
+    def _settle(self, reservation: dict):
+        for name in self.buckets:
+            self.in_flight[name] -= reservation[name]
 
-        # Use Claude for OCR if requested
-        if request.use_claude and request.claude_api_key:
-            logger.info("Using Claude AI for OCR with layout preservation...")
+    def _sync_headers(self, headers):
+        """Adopt the server's limit and remaining quota, less what our other requests still have in flight"""
+        now = time.monotonic()
+        for name, prefix in _CLAUDE_RATE_LIMIT_HEADERS.items():
             try:
-                import anthropic
-                client = anthropic.Anthropic(api_key=request.claude_api_key)
+                limit = headers.get(f"{prefix}-limit")
+                remaining = headers.get(f"{prefix}-remaining")
+                bucket = self.buckets[name]
+                bucket.refill(now)
+                if limit:
+                    bucket.capacity = max(float(limit), 1.0)
+                if remaining is not None:
+                    bucket.level = min(bucket.capacity, float(remaining)) - self.in_flight[name]
+            except (TypeError, ValueError):
+                continue
 
-                # Build the OCR prompt
-                ocr_prompt = """Extract ALL text from this document image.
+    def record(self, reservation: dict, usage=None, headers=None):
+        """Charge the real token usage instead of the estimate and adopt the server's view of the quota"""
+        self._settle(reservation)
+        if usage is not None:
+            actual_input = (getattr(usage, "input_tokens", 0) or 0) + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+            actual_output = getattr(usage, "output_tokens", 0) or 0
+            self.buckets["input_tokens"].level -= actual_input - reservation["input_tokens"]
+            self.buckets["output_tokens"].level -= actual_output - reservation["output_tokens"]
+            self.stats["input_tokens"] += actual_input
+            self.stats["output_tokens"] += actual_output
+        if headers is not None:
+            self._sync_headers(headers)
+        self._quota_changed.set()
+
+    def release(self, reservation: dict):
+        """The request failed before using any quota: give the reservation back"""
+        self._settle(reservation)
+        for name, bucket in self.buckets.items():
+            bucket.level += reservation[name]
+        self._quota_changed.set()
+
+    def rate_limited(self, reservation: dict, error, fallback_seconds: float = 60.0) -> float:
+        """A 429: pause every caller on this key for retry-after (or the fallback) seconds"""
+        self._settle(reservation)
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            pause = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pause = fallback_seconds
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        self.stats["rate_limited"] += 1
+        self._sync_headers(headers)
+        return pause
+
+    def snapshot(self) -> dict:
+        return {
+            "capacity_per_minute": {name: bucket.capacity for name, bucket in self.buckets.items()},
+            "available": {name: round(bucket.level) for name, bucket in self.buckets.items()},
+            "in_flight": dict(self.in_flight),
+            **{key: round(value, 1) if isinstance(value, float) else value for key, value in self.stats.items()}
+        }
 
-CRITICAL INSTRUCTIONS:
-1. Maintain the EXACT original layout, structure, and formatting
-2. Preserve all line breaks, spacing, and indentation
-3. Keep tables in their original format using markdown table syntax or ASCII art
-4. Preserve headers, titles, and sections exactly as they appear
-5. Include ALL text, even small print, stamps, and signatures
-6. Use ** for bold text and * for italic text where visible
-7. Maintain the visual hierarchy of the document
 
-"""
-                if request.special_commands:
-                    ocr_prompt += f"\nAdditional instructions: {request.special_commands}\n"
+_claude_rate_limiters = {}
 
-                ocr_prompt += "\nExtract the complete text now, preserving the original layout:"
 
-                # Handle PDFs by converting to images first
-                if is_pdf:
-                    logger.info("Converting PDF to images for Claude OCR...")
-                    try:
-                        pdf_document = fitz.open(stream=file_content, filetype="pdf")
-                        all_text = []
-
-                        for page_num in range(min(pdf_document.page_count, 15)):
-                            page = pdf_document[page_num]
-                            # Convert page to PNG image at 2x resolution
-                            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                            img_data = pix.tobytes("png")
-                            image_data = base64.b64encode(img_data).decode('utf-8')
-
-                            message = client.messages.create(
-                                model="claude-sonnet-4-5-20250929",
-                                max_tokens=4096,
-                                messages=[
-                                    {
-                                        "role": "user",
-                                        "content": [
-                                            {
-                                                "type": "image",
-                                                "source": {
-                                                    "type": "base64",
-                                                    "media_type": "image/png",
-                                                    "data": image_data,
-                                                },
-                                            },
-                                            {
-                                                "type": "text",
-                                                "text": ocr_prompt
-                                            }
-                                        ],
-                                    }
-                                ],
-                            )
+def get_claude_rate_limiter(api_key: str) -> ClaudeRateLimiter:
+    """One limiter per API key, so concurrent requests on the same key share its quota"""
+    key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+    if key_hash not in _claude_rate_limiters:
+        _claude_rate_limiters[key_hash] = ClaudeRateLimiter()
+    return _claude_rate_limiters[key_hash]
 
-                            page_text = message.content[0].text
-                            if page_text and page_text.strip():
-                                all_text.append(f"--- Page {page_num + 1} ---\n{page_text}")
 
-                        num_pages = pdf_document.page_count
-                        pdf_document.close()
-                        text = "\n\n".join(all_text)
-                        logger.info(f"Claude OCR extracted {len(text)} characters from {num_pages} PDF pages")
+def claude_rate_limiter_metrics() -> dict:
+    return {key_hash[:12]: limiter.snapshot() for key_hash, limiter in _claude_rate_limiters.items()}
 
-                        if text and len(text.strip()) > 10:
-                            return {"status": "success", "text": text, "method": "claude"}
-                    except Exception as pdf_err:
-                        logger.error(f"Claude PDF OCR failed: {str(pdf_err)}, falling back to standard OCR")
-                else:
-                    # For images, send directly to Claude
-                    image_data = base64.b64encode(file_content).decode('utf-8')
-                    media_type = request.file_type if request.file_type.startswith('image/') else 'image/png'
 
-                    message = client.messages.create(
-                        model="claude-sonnet-4-5-20250929",
-                        max_tokens=4096,
-                        messages=[
-                            {
-                                "role": "user",
-                                "content": [
-                                    {
-                                        "type": "image",
-                                        "source": {
-                                            "type": "base64",
-                                            "media_type": media_type,
-                                            "data": image_data,
-                                        },
-                                    },
-                                    {
-                                        "type": "text",
-                                        "text": ocr_prompt
-                                    }
-                                ],
-                            }
-                        ],
-                    )
+def estimate_claude_text_tokens(text: str) -> int:
+    """Rough token count for rate limiting (about 3 characters per token for pt/es/HTML)"""
+    return len(text or "") // 3 + 1
 
-                    text = message.content[0].text
-                    logger.info(f"Claude OCR extracted {len(text)} characters with layout preservation")
 
-                    if text and len(text.strip()) > 10:
-                        return {"status": "success", "text": text, "method": "claude"}
+def claude_cached_system(*sections: str) -> list:
+    """
+    System prompt as text blocks ordered from most to least widely shared, with prompt-cache
+    breakpoints after the first and the last block: requests that repeat the same prefix
+    (every chunk of a document, every document with the same settings) read it from the cache.
+    Empty sections are dropped; prefixes under the model minimum (1024 tokens) are simply not cached.
+    """
+    blocks = [{"type": "text", "text": section} for section in sections if section]
+    if blocks:
+        blocks[0]["cache_control"] = {"type": "ephemeral"}
+        blocks[-1]["cache_control"] = {"type": "ephemeral"}
+    return blocks
 
-            except Exception as e:
-                logger.error(f"Claude OCR failed: {str(e)}, falling back to standard OCR")
-                # Fall through to standard OCR methods
 
-        html_content = ""  # Will store HTML version for visual layout
+def claude_usage_tokens(usage) -> int:
+    """Input + output tokens of a response, counting prompt-cache reads and writes as input"""
+    return sum(getattr(usage, field, 0) or 0 for field in (
+        "input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens", "output_tokens"
+    ))
+
+
+def claude_prompt_cache_usage(usage) -> dict:
+    """Prompt-cache hit/miss for one response; cache reads cost 10% of input tokens, writes 125%"""
+    read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    created = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    return {
+        "requests": 1,
+        "hits": int(read > 0),
+        "misses": int(read == 0),
+        "cache_read_input_tokens": read,
+        "cache_creation_input_tokens": created,
+        "uncached_input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "input_tokens_saved": round(read * 0.9 - created * 0.25)
+    }
+
+
+def merge_prompt_cache_usage(*usages: dict) -> dict:
+    """Sum prompt-cache counters over chunks / stages (None entries are skipped)"""
+    merged = {}
+    for usage in usages:
+        for key, value in (usage or {}).items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+class ClaudeClientRegistry:
+    """
+    One AsyncAnthropic client per API key, all sharing a single keep-alive connection pool
+    (HTTP/2 when the h2 package is installed). SDK retries are disabled: claude_create_message
+    retries through the rate limiter instead. Keeps latency / token / retry counters per call site.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._http_client = None
+        self.calls = {}
+
+    def _shared_http_client(self):
+        if self._http_client is None or self._http_client.is_closed:
+            # The SDK pins its own httpx build; take Limits from it so both stay compatible
+            limits = type(anthropic.DEFAULT_CONNECTION_LIMITS)(
+                max_connections=CLAUDE_MAX_CONNECTIONS,
+                max_keepalive_connections=CLAUDE_MAX_CONNECTIONS,
+                keepalive_expiry=CLAUDE_KEEPALIVE_SECONDS
+            )
+            self._http_client = anthropic.DefaultAsyncHttpxClient(limits=limits, http2=CLAUDE_HTTP2)
+            self._clients.clear()
+        return self._http_client
+
+    def get(self, api_key: str):
+        http_client = self._shared_http_client()
+        key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+        client = self._clients.get(key_hash)
+        if client is None:
+            client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0, timeout=CLAUDE_TIMEOUT_SECONDS)
+            self._clients[key_hash] = client
+        return client
+
+    def record_call(self, label: str, latency: float, retries: int, usage=None, failed: bool = False):
+        stats = self.calls.setdefault(label, {
+            "calls": 0, "failed": 0, "retries": 0, "latency_ms_total": 0.0, "latency_ms_max": 0.0,
+            "input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0
+        })
+        stats["calls"] += 1
+        stats["failed"] += int(failed)
+        stats["retries"] += retries
+        stats["latency_ms_total"] += latency * 1000
+        stats["latency_ms_max"] = max(stats["latency_ms_max"], latency * 1000)
+        if usage is not None:
+            for field in ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+                stats[field] += getattr(usage, field, 0) or 0
+
+    def metrics(self) -> dict:
+        return {
+            "clients": len(self._clients),
+            "http2": CLAUDE_HTTP2,
+            "calls": {
+                label: {**stats, "latency_ms_avg": round(stats["latency_ms_total"] / stats["calls"], 1),
+                        "latency_ms_total": round(stats["latency_ms_total"], 1), "latency_ms_max": round(stats["latency_ms_max"], 1)}
+                for label, stats in self.calls.items()
+            }
+        }
+
+    async def close(self):
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._clients.clear()
+
+
+claude_clients = ClaudeClientRegistry()
+
+
+def estimate_claude_request_tokens(create_kwargs: dict) -> int:
+    """Input-token estimate of a messages.create call (text length, plus a flat cost per image or document)"""
+    def content_tokens(content) -> int:
+        if isinstance(content, str):
+            return estimate_claude_text_tokens(content)
+        tokens = 0
+        for block in content or []:
+            if block.get("type") == "text":
+                tokens += estimate_claude_text_tokens(block.get("text", ""))
+            elif block.get("type") == "image":
+                tokens += CLAUDE_IMAGE_MAX_TOKENS
+            elif block.get("type") == "document":
+                tokens += CLAUDE_IMAGE_MAX_TOKENS * 3
+        return tokens
+
+    return content_tokens(create_kwargs.get("system", "")) + sum(
+        content_tokens(message.get("content")) for message in create_kwargs.get("messages", [])
+    )
+
+
+def claude_retry_backoff(attempt: int) -> float:
+    """Exponential backoff with jitter for overload / 5xx / connection errors"""
+    delay = min(CLAUDE_RETRY_BACKOFF_MAX_SECONDS, CLAUDE_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+    return delay * (0.5 + secrets.randbelow(1000) / 2000)
+
+
+async def claude_create_message(api_key: str, label: str, input_tokens: int = None, output_tokens: int = None,
+                                timeout: float = None, max_attempts: int = None, on_retry=None, on_text=None,
+                                **create_kwargs):
+    """
+    messages.create through the shared client for this API key: paced by the key's rate
+    limiter, retried on 429 / overload / 5xx / connection errors and timeouts, and measured
+    per call site (label). on_retry(attempt, wait_seconds, error) is awaited before each retry.
+    With on_text the completion is streamed and on_text(text_delta) is awaited for every delta
+    (a retry starts the text over; on_retry is the place to discard the partial output).
+    Other API errors (bad request, authentication) are raised at once.
+    """
+    client = claude_clients.get(api_key)
+    limiter = get_claude_rate_limiter(api_key)
+    if input_tokens is None:
+        input_tokens = estimate_claude_request_tokens(create_kwargs)
+    if output_tokens is None:
+        output_tokens = create_kwargs.get("max_tokens", 4096) // 4
+    max_attempts = max_attempts or CLAUDE_MAX_ATTEMPTS
+
+    started = time.monotonic()
+    for attempt in range(1, max_attempts + 1):
+        reservation = await limiter.acquire(input_tokens, output_tokens)
+        try:
+            if on_text is None:
+                raw_response = await client.messages.with_raw_response.create(
+                    timeout=timeout or CLAUDE_TIMEOUT_SECONDS, **create_kwargs
+                )
+                message, headers = raw_response.parse(), raw_response.headers
+            else:
+                async with client.messages.stream(timeout=timeout or CLAUDE_TIMEOUT_SECONDS, **create_kwargs) as stream:
+                    async for text in stream.text_stream:
+                        await on_text(text)
+                    message = await stream.get_final_message()
+                    headers = stream.response.headers
+        except anthropic.RateLimitError as e:
+            # The limiter holds every caller on this key until retry-after
+            wait = limiter.rate_limited(reservation, e, fallback_seconds=claude_retry_backoff(attempt))
+            error = e
+        except anthropic.APIStatusError as e:
+            limiter.release(reservation)
+            if e.status_code not in _CLAUDE_RETRYABLE_STATUS:
+                claude_clients.record_call(label, time.monotonic() - started, attempt - 1, failed=True)
+                raise
+            wait = claude_retry_backoff(attempt)
+            error = e
+        except anthropic.APIConnectionError as e:
+            limiter.release(reservation)
+            wait = claude_retry_backoff(attempt)
+            error = e
+        except BaseException:
+            limiter.release(reservation)
+            raise
+        else:
+            limiter.record(reservation, usage=message.usage, headers=headers)
+            claude_clients.record_call(label, time.monotonic() - started, attempt - 1, usage=message.usage)
+            return message
+
+        if attempt == max_attempts:
+            claude_clients.record_call(label, time.monotonic() - started, attempt - 1, failed=True)
+            logger.error(f"Claude {label}: giving up after {attempt} attempts: {error}")
+            raise error
+        logger.warning(f"Claude {label}: {type(error).__name__}, retry {attempt + 1}/{max_attempts} in {wait:.0f}s")
+        if on_retry is not None:
+            await on_retry(attempt, wait, error)
+        if not isinstance(error, anthropic.RateLimitError):
+            await asyncio.sleep(wait)
+
+
+def claude_http_exception(error: Exception) -> HTTPException:
+    """Map an Anthropic SDK error to the HTTPException the endpoints used to raise for the raw API response"""
+    if isinstance(error, anthropic.APITimeoutError):
+        return HTTPException(status_code=504, detail="Claude request timed out")
+    if isinstance(error, anthropic.APIStatusError):
+        return HTTPException(status_code=error.status_code, detail=parse_claude_api_error(error.response.text, error.status_code))
+    return HTTPException(status_code=502, detail=f"Claude API unavailable: {str(error)}")
+
+
+async def run_chunks_in_order(coroutines: list, limit: int = None, on_result=None) -> list:
+    """
+    Run chunk coroutines concurrently (at most `limit` at a time; the rate limiter decides the
+    real pace) and return their results in input order. on_result(index, result, done_count)
+    may return False to cancel the chunks still pending.
+    """
+    semaphore = asyncio.Semaphore(limit or CLAUDE_MAX_CONCURRENT_CHUNKS)
+
+    async def run(index: int, coroutine):
+        async with semaphore:
+            return index, await coroutine
+
+    tasks = [asyncio.create_task(run(index, coroutine)) for index, coroutine in enumerate(coroutines)]
+    results = [None] * len(tasks)
+    done_count = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, result = await next_done
+            results[index] = result
+            done_count += 1
+            if on_result is not None and await on_result(index, result, done_count) is False:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return results
+
+
+# ==================== CLAUDE VISION OCR ====================
+# PDF pages are rendered as JPEG, packed several per request (bounded by page count, image
+# tokens and payload size) and sent concurrently through the async client, under the
+# per-API-key Claude rate limiter. Results are yielded per page as each batch completes.
+
+CLAUDE_OCR_MODEL = "claude-sonnet-4-5-20250929"
+CLAUDE_OCR_PAGES_PER_REQUEST = int(os.environ.get("CLAUDE_OCR_PAGES_PER_REQUEST", "4"))
+CLAUDE_OCR_MAX_CONCURRENCY = int(os.environ.get("CLAUDE_OCR_MAX_CONCURRENCY", "3"))
+CLAUDE_OCR_MAX_IMAGE_TOKENS = int(os.environ.get("CLAUDE_OCR_MAX_IMAGE_TOKENS", "8000"))  # image input tokens per request
+CLAUDE_OCR_MAX_IMAGE_BYTES = int(os.environ.get("CLAUDE_OCR_MAX_IMAGE_BYTES", str(1536 * 1024)))  # per page, after compression
+CLAUDE_OCR_MAX_REQUEST_BYTES = 20 * 1024 * 1024  # API request limit is 32MB (base64 adds ~33%)
+CLAUDE_OCR_OUTPUT_TOKENS_PER_PAGE = 4096
+CLAUDE_OCR_MAX_OUTPUT_TOKENS = 16384
+_CLAUDE_OCR_PAGE_MARKER = re.compile(r'^\s*=== PAGE (\d+) ===\s*$', re.MULTILINE)
+
+
+def estimate_claude_image_tokens(width: int, height: int) -> int:
+    """Approximate input tokens for one image (width * height / 750, capped by Claude's downscaling)"""
+    return min(CLAUDE_IMAGE_MAX_TOKENS, math.ceil(width * height / 750))
+
+
+def estimate_page_image_tokens(page: dict) -> int:
+    """estimate_claude_image_tokens for a page payload; the cap when its size is unknown"""
+    if page.get("width") and page.get("height"):
+        return estimate_claude_image_tokens(page["width"], page["height"])
+    return CLAUDE_IMAGE_MAX_TOKENS
+
+
+def plan_claude_ocr_batches(pages: list, max_pages: int = None, max_image_tokens: int = None,
+                            max_bytes: int = CLAUDE_OCR_MAX_REQUEST_BYTES) -> list:
+    """
+    Pack consecutive pages into request batches without exceeding the page, image-token or
+    payload budget. pages are dicts with 'page', 'data' (base64), 'width' and 'height'.
+    """
+    max_pages = max_pages or CLAUDE_OCR_PAGES_PER_REQUEST
+    max_image_tokens = max_image_tokens or CLAUDE_OCR_MAX_IMAGE_TOKENS
+    batches = []
+    current, tokens, size = [], 0, 0
+    for page in pages:
+        page_tokens = estimate_page_image_tokens(page)
+        page_size = len(page['data'])
+        if current and (len(current) >= max_pages or tokens + page_tokens > max_image_tokens or size + page_size > max_bytes):
+            batches.append(current)
+            current, tokens, size = [], 0, 0
+        current.append(page)
+        tokens += page_tokens
+        size += page_size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _claude_ocr_batch_content(batch: list, ocr_prompt: str) -> list:
+    content = []
+    for page in batch:
+        if len(batch) > 1:
+            content.append({"type": "text", "text": f"Page {page['page']}:"})
+        content.append({
+            "type": "image",
+            "source": {"type": "base64", "media_type": page['media_type'], "data": page['data']}
+        })
+
+    if len(batch) > 1:
+        page_numbers = ", ".join(str(page['page']) for page in batch)
+        ocr_prompt += (
+            f"\n\nThe images above are pages {page_numbers} of the same document. "
+            f"Process each page separately: before each page's text write a line of the form "
+            f"=== PAGE <number> === (for example === PAGE {batch[0]['page']} ===), in page order, "
+            f"with no other commentary."
+        )
+    content.append({"type": "text", "text": ocr_prompt})
+    return content
+
+
+def split_claude_ocr_batch_text(text: str, page_numbers: list) -> dict:
+    """Split a multi-page response on its '=== PAGE N ===' markers. Returns None if pages are missing."""
+    if len(page_numbers) == 1:
+        return {page_numbers[0]: text}
+
+    markers = list(_CLAUDE_OCR_PAGE_MARKER.finditer(text))
+    pages = {}
+    for position, marker in enumerate(markers):
+        end = markers[position + 1].start() if position + 1 < len(markers) else len(text)
+        pages[int(marker.group(1))] = text[marker.end():end].strip('\n')
+    if sorted(pages) != sorted(page_numbers):
+        return None
+    return pages
+
+
+async def claude_ocr_batch(api_key: str, batch: list, ocr_prompt: str) -> dict:
+    """OCR one batch of pages in a single request. Falls back to one request per page if the reply can't be split."""
+    max_tokens = min(CLAUDE_OCR_MAX_OUTPUT_TOKENS, CLAUDE_OCR_OUTPUT_TOKENS_PER_PAGE * len(batch))
+    message = await claude_create_message(
+        api_key, "ocr",
+        input_tokens=sum(estimate_page_image_tokens(page) for page in batch) + estimate_claude_text_tokens(ocr_prompt),
+        output_tokens=max_tokens // 4,
+        model=CLAUDE_OCR_MODEL,
+        max_tokens=max_tokens,
+        messages=[{"role": "user", "content": _claude_ocr_batch_content(batch, ocr_prompt)}]
+    )
+    text = message.content[0].text
+    page_numbers = [page['page'] for page in batch]
+
+    pages = split_claude_ocr_batch_text(text, page_numbers)
+    if pages is None:
+        logger.warning(f"Claude OCR: could not split batch {page_numbers} by page, retrying pages one by one")
+        pages = {}
+        for page in batch:
+            pages.update(await claude_ocr_batch(api_key, [page], ocr_prompt))
+    return pages
+
+
+async def prepare_claude_ocr_pages(content: bytes, max_pages: int = 15) -> list:
+    """PDF pages as JPEG fitted to the per-page byte budget (rendered in the OCR process pool, cached per file)"""
+    return await page_render_cache.get_pdf_pages(content, max_bytes=CLAUDE_OCR_MAX_IMAGE_BYTES, max_pages=max_pages)
+
+
+async def claude_ocr_pages(pages: list, api_key: str, ocr_prompt: str):
+    """
+    Async generator: OCR prepared pages with batched, concurrent, rate-limited Claude requests.
+    Yields {'page', 'text'} or {'page', 'error'} for every page as soon as its batch completes.
+    """
+    semaphore = asyncio.Semaphore(CLAUDE_OCR_MAX_CONCURRENCY)
+
+    async def run_batch(batch: list):
+        async with semaphore:
+            try:
+                return batch, await claude_ocr_batch(api_key, batch, ocr_prompt), None
+            except Exception as e:
+                logger.error(f"Claude OCR batch {[page['page'] for page in batch]} failed: {e}")
+                return batch, {}, str(e)
+
+    batches = plan_claude_ocr_batches(pages)
+    logger.info(f"Claude OCR: {len(pages)} pages in {len(batches)} requests (concurrency {CLAUDE_OCR_MAX_CONCURRENCY})")
+    for finished in asyncio.as_completed([run_batch(batch) for batch in batches]):
+        batch, page_texts, error = await finished
+        for page in batch:
+            if page['page'] in page_texts:
+                yield {'page': page['page'], 'text': page_texts[page['page']]}
+            else:
+                yield {'page': page['page'], 'error': error or 'No text returned for this page'}
+
+
+def assemble_claude_ocr_pages(page_results: dict) -> str:
+    """'--- Page N ---' text in page order, skipping empty pages"""
+    return "\n\n".join(
+        f"--- Page {page_number} ---\n{page_results[page_number]}"
+        for page_number in sorted(page_results) if page_results[page_number] and page_results[page_number].strip()
+    )
+
+
+# ==================== TRANSLATION WORKSPACE ENDPOINTS ====================
+
+WORKSPACE_OCR_MAX_PAGES = 15  # PDF image pages OCR'd by /admin/ocr (uploads stop at 10)
+
+class OCRRequest(BaseModel):
+    file_base64: str
+    file_type: str
+    filename: str
+    use_claude: Optional[bool] = False
+    claude_api_key: Optional[str] = None
+    special_commands: Optional[str] = None
+    preserve_layout: Optional[bool] = True
+    source_language: Optional[str] = None  # short-word table for the word count
+
+class TranslatorNoteSettings(BaseModel):
+    enabled: bool = False
+    source_currency: Optional[str] = None  # e.g., 'BRL', 'NOK'
+    target_currency: Optional[str] = None  # e.g., 'USD', 'CAD'
+    exchange_rate: Optional[float] = None  # e.g., 5.42 (BRL per 1 USD)
+    rate_date: Optional[str] = None  # e.g., '2024-12-26'
+    rate_source: Optional[str] = None  # e.g., 'https://www.xe.com/currencyconverter/'
+    convert_values: Optional[bool] = True  # Whether to convert monetary values
+    source_currency_symbol: Optional[str] = None  # e.g., 'R$'
+    target_currency_symbol: Optional[str] = None  # e.g., '$'
+
+class TranslateRequest(BaseModel):
+    text: str
+    source_language: str
+    target_language: str
+    document_type: str
+    claude_api_key: str
+    action: str  # 'translate' or correction commands
+    current_translation: Optional[str] = None
+    general_instructions: Optional[str] = None  # Additional user instructions
+    preserve_layout: Optional[bool] = True  # Maintain original document layout
+    page_format: Optional[str] = 'letter'  # 'letter' or 'a4'
+    original_image: Optional[str] = None  # Base64 image for visual layout reference
+    translator_note: Optional[TranslatorNoteSettings] = None  # For financial document currency conversion
+
+async def validate_workspace_ocr_access(admin_key: str) -> bool:
+    """Admin key, or a token of an admin/pm/translator user"""
+    if admin_key == os.environ.get("ADMIN_KEY", "legacy_admin_2024"):
+        return True
+    user = await get_current_admin_user(admin_key)
+    return bool(user and user.get("role") in ["admin", "pm", "translator"])
+
+
+def build_claude_ocr_prompt(special_commands: str = None) -> str:
+    """The Claude Vision OCR prompt of every caller (workspace, Tradux, quick start), so they share cache entries"""
+    ocr_prompt = """Extract ALL text from this document image.
+
+CRITICAL INSTRUCTIONS:
+1. Maintain the EXACT original layout, structure, and formatting
+2. Preserve all line breaks, spacing, and indentation
+3. Keep tables in their original format using markdown table syntax or ASCII art
+4. Preserve headers, titles, and sections exactly as they appear
+5. Include ALL text, even small print, stamps, and signatures
+6. Use ** for bold text and * for italic text where visible
+7. Maintain the visual hierarchy of the document
+8. For handwritten text, use [handwritten: text] notation
+9. For stamps/seals, use [stamp: text] notation
+10. For signatures, use [signature: name if readable, or "illegible"]
+
+"""
+    if special_commands:
+        ocr_prompt += f"\nAdditional instructions: {special_commands}\n"
+
+    ocr_prompt += "\nExtract the complete text now, preserving the original layout:"
+    return ocr_prompt
+
 
-        if is_image:
+def claude_ocr_cache_params(ocr_prompt: str) -> dict:
+    """OCR result cache parameters of a Claude extraction: the model and the prompt, nothing else changes the text"""
+    return {
+        "model": CLAUDE_OCR_MODEL,
+        "prompt_sha256": hashlib.sha256(ocr_prompt.encode('utf-8')).hexdigest()
+    }
+
+
+async def run_claude_pdf_ocr(file_content: bytes, api_key: str, ocr_prompt: str, max_pages: int = 15):
+    """
+    Async generator of Claude PDF OCR events: {'type': 'start', 'pages'}, one {'type': 'page', ...}
+    per page as it completes, then {'type': 'result', 'text', 'failed_pages'}.
+    """
+    pages = await prepare_claude_ocr_pages(file_content, max_pages)
+    yield {"type": "start", "pages": len(pages)}
+
+    page_results = {}
+    async for page_result in claude_ocr_pages(pages, api_key, ocr_prompt):
+        if 'text' in page_result:
+            page_results[page_result['page']] = page_result['text']
+        yield {"type": "page", **page_result}
+
+    text = assemble_claude_ocr_pages(page_results)
+    failed_pages = [page['page'] for page in pages if page['page'] not in page_results]
+    logger.info(f"Claude OCR extracted {len(text)} characters from {len(pages)} PDF pages (failed pages: {failed_pages or 'none'})")
+    yield {"type": "result", "text": text, "failed_pages": failed_pages}
+
+
+@api_router.post("/admin/ocr")
+async def admin_ocr(request: OCRRequest, admin_key: str):
+    """Perform OCR on uploaded document (admin translation workspace)"""
+    # Validate admin key OR valid token
+    if not await validate_workspace_ocr_access(admin_key):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+    try:
+        # Decode base64 file
+        file_content = base64.b64decode(request.file_base64)
+        file_extension = request.filename.split('.')[-1].lower() if '.' in request.filename else ''
+
+        logger.info(f"OCR request for file: {request.filename}, type: {request.file_type}, size: {len(file_content)} bytes, use_claude: {request.use_claude}")
+
+        # Determine file type
+        is_image = request.file_type.startswith('image/') or file_extension in ['jpg', 'jpeg', 'png', 'bmp', 'tiff', 'gif', 'webp']
+        is_pdf = request.file_type == 'application/pdf' or file_extension == 'pdf'
+
+        text = ""
+        file_hash = file_sha256(file_content)
+
+        # Use Claude for OCR if requested
+        if request.use_claude and request.claude_api_key:
+            logger.info("Using Claude AI for OCR with layout preservation...")
+            try:
+                ocr_prompt = build_claude_ocr_prompt(request.special_commands)
+                claude_cache_params = claude_ocr_cache_params(ocr_prompt)
+                cached = await ocr_result_cache.get(file_hash, "claude", claude_cache_params)
+                if cached is not None:
+                    logger.info(f"Claude OCR cache hit for {request.filename}")
+                    return {"status": "success", "text": cached["text"], "method": "claude", "cached": True}
+
+                # Handle PDFs by converting to images first (batched, concurrent requests)
+                if is_pdf:
+                    logger.info("Converting PDF to images for Claude OCR...")
+                    try:
+                        result = None
+                        async for event in run_claude_pdf_ocr(file_content, request.claude_api_key, ocr_prompt):
+                            if event["type"] == "result":
+                                result = event
+                        text = result["text"]
+
+                        if text and len(text.strip()) > 10:
+                            # Partial results (failed pages) are not cached so the next request retries them
+                            response = {"status": "success", "text": text, "method": "claude"}
+                            if result["failed_pages"]:
+                                response["failed_pages"] = result["failed_pages"]
+                            else:
+                                await ocr_result_cache.put(file_hash, "claude", claude_cache_params, {"text": text})
+                            return response
+                    except Exception as pdf_err:
+                        logger.error(f"Claude PDF OCR failed: {str(pdf_err)}, falling back to standard OCR")
+                else:
+                    # For images, send directly to Claude
+                    media_type = request.file_type if request.file_type.startswith('image/') else 'image/png'
+                    image_page = await page_render_cache.get_image(file_content, media_type)
+
+                    page_result = {}
+                    async for page_result in claude_ocr_pages([image_page], request.claude_api_key, ocr_prompt):
+                        pass
+                    if 'error' in page_result:
+                        raise Exception(page_result['error'])
+
+                    text = page_result.get('text', '')
+                    logger.info(f"Claude OCR extracted {len(text)} characters with layout preservation")
+
+                    if text and len(text.strip()) > 10:
+                        await ocr_result_cache.put(file_hash, "claude", claude_cache_params, {"text": text})
+                        return {"status": "success", "text": text, "method": "claude"}
+
+            except Exception as e:
+                logger.error(f"Claude OCR failed: {str(e)}, falling back to standard OCR")
+                # Fall through to standard OCR methods
+
+        html_content = ""  # Will store HTML version for visual layout
+        failed_pages = []  # Pages Textract could not read (partial result)
+        ocr_page_limit = None  # Set when PDF image pages past WORKSPACE_OCR_MAX_PAGES were skipped
+
+        engine = "none"
+        cached = await ocr_result_cache.get_any(
+            file_hash, accepted_ocr_engines("pdf" if is_pdf else "image")
+        ) if (is_image or is_pdf) else None
+        if not standard_ocr_cache_covers(cached, WORKSPACE_OCR_MAX_PAGES):
+            cached = None
+        if cached is not None:
+            logger.info(f"OCR cache hit for {request.filename}")
+            text = cached["text"]
+            html_content = cached.get("html", "")
+
+        elif is_image:
             # Try AWS Textract first for images
             if textract_client:
                 logger.info("Using AWS Textract for image OCR...")
-                textract_result = extract_text_with_textract(file_content, file_extension)
+                textract_result = await extract_text_with_textract_async(file_content, file_extension)
                 if textract_result:
                     text = textract_result.get('text', '')
                     html_content = textract_result.get('html', '')
                     if text and len(text.strip()) > 10:
                         logger.info(f"Textract extracted {len(text)} characters")
+                        engine = "textract"
                     else:
                         text = ""
 
@@ -21132,134 +22301,36 @@ CRITICAL INSTRUCTIONS:
             if not text:
                 logger.info("Using Tesseract for image OCR with multiple configs...")
                 try:
-                    image = Image.open(io.BytesIO(file_content))
-                    if image.mode != 'RGB':
-                        image = image.convert('RGB')
-
-                    # Enhance image for better OCR
-                    from PIL import ImageEnhance, ImageFilter
-                    enhancer = ImageEnhance.Contrast(image)
-                    image = enhancer.enhance(2.0)
-                    image = image.filter(ImageFilter.SHARPEN)
-
-                    # Resize if too small
-                    width, height = image.size
-                    if width < 1000 or height < 1000:
-                        scale_factor = max(1000/width, 1000/height)
-                        new_width = int(width * scale_factor)
-                        new_height = int(height * scale_factor)
-                        image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-                    # Try multiple Tesseract configurations for best result
-                    configs = [
-                        r'--oem 3 --psm 6',   # Uniform text block
-                        r'--oem 3 --psm 3',   # Fully automatic
-                        r'--oem 3 --psm 4',   # Single column
-                        r'--oem 3 --psm 1',   # Auto with OSD
-                        r'--oem 3 --psm 12',  # Sparse text
-                    ]
-
-                    best_text = ""
-                    for config in configs:
-                        try:
-                            result = pytesseract.image_to_string(image, config=config)
-                            if len(result.strip()) > len(best_text.strip()):
-                                best_text = result
-                                logger.info(f"Tesseract config {config} extracted {len(result)} chars")
-                        except Exception as cfg_error:
-                            logger.warning(f"Tesseract config {config} failed: {str(cfg_error)}")
-                            continue
-
-                    text = best_text
+                    text = await tesseract_ocr_image(file_content, document_type=file_extension or "image")
+                    engine = "tesseract"
                     logger.info(f"Tesseract extracted {len(text)} characters (best result)")
                 except Exception as e:
                     logger.error(f"Tesseract OCR failed: {str(e)}")
                     raise HTTPException(status_code=500, detail=f"OCR failed: {str(e)}")
 
         elif is_pdf:
-            # Try text extraction first
-            try:
-                with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
-
-                if text.strip() and len(text.strip()) > 50:
-                    logger.info(f"pdfplumber extracted {len(text)} characters (text-based PDF)")
-            except Exception as e:
-                logger.warning(f"pdfplumber failed: {str(e)}")
-
-            # If text extraction failed, use OCR
-            if not text or len(text.strip()) < 50:
-                logger.info("PDF appears to be image-based, using OCR...")
-
-                # Try Textract first
-                if textract_client:
-                    logger.info("Using AWS Textract for PDF OCR...")
-                    textract_result = extract_text_with_textract(file_content, 'pdf')
-                    if textract_result:
-                        text = textract_result.get('text', '')
-                        html_content = textract_result.get('html', '')
-                        if text and len(text.strip()) > 10:
-                            logger.info(f"Textract extracted {len(text)} characters from PDF")
-
-                # Fallback to Tesseract with multiple configs
-                if not text or len(text.strip()) < 10:
-                    logger.info("Using Tesseract for PDF OCR with multiple configs...")
-                    try:
-                        pdf_document = fitz.open(stream=file_content, filetype="pdf")
-                        text = ""
-
-                        # OCR configurations to try
-                        configs = [
-                            r'--oem 3 --psm 6',   # Uniform text block
-                            r'--oem 3 --psm 3',   # Fully automatic
-                            r'--oem 3 --psm 4',   # Single column
-                            r'--oem 3 --psm 1',   # Auto with OSD
-                            r'--oem 3 --psm 12',  # Sparse text
-                        ]
-
-                        for page_num in range(min(pdf_document.page_count, 15)):
-                            page = pdf_document[page_num]
-                            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                            img_data = pix.tobytes("png")
-
-                            image = Image.open(io.BytesIO(img_data))
-
-                            # Preprocess image
-                            if image.mode != 'RGB':
-                                image = image.convert('RGB')
-                            from PIL import ImageEnhance, ImageFilter
-                            enhancer = ImageEnhance.Contrast(image)
-                            image = enhancer.enhance(2.0)
-                            image = image.filter(ImageFilter.SHARPEN)
-
-                            # Try multiple configs for best result
-                            best_page_text = ""
-                            for config in configs:
-                                try:
-                                    result = pytesseract.image_to_string(image, config=config)
-                                    if len(result.strip()) > len(best_page_text.strip()):
-                                        best_page_text = result
-                                except:
-                                    continue
-
-                            if best_page_text.strip():
-                                text += best_page_text + "\n"
-
-                        pdf_document.close()
-                        logger.info(f"Tesseract extracted {len(text)} characters from PDF (multi-config)")
-                    except Exception as e:
-                        logger.error(f"PDF OCR failed: {str(e)}")
+            # Text pages come straight from the text layer; only image pages are OCR'd
+            routed = await extract_pdf_text_routed(file_content, max_ocr_pages=WORKSPACE_OCR_MAX_PAGES)
+            text = routed['text']
+            html_content = routed['html']
+            failed_pages = routed['failed_pages']
+            engine = routed['engine']
+            ocr_page_limit = routed['ocr_page_limit']
+            logger.info(f"PDF extracted {len(text)} characters (text pages: {len(routed['text_pages'])}, OCR pages: {len(routed['ocr_pages'])})")
         else:
             raise HTTPException(status_code=400, detail=f"Unsupported file type: {request.file_type}")
 
         if not text or not text.strip():
             raise HTTPException(status_code=400, detail="Could not extract text from document")
 
+        # Partial results (failed pages) are not cached so the next request retries them
+        if cached is None and not failed_pages and cacheable_ocr_engine(engine):
+            await ocr_result_cache.put(file_hash, engine, None, standard_ocr_cache_entry(
+                {"text": text, "html": html_content, "ocr_page_limit": ocr_page_limit}
+            ))
+
         # Count words
-        word_count = count_words(text)
+        word_count = count_words(text, request.source_language)
 
         response = {
             "status": "success",
@@ -21272,6 +22343,9 @@ CRITICAL INSTRUCTIONS:
         if html_content:
             response["html"] = html_content
 
+        if failed_pages and text.strip():
+            response["failed_pages"] = failed_pages
+
         return response
 
     except HTTPException:
@@ -21281,6 +22355,72 @@ CRITICAL INSTRUCTIONS:
         raise HTTPException(status_code=500, detail=f"OCR failed: {str(e)}")
 
 
+@api_router.post("/admin/ocr/stream")
+async def admin_ocr_stream(request: OCRRequest, admin_key: str):
+    """
+    Same as /admin/ocr, streamed as newline-delimited JSON for the translation workspace.
+    Claude OCR of a PDF emits {"type": "start", "pages"}, then {"type": "page", "page", "text"|"error"}
+    as each page completes; every mode ends with {"type": "done", ...the /admin/ocr response}
+    or {"type": "error", "detail"}.
+    """
+    if not await validate_workspace_ocr_access(admin_key):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+    file_extension = request.filename.split('.')[-1].lower() if '.' in request.filename else ''
+    is_pdf = request.file_type == 'application/pdf' or file_extension == 'pdf'
+
+    def event_line(event: dict) -> str:
+        return json.dumps(event) + "\n"
+
+    async def standard_events(ocr_request: OCRRequest):
+        try:
+            result = await admin_ocr(ocr_request, admin_key)
+            yield event_line({"type": "done", **result})
+        except HTTPException as e:
+            yield event_line({"type": "error", "detail": e.detail})
+
+    if not (request.use_claude and request.claude_api_key and is_pdf):
+        return StreamingResponse(standard_events(request), media_type="application/x-ndjson")
+
+    async def claude_events():
+        try:
+            file_content = base64.b64decode(request.file_base64)
+            file_hash = file_sha256(file_content)
+            ocr_prompt = build_claude_ocr_prompt(request.special_commands)
+            claude_cache_params = claude_ocr_cache_params(ocr_prompt)
+
+            cached = await ocr_result_cache.get(file_hash, "claude", claude_cache_params)
+            if cached is not None:
+                logger.info(f"Claude OCR cache hit for {request.filename}")
+                yield event_line({"type": "done", "status": "success", "text": cached["text"], "method": "claude", "cached": True})
+                return
+
+            result = None
+            async for event in run_claude_pdf_ocr(file_content, request.claude_api_key, ocr_prompt):
+                if event["type"] == "result":
+                    result = event
+                else:
+                    yield event_line(event)
+
+            text = result["text"]
+            if text and len(text.strip()) > 10:
+                response = {"type": "done", "status": "success", "text": text, "method": "claude"}
+                if result["failed_pages"]:
+                    response["failed_pages"] = result["failed_pages"]
+                else:
+                    await ocr_result_cache.put(file_hash, "claude", claude_cache_params, {"text": text})
+                yield event_line(response)
+                return
+        except Exception as e:
+            logger.error(f"Claude PDF OCR failed: {str(e)}, falling back to standard OCR")
+
+        # Same fallback as /admin/ocr: standard OCR
+        async for line in standard_events(request.model_copy(update={"use_claude": False})):
+            yield line
+
+    return StreamingResponse(claude_events(), media_type="application/x-ndjson")
+
+
 def parse_claude_api_error(error_text: str, status_code: int = None) -> str:
     """Parse Claude API error responses and return user-friendly messages in Portuguese."""
     try:
@@ -21333,8 +22473,8 @@ async def fetch_matching_instructions(source_lang: str, target_lang: str, docume
     - documentType matches document_type OR is "All Documents"
     """
     try:
-        # Build query to match instructions
-        instructions = await db.translation_instructions.find().to_list(100)
+        # Instructions come from the reference data cache
+        instructions = await reference_cache.docs("translation_instructions", limit=100)
 
         matching_instructions = []
         for instr in instructions:
@@ -21604,22 +22744,21 @@ This marker must appear AFTER all translated content but BEFORE the closing body
                 source_lang_code = request.source_language.lower()[:2]
                 target_lang_code = request.target_language.lower()[:2]
 
-                # Fetch matching glossaries
+                # Glossary terms that occur in this text (matching glossaries, compiled once)
                 try:
-                    glossaries = await db.glossaries.find({
+                    glossary_automaton = await glossary_matchers.get({
                         "$or": [
                             {"sourceLang": source_lang_full, "targetLang": target_lang_full},
                             {"sourceLang": {"$regex": source_lang_code, "$options": "i"}, "targetLang": {"$regex": target_lang_code, "$options": "i"}},
                             {"source_language": source_lang_code, "target_language": target_lang_code}
                         ]
-                    }).to_list(10)
+                    }, limit=10)
 
-                    if glossaries:
-                        all_terms = []
-                        for glossary in glossaries:
-                            if glossary.get("terms"):
-                                for term in glossary["terms"][:100]:
-                                    all_terms.append(f"• {term.get('source', '')} → {term.get('target', '')}")
+                    if glossary_automaton:
+                        all_terms = [
+                            f"• {term.get('source', '')} → {term.get('target', '')}"
+                            for term in glossary_matchers.terms_in(glossary_automaton, request.text, 100)
+                        ]
 
                         if all_terms:
                             glossary_and_tm_section += f"""
@@ -21633,30 +22772,16 @@ You MUST use these EXACT translations for the following terms:
                 except Exception as e:
                     logger.warning(f"Error fetching glossaries for translation: {e}")
 
-                # Fetch Translation Memory entries
+                # Fetch Translation Memory matches for the segments of this text
                 try:
-                    tm_entries = await db.translation_memory.find({
-                        "$or": [
-                            {"sourceLang": source_lang_full, "targetLang": target_lang_full},
-                            {"sourceLang": {"$regex": source_lang_full[:10], "$options": "i"},
-                             "targetLang": {"$regex": target_lang_full[:10], "$options": "i"}}
-                        ]
-                    }).sort("score", -1).to_list(100)
-
-                    if tm_entries:
-                        uploaded_tm = [tm for tm in tm_entries if tm.get("is_uploaded") or tm.get("score", 0) == 100]
-                        auto_tm = [tm for tm in tm_entries if not tm.get("is_uploaded") and tm.get("score", 0) != 100]
+                    tm_matches = await translation_memory_index.match_text(source_lang_full, target_lang_full, request.text)
 
-                        tm_text = ""
-                        if uploaded_tm:
-                            tm_text += "🔹 PRIORITY TERMS (from uploaded TM - USE EXACTLY):\n"
-                            for tm in uploaded_tm[:50]:
-                                tm_text += f"• {tm.get('source', '')} → {tm.get('target', '')}\n"
-
-                        if auto_tm and len(uploaded_tm) < 50:
-                            tm_text += "\n🔸 APPROVED TRANSLATIONS (from high-quality translations):\n"
-                            for tm in auto_tm[:50 - len(uploaded_tm)]:
-                                tm_text += f"• {tm.get('source', '')} → {tm.get('target', '')} (score: {tm.get('score', 0)}%)\n"
+                    if tm_matches:
+                        tm_text = format_tm_matches(
+                            tm_matches,
+                            "🔹 EXACT MATCHES (USE EXACTLY):",
+                            "🔸 FUZZY MATCHES ([match %] - reuse, adapting only what differs):"
+                        )
 
                         if tm_text:
                             glossary_and_tm_section += f"""
@@ -21708,138 +22833,119 @@ CRITICAL OUTPUT RULES:
             user_message = f"Current translation ({request.target_language}):\n{request.current_translation}\n\nInstruction: {request.action}\n\nIMPORTANT: Output ONLY the corrected translation. No explanations or notes. Return the COMPLETE document."
 
         # Call Claude API - with image if available for layout preservation
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            # Build message content - include image if provided for visual layout reference
-            if request.original_image and request.action == 'translate':
-                # Clean base64 string (remove data:image/pdf prefix if present)
-                image_data = request.original_image
-                media_type = "image/jpeg"
-
-                if ',' in image_data:
-                    # Extract media type from data URL
-                    header = image_data.split(',')[0]
-                    image_data = image_data.split(',')[1]
-
-                    # Check if it's a PDF and convert to image
-                    if 'pdf' in header.lower():
-                        logger.info("Converting PDF to images for Claude...")
-                        try:
-                            import fitz  # PyMuPDF
-                            pdf_bytes = base64.b64decode(image_data)
-                            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-                            total_pages = len(doc)
-                            logger.info(f"PDF has {total_pages} pages")
-
-                            # Extract ALL pages as images
-                            page_images = []
-                            for page_num in range(total_pages):
-                                page = doc[page_num]
-                                pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))  # 2x zoom for better quality
-                                img_bytes = pix.tobytes("jpeg")
-                                # Compress image if needed to stay under Claude's 5MB limit
-                                compressed_bytes, final_media_type = compress_image_for_claude_api(
-                                    img_bytes, "image/jpeg"
-                                )
-                                page_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
-                                page_images.append({
-                                    "page_num": page_num + 1,
-                                    "data": page_b64,
-                                    "media_type": final_media_type
-                                })
+        # Build message content - include image if provided for visual layout reference
+        if request.original_image and request.action == 'translate':
+            # Clean base64 string (remove data:image/pdf prefix if present)
+            image_data = request.original_image
+            media_type = "image/jpeg"
 
-                            doc.close()
-                            logger.info(f"PDF converted to {len(page_images)} images successfully")
+            if ',' in image_data:
+                # Extract media type from data URL
+                header = image_data.split(',')[0]
+                image_data = image_data.split(',')[1]
 
-                            # Store all page images for multi-page translation
-                            all_page_images = page_images
-                            media_type = "image/jpeg"
+                # Check if it's a PDF and convert to image
+                if 'pdf' in header.lower():
+                    logger.info("Converting PDF to images for Claude...")
+                    try:
+                        # Extract ALL pages as images (2x zoom, compressed under Claude's 5MB limit; cached per file)
+                        pdf_bytes = base64.b64decode(image_data)
+                        page_images = [
+                            {"page_num": page["page"], "data": page["data"], "media_type": page["media_type"]}
+                            for page in await page_render_cache.get_pdf_pages(pdf_bytes)
+                        ]
+                        logger.info(f"PDF converted to {len(page_images)} images successfully")
 
-                        except Exception as e:
-                            logger.error(f"PDF conversion failed: {e}")
-                            # Fall back to text-only translation
-                            all_page_images = []
-                    elif 'png' in header.lower():
-                        media_type = "image/png"
-                        # Compress image if needed to stay under Claude's 5MB limit
-                        try:
-                            img_bytes = base64.b64decode(image_data)
-                            compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, media_type)
-                            compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
-                            all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
-                        except Exception as e:
-                            logger.warning(f"Image compression failed, using original: {e}")
-                            all_page_images = [{"page_num": 1, "data": image_data, "media_type": media_type}]
-                    elif 'gif' in header.lower():
-                        media_type = "image/gif"
-                        # Compress image if needed to stay under Claude's 5MB limit
-                        try:
-                            img_bytes = base64.b64decode(image_data)
-                            compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, media_type)
-                            compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
-                            all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
-                        except Exception as e:
-                            logger.warning(f"Image compression failed, using original: {e}")
-                            all_page_images = [{"page_num": 1, "data": image_data, "media_type": media_type}]
-                    elif 'webp' in header.lower():
-                        media_type = "image/webp"
-                        # Compress image if needed to stay under Claude's 5MB limit
-                        try:
-                            img_bytes = base64.b64decode(image_data)
-                            compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, media_type)
-                            compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
-                            all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
-                        except Exception as e:
-                            logger.warning(f"Image compression failed, using original: {e}")
-                            all_page_images = [{"page_num": 1, "data": image_data, "media_type": media_type}]
-                    else:
-                        # Default to jpeg - Compress image if needed
+                        # Store all page images for multi-page translation
+                        all_page_images = page_images
                         media_type = "image/jpeg"
-                        try:
-                            img_bytes = base64.b64decode(image_data)
-                            compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, media_type)
-                            compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
-                            all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
-                        except Exception as e:
-                            logger.warning(f"Image compression failed, using original: {e}")
-                            all_page_images = [{"page_num": 1, "data": image_data, "media_type": media_type}]
-                else:
-                    # No header, assume single image - compress if needed
-                    if image_data:
-                        try:
-                            img_bytes = base64.b64decode(image_data)
-                            compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, "image/jpeg")
-                            compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
-                            all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
-                        except Exception as e:
-                            logger.warning(f"Image compression failed, using original: {e}")
-                            all_page_images = [{"page_num": 1, "data": image_data, "media_type": "image/jpeg"}]
-                    else:
-                        all_page_images = []
 
-                # Build message content with ALL page images
-                if all_page_images:
-                    message_content = []
-
-                    # Add ALL page images to the message
-                    for page_info in all_page_images:
-                        # Use page-specific media_type if available, fallback to global media_type
-                        page_media_type = page_info.get("media_type", media_type)
-                        message_content.append({
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": page_media_type,
-                                "data": page_info["data"],
-                            },
-                        })
+                    except Exception as e:
+                        logger.error(f"PDF conversion failed: {e}")
+                        # Fall back to text-only translation
+                        all_page_images = []
+                elif 'png' in header.lower():
+                    media_type = "image/png"
+                    # Compress image if needed to stay under Claude's 5MB limit
+                    try:
+                        img_bytes = base64.b64decode(image_data)
+                        compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, media_type)
+                        compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
+                        all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
+                    except Exception as e:
+                        logger.warning(f"Image compression failed, using original: {e}")
+                        all_page_images = [{"page_num": 1, "data": image_data, "media_type": media_type}]
+                elif 'gif' in header.lower():
+                    media_type = "image/gif"
+                    # Compress image if needed to stay under Claude's 5MB limit
+                    try:
+                        img_bytes = base64.b64decode(image_data)
+                        compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, media_type)
+                        compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
+                        all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
+                    except Exception as e:
+                        logger.warning(f"Image compression failed, using original: {e}")
+                        all_page_images = [{"page_num": 1, "data": image_data, "media_type": media_type}]
+                elif 'webp' in header.lower():
+                    media_type = "image/webp"
+                    # Compress image if needed to stay under Claude's 5MB limit
+                    try:
+                        img_bytes = base64.b64decode(image_data)
+                        compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, media_type)
+                        compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
+                        all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
+                    except Exception as e:
+                        logger.warning(f"Image compression failed, using original: {e}")
+                        all_page_images = [{"page_num": 1, "data": image_data, "media_type": media_type}]
+                else:
+                    # Default to jpeg - Compress image if needed
+                    media_type = "image/jpeg"
+                    try:
+                        img_bytes = base64.b64decode(image_data)
+                        compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, media_type)
+                        compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
+                        all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
+                    except Exception as e:
+                        logger.warning(f"Image compression failed, using original: {e}")
+                        all_page_images = [{"page_num": 1, "data": image_data, "media_type": media_type}]
+            else:
+                # No header, assume single image - compress if needed
+                if image_data:
+                    try:
+                        img_bytes = base64.b64decode(image_data)
+                        compressed_bytes, final_media_type = compress_image_for_claude_api(img_bytes, "image/jpeg")
+                        compressed_b64 = base64.b64encode(compressed_bytes).decode('utf-8')
+                        all_page_images = [{"page_num": 1, "data": compressed_b64, "media_type": final_media_type}]
+                    except Exception as e:
+                        logger.warning(f"Image compression failed, using original: {e}")
+                        all_page_images = [{"page_num": 1, "data": image_data, "media_type": "image/jpeg"}]
+                else:
+                    all_page_images = []
 
-                    # Add the text instruction after all images
-                    total_pages = len(all_page_images)
-                    pages_text = f"This document has {total_pages} page(s). You MUST translate ALL {total_pages} pages." if total_pages > 1 else "This is a single-page document."
+            # Build message content with ALL page images
+            if all_page_images:
+                message_content = []
 
+                # Add ALL page images to the message
+                for page_info in all_page_images:
+                    # Use page-specific media_type if available, fallback to global media_type
+                    page_media_type = page_info.get("media_type", media_type)
                     message_content.append({
-                        "type": "text",
-                        "text": f"""Look at these document images carefully. These are ALL the pages of the original document.
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": page_media_type,
+                            "data": page_info["data"],
+                        },
+                    })
+
+                # Add the text instruction after all images
+                total_pages = len(all_page_images)
+                pages_text = f"This document has {total_pages} page(s). You MUST translate ALL {total_pages} pages." if total_pages > 1 else "This is a single-page document."
+
+                message_content.append({
+                    "type": "text",
+                    "text": f"""Look at these document images carefully. These are ALL the pages of the original document.
 
 {pages_text}
 
@@ -21860,60 +22966,47 @@ CRITICAL INSTRUCTIONS:
 7. DO NOT skip any pages - all pages must be translated
 8. IMPORTANT: For multi-page documents, REPEAT the document header/letterhead at the TOP of EACH page, just like in the original document
 9. Do NOT add "PAGE 1", "Page X of Y", or any page number labels/headers - start each page directly with the translated content"""
-                    })
-                else:
-                    message_content = user_message
+                })
             else:
                 message_content = user_message
+        else:
+            message_content = user_message
 
-            response = await client.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "x-api-key": request.claude_api_key,
-                    "anthropic-version": "2023-06-01",
-                    "content-type": "application/json"
-                },
-                json={
-                    "model": "claude-sonnet-4-5-20250929",
-                    "max_tokens": 16384,
-                    "system": system_prompt,
-                    "messages": [
-                        {"role": "user", "content": message_content}
-                    ]
-                }
+        try:
+            response = await claude_create_message(
+                request.claude_api_key, "translate",
+                timeout=120.0,
+                model="claude-sonnet-4-5-20250929",
+                max_tokens=16384,
+                system=system_prompt,
+                messages=[{"role": "user", "content": message_content}]
             )
+        except anthropic.APIError as api_error:
+            logger.error(f"Claude API error: {api_error}")
+            raise claude_http_exception(api_error)
 
-            if response.status_code != 200:
-                error_detail = response.text
-                logger.error(f"Claude API error: {response.status_code} - {error_detail}")
-                friendly_msg = parse_claude_api_error(error_detail, response.status_code)
-                raise HTTPException(status_code=response.status_code, detail=friendly_msg)
-
-            result = response.json()
-            translation = result.get("content", [{}])[0].get("text", "")
+        translation = response.content[0].text if response.content else ""
 
-            if not translation:
-                raise HTTPException(status_code=500, detail="No translation returned from Claude")
+        if not translation:
+            raise HTTPException(status_code=500, detail="No translation returned from Claude")
 
-            # Clean up markdown code blocks if present (Claude sometimes wraps HTML in ```html ... ```)
-            clean_translation = translation.strip()
-            if clean_translation.startswith("```html"):
-                clean_translation = clean_translation[7:]
-            elif clean_translation.startswith("```"):
-                clean_translation = clean_translation[3:]
-            if clean_translation.endswith("```"):
-                clean_translation = clean_translation[:-3]
-            clean_translation = clean_translation.strip()
+        # Clean up markdown code blocks if present (Claude sometimes wraps HTML in ```html ... ```)
+        clean_translation = translation.strip()
+        if clean_translation.startswith("```html"):
+            clean_translation = clean_translation[7:]
+        elif clean_translation.startswith("```"):
+            clean_translation = clean_translation[3:]
+        if clean_translation.endswith("```"):
+            clean_translation = clean_translation[:-3]
+        clean_translation = clean_translation.strip()
 
-            return {
-                "status": "success",
-                "translation": clean_translation,
-                "action": request.action,
-                "model": "claude-sonnet-4-5-20250929"
-            }
+        return {
+            "status": "success",
+            "translation": clean_translation,
+            "action": request.action,
+            "model": "claude-sonnet-4-5-20250929"
+        }
 
-    except httpx.TimeoutException:
-        raise HTTPException(status_code=504, detail="Translation request timed out")
     except HTTPException:
         raise
     except Exception as e:
@@ -22216,105 +23309,93 @@ Responda APENAS com o JSON válido, sem texto adicional."""
 
 Retorne o JSON com a análise completa."""
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "x-api-key": claude_api_key,
-                    "anthropic-version": "2023-06-01",
-                    "content-type": "application/json"
-                },
-                json={
-                    "model": "claude-sonnet-4-5-20250929",
-                    "max_tokens": 4096,
-                    "system": system_prompt,
-                    "messages": [
-                        {"role": "user", "content": user_message}
-                    ]
-                }
+        try:
+            response = await claude_create_message(
+                claude_api_key, "proofread",
+                timeout=120.0,
+                model="claude-sonnet-4-5-20250929",
+                max_tokens=4096,
+                system=system_prompt,
+                messages=[{"role": "user", "content": user_message}]
             )
+        except anthropic.APIError as api_error:
+            logger.error(f"Claude API error in simple proofread: {api_error}")
+            raise claude_http_exception(api_error)
 
-            if response.status_code != 200:
-                error_detail = response.text
-                logger.error(f"Claude API error in simple proofread: {response.status_code} - {error_detail}")
-                friendly_msg = parse_claude_api_error(error_detail, response.status_code)
-                raise HTTPException(status_code=response.status_code, detail=friendly_msg)
-
-            result = response.json()
-            proofreading_result = result.get("content", [{}])[0].get("text", "")
+        proofreading_result = response.content[0].text if response.content else ""
 
-            # Try to parse as JSON
-            try:
-                clean_result = proofreading_result.strip()
-                if clean_result.startswith("```json"):
-                    clean_result = clean_result[7:]
-                if clean_result.startswith("```"):
-                    clean_result = clean_result[3:]
-                if clean_result.endswith("```"):
-                    clean_result = clean_result[:-3]
-                clean_result = clean_result.strip()
-
-                parsed_result = json.loads(clean_result)
-
-                # Filter out errors where original equals sugestao (no actual change)
-                # This fixes a bug where AI flags items as errors when before/after are identical
-                if parsed_result.get("erros"):
-                    original_count = len(parsed_result["erros"])
-                    filtered_errors = []
-                    for erro in parsed_result["erros"]:
-                        original_text = (erro.get("original") or "").strip()
-                        sugestao = (erro.get("sugestao") or "").strip()
-                        # Only keep errors where there's an actual difference
-                        if original_text != sugestao:
-                            filtered_errors.append(erro)
-                        else:
-                            logger.info(f"Filtered out duplicate simple proofread error: '{original_text}' == '{sugestao}'")
-
-                    parsed_result["erros"] = filtered_errors
-                    filtered_count = original_count - len(filtered_errors)
-
-                    # Recalculate counts after filtering
-                    if filtered_count > 0:
-                        parsed_result["total_erros"] = len(filtered_errors)
-                        parsed_result["criticos"] = sum(1 for e in filtered_errors if e.get("gravidade") == "CRÍTICO")
-                        parsed_result["altos"] = sum(1 for e in filtered_errors if e.get("gravidade") == "ALTO")
-                        parsed_result["medios"] = sum(1 for e in filtered_errors if e.get("gravidade") == "MÉDIO")
-                        parsed_result["baixos"] = sum(1 for e in filtered_errors if e.get("gravidade") == "BAIXO")
-
-                        # Recalculate score and classification
-                        total = len(filtered_errors)
-                        criticos = parsed_result["criticos"]
-                        altos = parsed_result["altos"]
-
-                        if criticos > 0 or altos > 2:
-                            parsed_result["classificacao"] = "REPROVADO"
-                            parsed_result["pontuacao_final"] = max(0, 70 - (criticos * 15) - (altos * 5))
-                        elif altos > 0 or total > 3:
-                            parsed_result["classificacao"] = "APROVADO_COM_OBSERVACOES"
-                            parsed_result["pontuacao_final"] = max(70, 85 - (altos * 5) - (total * 2))
-                        else:
-                            parsed_result["classificacao"] = "APROVADO"
-                            parsed_result["pontuacao_final"] = max(85, 100 - (total * 3))
+        # Try to parse as JSON
+        try:
+            clean_result = proofreading_result.strip()
+            if clean_result.startswith("```json"):
+                clean_result = clean_result[7:]
+            if clean_result.startswith("```"):
+                clean_result = clean_result[3:]
+            if clean_result.endswith("```"):
+                clean_result = clean_result[:-3]
+            clean_result = clean_result.strip()
+
+            parsed_result = json.loads(clean_result)
+
+            # Filter out errors where original equals sugestao (no actual change)
+            # This fixes a bug where AI flags items as errors when before/after are identical
+            if parsed_result.get("erros"):
+                original_count = len(parsed_result["erros"])
+                filtered_errors = []
+                for erro in parsed_result["erros"]:
+                    original_text = (erro.get("original") or "").strip()
+                    sugestao = (erro.get("sugestao") or "").strip()
+                    # Only keep errors where there's an actual difference
+                    if original_text != sugestao:
+                        filtered_errors.append(erro)
+                    else:
+                        logger.info(f"Filtered out duplicate simple proofread error: '{original_text}' == '{sugestao}'")
+
+                parsed_result["erros"] = filtered_errors
+                filtered_count = original_count - len(filtered_errors)
+
+                # Recalculate counts after filtering
+                if filtered_count > 0:
+                    parsed_result["total_erros"] = len(filtered_errors)
+                    parsed_result["criticos"] = sum(1 for e in filtered_errors if e.get("gravidade") == "CRÍTICO")
+                    parsed_result["altos"] = sum(1 for e in filtered_errors if e.get("gravidade") == "ALTO")
+                    parsed_result["medios"] = sum(1 for e in filtered_errors if e.get("gravidade") == "MÉDIO")
+                    parsed_result["baixos"] = sum(1 for e in filtered_errors if e.get("gravidade") == "BAIXO")
+
+                    # Recalculate score and classification
+                    total = len(filtered_errors)
+                    criticos = parsed_result["criticos"]
+                    altos = parsed_result["altos"]
+
+                    if criticos > 0 or altos > 2:
+                        parsed_result["classificacao"] = "REPROVADO"
+                        parsed_result["pontuacao_final"] = max(0, 70 - (criticos * 15) - (altos * 5))
+                    elif altos > 0 or total > 3:
+                        parsed_result["classificacao"] = "APROVADO_COM_OBSERVACOES"
+                        parsed_result["pontuacao_final"] = max(70, 85 - (altos * 5) - (total * 2))
+                    else:
+                        parsed_result["classificacao"] = "APROVADO"
+                        parsed_result["pontuacao_final"] = max(85, 100 - (total * 3))
 
-                        logger.info(f"Simple proofread: Filtered {filtered_count} duplicate errors, {len(filtered_errors)} remaining")
+                    logger.info(f"Simple proofread: Filtered {filtered_count} duplicate errors, {len(filtered_errors)} remaining")
 
-                return parsed_result
+            return parsed_result
 
-            except json.JSONDecodeError:
-                # If JSON parsing fails, return a default response
-                logger.warning(f"Failed to parse proofreading JSON: {proofreading_result[:200]}")
-                return {
-                    "pontuacao_final": 75,
-                    "classificacao": "APROVADO_COM_OBSERVACOES",
-                    "total_erros": 0,
-                    "criticos": 0,
-                    "altos": 0,
-                    "medios": 0,
-                    "baixos": 0,
-                    "erros": [],
-                    "observacoes": proofreading_result[:500],
-                    "resumo": "Análise concluída - verifique observações"
-                }
+        except json.JSONDecodeError:
+            # If JSON parsing fails, return a default response
+            logger.warning(f"Failed to parse proofreading JSON: {proofreading_result[:200]}")
+            return {
+                "pontuacao_final": 75,
+                "classificacao": "APROVADO_COM_OBSERVACOES",
+                "total_erros": 0,
+                "criticos": 0,
+                "altos": 0,
+                "medios": 0,
+                "baixos": 0,
+                "erros": [],
+                "observacoes": proofreading_result[:500],
+                "resumo": "Análise concluída - verifique observações"
+            }
 
     except HTTPException:
         raise
@@ -22429,22 +23510,21 @@ async def admin_proofread(request: ProofreadRequest, admin_key: str):
         source_lang_code = request.source_language.lower()[:2]
         target_lang_code = request.target_language.lower()[:2]
 
-        # Fetch matching glossaries
+        # Glossary terms that occur in the original text: only those can be enforced in the translation
         try:
-            glossaries = await db.glossaries.find({
+            glossary_automaton = await glossary_matchers.get({
                 "$or": [
                     {"sourceLang": source_lang_full, "targetLang": target_lang_full},
                     {"sourceLang": {"$regex": source_lang_code, "$options": "i"}, "targetLang": {"$regex": target_lang_code, "$options": "i"}},
                     {"source_language": source_lang_code, "target_language": target_lang_code}
                 ]
-            }).to_list(10)
+            }, limit=10)
 
-            if glossaries:
-                all_terms = []
-                for glossary in glossaries:
-                    if glossary.get("terms"):
-                        for term in glossary["terms"][:100]:
-                            all_terms.append(f"• {term.get('source', '')} → {term.get('target', '')}")
+            if glossary_automaton:
+                all_terms = [
+                    f"• {term.get('source', '')} → {term.get('target', '')}"
+                    for term in glossary_matchers.terms_in(glossary_automaton, request.original_text, 100)
+                ]
 
                 if all_terms:
                     glossary_and_tm_terms += f"""
@@ -22457,31 +23537,16 @@ Use EXATAMENTE estas traduções para os seguintes termos:
         except Exception as e:
             logger.warning(f"Error fetching glossaries for proofreading: {e}")
 
-        # Fetch Translation Memory entries
+        # Fetch Translation Memory matches for the segments of the original text
         try:
-            tm_entries = await db.translation_memory.find({
-                "$or": [
-                    {"sourceLang": source_lang_full, "targetLang": target_lang_full},
-                    {"sourceLang": {"$regex": source_lang_full[:10], "$options": "i"},
-                     "targetLang": {"$regex": target_lang_full[:10], "$options": "i"}}
-                ]
-            }).sort("score", -1).to_list(100)
-
-            if tm_entries:
-                # Separate uploaded TM (priority) from auto-generated TM
-                uploaded_tm = [tm for tm in tm_entries if tm.get("is_uploaded") or tm.get("score", 0) == 100]
-                auto_tm = [tm for tm in tm_entries if not tm.get("is_uploaded") and tm.get("score", 0) != 100]
-
-                tm_text = ""
-                if uploaded_tm:
-                    tm_text += "🔹 TERMOS PRIORITÁRIOS (TM importada - USE EXATAMENTE):\n"
-                    for tm in uploaded_tm[:50]:
-                        tm_text += f"• {tm.get('source', '')} → {tm.get('target', '')}\n"
+            tm_matches = await translation_memory_index.match_text(source_lang_full, target_lang_full, request.original_text)
 
-                if auto_tm and len(uploaded_tm) < 50:
-                    tm_text += "\n🔸 TRADUÇÕES APROVADAS (de traduções de alta qualidade):\n"
-                    for tm in auto_tm[:50 - len(uploaded_tm)]:
-                        tm_text += f"• {tm.get('source', '')} → {tm.get('target', '')} (score: {tm.get('score', 0)}%)\n"
+            if tm_matches:
+                tm_text = format_tm_matches(
+                    tm_matches,
+                    "🔹 CORRESPONDÊNCIAS EXATAS (USE EXATAMENTE):",
+                    "🔸 CORRESPONDÊNCIAS PARCIAIS ([% de correspondência] - adaptar apenas o que difere):"
+                )
 
                 if tm_text:
                     glossary_and_tm_terms += f"""
@@ -22600,115 +23665,103 @@ Analise minuciosamente TODAS as páginas e retorne o JSON com todos os erros enc
 Analise minuciosamente e retorne o JSON com todos os erros encontrados."""
             messages = [{"role": "user", "content": user_message}]
 
-        async with httpx.AsyncClient(timeout=180.0) as client:
-            response = await client.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "x-api-key": request.claude_api_key,
-                    "anthropic-version": "2023-06-01",
-                    "content-type": "application/json"
-                },
-                json={
-                    "model": "claude-sonnet-4-5-20250929",
-                    "max_tokens": 16384,
-                    "system": system_prompt,
-                    "messages": messages
-                }
+        try:
+            response = await claude_create_message(
+                request.claude_api_key, "proofread",
+                timeout=180.0,
+                model="claude-sonnet-4-5-20250929",
+                max_tokens=16384,
+                system=system_prompt,
+                messages=messages
             )
+        except anthropic.APIError as api_error:
+            logger.error(f"Claude API error: {api_error}")
+            raise claude_http_exception(api_error)
 
-            if response.status_code != 200:
-                error_detail = response.text
-                logger.error(f"Claude API error: {response.status_code} - {error_detail}")
-                friendly_msg = parse_claude_api_error(error_detail, response.status_code)
-                raise HTTPException(status_code=response.status_code, detail=friendly_msg)
-
-            result = response.json()
-            proofreading_result = result.get("content", [{}])[0].get("text", "")
-            stop_reason = result.get("stop_reason", "end_turn")
+        proofreading_result = response.content[0].text if response.content else ""
+        stop_reason = response.stop_reason or "end_turn"
 
-            # Try to parse as JSON
-            try:
-                # Clean up the response - remove markdown code blocks if present
-                clean_result = proofreading_result.strip()
-                # Remove opening markdown code block (```json or ```)
-                import re as _re
-                clean_result = _re.sub(r'^```(?:json)?\s*', '', clean_result)
-                # Remove closing markdown code block
-                clean_result = _re.sub(r'\s*```\s*$', '', clean_result)
-                clean_result = clean_result.strip()
-
-                # If the response was truncated (max_tokens hit), try to repair the JSON
-                if stop_reason == "max_tokens":
-                    logger.warning("Proofreading response was truncated (max_tokens). Attempting JSON repair.")
-                    clean_result = _repair_truncated_json(clean_result)
-
-                parsed_result = json.loads(clean_result)
-
-                # Filter out errors where traducao_errada equals correcao (no actual change)
-                # This fixes a bug where AI flags items as errors when before/after are identical
-                if parsed_result.get("erros"):
-                    original_count = len(parsed_result["erros"])
-                    filtered_errors = []
-                    for erro in parsed_result["erros"]:
-                        traducao_errada = (erro.get("traducao_errada") or "").strip()
-                        correcao = (erro.get("correcao") or "").strip()
-                        # Only keep errors where there's an actual difference
-                        if traducao_errada != correcao:
-                            filtered_errors.append(erro)
-                        else:
-                            logger.info(f"Filtered out duplicate proofreading error: '{traducao_errada}' == '{correcao}'")
-
-                    parsed_result["erros"] = filtered_errors
-                    filtered_count = original_count - len(filtered_errors)
-
-                    if filtered_count > 0:
-                        logger.info(f"Proofreading: Filtered {filtered_count} duplicate errors, {len(filtered_errors)} remaining")
-
-                # Always recalculate summary and classification based on actual errors
-                # This ensures consistency regardless of what AI returned
-                erros = parsed_result.get("erros", [])
-                if not parsed_result.get("resumo"):
-                    parsed_result["resumo"] = {}
-
-                resumo = parsed_result["resumo"]
-                resumo["total_erros"] = len(erros)
-                resumo["criticos"] = sum(1 for e in erros if e.get("gravidade") == "CRÍTICO")
-                resumo["altos"] = sum(1 for e in erros if e.get("gravidade") == "ALTO")
-                resumo["medios"] = sum(1 for e in erros if e.get("gravidade") == "MÉDIO")
-                resumo["baixos"] = sum(1 for e in erros if e.get("gravidade") == "BAIXO")
-
-                # Determine quality classification based on error counts
-                # REPROVADO: critical errors OR more than 2 high errors
-                # APROVADO_COM_OBSERVACOES: any high errors OR more than 3 medium errors
-                # APROVADO: only low/medium errors within acceptable limits
-                if resumo["criticos"] > 0 or resumo["altos"] > 2:
-                    resumo["qualidade"] = "REPROVADO"
-                elif resumo["altos"] > 0 or resumo["medios"] > 3:
-                    resumo["qualidade"] = "APROVADO_COM_OBSERVACOES"
-                else:
-                    resumo["qualidade"] = "APROVADO"
+        # Try to parse as JSON
+        try:
+            # Clean up the response - remove markdown code blocks if present
+            clean_result = proofreading_result.strip()
+            # Remove opening markdown code block (```json or ```)
+            import re as _re
+            clean_result = _re.sub(r'^```(?:json)?\s*', '', clean_result)
+            # Remove closing markdown code block
+            clean_result = _re.sub(r'\s*```\s*$', '', clean_result)
+            clean_result = clean_result.strip()
+
+            # If the response was truncated (max_tokens hit), try to repair the JSON
+            if stop_reason == "max_tokens":
+                logger.warning("Proofreading response was truncated (max_tokens). Attempting JSON repair.")
+                clean_result = _repair_truncated_json(clean_result)
+
+            parsed_result = json.loads(clean_result)
+
+            # Filter out errors where traducao_errada equals correcao (no actual change)
+            # This fixes a bug where AI flags items as errors when before/after are identical
+            if parsed_result.get("erros"):
+                original_count = len(parsed_result["erros"])
+                filtered_errors = []
+                for erro in parsed_result["erros"]:
+                    traducao_errada = (erro.get("traducao_errada") or "").strip()
+                    correcao = (erro.get("correcao") or "").strip()
+                    # Only keep errors where there's an actual difference
+                    if traducao_errada != correcao:
+                        filtered_errors.append(erro)
+                    else:
+                        logger.info(f"Filtered out duplicate proofreading error: '{traducao_errada}' == '{correcao}'")
+
+                parsed_result["erros"] = filtered_errors
+                filtered_count = original_count - len(filtered_errors)
+
+                if filtered_count > 0:
+                    logger.info(f"Proofreading: Filtered {filtered_count} duplicate errors, {len(filtered_errors)} remaining")
+
+            # Always recalculate summary and classification based on actual errors
+            # This ensures consistency regardless of what AI returned
+            erros = parsed_result.get("erros", [])
+            if not parsed_result.get("resumo"):
+                parsed_result["resumo"] = {}
+
+            resumo = parsed_result["resumo"]
+            resumo["total_erros"] = len(erros)
+            resumo["criticos"] = sum(1 for e in erros if e.get("gravidade") == "CRÍTICO")
+            resumo["altos"] = sum(1 for e in erros if e.get("gravidade") == "ALTO")
+            resumo["medios"] = sum(1 for e in erros if e.get("gravidade") == "MÉDIO")
+            resumo["baixos"] = sum(1 for e in erros if e.get("gravidade") == "BAIXO")
+
+            # Determine quality classification based on error counts
+            # REPROVADO: critical errors OR more than 2 high errors
+            # APROVADO_COM_OBSERVACOES: any high errors OR more than 3 medium errors
+            # APROVADO: only low/medium errors within acceptable limits
+            if resumo["criticos"] > 0 or resumo["altos"] > 2:
+                resumo["qualidade"] = "REPROVADO"
+            elif resumo["altos"] > 0 or resumo["medios"] > 3:
+                resumo["qualidade"] = "APROVADO_COM_OBSERVACOES"
+            else:
+                resumo["qualidade"] = "APROVADO"
 
-                # Sync classificacao field for frontend compatibility
-                parsed_result["classificacao"] = resumo["qualidade"]
+            # Sync classificacao field for frontend compatibility
+            parsed_result["classificacao"] = resumo["qualidade"]
 
-                logger.info(f"Proofreading result: {resumo['total_erros']} errors (C:{resumo['criticos']} A:{resumo['altos']} M:{resumo['medios']} B:{resumo['baixos']}) -> {resumo['qualidade']}")
+            logger.info(f"Proofreading result: {resumo['total_erros']} errors (C:{resumo['criticos']} A:{resumo['altos']} M:{resumo['medios']} B:{resumo['baixos']}) -> {resumo['qualidade']}")
 
-                return {
-                    "status": "success",
-                    "proofreading_result": parsed_result,
-                    "raw_response": proofreading_result
-                }
-            except json.JSONDecodeError:
-                # If JSON parsing fails, return raw response
-                return {
-                    "status": "success",
-                    "proofreading_result": None,
-                    "raw_response": proofreading_result,
-                    "parse_error": "Could not parse response as JSON"
-                }
+            return {
+                "status": "success",
+                "proofreading_result": parsed_result,
+                "raw_response": proofreading_result
+            }
+        except json.JSONDecodeError:
+            # If JSON parsing fails, return raw response
+            return {
+                "status": "success",
+                "proofreading_result": None,
+                "raw_response": proofreading_result,
+                "parse_error": "Could not parse response as JSON"
+            }
 
-    except httpx.TimeoutException:
-        raise HTTPException(status_code=504, detail="Proofreading request timed out")
     except HTTPException:
         raise
     except Exception as e:
@@ -22782,6 +23835,7 @@ async def create_translation_instruction(data: TranslationInstructionCreate, adm
     }
 
     await db.translation_instructions.insert_one(instruction)
+    await reference_cache.invalidate("translation_instructions")
 
     return {"status": "success", "instruction": instruction, "id": instruction["id"]}
 
@@ -22812,6 +23866,8 @@ async def update_translation_instruction(instruction_id: str, data: TranslationI
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Instruction not found")
 
+    await reference_cache.invalidate("translation_instructions")
+
     return {"status": "success"}
 
 
@@ -22831,6 +23887,8 @@ async def delete_translation_instruction(instruction_id: str, admin_key: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Instruction not found")
 
+    await reference_cache.invalidate("translation_instructions")
+
     return {"status": "success"}
 
 
@@ -22888,6 +23946,7 @@ async def create_glossary(data: GlossaryCreate, admin_key: str):
     }
 
     await db.glossaries.insert_one(glossary)
+    await glossary_matchers.changed()
 
     return {"status": "success", "glossary": glossary}
 
@@ -22922,6 +23981,8 @@ async def update_glossary(glossary_id: str, data: GlossaryCreate, admin_key: str
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Glossary not found")
 
+    await glossary_matchers.changed()
+
     return {"status": "success"}
 
 
@@ -22944,6 +24005,8 @@ async def delete_glossary(glossary_id: str, admin_key: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Glossary not found")
 
+    await glossary_matchers.changed()
+
     return {"status": "success"}
 
 
@@ -22964,25 +24027,19 @@ async def convert_pdf_to_images(request: PDFToImageRequest, admin_key: str):
         # Decode PDF
         pdf_bytes = base64.b64decode(request.file_base64)
 
-        # Open PDF with PyMuPDF
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        # Convert to images with 2x zoom for better quality (in the OCR process pool)
+        rendered_pages = await ocr_executor.run_cpu(render_pdf_pages, pdf_bytes, 2.0)
 
         images = []
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            # Convert to image with 2x zoom for better quality
-            pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))
-            img_bytes = pix.tobytes("png")
-            img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+        for rendered_page in rendered_pages:
+            img_base64 = base64.b64encode(rendered_page["data"]).decode('utf-8')
             images.append({
-                "page": page_num + 1,
+                "page": rendered_page["page"],
                 "data": f"data:image/png;base64,{img_base64}",
-                "width": pix.width,
-                "height": pix.height
+                "width": rendered_page["width"],
+                "height": rendered_page["height"]
             })
 
-        doc.close()
-
         return {"status": "success", "images": images, "total_pages": len(images)}
 
     except Exception as e:
@@ -23061,11 +24118,9 @@ async def get_translation_template(template_id: str, admin_key: str):
     if user_role not in ["admin", "pm"] and not is_in_house:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    template = await db.translation_templates.find_one({"id": template_id})
+    template = await reference_cache.find_one("translation_templates", {"id": template_id})
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
-    if '_id' in template:
-        del template['_id']
 
     return {"template": template}
 
@@ -23102,6 +24157,7 @@ async def create_translation_template(template_data: TemplateCreate, admin_key:
     )
 
     await db.translation_templates.insert_one(template.dict())
+    await reference_cache.invalidate("translation_templates")
 
     return {"status": "success", "template": template.dict()}
 
@@ -23146,6 +24202,7 @@ async def update_translation_template(template_id: str, update_data: TemplateUpd
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Template not found")
 
+    await reference_cache.invalidate("translation_templates")
     template = await db.translation_templates.find_one({"id": template_id})
     if '_id' in template:
         del template['_id']
@@ -23171,6 +24228,8 @@ async def delete_translation_template(template_id: str, admin_key: str):
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Template not found")
 
+    await reference_cache.invalidate("translation_templates")
+
     return {"status": "success"}
 
 @api_router.post("/admin/translation-templates/{template_id}/use")
@@ -23185,7 +24244,7 @@ async def use_translation_template(template_id: str, admin_key: str, data: dict
     if user_role not in ["admin", "pm"] and not is_in_house:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    template = await db.translation_templates.find_one({"id": template_id})
+    template = await reference_cache.find_one("translation_templates", {"id": template_id})
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
 
@@ -23201,10 +24260,478 @@ async def use_translation_template(template_id: str, admin_key: str, data: dict
         {"id": template_id},
         {"$inc": {"usage_count": 1}}
     )
+    await reference_cache.invalidate("translation_templates")
 
     return {"status": "success", "filled_content": filled_content}
 
 
+# ==================== CACHE VERSIONS ====================
+# In-memory reference data (reference cache, TM index) is kept per process. Every write bumps
+# a counter in cache_versions; readers compare it with the version they built from and rebuild
+# when another process (API replica, worker.py) changed the data.
+
+class CacheVersion:
+    """Change counter of one cached collection, shared by every process through cache_versions"""
+
+    def __init__(self, collection, key: str):
+        self.collection = collection
+        self.key = key
+
+    async def current(self) -> int:
+        state = await self.collection.find_one({"_id": self.key})
+        return (state or {}).get("version", 0)
+
+    async def bump(self) -> Optional[int]:
+        """New version after this change, or None when it could not be recorded"""
+        try:
+            state = await self.collection.find_one_and_update(
+                {"_id": self.key}, {"$inc": {"version": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            logger.warning(f"Could not bump {self.key} cache version: {e}")
+            return None
+        return state["version"]
+
+
+# ==================== REFERENCE DATA CACHE ====================
+# Small, rarely written admin collections read on every translate / proofread call (glossaries,
+# translation instructions, templates, app settings) are served from memory. A collection is
+# loaded whole on first use (warmed at startup) and dropped when it changes:
+# - writes through the admin endpoints invalidate it right away (and bump cache_versions)
+# - a MongoDB change stream invalidates it in every process when anyone writes to it; without a
+#   replica set (no change streams) each process polls cache_versions instead
+# - REFERENCE_CACHE_TTL_SECONDS bounds the staleness of edits made outside the API in polling mode
+
+REFERENCE_CACHE_COLLECTIONS = ("glossaries", "translation_instructions", "translation_templates", "app_settings")
+REFERENCE_CACHE_POLL_SECONDS = float(os.environ.get("REFERENCE_CACHE_POLL_SECONDS", "5"))
+REFERENCE_CACHE_TTL_SECONDS = float(os.environ.get("REFERENCE_CACHE_TTL_SECONDS", "300"))
+
+
+def document_matches(doc: dict, query: dict) -> bool:
+    """Evaluate the subset of MongoDB filters used on reference data ($or/$and, equality, $in, $regex)"""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(document_matches(doc, clause) for clause in condition):
+                return False
+        elif field == "$and":
+            if not all(document_matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+            value = doc.get(field)
+            for operator, operand in condition.items():
+                if operator == "$regex":
+                    flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+                    if not isinstance(value, str) or not re.search(operand, value, flags):
+                        return False
+                elif operator == "$in":
+                    if value not in operand:
+                        return False
+                elif operator == "$ne":
+                    if value == operand:
+                        return False
+                elif operator != "$options":
+                    raise ValueError(f"Unsupported operator in reference data query: {operator}")
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class ReferenceDataCache:
+    """Whole-collection in-memory snapshots of reference data, invalidated on change"""
+
+    def __init__(self, database, collections: tuple = REFERENCE_CACHE_COLLECTIONS):
+        self.database = database
+        self.collections = collections
+        self.versions = {name: CacheVersion(database.cache_versions, name) for name in collections}
+        self._snapshots: Dict[str, list] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._known_versions: Dict[str, int] = {}
+        self._locks = {name: asyncio.Lock() for name in collections}
+        self._last_poll = 0.0
+        self._listener = None
+        self.mode = "polling"
+        self.stats = {name: {"hits": 0, "misses": 0, "invalidations": 0} for name in collections}
+
+    async def _snapshot(self, name: str) -> list:
+        if self._listener is None or self.mode == "polling":
+            # No running poller (worker without listener, serverless freeze): check versions inline
+            if time.monotonic() - self._last_poll > 2 * REFERENCE_CACHE_POLL_SECONDS:
+                await self._poll_versions()
+
+        snapshot = self._snapshots.get(name)
+        if snapshot is not None and time.monotonic() - self._loaded_at[name] < REFERENCE_CACHE_TTL_SECONDS:
+            self.stats[name]["hits"] += 1
+            return snapshot
+
+        async with self._locks[name]:
+            snapshot = self._snapshots.get(name)
+            if snapshot is not None and time.monotonic() - self._loaded_at[name] < REFERENCE_CACHE_TTL_SECONDS:
+                self.stats[name]["hits"] += 1
+                return snapshot
+            self.stats[name]["misses"] += 1
+            snapshot = await self.database[name].find({}, {"_id": 0}).to_list(None)
+            self._snapshots[name] = snapshot
+            self._loaded_at[name] = time.monotonic()
+            return snapshot
+
+    async def docs(self, name: str, query: dict = None, limit: int = None) -> List[dict]:
+        """Documents of a cached collection matching query, in natural order (shallow copies)"""
+        snapshot = await self._snapshot(name)
+        matched = [dict(doc) for doc in snapshot if not query or document_matches(doc, query)]
+        return matched[:limit] if limit else matched
+
+    async def snapshot(self, name: str) -> list:
+        """The cached documents themselves (read-only); a new list object after every reload"""
+        return await self._snapshot(name)
+
+    async def find_one(self, name: str, query: dict) -> Optional[dict]:
+        for doc in await self._snapshot(name):
+            if document_matches(doc, query):
+                return dict(doc)
+        return None
+
+    def _drop(self, name: str):
+        if self._snapshots.pop(name, None) is not None:
+            self.stats[name]["invalidations"] += 1
+
+    async def invalidate(self, name: str):
+        """Called after every write to a cached collection"""
+        self._drop(name)
+        version = await self.versions[name].bump()
+        if version is not None:
+            self._known_versions[name] = version
+
+    async def _poll_versions(self):
+        self._last_poll = time.monotonic()
+        try:
+            states = await self.database.cache_versions.find({"_id": {"$in": list(self.collections)}}).to_list(None)
+        except Exception as e:
+            logger.warning(f"Reference cache version poll failed: {e}")
+            return
+        versions = {state["_id"]: state.get("version", 0) for state in states}
+        for name in self.collections:
+            version = versions.get(name, 0)
+            if name in self._known_versions and self._known_versions[name] != version:
+                self._drop(name)
+            self._known_versions[name] = version
+
+    async def _watch(self):
+        pipeline = [{"$match": {"ns.coll": {"$in": list(self.collections)}}}]
+        while True:
+            try:
+                async with self.database.watch(pipeline) as stream:
+                    self.mode = "change_stream"
+                    # Anything written before the stream opened may have been missed
+                    for name in self.collections:
+                        self._drop(name)
+                    async for change in stream:
+                        self._drop(change["ns"]["coll"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.mode != "change_stream":
+                    logger.info(f"Reference cache: change streams unavailable ({e}); polling cache_versions "
+                                f"every {REFERENCE_CACHE_POLL_SECONDS:g}s")
+                    self.mode = "polling"
+                    while True:
+                        await self._poll_versions()
+                        await asyncio.sleep(REFERENCE_CACHE_POLL_SECONDS)
+                logger.warning(f"Reference cache change stream interrupted, reopening: {e}")
+                self.mode = "reconnecting"
+                for name in self.collections:
+                    self._drop(name)
+                await asyncio.sleep(REFERENCE_CACHE_POLL_SECONDS)
+
+    async def warm(self):
+        await self._poll_versions()
+        for name in self.collections:
+            try:
+                await self._snapshot(name)
+            except Exception as e:
+                logger.warning(f"Reference cache warm-up failed for {name}: {e}")
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def metrics(self) -> dict:
+        collections = {}
+        for name, stats in self.stats.items():
+            reads = stats["hits"] + stats["misses"]
+            collections[name] = {
+                **stats,
+                "hit_ratio": round(stats["hits"] / reads, 3) if reads else None,
+                "documents": len(self._snapshots[name]) if name in self._snapshots else None,
+            }
+        return {"mode": self.mode, "collections": collections}
+
+
+reference_cache = ReferenceDataCache(db)
+
+
+# ==================== TRANSLATION MEMORY INDEX ====================
+# Fuzzy TM lookup (tm_index.TMPairIndex): prompts get the TM entries that match the segments of
+# the document being translated, with their match percentage, instead of the top-N entries of
+# the language pair. Each process keeps the index in memory, loads it on first use and updates
+# it on every TM write; cache_versions.translation_memory tells other processes (API replicas,
+# worker.py) when to reload.
+
+TM_FUZZY_MIN_MATCH = int(os.environ.get("TM_FUZZY_MIN_MATCH", "70"))
+TM_MATCHES_PER_SEGMENT = int(os.environ.get("TM_MATCHES_PER_SEGMENT", "2"))
+TM_MAX_PROMPT_MATCHES = int(os.environ.get("TM_MAX_PROMPT_MATCHES", "50"))
+TM_MAX_SEGMENTS = int(os.environ.get("TM_MAX_SEGMENTS", "1000"))
+
+TM_INDEX_PROJECTION = {"_id": 1, "id": 1, "sourceLang": 1, "targetLang": 1, "source": 1, "target": 1, "score": 1, "is_uploaded": 1}
+
+
+class TranslationMemoryIndex:
+    """Per language pair fuzzy indexes over the translation_memory collection"""
+
+    YIELD_EVERY = 50  # segments matched between event loop yields
+
+    def __init__(self, collection, version: CacheVersion):
+        self.collection = collection
+        self.version = version
+        self._pairs: Dict[tuple, TMPairIndex] = {}
+        self._entry_pairs: Dict[str, tuple] = {}
+        self._version = None
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self.stats = {"lookups": 0, "segments": 0, "matches": 0, "reloads": 0, "lookup_ms": 0.0, "load_ms": 0.0}
+
+    @staticmethod
+    def entry_id(doc: dict) -> str:
+        return doc.get("id") or str(doc.get("_id"))
+
+    async def ensure_loaded(self):
+        """(Re)load the index when another process changed the TM since it was built"""
+        version = await self.version.current()
+        if not self._stale and version == self._version:
+            return
+        async with self._lock:
+            version = await self.version.current()
+            if not self._stale and version == self._version:
+                return
+            started = time.perf_counter()
+            pairs, entry_pairs = {}, {}
+            async for doc in self.collection.find({}, TM_INDEX_PROJECTION):
+                pair = (doc.get("sourceLang") or "", doc.get("targetLang") or "")
+                entry_id = self.entry_id(doc)
+                pairs.setdefault(pair, TMPairIndex()).add(
+                    entry_id, doc.get("source") or "", doc.get("target") or "", doc.get("score") or 0, doc.get("is_uploaded")
+                )
+                entry_pairs[entry_id] = pair
+            self._pairs, self._entry_pairs = pairs, entry_pairs
+            self._version = version
+            self._stale = False
+            self.stats["reloads"] += 1
+            self.stats["load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            logger.info(f"Translation memory index loaded: {len(entry_pairs)} entries, {len(pairs)} language pairs "
+                        f"in {self.stats['load_ms']:.0f}ms")
+
+    async def warm(self):
+        try:
+            await self.ensure_loaded()
+        except Exception as e:
+            logger.warning(f"Translation memory index warm-up failed (loads on first lookup): {e}")
+
+    async def _bump_version(self):
+        """Tell other processes the TM changed; reload here too if someone else changed it meanwhile"""
+        version = await self.version.bump()
+        if version is not None and self._version is not None and version == self._version + 1:
+            self._version = version
+        else:
+            self._stale = True
+
+    def _remove(self, entry_id: str):
+        pair = self._entry_pairs.pop(entry_id, None)
+        if pair in self._pairs:
+            self._pairs[pair].remove(entry_id)
+
+    async def entries_changed(self, docs: list = None, removed_ids: list = None):
+        """Apply inserted/updated TM documents and deleted entry ids to the in-memory index"""
+        if not self._stale:
+            for entry_id in removed_ids or []:
+                self._remove(entry_id)
+            for doc in docs or []:
+                entry_id = self.entry_id(doc)
+                self._remove(entry_id)
+                pair = (doc.get("sourceLang") or "", doc.get("targetLang") or "")
+                self._pairs.setdefault(pair, TMPairIndex()).add(
+                    entry_id, doc.get("source") or "", doc.get("target") or "", doc.get("score") or 0, doc.get("is_uploaded")
+                )
+                self._entry_pairs[entry_id] = pair
+        await self._bump_version()
+
+    async def invalidate(self):
+        """Bulk changes (clear): rebuild on the next lookup"""
+        self._stale = True
+        await self._bump_version()
+
+    def _matching_pairs(self, source_lang: str, target_lang: str) -> list:
+        """Same language matching as the TM queries: exact, or containing the first 10 characters"""
+        source_key = source_lang[:10].lower()
+        target_key = target_lang[:10].lower()
+        return [
+            index for (source, target), index in self._pairs.items()
+            if (source == source_lang and target == target_lang)
+            or (source_key in source.lower() and target_key in target.lower())
+        ]
+
+    async def match_text(self, source_lang: str, target_lang: str, text: str, min_match: int = None,
+                         per_segment: int = None, max_matches: int = None) -> List[dict]:
+        """
+        TM matches for the segments of a source text, in document order:
+        [{segment, source, target, match, score, is_uploaded}], each entry at most once.
+        """
+        if not text or not text.strip():
+            return []
+        await self.ensure_loaded()
+        pairs = self._matching_pairs(source_lang, target_lang)
+        if not pairs:
+            return []
+
+        min_match = min_match or TM_FUZZY_MIN_MATCH
+        per_segment = per_segment or TM_MATCHES_PER_SEGMENT
+        max_matches = max_matches or TM_MAX_PROMPT_MATCHES
+        started = time.perf_counter()
+        segments = split_source_segments(text)[:TM_MAX_SEGMENTS]
+        matches, seen = [], set()
+        for number, segment in enumerate(segments):
+            found = []
+            for index in pairs:
+                found.extend(index.lookup(segment, limit=per_segment, min_match=min_match))
+            found.sort(key=lambda match: (-match["match"], -match["score"]))
+            for match in found[:per_segment]:
+                if match["id"] not in seen:
+                    seen.add(match["id"])
+                    matches.append({"segment": segment, **match})
+            if len(matches) >= max_matches:
+                break
+            if number % self.YIELD_EVERY == self.YIELD_EVERY - 1:
+                await asyncio.sleep(0)
+
+        self.stats["lookups"] += 1
+        self.stats["segments"] += len(segments)
+        self.stats["matches"] += len(matches)
+        self.stats["lookup_ms"] += (time.perf_counter() - started) * 1000
+        return matches[:max_matches]
+
+    def metrics(self) -> dict:
+        segments = self.stats["segments"]
+        return {
+            **{key: round(value, 1) if isinstance(value, float) else value for key, value in self.stats.items()},
+            "entries": len(self._entry_pairs),
+            "language_pairs": len(self._pairs),
+            "ms_per_segment": round(self.stats["lookup_ms"] / segments, 3) if segments else None,
+            "version": self._version,
+            "stale": self._stale,
+        }
+
+
+translation_memory_index = TranslationMemoryIndex(db.translation_memory, CacheVersion(db.cache_versions, "translation_memory"))
+
+
+def format_tm_matches(matches: List[dict], exact_heading: str, fuzzy_heading: str) -> str:
+    """Prompt lines for TM matches: exact matches (use as-is) first, then fuzzy ones with their match %"""
+    exact = [match for match in matches if match["match"] == 100]
+    fuzzy = [match for match in matches if match["match"] < 100]
+    tm_text = ""
+    if exact:
+        tm_text += f"{exact_heading}\n"
+        for match in exact:
+            tm_text += f"• {match['source']} → {match['target']}\n"
+    if fuzzy:
+        tm_text += f"\n{fuzzy_heading}\n"
+        for match in fuzzy:
+            tm_text += f"• [{match['match']}%] {match['source']} → {match['target']}\n"
+    return tm_text
+
+
+# ==================== GLOSSARY MATCHING ====================
+# Prompts get the glossary terms that occur in the source text, in document order, instead of the
+# first N terms of every matching glossary. The terms of each glossary selection are compiled once
+# into an Aho-Corasick automaton (glossary_matcher.GlossaryAutomaton) from the reference data
+# cache and kept until the cached glossaries change (create, update, delete, upload).
+
+
+class GlossaryMatchers:
+    """Compiled glossary automata per glossary query, dropped whenever the glossaries change"""
+
+    def __init__(self, cache: ReferenceDataCache):
+        self.cache = cache
+        self._automata: Dict[str, GlossaryAutomaton] = {}
+        self._source = None
+        self.stats = {"hits": 0, "builds": 0, "scans": 0, "terms_matched": 0, "build_ms": 0.0, "scan_ms": 0.0}
+
+    async def get(self, query: dict, limit: int = 50, reverse_when: dict = None) -> GlossaryAutomaton:
+        """
+        Automaton over the terms of the glossaries matching query (up to limit glossaries, in
+        natural order). Glossaries whose fields equal every item of reverse_when contribute
+        their terms target → source (bidirectional glossaries of the opposite pair).
+        """
+        glossaries = await self.cache.snapshot("glossaries")
+        if glossaries is not self._source:
+            self._automata = {}
+            self._source = glossaries
+
+        key = json.dumps([query, limit, reverse_when], sort_keys=True, default=str)
+        automaton = self._automata.get(key)
+        if automaton is not None:
+            self.stats["hits"] += 1
+            return automaton
+
+        started = time.perf_counter()
+        terms = []
+        for glossary in [glossary for glossary in glossaries if document_matches(glossary, query)][:limit]:
+            reverse = bool(reverse_when) and all(glossary.get(field) == value for field, value in reverse_when.items())
+            for term in glossary.get("terms") or []:
+                if reverse:
+                    term = {**term, "source": term.get("target"), "target": term.get("source")}
+                terms.append(term)
+        automaton = await asyncio.to_thread(GlossaryAutomaton, terms) if len(terms) > 2000 else GlossaryAutomaton(terms)
+        self._automata[key] = automaton
+        self.stats["builds"] += 1
+        self.stats["build_ms"] += (time.perf_counter() - started) * 1000
+        return automaton
+
+    def terms_in(self, automaton: GlossaryAutomaton, text: str, limit: int) -> List[dict]:
+        """
+        Terms occurring in text, in document order. Without source text (image-only documents)
+        there is nothing to scan, so the first terms of the selection are used as before.
+        """
+        if not text or not text.strip():
+            return automaton.terms[:limit]
+        started = time.perf_counter()
+        terms = automaton.find(text)[:limit]
+        self.stats["scans"] += 1
+        self.stats["terms_matched"] += len(terms)
+        self.stats["scan_ms"] += (time.perf_counter() - started) * 1000
+        return terms
+
+    async def changed(self):
+        """Called after every glossary write"""
+        await self.cache.invalidate("glossaries")
+
+    def metrics(self) -> dict:
+        return {
+            **{key: round(value, 1) if isinstance(value, float) else value for key, value in self.stats.items()},
+            "compiled": len(self._automata),
+        }
+
+
+glossary_matchers = GlossaryMatchers(reference_cache)
+
+
 # ==================== TRANSLATION MEMORY ====================
 
 class TranslationMemoryEntry(BaseModel):
@@ -23285,16 +24812,18 @@ async def add_translation_memory(data: TranslationMemoryCreate, admin_key: str):
         return {"status": "success", "added": 0}
 
     added_count = 0
+    indexed = []
     for entry in data.entries:
         # Skip empty entries
         if not entry.source.strip() or not entry.target.strip():
             continue
 
         # Check if entry already exists (avoid duplicates)
+        entry_hash = source_hash(entry.source.strip())
         existing = await db.translation_memory.find_one({
             "sourceLang": data.sourceLang,
             "targetLang": data.targetLang,
-            "source": entry.source.strip()
+            "source_hash": entry_hash
         })
 
         # Get the score (from entry or from data)
@@ -23313,6 +24842,7 @@ async def add_translation_memory(data: TranslationMemoryCreate, admin_key: str):
                         "updated_at": datetime.utcnow()
                     }}
                 )
+                indexed.append({**existing, "target": entry.target.strip(), "score": new_score})
                 added_count += 1  # Count as updated
             elif existing.get("target") != entry.target.strip() and new_score == existing_score:
                 # Same score but different translation - keep existing (first wins)
@@ -23326,15 +24856,24 @@ async def add_translation_memory(data: TranslationMemoryCreate, admin_key: str):
             "field": data.field,
             "documentType": data.documentType,
             "source": entry.source.strip(),
+            "source_hash": entry_hash,
             "target": entry.target.strip(),
             "score": new_score,
             "context": entry.context,
             "created_at": datetime.utcnow(),
             "created_by": user_info.get("user_id", "system")
         }
-        await db.translation_memory.insert_one(tm_entry)
+        try:
+            await db.translation_memory.insert_one(tm_entry)
+        except DuplicateKeyError:
+            # Added by a concurrent request since the check above (first wins)
+            continue
+        indexed.append(tm_entry)
         added_count += 1
 
+    if indexed:
+        await translation_memory_index.entries_changed(docs=indexed)
+
     return {"status": "success", "added": added_count}
 
 @api_router.delete("/admin/translation-memory/{entry_id}")
@@ -23356,6 +24895,8 @@ async def delete_translation_memory(entry_id: str, admin_key: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Entry not found")
 
+    await translation_memory_index.entries_changed(removed_ids=[entry_id])
+
     return {"status": "success"}
 
 class TranslationMemoryUpdate(BaseModel):
@@ -23382,6 +24923,7 @@ async def update_translation_memory(entry_id: str, data: TranslationMemoryUpdate
     # Build update data
     update_data = {
         "source": data.source.strip(),
+        "source_hash": source_hash(data.source.strip()),
         "target": data.target.strip(),
         "updated_at": datetime.utcnow(),
         "updated_by": user_info.get("user_id", "system")
@@ -23394,14 +24936,21 @@ async def update_translation_memory(entry_id: str, data: TranslationMemoryUpdate
     if data.targetLang:
         update_data["targetLang"] = data.targetLang
 
-    result = await db.translation_memory.update_one(
-        {"id": entry_id},
-        {"$set": update_data}
-    )
+    try:
+        updated = await db.translation_memory.find_one_and_update(
+            {"id": entry_id},
+            {"$set": update_data},
+            projection=TM_INDEX_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Another TM entry already has this source text for the language pair")
 
-    if result.matched_count == 0:
+    if not updated:
         raise HTTPException(status_code=404, detail="Entry not found")
 
+    await translation_memory_index.entries_changed(docs=[updated])
+
     return {"status": "success", "message": "TM entry updated successfully"}
 
 @api_router.delete("/admin/translation-memory")
@@ -23426,11 +24975,101 @@ async def clear_translation_memory(admin_key: str, sourceLang: Optional[str] = N
 
     result = await db.translation_memory.delete_many(query)
 
+    if result.deleted_count:
+        await translation_memory_index.invalidate()
+
     return {"status": "success", "deleted": result.deleted_count}
 
+
+# TM exports are written from the database cursor as they are sent, so memory stays flat at any TM size
+TM_EXPORT_FLUSH_BYTES = 64 * 1024
+TM_EXPORT_PROJECTION = {"_id": 0, "sourceLang": 1, "targetLang": 1, "field": 1, "source": 1, "target": 1, "created_at": 1}
+
+TMX_EXPORT_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<!DOCTYPE tmx SYSTEM "tmx14.dtd">\n'
+    '<tmx version="1.4">\n'
+    '  <header creationtool="Legacy Portal" creationtoolversion="1.0" datatype="plaintext" segtype="sentence" adminlang="en-US" srclang="*all*" o-tmf="Legacy Portal"/>\n'
+    '  <body>\n'
+)
+TMX_EXPORT_FOOTER = '  </body>\n</tmx>'
+
+
+def tmx_lang_code(language: str) -> str:
+    return xml_escape(language.replace(" ", "-").replace("(", "").replace(")", "")[:5], {'"': "&quot;"})
+
+
+def tmx_export_unit(mem: dict) -> str:
+    src_lang_code = tmx_lang_code(mem.get("sourceLang") or "pt-BR")
+    tgt_lang_code = tmx_lang_code(mem.get("targetLang") or "en-US")
+    return (
+        f'    <tu>\n'
+        f'      <tuv xml:lang="{src_lang_code}">\n'
+        f'        <seg>{xml_escape(mem.get("source") or "")}</seg>\n'
+        f'      </tuv>\n'
+        f'      <tuv xml:lang="{tgt_lang_code}">\n'
+        f'        <seg>{xml_escape(mem.get("target") or "")}</seg>\n'
+        f'      </tuv>\n'
+        f'    </tu>\n'
+    )
+
+
+async def translation_memory_export_chunks(query: dict, file_format: str, compress: bool = False):
+    """
+    CSV rows or TMX units of the matching TM entries, read from a cursor and emitted in
+    ~TM_EXPORT_FLUSH_BYTES pieces (gzip-compressed on the fly when compress is set)
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator="\n")
+
+    def take() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(data) if compressor else data
+
+    if file_format == "tmx":
+        buffer.write(TMX_EXPORT_HEADER)
+    else:
+        writer.writerow(["Source Language", "Target Language", "Field", "Source Text", "Target Text", "Created At"])
+
+    cursor = db.translation_memory.find(query, TM_EXPORT_PROJECTION).sort("created_at", -1).batch_size(1000)
+    try:
+        async for mem in cursor:
+            if file_format == "tmx":
+                buffer.write(tmx_export_unit(mem))
+            else:
+                created = mem.get("created_at", "")
+                writer.writerow([
+                    mem.get("sourceLang") or "", mem.get("targetLang") or "", mem.get("field") or "",
+                    mem.get("source") or "", mem.get("target") or "",
+                    created.isoformat() if hasattr(created, "isoformat") else str(created or "")
+                ])
+            if buffer.tell() >= TM_EXPORT_FLUSH_BYTES:
+                chunk = take()
+                if chunk:
+                    yield chunk
+    finally:
+        await cursor.close()
+
+    if file_format == "tmx":
+        buffer.write(TMX_EXPORT_FOOTER)
+    chunk = take()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
 @api_router.get("/admin/translation-memory/download")
-async def download_translation_memory(admin_key: str, format: str = "csv", sourceLang: Optional[str] = None, targetLang: Optional[str] = None):
-    """Download translation memory as CSV or TMX - Admin, PM, and in-house translators"""
+async def download_translation_memory(admin_key: str, format: str = "csv", sourceLang: Optional[str] = None,
+                                      targetLang: Optional[str] = None, gzip: bool = False):
+    """
+    Download translation memory as CSV or TMX - Admin, PM, and in-house translators
+    Streamed as an attachment straight from the database cursor (every entry, no size limit);
+    gzip=true sends a .gz file compressed on the fly
+    """
     user_info = await validate_admin_or_user_token(admin_key)
     if not user_info:
         raise HTTPException(status_code=401, detail="Invalid admin key or token")
@@ -23449,63 +25088,271 @@ async def download_translation_memory(admin_key: str, format: str = "csv", sourc
     if targetLang:
         query["targetLang"] = targetLang
 
-    memories = await db.translation_memory.find(query).sort("created_at", -1).to_list(10000)
+    file_format = "tmx" if format.lower() == "tmx" else "csv"
+    filename = f"translation_memory_{datetime.now().strftime('%Y%m%d')}.{file_format}"
+    media_type = "application/xml" if file_format == "tmx" else "text/csv; charset=utf-8"
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        translation_memory_export_chunks(query, file_format, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
-    if format.lower() == "tmx":
-        # Generate TMX (Translation Memory eXchange) format
-        tmx_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
-        tmx_content += '<!DOCTYPE tmx SYSTEM "tmx14.dtd">\n'
-        tmx_content += '<tmx version="1.4">\n'
-        tmx_content += '  <header creationtool="Legacy Portal" creationtoolversion="1.0" datatype="plaintext" segtype="sentence" adminlang="en-US" srclang="*all*" o-tmf="Legacy Portal"/>\n'
-        tmx_content += '  <body>\n'
 
-        for mem in memories:
-            src_lang_code = mem.get("sourceLang", "pt-BR").replace(" ", "-").replace("(", "").replace(")", "")[:5]
-            tgt_lang_code = mem.get("targetLang", "en-US").replace(" ", "-").replace("(", "").replace(")", "")[:5]
-            source_text = mem.get("source", "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-            target_text = mem.get("target", "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+# ==================== TM AND GLOSSARY IMPORT ====================
+# Uploaded TM and glossary files are spooled to disk and read in batches by the streaming readers
+# in tm_import.py. A TM batch costs one lookup of the entries it already has and one unordered
+# bulk_write of upserts on the unique (sourceLang, targetLang, source_hash) index, instead of a
+# find_one plus an insert or update per entry; glossary batches are appended with $push. Files
+# over TM_IMPORT_INLINE_MAX_MB are stored in GridFS and imported by a background job whose
+# progress is on GET /admin/jobs/{job_id}. Re-running an import is harmless, so a job that fails
+# halfway is simply retried.
+
+TM_IMPORT_BATCH_SIZE = int(os.environ.get("TM_IMPORT_BATCH_SIZE", "1000"))
+TM_IMPORT_INLINE_MAX_MB = float(os.environ.get("TM_IMPORT_INLINE_MAX_MB", "5"))
+GLOSSARY_SDLTM_MAX_TERMS = 5000  # a glossary keeps all its terms in one document
+
+TM_SOURCE_HASH_INDEX = "tm_pair_source_hash"
+
+
+async def ensure_translation_memory_indexes():
+    """Backfill source_hash on entries written before it existed, then index it (unique per language pair)"""
+    collection = db.translation_memory
+    operations = []
+    backfilled = 0
+    async for doc in collection.find({"source_hash": {"$exists": False}, "source": {"$type": "string", "$ne": ""}}, {"_id": 1, "source": 1}):
+        operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"source_hash": source_hash(doc["source"])}}))
+        if len(operations) >= TM_IMPORT_BATCH_SIZE:
+            await collection.bulk_write(operations, ordered=False)
+            backfilled += len(operations)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        backfilled += len(operations)
+    if backfilled:
+        logger.info(f"Translation memory: added source_hash to {backfilled} entries")
+
+    keys = [("sourceLang", 1), ("targetLang", 1), ("source_hash", 1)]
+    try:
+        await collection.create_index(keys, name=TM_SOURCE_HASH_INDEX, unique=True,
+                                      partialFilterExpression={"source_hash": {"$exists": True}})
+    except OperationFailure as e:
+        # Older data can hold the same source twice for a pair; imports still upsert one of them
+        logger.warning(f"Translation memory has duplicate sources, source_hash index is not unique: {e}")
+        await collection.create_index(keys, name=TM_SOURCE_HASH_INDEX)
+    # Newest-first listing and the streamed export walk this instead of sorting the whole TM in memory
+    await collection.create_index([("created_at", -1)])
 
-            tmx_content += f'    <tu>\n'
-            tmx_content += f'      <tuv xml:lang="{src_lang_code}">\n'
-            tmx_content += f'        <seg>{source_text}</seg>\n'
-            tmx_content += f'      </tuv>\n'
-            tmx_content += f'      <tuv xml:lang="{tgt_lang_code}">\n'
-            tmx_content += f'        <seg>{target_text}</seg>\n'
-            tmx_content += f'      </tuv>\n'
-            tmx_content += f'    </tu>\n'
 
-        tmx_content += '  </body>\n'
-        tmx_content += '</tmx>'
+async def next_import_batch(batches) -> Optional[tuple]:
+    """Parse the next batch in a worker thread (openpyxl / iterparse / csv are blocking)"""
+    return await asyncio.to_thread(next, batches, None)
 
-        return JSONResponse(content={"format": "tmx", "content": tmx_content, "filename": f"translation_memory_{datetime.now().strftime('%Y%m%d')}.tmx"})
 
-    else:
-        # Generate CSV format
-        csv_lines = ["Source Language,Target Language,Field,Source Text,Target Text,Created At"]
-        for mem in memories:
-            src_lang = mem.get("sourceLang", "").replace(",", ";")
-            tgt_lang = mem.get("targetLang", "").replace(",", ";")
-            field = mem.get("field", "").replace(",", ";")
-            source = mem.get("source", "").replace(",", ";").replace("\n", " ")
-            target = mem.get("target", "").replace(",", ";").replace("\n", " ")
-            created = mem.get("created_at", "").isoformat() if hasattr(mem.get("created_at", ""), 'isoformat') else str(mem.get("created_at", ""))
-            csv_lines.append(f'"{src_lang}","{tgt_lang}","{field}","{source}","{target}","{created}"')
+async def import_translation_memory_rows(rows, source_lang: str, target_lang: str, field: str, user_id: Optional[str],
+                                         progress=None) -> dict:
+    """
+    Upsert uploaded TM rows batch by batch: new sources are inserted, existing ones with another
+    target get the uploaded one (uploaded TM gets the highest score). A source repeated in the
+    file keeps its last target. Returns {added, updated, total_entries}.
+    """
+    collection = db.translation_memory
+    counts = {"added": 0, "updated": 0, "total_entries": 0}
+    pending = import_batches(rows, TM_IMPORT_BATCH_SIZE, keep="last")
+    while True:
+        item = await next_import_batch(pending)
+        if item is None:
+            break
+        batch, read = item
+        counts["total_entries"] += read
+        by_hash = {source_hash(row["source"]): row for row in batch}
+        pair = {"sourceLang": source_lang, "targetLang": target_lang}
 
-        csv_content = "\n".join(csv_lines)
-        return JSONResponse(content={"format": "csv", "content": csv_content, "filename": f"translation_memory_{datetime.now().strftime('%Y%m%d')}.csv"})
+        existing = {}
+        async for doc in collection.find({**pair, "source_hash": {"$in": list(by_hash)}},
+                                         {"_id": 1, "id": 1, "source_hash": 1, "target": 1}):
+            existing[doc["source_hash"]] = doc
 
+        now = datetime.utcnow()
+        operations, changed = [], []
+        for digest, row in by_hash.items():
+            current = existing.get(digest)
+            if current and current.get("target") == row["target"]:
+                continue
+            update = {"target": row["target"], "score": 100, "is_uploaded": True}
+            if current:
+                update["updated_at"] = now
+            new_id = str(uuid.uuid4())
+            operations.append(UpdateOne(
+                {**pair, "source_hash": digest},
+                {"$set": update, "$setOnInsert": {
+                    "id": new_id,
+                    "field": field,
+                    "documentType": "Uploaded TM",
+                    "source": row["source"],
+                    "context": f"Uploaded by {user_id or 'unknown'}",
+                    "created_at": now,
+                    "created_by": user_id or "system"
+                }},
+                upsert=True
+            ))
+            changed.append(({**pair, "id": TranslationMemoryIndex.entry_id(current) if current else None,
+                             "source": row["source"], **update}, new_id))
 
-@api_router.post("/admin/translation-memory/upload")
-async def upload_translation_memory(
-    admin_key: str,
-    file: UploadFile = File(...),
-    sourceLang: str = Form("Portuguese (Brazil)"),
-    targetLang: str = Form("English"),
+        if operations:
+            try:
+                result = (await collection.bulk_write(operations, ordered=False)).bulk_api_result
+            except BulkWriteError as e:
+                # Unordered: every other upsert was applied (a concurrent upload can win a race on the unique index)
+                result = e.details
+                logger.warning(f"TM import: {len(result.get('writeErrors', []))} of {len(operations)} upserts failed: "
+                               f"{result['writeErrors'][0].get('errmsg') if result.get('writeErrors') else ''}")
+            counts["added"] += result.get("nUpserted", 0)
+            counts["updated"] += result.get("nModified", 0)
+
+            # Inserted entries are indexed under the id they were created with
+            for upserted in result.get("upserted", []):
+                doc, new_id = changed[upserted["index"]]
+                doc["id"] = new_id
+            docs = [doc for doc, _ in changed if doc["id"]]
+            if len(docs) < len(changed):
+                # A source that another writer inserted meanwhile was updated under an id we do not know
+                await translation_memory_index.invalidate()
+            else:
+                await translation_memory_index.entries_changed(docs=docs)
+
+        if progress:
+            await progress(dict(counts))
+
+    return counts
+
+
+async def import_glossary_rows(rows, name: str, source_lang: str, target_lang: str, field: str, bidirectional: bool,
+                               user_id: Optional[str], progress=None) -> dict:
+    """
+    Add uploaded terms to the glossary with this name (created on the first batch when there is
+    none), skipping sources it already has (ignoring case); a source repeated in the file keeps
+    its first target. Returns {glossary_id, name, created, added_terms, total_terms, total_entries}.
+    """
+    glossary_name = name or f"Uploaded Glossary ({datetime.now().strftime('%Y-%m-%d')})"
+    glossary = await db.glossaries.find_one({"name": glossary_name}, {"_id": 0, "id": 1, "terms.source": 1})
+    existing_sources = {(term.get("source") or "").lower() for term in (glossary or {}).get("terms", [])}
+    term_count = len((glossary or {}).get("terms", []))
+    counts = {"glossary_id": glossary["id"] if glossary else None, "name": glossary_name, "created": False,
+              "added_terms": 0, "total_terms": term_count, "total_entries": 0}
+
+    pending = import_batches(rows, TM_IMPORT_BATCH_SIZE, key=lambda row: row["source"].lower(), keep="first")
+    try:
+        while True:
+            item = await next_import_batch(pending)
+            if item is None:
+                break
+            batch, read = item
+            counts["total_entries"] += read
+            terms = []
+            for row in batch:
+                if row["source"].lower() in existing_sources:
+                    continue
+                existing_sources.add(row["source"].lower())
+                term_count += 1
+                terms.append({"id": term_count, "source": row["source"], "target": row["target"], "notes": row["notes"]})
+
+            if terms and glossary is None:
+                glossary = {
+                    "id": str(uuid.uuid4()),
+                    "name": glossary_name,
+                    "sourceLang": source_lang,
+                    "targetLang": target_lang,
+                    "bidirectional": bidirectional,
+                    "language": f"{source_lang} <> {target_lang}",
+                    "field": field,
+                    "terms": terms,
+                    "is_uploaded": True,
+                    "created_at": datetime.utcnow(),
+                    "created_by": user_id or "system"
+                }
+                await db.glossaries.insert_one(glossary)
+                counts["glossary_id"] = glossary["id"]
+                counts["created"] = True
+            elif terms:
+                await db.glossaries.update_one(
+                    {"id": glossary["id"]},
+                    {"$push": {"terms": {"$each": terms}},
+                     "$set": {"is_uploaded": True, "updated_at": datetime.utcnow()}}
+                )
+            counts["added_terms"] += len(terms)
+            counts["total_terms"] = term_count
+
+            if progress:
+                await progress(dict(counts))
+    finally:
+        if counts["added_terms"]:
+            await glossary_matchers.changed()
+
+    return counts
+
+
+def file_import_response(kind: str, result: dict) -> dict:
+    """Upload endpoint response for a finished TM ("translation_memory") or glossary import"""
+    if kind == "translation_memory":
+        return {
+            "status": "success",
+            **result,
+            "message": f"Successfully processed {result['total_entries']} TM entries"
+        }
+    message = (f"Created glossary '{result['name']}' with {result['added_terms']} terms" if result["created"]
+               else f"Merged {result['added_terms']} terms into existing glossary '{result['name']}'")
+    return {"status": "success", **result, "message": message}
+
+
+async def queue_file_import(kind: str, spooled: dict, filename: str, payload: dict, user_id: Optional[str]) -> dict:
+    """Keep a large upload in GridFS and import it in a background job"""
+    file_id = await store_local_file_in_gridfs(
+        spooled["path"], filename, "application/octet-stream",
+        metadata={"purpose": f"{kind}_import", "sha256": spooled["sha256"], "uploaded_by": user_id}
+    )
+    job_id = await job_queue.enqueue(f"{kind}.import", payload={
+        **payload, "file_id": file_id, "filename": filename, "size": spooled["size"], "user_id": user_id
+    })
+    label = "TM" if kind == "translation_memory" else "glossary"
+    return {
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": f"/admin/jobs/{job_id}",
+        "message": f"Importing {filename} ({spooled['size'] / (1024 * 1024):.1f}MB) in the background; "
+                   f"the {label} updates as batches are written"
+    }
+
+
+async def download_gridfs_file_to_disk(file_id: str, suffix: str = "") -> str:
+    """Stream a GridFS file into a temp file and return its path (remove it when done)"""
+    from bson import ObjectId
+
+    fd, path = tempfile.mkstemp(prefix="import_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as destination:
+            await fs_bucket.download_to_stream(ObjectId(file_id), destination)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+@api_router.post("/admin/translation-memory/upload")
+async def upload_translation_memory(
+    admin_key: str,
+    file: UploadFile = File(...),
+    sourceLang: str = Form("Portuguese (Brazil)"),
+    targetLang: str = Form("English"),
     field: str = Form("General")
 ):
     """
-    Upload Translation Memory from CSV or TMX file
+    Upload Translation Memory from CSV, Excel, TMX or Trados TM file
     Only admin, PM, and in-house translators can upload TM
+    Large files are imported in the background (returns job_id / status_url)
     """
     user_info = await validate_admin_or_user_token(admin_key)
     if not user_info:
@@ -23518,213 +25365,33 @@ async def upload_translation_memory(
     if user_role not in ["admin", "pm"] and not is_in_house_translator and not user_info.get("is_master"):
         raise HTTPException(status_code=403, detail="Only admin, PM, or in-house translators can upload Translation Memory")
 
-    # Read file content
-    content = await file.read()
-    filename = file.filename.lower()
-
-    added_count = 0
-    updated_count = 0
-    entries = []
+    if not import_format(file.filename):
+        raise HTTPException(status_code=400, detail="Unsupported file format. Use CSV, Excel (.xlsx/.xls), TMX/XML, or Trados TM (.sdltm)")
 
+    spooled = await spool_upload_to_disk(file, max_bytes=None)
     try:
-        if filename.endswith('.tmx') or filename.endswith('.xml'):
-            # Parse TMX file
-            import xml.etree.ElementTree as ET
-            root = ET.fromstring(content.decode('utf-8'))
-
-            for tu in root.findall('.//tu'):
-                tuvs = tu.findall('tuv')
-                if len(tuvs) >= 2:
-                    source_text = ""
-                    target_text = ""
-
-                    for tuv in tuvs:
-                        lang = tuv.get('{http://www.w3.org/XML/1998/namespace}lang', '') or tuv.get('lang', '')
-                        seg = tuv.find('seg')
-                        if seg is not None and seg.text:
-                            # Determine if this is source or target based on language code
-                            lang_lower = lang.lower()
-                            if lang_lower.startswith('pt') or lang_lower.startswith('por'):
-                                source_text = seg.text.strip()
-                            elif lang_lower.startswith('en'):
-                                target_text = seg.text.strip()
-                            elif not source_text:
-                                source_text = seg.text.strip()
-                            else:
-                                target_text = seg.text.strip()
-
-                    if source_text and target_text:
-                        entries.append({
-                            "source": source_text,
-                            "target": target_text
-                        })
-
-        elif filename.endswith('.csv'):
-            # Parse CSV file
-            import csv
-            import io
-            content_str = content.decode('utf-8-sig')  # Handle BOM
-            reader = csv.reader(io.StringIO(content_str))
-            header = next(reader, None)  # Skip header row
-
-            # Try to determine column positions
-            source_col = 0
-            target_col = 1
-
-            if header:
-                header_lower = [h.lower().strip() for h in header]
-                for i, h in enumerate(header_lower):
-                    if 'source' in h or 'original' in h or 'origem' in h:
-                        source_col = i
-                    elif 'target' in h or 'translation' in h or 'destino' in h or 'tradução' in h:
-                        target_col = i
-
-            for row in reader:
-                if len(row) > max(source_col, target_col):
-                    source_text = row[source_col].strip()
-                    target_text = row[target_col].strip()
-
-                    if source_text and target_text:
-                        entries.append({
-                            "source": source_text,
-                            "target": target_text
-                        })
-
-        elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-            # Parse Excel file
-            try:
-                import openpyxl
-                import io
-
-                workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
-                sheet = workbook.active
-
-                # Try to find header row and determine columns
-                source_col = 0
-                target_col = 1
-                header_row = list(sheet.iter_rows(min_row=1, max_row=1, values_only=True))[0] if sheet.max_row > 0 else []
-
-                if header_row:
-                    header_lower = [str(h).lower().strip() if h else '' for h in header_row]
-                    for i, h in enumerate(header_lower):
-                        if 'source' in h or 'original' in h or 'origem' in h or 'português' in h:
-                            source_col = i
-                        elif 'target' in h or 'translation' in h or 'destino' in h or 'tradução' in h or 'english' in h or 'inglês' in h:
-                            target_col = i
-
-                for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip header
-                    if len(row) > max(source_col, target_col):
-                        source_text = str(row[source_col]).strip() if row[source_col] else ""
-                        target_text = str(row[target_col]).strip() if row[target_col] else ""
-
-                        if source_text and target_text and source_text != 'None' and target_text != 'None':
-                            entries.append({
-                                "source": source_text,
-                                "target": target_text
-                            })
-
-                workbook.close()
-            except ImportError:
-                raise HTTPException(status_code=400, detail="Excel support not available. Please use CSV or TMX format.")
-
-        elif filename.endswith('.sdltm'):
-            # Parse SDL Trados TM file (SQLite database)
-            try:
-                import sqlite3
-                import tempfile
-                import os
-
-                # Write content to temp file (sqlite needs file path)
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.sdltm') as tmp:
-                    tmp.write(content)
-                    tmp_path = tmp.name
-
-                try:
-                    conn = sqlite3.connect(tmp_path)
-                    cursor = conn.cursor()
-
-                    # SDL TM stores translations in translation_units table
-                    cursor.execute("""
-                        SELECT source_segment, target_segment
-                        FROM translation_units
-                        WHERE source_segment IS NOT NULL AND target_segment IS NOT NULL
-                    """)
-
-                    for row in cursor.fetchall():
-                        source_text = row[0].strip() if row[0] else ""
-                        target_text = row[1].strip() if row[1] else ""
-
-                        if source_text and target_text:
-                            entries.append({
-                                "source": source_text,
-                                "target": target_text
-                            })
-
-                    conn.close()
-                finally:
-                    os.unlink(tmp_path)
+        if spooled["size"] > TM_IMPORT_INLINE_MAX_MB * 1024 * 1024:
+            return await queue_file_import("translation_memory", spooled, file.filename, {
+                "sourceLang": sourceLang, "targetLang": targetLang, "field": field
+            }, user_info.get("user_id"))
 
-            except Exception as e:
-                logger.warning(f"Error parsing SDLTM file: {e}")
-                raise HTTPException(status_code=400, detail=f"Error parsing Trados TM file: {str(e)}")
-
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file format. Use CSV, Excel (.xlsx/.xls), TMX/XML, or Trados TM (.sdltm)")
-
-        if not entries:
+        result = await import_translation_memory_rows(
+            read_rows(spooled["path"], file.filename), sourceLang, targetLang, field, user_info.get("user_id")
+        )
+        if not result["total_entries"]:
             raise HTTPException(status_code=400, detail="No valid entries found in the file")
+        return file_import_response("translation_memory", result)
 
-        # Insert entries into database
-        for entry in entries:
-            # Check if entry already exists
-            existing = await db.translation_memory.find_one({
-                "sourceLang": sourceLang,
-                "targetLang": targetLang,
-                "source": entry["source"]
-            })
-
-            if existing:
-                # Update if target is different
-                if existing.get("target") != entry["target"]:
-                    await db.translation_memory.update_one(
-                        {"id": existing["id"]},
-                        {"$set": {
-                            "target": entry["target"],
-                            "score": 100,  # Uploaded TM gets highest priority
-                            "is_uploaded": True,
-                            "updated_at": datetime.utcnow()
-                        }}
-                    )
-                    updated_count += 1
-            else:
-                tm_entry = {
-                    "id": str(uuid.uuid4()),
-                    "sourceLang": sourceLang,
-                    "targetLang": targetLang,
-                    "field": field,
-                    "documentType": "Uploaded TM",
-                    "source": entry["source"],
-                    "target": entry["target"],
-                    "score": 100,  # Uploaded TM gets highest priority
-                    "is_uploaded": True,
-                    "context": f"Uploaded by {user_info.get('user_id', 'unknown')}",
-                    "created_at": datetime.utcnow(),
-                    "created_by": user_info.get("user_id", "system")
-                }
-                await db.translation_memory.insert_one(tm_entry)
-                added_count += 1
-
-        return {
-            "status": "success",
-            "added": added_count,
-            "updated": updated_count,
-            "total_entries": len(entries),
-            "message": f"Successfully processed {len(entries)} TM entries"
-        }
-
+    except HTTPException:
+        raise
+    except ImportFileError as e:
+        logger.warning(f"Error reading TM upload {file.filename}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error uploading TM: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+    finally:
+        discard_spooled_upload(spooled)
 
 
 @api_router.post("/admin/glossaries/upload")
@@ -23738,8 +25405,9 @@ async def upload_glossary(
     bidirectional: bool = Form(True)
 ):
     """
-    Upload Glossary from CSV or TMX file
+    Upload Glossary from CSV, Excel, TMX or Trados TM file
     Only admin, PM, and in-house translators can upload glossaries
+    Large files are imported in the background (returns job_id / status_url)
     """
     user_info = await validate_admin_or_user_token(admin_key)
     if not user_info:
@@ -23752,244 +25420,34 @@ async def upload_glossary(
     if user_role not in ["admin", "pm"] and not is_in_house_translator and not user_info.get("is_master"):
         raise HTTPException(status_code=403, detail="Only admin, PM, or in-house translators can upload glossaries")
 
-    # Read file content
-    content = await file.read()
-    filename = file.filename.lower()
-
-    terms = []
+    if not import_format(file.filename):
+        raise HTTPException(status_code=400, detail="Unsupported file format. Use CSV, Excel (.xlsx), TMX, or Trados TM (.sdltm)")
 
+    spooled = await spool_upload_to_disk(file, max_bytes=None)
     try:
-        if filename.endswith('.tmx') or filename.endswith('.xml'):
-            # Parse TMX file
-            import xml.etree.ElementTree as ET
-            root = ET.fromstring(content.decode('utf-8'))
-
-            for tu in root.findall('.//tu'):
-                tuvs = tu.findall('tuv')
-                if len(tuvs) >= 2:
-                    source_text = ""
-                    target_text = ""
-
-                    for tuv in tuvs:
-                        lang = tuv.get('{http://www.w3.org/XML/1998/namespace}lang', '') or tuv.get('lang', '')
-                        seg = tuv.find('seg')
-                        if seg is not None and seg.text:
-                            lang_lower = lang.lower()
-                            if lang_lower.startswith('pt') or lang_lower.startswith('por'):
-                                source_text = seg.text.strip()
-                            elif lang_lower.startswith('en'):
-                                target_text = seg.text.strip()
-                            elif not source_text:
-                                source_text = seg.text.strip()
-                            else:
-                                target_text = seg.text.strip()
-
-                    if source_text and target_text:
-                        terms.append({
-                            "id": len(terms) + 1,
-                            "source": source_text,
-                            "target": target_text,
-                            "notes": ""
-                        })
-
-        elif filename.endswith('.csv'):
-            # Parse CSV file
-            import csv
-            import io
-            content_str = content.decode('utf-8-sig')  # Handle BOM
-            reader = csv.reader(io.StringIO(content_str))
-            header = next(reader, None)  # Skip header row
-
-            # Try to determine column positions
-            source_col = 0
-            target_col = 1
-            notes_col = -1
-
-            if header:
-                header_lower = [h.lower().strip() for h in header]
-                for i, h in enumerate(header_lower):
-                    if 'source' in h or 'original' in h or 'origem' in h or 'term' in h:
-                        source_col = i
-                    elif 'target' in h or 'translation' in h or 'destino' in h or 'tradução' in h:
-                        target_col = i
-                    elif 'note' in h or 'comment' in h or 'observação' in h:
-                        notes_col = i
-
-            term_id = 1
-            for row in reader:
-                if len(row) > max(source_col, target_col):
-                    source_text = row[source_col].strip()
-                    target_text = row[target_col].strip()
-                    notes = row[notes_col].strip() if notes_col >= 0 and len(row) > notes_col else ""
-
-                    if source_text and target_text:
-                        terms.append({
-                            "id": term_id,
-                            "source": source_text,
-                            "target": target_text,
-                            "notes": notes
-                        })
-                        term_id += 1
-
-        elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-            # Parse Excel file
-            try:
-                import openpyxl
-                import io
-
-                workbook = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
-                sheet = workbook.active
-
-                # Try to find header row and determine columns
-                source_col = 0
-                target_col = 1
-                notes_col = -1
-                header_row = list(sheet.iter_rows(min_row=1, max_row=1, values_only=True))[0] if sheet.max_row > 0 else []
-
-                if header_row:
-                    header_lower = [str(h).lower().strip() if h else '' for h in header_row]
-                    for i, h in enumerate(header_lower):
-                        if 'source' in h or 'original' in h or 'origem' in h or 'term' in h or 'português' in h:
-                            source_col = i
-                        elif 'target' in h or 'translation' in h or 'destino' in h or 'tradução' in h or 'english' in h or 'inglês' in h:
-                            target_col = i
-                        elif 'note' in h or 'comment' in h or 'observação' in h:
-                            notes_col = i
-
-                term_id = 1
-                for row in sheet.iter_rows(min_row=2, values_only=True):  # Skip header
-                    if len(row) > max(source_col, target_col):
-                        source_text = str(row[source_col]).strip() if row[source_col] else ""
-                        target_text = str(row[target_col]).strip() if row[target_col] else ""
-                        notes = str(row[notes_col]).strip() if notes_col >= 0 and len(row) > notes_col and row[notes_col] else ""
-
-                        if source_text and target_text and source_text != 'None' and target_text != 'None':
-                            terms.append({
-                                "id": term_id,
-                                "source": source_text,
-                                "target": target_text,
-                                "notes": notes
-                            })
-                            term_id += 1
-
-                workbook.close()
-            except ImportError:
-                raise HTTPException(status_code=400, detail="Excel support not available. Please use CSV or TMX format.")
-
-        elif filename.endswith('.sdltm'):
-            # Parse SDL Trados TM file (SQLite database)
-            try:
-                import sqlite3
-                import tempfile
-                import os
-
-                # Write content to temp file (sqlite needs file path)
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.sdltm') as tmp:
-                    tmp.write(content)
-                    tmp_path = tmp.name
-
-                try:
-                    conn = sqlite3.connect(tmp_path)
-                    cursor = conn.cursor()
-
-                    # SDL TM stores translations in translation_units table
-                    cursor.execute("""
-                        SELECT source_segment, target_segment
-                        FROM translation_units
-                        WHERE source_segment IS NOT NULL AND target_segment IS NOT NULL
-                        LIMIT 5000
-                    """)
-
-                    term_id = 1
-                    for row in cursor.fetchall():
-                        source_text = row[0].strip() if row[0] else ""
-                        target_text = row[1].strip() if row[1] else ""
-
-                        if source_text and target_text:
-                            terms.append({
-                                "id": term_id,
-                                "source": source_text,
-                                "target": target_text,
-                                "notes": "from Trados TM"
-                            })
-                            term_id += 1
-
-                    conn.close()
-                finally:
-                    os.unlink(tmp_path)
-
-            except Exception as e:
-                logger.warning(f"Error parsing SDLTM file: {e}")
-                raise HTTPException(status_code=400, detail=f"Error parsing Trados TM file: {str(e)}")
-
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file format. Use CSV, Excel (.xlsx), TMX, or Trados TM (.sdltm)")
-
-        if not terms:
+        if spooled["size"] > TM_IMPORT_INLINE_MAX_MB * 1024 * 1024:
+            return await queue_file_import("glossary", spooled, file.filename, {
+                "name": name, "sourceLang": sourceLang, "targetLang": targetLang,
+                "field": field, "bidirectional": bidirectional
+            }, user_info.get("user_id"))
+
+        rows = read_rows(spooled["path"], file.filename, glossary=True,
+                         sdltm_notes="from Trados TM", sdltm_limit=GLOSSARY_SDLTM_MAX_TERMS)
+        result = await import_glossary_rows(rows, name, sourceLang, targetLang, field, bidirectional, user_info.get("user_id"))
+        if not result["total_entries"]:
             raise HTTPException(status_code=400, detail="No valid terms found in the file")
-
-        # Create or update glossary
-        glossary_name = name or f"Uploaded Glossary ({datetime.now().strftime('%Y-%m-%d')})"
-
-        # Check if glossary with same name exists
-        existing_glossary = await db.glossaries.find_one({"name": glossary_name})
-
-        if existing_glossary:
-            # Merge terms
-            existing_terms = existing_glossary.get("terms", [])
-            existing_sources = {t["source"].lower() for t in existing_terms}
-
-            for term in terms:
-                if term["source"].lower() not in existing_sources:
-                    term["id"] = len(existing_terms) + 1
-                    existing_terms.append(term)
-
-            await db.glossaries.update_one(
-                {"id": existing_glossary["id"]},
-                {"$set": {
-                    "terms": existing_terms,
-                    "is_uploaded": True,
-                    "updated_at": datetime.utcnow()
-                }}
-            )
-
-            return {
-                "status": "success",
-                "glossary_id": existing_glossary["id"],
-                "added_terms": len(terms),
-                "total_terms": len(existing_terms),
-                "message": f"Merged {len(terms)} terms into existing glossary '{glossary_name}'"
-            }
-        else:
-            # Create new glossary
-            glossary = {
-                "id": str(uuid.uuid4()),
-                "name": glossary_name,
-                "sourceLang": sourceLang,
-                "targetLang": targetLang,
-                "bidirectional": bidirectional,
-                "language": f"{sourceLang} <> {targetLang}",
-                "field": field,
-                "terms": terms,
-                "is_uploaded": True,
-                "created_at": datetime.utcnow(),
-                "created_by": user_info.get("user_id", "system")
-            }
-
-            await db.glossaries.insert_one(glossary)
-
-            return {
-                "status": "success",
-                "glossary_id": glossary["id"],
-                "added_terms": len(terms),
-                "message": f"Created glossary '{glossary_name}' with {len(terms)} terms"
-            }
+        return file_import_response("glossary", result)
 
     except HTTPException:
         raise
+    except ImportFileError as e:
+        logger.warning(f"Error reading glossary upload {file.filename}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error uploading glossary: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
+    finally:
+        discard_spooled_upload(spooled)
 
 
 # ==================== CUSTOMER MODELS ====================
@@ -26787,7 +28245,7 @@ async def get_shared_api_key(admin_key: str):
     """Get the shared Claude API key (masked for security)"""
     await validate_admin_or_user_token(admin_key)
 
-    settings = await db.app_settings.find_one({"key": "shared_claude_api_key"})
+    settings = await reference_cache.find_one("app_settings", {"key": "shared_claude_api_key"})
     if settings and settings.get("value"):
         # Return masked key for display (show only last 8 chars)
         full_key = settings["value"]
@@ -26819,6 +28277,7 @@ async def save_shared_api_key(admin_key: str, api_key: str = Body(..., embed=Tru
         },
         upsert=True
     )
+    await reference_cache.invalidate("app_settings")
 
     logger.info("Shared Claude API key updated")
     return {"status": "success", "message": "API key saved successfully"}
@@ -26829,6 +28288,7 @@ async def delete_shared_api_key(admin_key: str):
     await validate_admin_or_user_token(admin_key)
 
     await db.app_settings.delete_one({"key": "shared_claude_api_key"})
+    await reference_cache.invalidate("app_settings")
     logger.info("Shared Claude API key deleted")
     return {"status": "success", "message": "API key removed"}
 
@@ -26870,7 +28330,7 @@ async def test_api_key(admin_key: str, api_key: str = Body(..., embed=True)):
 @api_router.get("/settings/api-key/check")
 async def check_shared_api_key_available():
     """Public endpoint to check if a shared API key is configured (for translators)"""
-    settings = await db.app_settings.find_one({"key": "shared_claude_api_key"})
+    settings = await reference_cache.find_one("app_settings", {"key": "shared_claude_api_key"})
     return {"available": bool(settings and settings.get("value"))}
 
 @api_router.get("/admin/settings/api-key/diagnose")
@@ -26890,7 +28350,7 @@ async def diagnose_api_keys(admin_key: str):
         })
 
     # Source 2: Database shared key
-    settings = await db.app_settings.find_one({"key": "shared_claude_api_key"})
+    settings = await reference_cache.find_one("app_settings", {"key": "shared_claude_api_key"})
     db_key = settings.get("value") if settings else None
     if db_key:
         sources.append({
@@ -26953,7 +28413,7 @@ async def get_api_key_for_translation(token: str = None):
         if not partner:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-    settings = await db.app_settings.find_one({"key": "shared_claude_api_key"})
+    settings = await reference_cache.find_one("app_settings", {"key": "shared_claude_api_key"})
     if settings and settings.get("value"):
         return {"api_key": settings["value"]}
 
@@ -27562,103 +29022,232 @@ Se não houver erros, retorne:
     return prompt
 
 
-async def chunk_document_for_translation(original_text: str, original_images: list, max_pages: int = 25) -> list:
+# ==================== TOKEN-AWARE CHUNKING ====================
+# Documents too large for one Claude call are split by estimated tokens instead of characters or
+# page counts. Pages (source text + image) or HTML sections are the units; a unit is only split
+# when it alone exceeds the budget, and then only at block boundaries outside any <table>.
+# Consecutive units are grouped into the fewest chunks that fit the budget, with the load spread
+# evenly across them.
+
+AI_CHUNK_OUTPUT_TOKENS = int(os.environ.get("AI_CHUNK_OUTPUT_TOKENS", "13000"))  # per call; max_tokens is 16384
+AI_CHUNK_INPUT_TOKENS = int(os.environ.get("AI_CHUNK_INPUT_TOKENS", "100000"))
+AI_CHUNK_MAX_PAGES = int(os.environ.get("AI_CHUNK_MAX_PAGES", "15"))  # page images per call
+TRANSLATION_HTML_EXPANSION = 1.5  # output HTML tokens per source text token
+TRANSLATION_PAGE_OVERHEAD_TOKENS = 200  # page wrapper, styles
+TRANSLATION_IMAGE_PAGE_TOKENS = 1200  # output of a page known only from its image
+
+# "--- Page 3 ---", "--- Página 1 de 5 ---", "--- PAGE BREAK ---" on a line of their own
+PAGE_MARKER_PATTERN = re.compile(
+    r"^[ \t]*-{3,}[ \t]*(?:page|p[áa]gina)\b(?:[ \t]+(\d+))?[^\n]*?-{3,}[ \t]*$",
+    re.IGNORECASE | re.MULTILINE
+)
+PAGE_BREAK_DIV_PATTERN = re.compile(
+    r'<div[^>]*class=["\'][^"\']*page-break[^"\']*["\'][^>]*>.*?</div>', re.DOTALL | re.IGNORECASE
+)
+_HTML_SPLIT_PATTERN = re.compile(r"<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^>]*>|\n[ \t]*\n")
+_HTML_NESTING_TAGS = {"html", "body", "div", "section", "article", "header", "footer", "main", "table", "ul", "ol",
+                      "blockquote", "p", "li", "pre", "h1", "h2", "h3", "h4", "h5", "h6"}
+_HTML_BLOCK_END_TAGS = {"p", "div", "table", "ul", "ol", "section", "article", "header", "footer", "blockquote", "pre",
+                        "head", "h1", "h2", "h3", "h4", "h5", "h6"}
+
+
+def split_text_pages(text: str) -> list:
     """
-    Divide documentos grandes em chunks menores para tradução
+    [(page_number or None, page_text)] split at page marker lines; [] when the text has none.
+    Each page keeps its marker line, anything before the first marker goes with the first page,
+    and joining the page texts gives back the original text.
     """
-    chunks = []
+    markers = list(PAGE_MARKER_PATTERN.finditer(text or ""))
+    if not markers:
+        return []
+    pages = []
+    for index, marker in enumerate(markers):
+        start = 0 if index == 0 else marker.start()
+        end = markers[index + 1].start() if index + 1 < len(markers) else len(text)
+        pages.append((int(marker.group(1)) if marker.group(1) else None, text[start:end]))
+    return pages
+
+
+def align_text_pages(text: str, page_numbers: list) -> Optional[list]:
+    """Source text for each page image (by position or by page number), or None if it cannot be aligned"""
+    pages = split_text_pages(text)
+    if not pages:
+        return None
+    if len(pages) == len(page_numbers):
+        return [page_text for _, page_text in pages]
+    numbers = [number for number, _ in pages]
+    if all(numbers) and len(set(numbers)) == len(numbers) and set(numbers) <= set(page_numbers):
+        by_number = dict(pages)
+        return [by_number.get(number, "") for number in page_numbers]
+    return None
+
+
+def split_html_blocks(html: str) -> list:
+    """
+    Split HTML (or plain text) at its shallowest block boundaries: after closing block tags, <br>
+    and blank lines, never inside a <table>, <style> or <script>. Returns [html] when it has none.
+    """
+    candidates = []
+    depth = 0
+    table_depth = 0
+    raw_tag = None
+    for match in _HTML_SPLIT_PATTERN.finditer(html):
+        closing, tag = match.group(1), (match.group(2) or "").lower()
+        if raw_tag:
+            if closing and tag == raw_tag:
+                raw_tag = None
+            continue
+        if tag in ("style", "script") and not closing:
+            raw_tag = tag
+            continue
+        if tag in _HTML_NESTING_TAGS and not match.group(0).endswith("/>"):
+            depth = max(0, depth - 1) if closing else depth + 1
+        if tag == "table":
+            table_depth = max(0, table_depth - 1) if closing else table_depth + 1
+        boundary = match.group(2) is None or tag == "br" or (closing and tag in _HTML_BLOCK_END_TAGS)
+        if boundary and table_depth == 0 and 0 < match.end() < len(html):
+            candidates.append((match.end(), depth))
+    if not candidates:
+        return [html]
+    shallowest = min(candidate_depth for _, candidate_depth in candidates)
+    cuts = [position for position, candidate_depth in candidates if candidate_depth == shallowest]
+    return [html[start:end] for start, end in zip([0] + cuts, cuts + [len(html)]) if html[start:end]]
+
+
+def split_to_token_budget(text: str, max_tokens: int) -> list:
+    """Pieces of text of at most max_tokens each where block boundaries allow it (tables stay whole)"""
+    if estimate_claude_text_tokens(text) <= max_tokens:
+        return [text]
+    blocks = split_html_blocks(text)
+    if len(blocks) == 1:
+        return blocks
+    pieces = [piece for block in blocks for piece in split_to_token_budget(block, max_tokens)]
+    groups = balance_chunks([estimate_claude_text_tokens(piece) for piece in pieces], max_tokens)
+    return ["".join(pieces[start:end]) for start, end in groups]
+
+
+def _greedy_chunk_groups(weights: list, limit: int, max_items: int = None, input_weights: list = None,
+                         input_budget: int = None) -> list:
+    groups = []
+    start = 0
+    load = 0
+    input_load = 0
+    for index, weight in enumerate(weights):
+        input_weight = input_weights[index] if input_weights else 0
+        if index > start and (load + weight > limit
+                              or (max_items and index - start >= max_items)
+                              or (input_budget and input_load + input_weight > input_budget)):
+            groups.append((start, index))
+            start, load, input_load = index, 0, 0
+        load += weight
+        input_load += input_weight
+    if weights:
+        groups.append((start, len(weights)))
+    return groups
+
+
+def balance_chunks(weights: list, budget: int, max_items: int = None, input_weights: list = None,
+                   input_budget: int = None) -> list:
+    """
+    Group consecutive units into the fewest chunks whose weight fits the budget (and at most max_items
+    units / input_budget input tokens each), then lower the heaviest chunk as far as that chunk count
+    allows. A unit over the budget on its own is a chunk by itself. Returns [(start, end)] index ranges.
+    """
+    groups = []
+    run_start = 0
+    for index in range(len(weights) + 1):
+        if index < len(weights) and weights[index] <= budget:
+            continue
+        if index > run_start:
+            run = weights[run_start:index]
+            run_inputs = input_weights[run_start:index] if input_weights else None
+            count = len(_greedy_chunk_groups(run, budget, max_items, run_inputs, input_budget))
+            low, high = max(run), budget
+            while low < high:
+                middle = (low + high) // 2
+                if len(_greedy_chunk_groups(run, middle, max_items, run_inputs, input_budget)) <= count:
+                    high = middle
+                else:
+                    low = middle + 1
+            groups += [(run_start + start, run_start + end)
+                       for start, end in _greedy_chunk_groups(run, low, max_items, run_inputs, input_budget)]
+        if index < len(weights):
+            groups.append((index, index + 1))
+        run_start = index + 1
+    return groups
 
-    # Se temos imagens (páginas individuais)
-    if original_images and len(original_images) > 0:
-        total_pages = len(original_images)
-
-        if total_pages <= max_pages:
-            # Documento pequeno, não precisa dividir
-            chunks.append({
-                "chunk_id": 1,
-                "total_chunks": 1,
-                "pages": list(range(1, total_pages + 1)),
-                "images": original_images,
-                "text": original_text
-            })
-        else:
-            # Dividir em chunks
-            num_chunks = math.ceil(total_pages / max_pages)
 
-            for i in range(num_chunks):
-                start_idx = i * max_pages
-                end_idx = min((i + 1) * max_pages, total_pages)
+def estimate_translation_output_tokens(text: str) -> int:
+    """Output tokens of translating one page to HTML (a fixed estimate when only the image is known)"""
+    if not text or not text.strip():
+        return TRANSLATION_IMAGE_PAGE_TOKENS
+    return int(estimate_claude_text_tokens(text) * TRANSLATION_HTML_EXPANSION) + TRANSLATION_PAGE_OVERHEAD_TOKENS
 
-                chunk_images = original_images[start_idx:end_idx]
 
-                # Dividir texto também (se tiver separadores de página)
-                if "--- PAGE BREAK ---" in original_text or "---" in original_text:
-                    text_pages = original_text.split("---")
-                    text_pages = [p.strip() for p in text_pages if p.strip() and "PAGE BREAK" not in p]
-                    chunk_text = "\n\n--- PAGE ---\n\n".join(text_pages[start_idx:end_idx]) if len(text_pages) > start_idx else ""
-                else:
-                    chunk_text = original_text if i == 0 else ""
-
-                chunks.append({
-                    "chunk_id": i + 1,
-                    "total_chunks": num_chunks,
-                    "pages": list(range(start_idx + 1, end_idx + 1)),
-                    "images": chunk_images,
-                    "text": chunk_text,
-                    "page_range": f"{start_idx + 1}-{end_idx}"
-                })
+def plan_translation_chunks(page_images: list, text: str, max_output_tokens: int = None,
+                            max_pages: int = None, max_input_tokens: int = None) -> list:
+    """
+    Translator chunks: [{chunk_id, total_chunks, pages, images, text, page_range,
+    estimated_output_tokens, estimated_input_tokens}]. Each chunk carries the source text of exactly
+    the pages whose images it carries. Text that cannot be aligned with the images (no page markers,
+    or markers that do not match) only goes along when the document is a single chunk.
+    """
+    max_output_tokens = max_output_tokens or AI_CHUNK_OUTPUT_TOKENS
+    max_pages = max_pages or AI_CHUNK_MAX_PAGES
+    max_input_tokens = max_input_tokens or AI_CHUNK_INPUT_TOKENS
+    text = text or ""
+
+    if page_images:
+        page_numbers = [page["page"] for page in page_images]
+        page_texts = align_text_pages(text, page_numbers)
+        aligned = page_texts is not None
+        if not aligned:
+            page_texts = [""] * len(page_images)
+        units = [{"pages": [page["page"]], "images": [page], "text": page_text}
+                 for page, page_text in zip(page_images, page_texts)]
+        input_weights = [
+            estimate_claude_text_tokens(unit["text"]) + estimate_page_image_tokens(page)
+            for unit, page in zip(units, page_images)
+        ]
     else:
-        # Só texto, dividir por tamanho
-        if len(original_text) > 50000:  # ~10 páginas de texto
-            # Dividir por separadores ou tamanho
-            if "---" in original_text:
-                sections = original_text.split("---")
-                sections = [s.strip() for s in sections if s.strip()]
-
-                chunk_size = 10
-                num_chunks = math.ceil(len(sections) / chunk_size)
-
-                for i in range(num_chunks):
-                    start = i * chunk_size
-                    end = min((i + 1) * chunk_size, len(sections))
-
-                    chunks.append({
-                        "chunk_id": i + 1,
-                        "total_chunks": num_chunks,
-                        "pages": list(range(start + 1, end + 1)),
-                        "images": [],
-                        "text": "\n\n---\n\n".join(sections[start:end]),
-                        "page_range": f"{start + 1}-{end}"
-                    })
-            else:
-                # Dividir por caracteres
-                chunk_length = 40000
-                num_chunks = math.ceil(len(original_text) / chunk_length)
-
-                for i in range(num_chunks):
-                    start = i * chunk_length
-                    end = min((i + 1) * chunk_length, len(original_text))
-
-                    chunks.append({
-                        "chunk_id": i + 1,
-                        "total_chunks": num_chunks,
-                        "pages": [i + 1],
-                        "images": [],
-                        "text": original_text[start:end],
-                        "page_range": f"Part {i + 1}"
-                    })
-        else:
-            chunks.append({
-                "chunk_id": 1,
-                "total_chunks": 1,
-                "pages": [1],
-                "images": [],
-                "text": original_text
-            })
+        aligned = True
+        page_texts = [page_text for _, page_text in split_text_pages(text)] or [text]
+        # Text pages over the budget are split further (translated HTML is larger than its source)
+        piece_tokens = max(1, int((max_output_tokens - TRANSLATION_PAGE_OVERHEAD_TOKENS) / TRANSLATION_HTML_EXPANSION))
+        units = [{"pages": [number], "images": [], "text": piece}
+                 for number, page_text in enumerate(page_texts, 1)
+                 for piece in split_to_token_budget(page_text, piece_tokens)]
+        input_weights = [estimate_claude_text_tokens(unit["text"]) for unit in units]
+
+    weights = [estimate_translation_output_tokens(unit["text"]) for unit in units]
+    groups = balance_chunks(weights, max_output_tokens, max_pages if page_images else None,
+                            input_weights, max_input_tokens)
+    if not aligned and len(groups) > 1 and text.strip():
+        logger.warning("Source text has no page markers matching the page images; chunks are translated from the images only")
 
+    chunks = []
+    for chunk_index, (start, end) in enumerate(groups, 1):
+        pages = sorted({number for unit in units[start:end] for number in unit["pages"]})
+        chunks.append({
+            "chunk_id": chunk_index,
+            "total_chunks": len(groups),
+            "pages": pages,
+            "images": [image for unit in units[start:end] for image in unit["images"]],
+            "text": text if len(groups) == 1 else "".join(unit["text"] for unit in units[start:end]),
+            "page_range": f"{pages[0]}-{pages[-1]}" if len(pages) > 1 else f"{pages[0]}",
+            "estimated_output_tokens": sum(weights[start:end]),
+            "estimated_input_tokens": sum(input_weights[start:end])
+        })
     return chunks
 
 
+async def chunk_document_for_translation(original_text: str, original_images: list, max_pages: int = 25) -> list:
+    """
+    Divide documentos grandes em chunks menores para tradução (por tokens estimados; ver plan_translation_chunks)
+    """
+    return plan_translation_chunks(original_images, original_text, max_pages=max_pages)
+
+
 def compress_image_for_claude_api(img_bytes: bytes, media_type: str = "image/jpeg", max_size: int = 5 * 1024 * 1024, max_dimension: int = 7900) -> tuple:
     """
     Compress an image to stay under Claude API's 5MB size limit and 8000px dimension limit.
@@ -27671,12 +29260,18 @@ def compress_image_for_claude_api(img_bytes: bytes, media_type: str = "image/jpe
 
     Returns:
         tuple: (compressed_bytes, media_type) - always returns JPEG if compression needed
+
+    The quality / scale search is predictive (fit_image_to_budget): usually 2-4 JPEG encodes
+    instead of trying every quality and scale in turn.
     """
     try:
         # Always check pixel dimensions first, even if file size is OK
         img = Image.open(io.BytesIO(img_bytes))
         needs_resize = img.width > max_dimension or img.height > max_dimension
 
+        if not needs_resize and len(img_bytes) <= max_size:
+            return img_bytes, media_type
+
         if needs_resize:
             logger.info(f"Image dimensions {img.width}x{img.height} exceed {max_dimension}px limit, resizing...")
             # Convert to RGB if necessary (for JPEG output)
@@ -27689,61 +29284,270 @@ def compress_image_for_claude_api(img_bytes: bytes, media_type: str = "image/jpe
             img = img.resize(new_size, Image.LANCZOS)
             logger.info(f"Image resized to {new_size[0]}x{new_size[1]}")
 
-            # Save resized image
-            jpeg_buffer = io.BytesIO()
-            img.save(jpeg_buffer, format='JPEG', quality=85, optimize=True)
-            img_bytes = jpeg_buffer.getvalue()
-            media_type = "image/jpeg"
-
-            # Check if resized image is under size limit
-            if len(img_bytes) <= max_size:
-                return img_bytes, media_type
+        fitted = fit_image_to_budget(img, max_size)
+        compressed_bytes = fitted["data"]
+        if len(compressed_bytes) > max_size:
+            logger.warning(f"Could not compress image below {max_size} bytes, using smallest version ({len(compressed_bytes)} bytes)")
         else:
-            # No resize needed - check if file size is already OK
-            if len(img_bytes) <= max_size:
-                return img_bytes, media_type
+            logger.info(f"Image compressed from {len(img_bytes)} to {len(compressed_bytes)} bytes "
+                        f"(quality={fitted['quality']}, scale={fitted['scale']}, {fitted['encodes']} encodes)")
+        return compressed_bytes, "image/jpeg"
 
-            # Need to compress - load for processing
-            if img.mode in ('RGBA', 'P', 'LA'):
-                img = img.convert('RGB')
+    except Exception as e:
+        logger.error(f"Image compression failed: {e}")
+        return img_bytes, media_type
 
-        # Try progressively lower quality settings
-        quality_levels = [85, 70, 55, 40]
 
-        for quality in quality_levels:
-            jpeg_buffer = io.BytesIO()
-            img.save(jpeg_buffer, format='JPEG', quality=quality, optimize=True)
-            compressed_bytes = jpeg_buffer.getvalue()
+def compress_image_with_size(img_bytes: bytes, media_type: str = "image/jpeg", max_size: int = 5 * 1024 * 1024) -> tuple:
+    """compress_image_for_claude_api plus the output's pixel size: (bytes, media_type, width, height), sizes None if unreadable"""
+    data, final_media_type = compress_image_for_claude_api(img_bytes, media_type, max_size)
+    try:
+        width, height = Image.open(io.BytesIO(data)).size
+    except Exception:
+        width = height = None
+    return data, final_media_type, width, height
 
-            if len(compressed_bytes) <= max_size:
-                logger.info(f"Image compressed from {len(img_bytes)} to {len(compressed_bytes)} bytes (quality={quality})")
-                return compressed_bytes, "image/jpeg"
 
-        # If still too large, resize the image progressively
-        scale_factors = [0.75, 0.5, 0.35, 0.25]
-        original_size = img.size
+# ==================== CHUNK CHECKPOINTS ====================
+# One record per Claude call of a multi-call stage (a translator chunk, a Tradux OCR page or step) in
+# chunk_checkpoints: input hash, output, tokens and status. A stage that failed part-way is resumed
+# by reusing the completed chunks whose input hash still matches, so only failed, missing or edited
+# chunks are sent to Claude again. A scope's checkpoints are cleared once its stage succeeds.
 
-        for scale in scale_factors:
-            new_size = (int(original_size[0] * scale), int(original_size[1] * scale))
-            resized_img = img.resize(new_size, Image.LANCZOS)
+CHUNK_CHECKPOINT_TTL_DAYS = int(os.environ.get("CHUNK_CHECKPOINT_TTL_DAYS", "30"))
 
-            # Try quality settings again with resized image
-            for quality in [70, 50, 35]:
-                jpeg_buffer = io.BytesIO()
-                resized_img.save(jpeg_buffer, format='JPEG', quality=quality, optimize=True)
-                compressed_bytes = jpeg_buffer.getvalue()
 
-                if len(compressed_bytes) <= max_size:
-                    logger.info(f"Image resized to {new_size} and compressed to {len(compressed_bytes)} bytes (quality={quality})")
-                    return compressed_bytes, "image/jpeg"
+def claude_request_hash(*parts) -> str:
+    """Hash of a Claude request (system blocks, content, parameters) to tell if a saved output still applies"""
+    return hashlib.sha256(json.dumps(list(parts), sort_keys=True, default=str).encode("utf-8")).hexdigest()
 
-        # Last resort: return the smallest version we could make
-        logger.warning(f"Could not compress image below {max_size} bytes, using smallest version ({len(compressed_bytes)} bytes)")
-        return compressed_bytes, "image/jpeg"
 
+class ChunkCheckpoints:
+    """Per-chunk results keyed by (scope, chunk) and guarded by the hash of the chunk's input"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.stats = {"reused": 0, "stale": 0, "missing": 0, "saved": 0, "failed": 0}
+
+    async def get(self, scope: str, chunk: str, input_hash: str) -> Optional[dict]:
+        """The completed checkpoint for exactly this input, or None"""
+        try:
+            entry = await self.collection.find_one({"scope": scope, "chunk": chunk}, {"_id": 0})
+        except Exception as e:
+            logger.warning(f"Checkpoint lookup failed for {scope}/{chunk}: {e}")
+            entry = None
+        if not entry or entry.get("status") != "completed":
+            self.stats["missing"] += 1
+            return None
+        if entry.get("input_hash") != input_hash:
+            self.stats["stale"] += 1
+            return None
+        self.stats["reused"] += 1
+        return entry
+
+    async def save(self, scope: str, chunk: str, input_hash: str, output, tokens_used: int = 0, prompt_cache: dict = None):
+        await self._write(scope, chunk, {
+            "input_hash": input_hash,
+            "status": "completed",
+            "output": output,
+            "tokens_used": tokens_used,
+            "prompt_cache": prompt_cache,
+            "error": None
+        })
+        self.stats["saved"] += 1
+
+    async def fail(self, scope: str, chunk: str, input_hash: str, error: str):
+        await self._write(scope, chunk, {
+            "input_hash": input_hash,
+            "status": "failed",
+            "output": None,
+            "error": error
+        })
+        self.stats["failed"] += 1
+
+    async def _write(self, scope: str, chunk: str, fields: dict):
+        now = datetime.utcnow()
+        try:
+            await self.collection.update_one(
+                {"scope": scope, "chunk": chunk},
+                {"$set": {**fields, "updated_at": now},
+                 "$setOnInsert": {"created_at": now},
+                 "$inc": {"attempts": 1}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Checkpoint write failed for {scope}/{chunk}: {e}")
+
+    async def summary(self, scope: str) -> dict:
+        """Chunk counts by status, e.g. {"completed": 6, "failed": 1}"""
+        counts = await self.collection.aggregate([
+            {"$match": {"scope": scope}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        return {entry["_id"]: entry["count"] for entry in counts}
+
+    async def clear(self, scope: str):
+        try:
+            await self.collection.delete_many({"scope": scope})
+        except Exception as e:
+            logger.warning(f"Could not clear checkpoints of {scope}: {e}")
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("scope", 1), ("chunk", 1)], unique=True)
+        await self.collection.create_index("updated_at", expireAfterSeconds=CHUNK_CHECKPOINT_TTL_DAYS * 24 * 3600)
+
+    def metrics(self) -> dict:
+        return dict(self.stats)
+
+
+chunk_checkpoints = ChunkCheckpoints(db.chunk_checkpoints)
+
+
+def ai_translator_checkpoint_scope(pipeline_id: str) -> str:
+    return f"ai_pipeline:{pipeline_id}:ai_translator"
+
+
+async def checkpointed_claude_text(scope: str, chunk: str, api_key: str, label: str, **create_kwargs) -> str:
+    """claude_create_message for a single-text reply, reusing the checkpoint of an identical earlier request"""
+    input_hash = claude_request_hash(create_kwargs)
+    saved = await chunk_checkpoints.get(scope, chunk, input_hash)
+    if saved:
+        logger.info(f"{scope}/{chunk}: reusing checkpointed output")
+        return saved["output"]
+    try:
+        response = await claude_create_message(api_key, label, **create_kwargs)
+        text = response.content[0].text
     except Exception as e:
-        logger.error(f"Image compression failed: {e}")
-        return img_bytes, media_type
+        await chunk_checkpoints.fail(scope, chunk, input_hash, str(e))
+        raise
+    await chunk_checkpoints.save(scope, chunk, input_hash, text, claude_usage_tokens(response.usage))
+    return text
+
+
+# ==================== AI TRANSLATOR STREAMING ====================
+# Translator chunks are streamed: the partial HTML of each chunk is appended to
+# stages.ai_translator.stream.chunk_<n> every AI_STREAM_FLUSH_TOKENS tokens, so
+# GET /admin/ai-pipeline/{pipeline_id}/stream can show the translation while it is written and
+# a retry or a crash mid-chunk continues from the partial output instead of starting over.
+
+AI_STREAM_FLUSH_TOKENS = int(os.environ.get("AI_STREAM_FLUSH_TOKENS", "200"))
+AI_STREAM_POLL_SECONDS = float(os.environ.get("AI_STREAM_POLL_SECONDS", "1.0"))
+AI_STREAM_HEARTBEAT_SECONDS = 15
+
+
+class ChunkStreamBuffer:
+    """
+    Streamed output of one translator chunk, flushed to the pipeline document.
+    start(messages) returns the partial output a previous attempt left for the same input (empty
+    otherwise) and prefills it into messages; append() is the claude_create_message on_text
+    callback; restart() is its on_retry callback and moves the prefill up to the text streamed so far.
+    """
+
+    def __init__(self, pipeline_id: str, chunk_num: int, total_chunks: int, input_hash: str,
+                 flush_tokens: int = AI_STREAM_FLUSH_TOKENS):
+        self.pipeline_id = pipeline_id
+        self.chunk_num = chunk_num
+        self.total_chunks = total_chunks
+        self.input_hash = input_hash
+        self.flush_tokens = flush_tokens
+        self.field = f"stages.ai_translator.stream.chunk_{chunk_num}"
+        self.prefix = ""
+        self.text = ""
+        self.pending = ""
+        self.messages = None
+        self.restarts = 0
+        self.flushes = 0
+        # After a failed write the stored text is uncertain: the next flush rewrites it instead of appending
+        self._resync = False
+
+    async def start(self, messages: list) -> str:
+        saved = {}
+        try:
+            pipeline = await db.ai_pipelines.find_one({"id": self.pipeline_id}, {self.field: 1})
+            saved = (((pipeline or {}).get("stages") or {}).get("ai_translator") or {}).get("stream", {}).get(f"chunk_{self.chunk_num}") or {}
+        except Exception as e:
+            logger.warning(f"Could not read the stream buffer of chunk {self.chunk_num}: {e}")
+        if saved.get("input_hash") == self.input_hash and saved.get("status") != "completed":
+            # The API rejects an assistant prefill that ends in whitespace
+            self.prefix = (saved.get("text") or "").rstrip()
+        self.restarts = saved.get("restarts", -1) + 1
+        if self.prefix:
+            logger.info(f"Chunk {self.chunk_num}: resuming from {len(self.prefix)} characters of saved output")
+        self.messages = messages
+        self._prefill()
+        await self._write_all("streaming", reset=True)
+        return self.prefix
+
+    async def append(self, text: str):
+        self.text += text
+        self.pending += text
+        if estimate_claude_text_tokens(self.pending) >= self.flush_tokens:
+            await self.flush()
+
+    async def restart(self, attempt: int = None, wait: float = None, error: Exception = None):
+        """The request is retried: it continues from the text streamed so far (already sent to clients)"""
+        self.restarts += 1
+        self.prefix = self.text.rstrip()
+        self._prefill()
+        if self.prefix:
+            logger.info(f"Chunk {self.chunk_num}: retry continues from {len(self.prefix)} streamed characters")
+        await self._write_all("streaming", reset=True)
+
+    def _prefill(self):
+        """Make the prefix the assistant prefill of the request messages (the list a retry is sent with)"""
+        if self.messages[-1]["role"] == "assistant":
+            self.messages.pop()
+        if self.prefix:
+            self.messages.append({"role": "assistant", "content": self.prefix})
+
+    async def flush(self):
+        if not self.pending and not self._resync:
+            return
+        if self._resync:
+            self.pending = ""
+            await self._write_all("streaming")
+            return
+        pending, self.pending = self.pending, ""
+        try:
+            # Pipeline update so the delta is appended server-side ($literal: the text may start with "$")
+            await db.ai_pipelines.update_one(
+                {"id": self.pipeline_id},
+                [{"$set": {
+                    f"{self.field}.text": {"$concat": [{"$ifNull": [f"${self.field}.text", ""]}, {"$literal": pending}]},
+                    f"{self.field}.updated_at": "$$NOW"
+                }}]
+            )
+            self.flushes += 1
+        except Exception as e:
+            logger.warning(f"Stream flush of chunk {self.chunk_num} failed: {e}")
+            self._resync = True
+
+    async def finish(self, status: str):
+        self.pending = ""
+        await self._write_all(status)
+
+    async def _write_all(self, status: str, reset: bool = False):
+        if reset:
+            self.text = self.prefix
+            self.pending = ""
+        try:
+            await db.ai_pipelines.update_one(
+                {"id": self.pipeline_id},
+                {"$set": {self.field: {
+                    "text": self.text,
+                    "status": status,
+                    "input_hash": self.input_hash,
+                    "total_chunks": self.total_chunks,
+                    "resumed_chars": len(self.prefix),
+                    "restarts": self.restarts,
+                    "updated_at": datetime.utcnow()
+                }}}
+            )
+            self.flushes += 1
+            self._resync = False
+        except Exception as e:
+            logger.warning(f"Stream write of chunk {self.chunk_num} failed: {e}")
+            self._resync = True
 
 
 async def run_ai_translator_stage(pipeline: dict, claude_api_key: str) -> dict:
@@ -27755,8 +29559,6 @@ async def run_ai_translator_stage(pipeline: dict, claude_api_key: str) -> dict:
     - Applies document-specific formatting
     - Handles large documents by chunking (10+ pages)
     """
-    import anthropic
-
     config = pipeline["config"]
     original_text = pipeline["original_text"] or ""
 
@@ -27767,36 +29569,24 @@ async def run_ai_translator_stage(pipeline: dict, claude_api_key: str) -> dict:
     source_lang = source_lang_full.lower()[:2]
     target_lang = target_lang_full.lower()[:2]
 
-    # Always fetch all matching glossaries for the language pair
+    # Always match all glossaries of the language pair; the terms that occur in the document are
+    # injected in document order (ALL glossaries created by users are treated as priority)
     try:
-        glossaries = await db.glossaries.find({
+        glossary_automaton = await glossary_matchers.get({
             "$or": [
                 {"source_language": source_lang, "target_language": target_lang},
                 {"language_pair": f"{source_lang}-{target_lang}"},
                 {"sourceLang": source_lang_full, "targetLang": target_lang_full},
                 {"sourceLang": {"$regex": source_lang, "$options": "i"}, "targetLang": {"$regex": target_lang, "$options": "i"}}
             ]
-        }).to_list(50)
-
-        # Collect all terms from all matching glossaries
-        # ALL glossaries created by users are treated as priority
-        all_terms = []
-
-        for glossary in glossaries:
-            if glossary and glossary.get("terms"):
-                for term in glossary["terms"]:
-                    if term.get("source") and term.get("target"):
-                        term_entry = {"source": term["source"], "target": term["target"]}
-                        all_terms.append(term_entry)
+        }, limit=50)
+        all_terms = glossary_matchers.terms_in(glossary_automaton, original_text, 200)  # Allow up to 200 terms
 
         # Build glossary text - ALL glossaries are treated as priority/mandatory
         if all_terms:
             glossary_text = "🔹 MANDATORY GLOSSARY TERMS (USE EXACTLY):\n"
-            seen_sources = set()
-            for t in all_terms[:200]:  # Allow up to 200 terms
-                if t["source"].lower() not in seen_sources:
-                    glossary_text += f"• {t['source']} → {t['target']}\n"
-                    seen_sources.add(t["source"].lower())
+            for t in all_terms:
+                glossary_text += f"• {t['source']} → {t['target']}\n"
 
             glossary_terms = f"""
 ═══════════════════════════════════════════════════════════════════
@@ -27811,33 +29601,18 @@ DO NOT translate these terms differently under any circumstances.
     except Exception as e:
         logger.warning(f"Error fetching glossaries for translation: {e}")
 
-    # Get Translation Memory entries (prioritize uploaded TM with score=100)
+    # Get Translation Memory matches for the segments of this document (document order, so every
+    # chunk of the document shares the same cached prompt prefix)
     tm_terms = ""
     try:
-        # Fetch TM entries sorted by score (highest first) - uploaded TM has score=100
-        tm_entries = await db.translation_memory.find({
-            "$or": [
-                {"sourceLang": source_lang_full, "targetLang": target_lang_full},
-                {"sourceLang": {"$regex": source_lang_full[:10], "$options": "i"},
-                 "targetLang": {"$regex": target_lang_full[:10], "$options": "i"}}
-            ]
-        }).sort("score", -1).to_list(100)
-
-        if tm_entries:
-            # Separate uploaded TM (priority) from auto-generated TM
-            uploaded_tm = [tm for tm in tm_entries if tm.get("is_uploaded") or tm.get("score", 0) == 100]
-            auto_tm = [tm for tm in tm_entries if not tm.get("is_uploaded") and tm.get("score", 0) != 100]
+        tm_matches = await translation_memory_index.match_text(source_lang_full, target_lang_full, original_text)
 
-            tm_text = ""
-            if uploaded_tm:
-                tm_text += "🔹 PRIORITY TERMS (from uploaded TM - USE EXACTLY):\n"
-                for tm in uploaded_tm[:50]:
-                    tm_text += f"• {tm['source']} → {tm['target']}\n"
-
-            if auto_tm and len(uploaded_tm) < 50:
-                tm_text += "\n🔸 APPROVED TRANSLATIONS (from high-quality translations):\n"
-                for tm in auto_tm[:50 - len(uploaded_tm)]:
-                    tm_text += f"• {tm['source']} → {tm['target']} (score: {tm.get('score', 0)}%)\n"
+        if tm_matches:
+            tm_text = format_tm_matches(
+                tm_matches,
+                "🔹 EXACT MATCHES (USE EXACTLY):",
+                "🔸 FUZZY MATCHES ([match %] - reuse, adapting only what differs):"
+            )
 
             if tm_text:
                 tm_terms = f"""
@@ -27850,14 +29625,10 @@ Reference these approved translations when translating similar content:
     except Exception as e:
         logger.warning(f"Error fetching TM for translation: {e}")
 
-    # Get specialized prompt - combine glossary and TM terms
-    combined_terms = glossary_terms + tm_terms
-    system_prompt = get_ai_translator_prompt(config, combined_terms)
-
     # Add custom instructions if provided
     custom_instructions = config.get("custom_instructions", "") or ""
     if custom_instructions:
-        system_prompt += f"""
+        custom_instructions = f"""
 
 ═══════════════════════════════════════════════════════════════════
                     CUSTOM INSTRUCTIONS
@@ -27865,10 +29636,17 @@ Reference these approved translations when translating similar content:
 {custom_instructions}
 """
 
-    try:
-        client = anthropic.Anthropic(api_key=claude_api_key)
+    # Specialized prompt as a cacheable prefix: the base instructions are shared by every document with
+    # the same languages, type and settings; glossary + TM terms and custom instructions follow.
+    # Only the page images and chunk text in the user message change between requests.
+    system_prompt = claude_cached_system(
+        get_ai_translator_prompt(config),
+        glossary_terms + tm_terms,
+        custom_instructions
+    )
 
-        # Extract all pages from PDF if present
+    try:
+        # Extract all pages from PDF if present (rendered + compressed pages come from the page render cache)
         all_page_images = []
         total_pages = 1
 
@@ -27883,160 +29661,109 @@ Reference these approved translations when translating similar content:
                 if 'pdf' in header.lower():
                     try:
                         pdf_bytes = base64.b64decode(raw_data)
-                        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-                        total_pages = doc.page_count
+                        all_page_images = await page_render_cache.get_pdf_pages(pdf_bytes)
+                        total_pages = len(all_page_images)
                         logger.info(f"PDF has {total_pages} pages")
-
-                        for page_num in range(total_pages):
-                            page = doc[page_num]
-                            # Use higher resolution for better OCR
-                            pix = page.get_pixmap(matrix=fitz.Matrix(2.0, 2.0))
-                            img_bytes = pix.tobytes("jpeg")
-
-                            # Compress image if needed to stay under Claude's 5MB limit
-                            compressed_bytes, final_media_type = compress_image_for_claude_api(
-                                img_bytes, "image/jpeg"
-                            )
-
-                            page_base64 = base64.b64encode(compressed_bytes).decode('utf-8')
-                            all_page_images.append({
-                                "page": page_num + 1,
-                                "data": page_base64,
-                                "media_type": final_media_type
-                            })
-                        doc.close()
                     except Exception as e:
                         logger.error(f"PDF extraction failed: {e}")
                         # Fallback to single image - still try to compress
                         try:
-                            img_bytes = base64.b64decode(raw_data)
-                            compressed_bytes, final_media_type = compress_image_for_claude_api(
-                                img_bytes, "image/jpeg"
-                            )
-                            compressed_base64 = base64.b64encode(compressed_bytes).decode('utf-8')
+                            all_page_images = [await page_render_cache.get_image(base64.b64decode(raw_data), "image/jpeg")]
                         except Exception as compress_err:
                             logger.warning(f"Fallback compression failed: {compress_err}")
-                            compressed_base64 = raw_data
-                            final_media_type = "image/jpeg"
-
-                        all_page_images.append({
-                            "page": 1,
-                            "data": compressed_base64,
-                            "media_type": final_media_type
-                        })
+                            all_page_images = [{"page": 1, "data": raw_data, "media_type": "image/jpeg"}]
                 else:
                     # Single image (not PDF)
                     media_type = "image/png" if 'png' in header.lower() else "image/jpeg"
 
                     # Decode and compress if needed to stay under Claude's 5MB limit
                     try:
-                        img_bytes = base64.b64decode(raw_data)
-                        compressed_bytes, final_media_type = compress_image_for_claude_api(
-                            img_bytes, media_type
-                        )
-                        compressed_base64 = base64.b64encode(compressed_bytes).decode('utf-8')
+                        all_page_images = [await page_render_cache.get_image(base64.b64decode(raw_data), media_type)]
                     except Exception as e:
                         logger.warning(f"Image compression failed, using original: {e}")
-                        compressed_base64 = raw_data
-                        final_media_type = media_type
-
-                    all_page_images.append({
-                        "page": 1,
-                        "data": compressed_base64,
-                        "media_type": final_media_type
-                    })
+                        all_page_images = [{"page": 1, "data": raw_data, "media_type": media_type}]
             elif image_data:
                 # Raw base64 without header - decode and compress if needed
                 try:
-                    img_bytes = base64.b64decode(image_data)
-                    compressed_bytes, final_media_type = compress_image_for_claude_api(
-                        img_bytes, "image/jpeg"
-                    )
-                    compressed_base64 = base64.b64encode(compressed_bytes).decode('utf-8')
+                    all_page_images = [await page_render_cache.get_image(base64.b64decode(image_data), "image/jpeg")]
                 except Exception as e:
                     logger.warning(f"Image compression failed, using original: {e}")
-                    compressed_base64 = image_data
-                    final_media_type = "image/jpeg"
-
-                all_page_images.append({
-                    "page": 1,
-                    "data": compressed_base64,
-                    "media_type": final_media_type
-                })
+                    all_page_images = [{"page": 1, "data": image_data, "media_type": "image/jpeg"}]
 
-        # Determine chunk size based on number of pages
-        # Claude can handle ~10-15 images at once reliably
-        MAX_PAGES_PER_CHUNK = 10
+        # Chunks are planned by estimated tokens per page (text + image), never more than
+        # AI_CHUNK_MAX_PAGES images, each with the source text of exactly its own pages
         total_pages = len(all_page_images) if all_page_images else 1
+        chunks = plan_translation_chunks(all_page_images, original_text)
+        num_chunks = len(chunks)
 
         # If small document, process in single call
-        if total_pages <= MAX_PAGES_PER_CHUNK:
+        if num_chunks == 1:
             return await translate_single_chunk(
-                client, config, system_prompt, all_page_images, original_text, 1, 1
+                claude_api_key, config, system_prompt, all_page_images, original_text, 1, 1,
+                pipeline_id=pipeline["id"]
             )
 
         # Large document - process in chunks
-        logger.info(f"Large document detected: {total_pages} pages. Processing in chunks of {MAX_PAGES_PER_CHUNK}")
-
-        all_translations = []
-        total_tokens = 0
-        num_chunks = math.ceil(total_pages / MAX_PAGES_PER_CHUNK)
-
-        # Split text by page breaks if available
-        text_chunks = []
-        if original_text and ("--- PAGE" in original_text or "---" in original_text):
-            text_parts = [p.strip() for p in original_text.split("---") if p.strip() and "PAGE" not in p.upper()]
-            for i in range(num_chunks):
-                start = i * MAX_PAGES_PER_CHUNK
-                end = min((i + 1) * MAX_PAGES_PER_CHUNK, len(text_parts))
-                text_chunks.append("\n\n".join(text_parts[start:end]) if start < len(text_parts) else "")
-        else:
-            text_chunks = [original_text if i == 0 else "" for i in range(num_chunks)]
-
-        # Process each chunk
-        for chunk_idx in range(num_chunks):
-            start_page = chunk_idx * MAX_PAGES_PER_CHUNK
-            end_page = min((chunk_idx + 1) * MAX_PAGES_PER_CHUNK, total_pages)
-            chunk_images = all_page_images[start_page:end_page]
-            chunk_text = text_chunks[chunk_idx] if chunk_idx < len(text_chunks) else ""
+        logger.info(f"Large document detected: {total_pages} pages. Processing in {num_chunks} token-balanced chunks")
+
+        def chunk_job(chunk: dict):
+            logger.info(f"Queueing chunk {chunk['chunk_id']}/{num_chunks}: pages {chunk['page_range']} "
+                        f"(~{chunk['estimated_output_tokens']} output tokens)")
+            return translate_single_chunk(
+                claude_api_key, config, system_prompt, chunk["images"], chunk["text"],
+                chunk["chunk_id"], num_chunks, pipeline_id=pipeline["id"]
+            )
 
-            logger.info(f"Processing chunk {chunk_idx + 1}/{num_chunks}: pages {start_page + 1}-{end_page}")
+        failure = {}
 
+        async def chunk_finished(chunk_idx: int, chunk_result: dict, done_count: int):
+            # The other chunks keep running so their translations are checkpointed for the retry
+            if not chunk_result["success"]:
+                failure.setdefault("error", f"Chunk {chunk_idx + 1} failed: {chunk_result.get('error', 'Unknown error')}")
+                return
             # Update pipeline status in database
             await db.ai_pipelines.update_one(
                 {"id": pipeline["id"]},
                 {"$set": {
-                    "stages.ai_translator.notes": f"Traduzindo chunk {chunk_idx + 1} de {num_chunks} (páginas {start_page + 1}-{end_page})..."
+                    "stages.ai_translator.notes": f"Traduzindo: {done_count} de {num_chunks} chunks concluídos..."
                 }}
             )
 
-            chunk_result = await translate_single_chunk(
-                client, config, system_prompt, chunk_images, chunk_text,
-                chunk_idx + 1, num_chunks
-            )
+        # The first chunk goes alone and writes the cached system prompt; the others are sent once
+        # it is done, so they read the prompt cache instead of each paying for the same cache write.
+        # They are then dispatched together and the per-key rate limiter paces them to the real quota.
+        first_result = await chunk_job(chunks[0])
+        await chunk_finished(0, first_result, 1)
 
-            if not chunk_result["success"]:
-                return {
-                    "success": False,
-                    "error": f"Chunk {chunk_idx + 1} failed: {chunk_result.get('error', 'Unknown error')}",
-                    "result": None
-                }
+        async def rest_finished(chunk_idx: int, chunk_result: dict, done_count: int):
+            return await chunk_finished(chunk_idx + 1, chunk_result, done_count + 1)
 
-            all_translations.append(chunk_result["result"])
-            total_tokens += chunk_result.get("tokens_used", 0)
+        chunk_results = [first_result] + await run_chunks_in_order(
+            [chunk_job(chunk) for chunk in chunks[1:]], on_result=rest_finished
+        )
 
-            # Rate limiting: wait between chunks to avoid API rate limits
-            if chunk_idx < num_chunks - 1:
-                await asyncio.sleep(45)  # Wait 45 seconds between chunks (8K tokens/min limit)
+        if failure:
+            return {
+                "success": False,
+                "error": failure["error"],
+                "result": None
+            }
+
+        # Reassemble in page order, whatever order the chunks finished in
+        all_translations = [chunk_result["result"] for chunk_result in chunk_results]
+        total_tokens = sum(chunk_result.get("tokens_used", 0) for chunk_result in chunk_results)
 
         # Combine all chunk translations
         combined_translation = combine_chunk_translations(all_translations, total_pages)
+        reused_chunks = sum(1 for chunk_result in chunk_results if chunk_result.get("from_checkpoint"))
+        resumed_note = f" {reused_chunks} chunks reused from checkpoints." if reused_chunks else ""
 
         return {
             "success": True,
             "result": combined_translation,
             "tokens_used": total_tokens,
-            "notes": f"Translation completed. {total_pages} pages processed in {num_chunks} chunks. Language: {config['source_language']} → {config['target_language']}."
+            "prompt_cache": merge_prompt_cache_usage(*(chunk_result.get("prompt_cache") for chunk_result in chunk_results)),
+            "notes": f"Translation completed. {total_pages} pages processed in {num_chunks} chunks.{resumed_note} Language: {config['source_language']} → {config['target_language']}."
         }
 
     except Exception as e:
@@ -28048,8 +29775,15 @@ Reference these approved translations when translating similar content:
         }
 
 
-async def translate_single_chunk(client, config: dict, system_prompt: str, page_images: list, text: str, chunk_num: int, total_chunks: int) -> dict:
-    """Translate a single chunk of pages"""
+async def translate_single_chunk(claude_api_key: str, config: dict, system_prompt: list, page_images: list, text: str, chunk_num: int, total_chunks: int,
+                                 pipeline_id: str = None) -> dict:
+    """
+    Translate a single chunk of pages (system_prompt: cached system blocks from claude_cached_system).
+    With pipeline_id the completion is streamed into the pipeline's ChunkStreamBuffer, continuing
+    from the partial output an interrupted attempt left for the same input, and checkpointed:
+    a chunk already translated from the same input is returned from its checkpoint.
+    """
+    stream_buffer = None
     try:
         message_content = []
 
@@ -28065,7 +29799,12 @@ async def translate_single_chunk(client, config: dict, system_prompt: str, page_
             })
 
         # Prepare text prompt
-        page_range = f"pages {page_images[0]['page']}-{page_images[-1]['page']}" if len(page_images) > 1 else f"page {page_images[0]['page']}"
+        if not page_images:
+            page_range = f"part {chunk_num} of the text"
+        elif len(page_images) > 1:
+            page_range = f"pages {page_images[0]['page']}-{page_images[-1]['page']}"
+        else:
+            page_range = f"page {page_images[0]['page']}"
         chunk_info = f" (Chunk {chunk_num}/{total_chunks}: {page_range})" if total_chunks > 1 else ""
 
         if text and text.strip():
@@ -28092,49 +29831,87 @@ Do NOT add "PAGE 1", "Page X of Y", or any page number labels/headers - start di
             "text": text_prompt
         })
 
-        # Retry logic for rate limits
-        import anthropic
+        messages = [{"role": "user", "content": message_content}]
+        stream_kwargs = {}
+        if pipeline_id:
+            input_hash = claude_request_hash(system_prompt, message_content)
+            checkpoint_scope = ai_translator_checkpoint_scope(pipeline_id)
+            stream_buffer = ChunkStreamBuffer(pipeline_id, chunk_num, total_chunks, input_hash)
+            checkpoint = await chunk_checkpoints.get(checkpoint_scope, f"chunk_{chunk_num}", input_hash)
+            if checkpoint:
+                logger.info(f"Translator chunk {chunk_num}/{total_chunks}: reusing checkpointed translation")
+                stream_buffer.text = checkpoint["output"]
+                await stream_buffer.finish("completed")
+                return {
+                    "success": True,
+                    "result": checkpoint["output"],
+                    "tokens_used": checkpoint.get("tokens_used", 0),
+                    "prompt_cache": checkpoint.get("prompt_cache"),
+                    "from_checkpoint": True
+                }
+            # Prefills the saved partial output so the model continues where the last attempt stopped
+            await stream_buffer.start(messages)
+            stream_kwargs = {"on_text": stream_buffer.append, "on_retry": stream_buffer.restart}
+
+        # Rate limits and overloads are retried (and paced per API key) by claude_create_message
         max_retries = 3
-        response = None
-        for attempt in range(max_retries):
-            try:
-                response = client.messages.create(
-                    model="claude-sonnet-4-5-20250929",
-                    max_tokens=16384,  # Increased for multi-page documents
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": message_content}]
-                )
-                break  # Success
-            except anthropic.RateLimitError:
-                if attempt < max_retries - 1:
-                    wait_time = 60 * (attempt + 1)
-                    logger.warning(f"Translator chunk {chunk_num} rate limit, waiting {wait_time}s before retry {attempt + 2}/{max_retries}")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.error(f"Translator chunk {chunk_num} rate limit exceeded after {max_retries} retries")
-                    return {
-                        "success": False,
-                        "error": "API rate limit exceeded after multiple retries",
-                        "result": None
-                    }
+        text_tokens = estimate_claude_text_tokens(text)
+        try:
+            response = await claude_create_message(
+                claude_api_key, "translator",
+                output_tokens=min(16384, max(text_tokens * 2, len(page_images) * 2000)),
+                max_attempts=max_retries,
+                model="claude-sonnet-4-5-20250929",
+                max_tokens=16384,  # Increased for multi-page documents
+                system=system_prompt,
+                messages=messages,
+                **stream_kwargs
+            )
+        except anthropic.RateLimitError:
+            logger.error(f"Translator chunk {chunk_num} rate limit exceeded after {max_retries} retries")
+            if stream_buffer:
+                await stream_buffer.finish("failed")
+                await chunk_checkpoints.fail(checkpoint_scope, f"chunk_{chunk_num}", input_hash, "rate limit exceeded")
+            return {
+                "success": False,
+                "error": "API rate limit exceeded after multiple retries",
+                "result": None
+            }
 
         # Safety check for empty response
         if not response or not response.content or len(response.content) == 0:
             logger.warning(f"Chunk {chunk_num} translation returned empty response")
+            if stream_buffer:
+                await stream_buffer.finish("failed")
+                await chunk_checkpoints.fail(checkpoint_scope, f"chunk_{chunk_num}", input_hash, "empty response")
             return {
                 "success": False,
                 "error": "API returned empty response (possible rate limit)",
                 "result": None
             }
 
+        # The reply continues the prefill the last attempt was sent with
+        result = (stream_buffer.prefix if stream_buffer else "") + response.content[0].text
+        tokens_used = claude_usage_tokens(response.usage)
+        prompt_cache = claude_prompt_cache_usage(response.usage)
+        if stream_buffer:
+            stream_buffer.text = result
+            await stream_buffer.finish("completed")
+            await chunk_checkpoints.save(checkpoint_scope, f"chunk_{chunk_num}", input_hash, result, tokens_used, prompt_cache)
+
         return {
             "success": True,
-            "result": response.content[0].text,
-            "tokens_used": response.usage.input_tokens + response.usage.output_tokens
+            "result": result,
+            "tokens_used": tokens_used,
+            "prompt_cache": prompt_cache
         }
 
     except Exception as e:
         logger.error(f"Chunk translation failed: {str(e)}")
+        if stream_buffer:
+            # Keep what was streamed so the retry continues from it
+            await stream_buffer.finish("failed")
+            await chunk_checkpoints.fail(checkpoint_scope, f"chunk_{chunk_num}", input_hash, str(e))
         return {
             "success": False,
             "error": str(e),
@@ -28218,101 +29995,44 @@ def combine_chunk_translations(translations: list, total_pages: int) -> str:
     return combined_html
 
 
-def split_html_into_chunks(html_content: str, max_chunk_size: int = 50000) -> list:
-    """Split HTML content into chunks by page-break divs or by size"""
-    import re
-
-    # Try to split by page-break divs first
-    page_break_pattern = r'<div[^>]*class="[^"]*page-break[^"]*"[^>]*>.*?</div>'
-
-    # Find all page break positions
-    breaks = list(re.finditer(page_break_pattern, html_content, re.DOTALL | re.IGNORECASE))
-
-    if breaks:
-        # Split by page breaks
-        chunks = []
-        last_end = 0
-        current_chunk = ""
-
-        for match in breaks:
-            section = html_content[last_end:match.end()]
-
-            # If adding this section would make chunk too large, save current and start new
-            if len(current_chunk) + len(section) > max_chunk_size and current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = section
-            else:
-                current_chunk += section
-
-            last_end = match.end()
-
-        # Add remaining content
-        remaining = html_content[last_end:]
-        if remaining.strip():
-            if len(current_chunk) + len(remaining) > max_chunk_size and current_chunk:
-                chunks.append(current_chunk)
-                chunks.append(remaining)
-            else:
-                current_chunk += remaining
-                chunks.append(current_chunk)
-        elif current_chunk:
-            chunks.append(current_chunk)
-
-        return chunks if chunks else [html_content]
-
-    # Fallback: split by size at paragraph boundaries
-    if len(html_content) <= max_chunk_size:
-        return [html_content]
-
-    chunks = []
-    current_pos = 0
-
-    while current_pos < len(html_content):
-        end_pos = min(current_pos + max_chunk_size, len(html_content))
-
-        # Try to find a good break point (end of paragraph or div)
-        if end_pos < len(html_content):
-            # Look for </div> or </p> near the end
-            search_start = max(current_pos, end_pos - 1000)
-            search_text = html_content[search_start:end_pos]
-
-            for pattern in ['</div>', '</p>', '</table>', '<br']:
-                last_break = search_text.rfind(pattern)
-                if last_break != -1:
-                    end_pos = search_start + last_break + len(pattern)
-                    break
-
-        chunks.append(html_content[current_pos:end_pos])
-        current_pos = end_pos
-
-    return chunks
+def split_html_into_chunks(html_content: str, max_tokens: int = None) -> list:
+    """
+    Split HTML into chunks of about max_tokens (estimated) for the layout / proofreader stages.
+    Page sections (each ending with its page-break div) stay whole unless one alone is over the
+    budget; those are split at block boundaries, never inside a <table>. Joining the chunks gives
+    back the original HTML.
+    """
+    max_tokens = max_tokens or AI_CHUNK_OUTPUT_TOKENS
+    cuts = [match.end() for match in PAGE_BREAK_DIV_PATTERN.finditer(html_content) if match.end() < len(html_content)]
+    sections = [html_content[start:end] for start, end in zip([0] + cuts, cuts + [len(html_content)])]
+    units = [piece for section in sections for piece in split_to_token_budget(section, max_tokens)]
+    groups = balance_chunks([estimate_claude_text_tokens(unit) for unit in units], max_tokens)
+    return ["".join(units[start:end]) for start, end in groups] or [html_content]
 
 
 async def process_layout_chunk(chunk: str, chunk_num: int, total_chunks: int,
                                 config: dict, claude_api_key: str) -> dict:
     """Process a single chunk through layout optimization"""
-    import anthropic
-
     page_format = config.get("page_format", "letter")
     page_size = "US Letter (8.5\" × 11\")" if page_format == "letter" else "A4 (210mm × 297mm)"
 
     system_prompt = get_ai_layout_prompt(config)
 
     try:
-        client = anthropic.Anthropic(api_key=claude_api_key)
-
-        # Retry logic for rate limits
-        max_retries = 3
-        response = None
-        for attempt in range(max_retries):
-            try:
-                response = client.messages.create(
-                    model="claude-sonnet-4-5-20250929",
-                    max_tokens=16384,
-                    system=system_prompt,
-                    messages=[{
-                        "role": "user",
-                        "content": f"""Optimize the layout of this document section (chunk {chunk_num}/{total_chunks}) for professional printing:
+        # Rate limits and overloads are retried (and paced per API key) by claude_create_message
+        chunk_tokens = estimate_claude_text_tokens(chunk)
+        try:
+            response = await claude_create_message(
+                claude_api_key, "layout",
+                input_tokens=estimate_claude_text_tokens(system_prompt) + chunk_tokens,
+                output_tokens=min(16384, chunk_tokens),
+                max_attempts=3,
+                model="claude-sonnet-4-5-20250929",
+                max_tokens=16384,
+                system=claude_cached_system(system_prompt),
+                messages=[{
+                    "role": "user",
+                    "content": f"""Optimize the layout of this document section (chunk {chunk_num}/{total_chunks}) for professional printing:
 
 {chunk}
 
@@ -28320,17 +30040,11 @@ TARGET: {page_size}
 TASK: Optimize CSS, fix page breaks, ensure print-ready output.
 IMPORTANT: Return ONLY the optimized HTML content. Preserve all structure.
 OUTPUT: Complete corrected HTML section."""
-                    }]
-                )
-                break  # Success
-            except anthropic.RateLimitError:
-                if attempt < max_retries - 1:
-                    wait_time = 60 * (attempt + 1)
-                    logger.warning(f"Layout chunk {chunk_num} rate limit, waiting {wait_time}s")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.warning(f"Layout chunk {chunk_num} rate limit exceeded, using original")
-                    return {"success": True, "result": chunk, "tokens_used": 0, "changes": []}
+                }]
+            )
+        except anthropic.RateLimitError:
+            logger.warning(f"Layout chunk {chunk_num} rate limit exceeded, using original")
+            return {"success": True, "result": chunk, "tokens_used": 0, "changes": []}
 
         if not response:
             return {"success": True, "result": chunk, "tokens_used": 0, "changes": []}
@@ -28346,7 +30060,8 @@ OUTPUT: Complete corrected HTML section."""
             }
 
         result = response.content[0].text
-        tokens_used = response.usage.input_tokens + response.usage.output_tokens
+        tokens_used = claude_usage_tokens(response.usage)
+        prompt_cache = claude_prompt_cache_usage(response.usage)
 
         # Extract changes if present
         changes = []
@@ -28363,6 +30078,7 @@ OUTPUT: Complete corrected HTML section."""
             "success": True,
             "result": result,
             "tokens_used": tokens_used,
+            "prompt_cache": prompt_cache,
             "changes": changes
         }
 
@@ -28469,8 +30185,6 @@ async def run_ai_layout_stage(pipeline: dict, previous_translation: str, claude_
     - Maintains original document appearance
     - Processes large documents in chunks
     """
-    import anthropic
-
     config = pipeline["config"]
     page_format = config.get("page_format", "letter")
     page_size = "US Letter (8.5\" × 11\")" if page_format == "letter" else "A4 (210mm × 297mm)"
@@ -28485,35 +30199,26 @@ async def run_ai_layout_stage(pipeline: dict, previous_translation: str, claude_
         }
 
     translation_size = len(previous_translation)
-    logger.info(f"AI Layout stage: Processing translation of {translation_size} characters")
-
-    # Threshold for chunking (50KB per chunk)
-    MAX_CHUNK_SIZE = 50000
+    translation_tokens = estimate_claude_text_tokens(previous_translation)
+    logger.info(f"AI Layout stage: Processing translation of {translation_size} characters (~{translation_tokens} tokens)")
 
-    # If document is large, use chunking
-    if translation_size > MAX_CHUNK_SIZE:
+    # The stage returns the whole HTML, so chunk when it would not fit in one reply
+    if translation_tokens > AI_CHUNK_OUTPUT_TOKENS:
         logger.info(f"AI Layout stage: Large document detected, using chunking")
 
-        chunks = split_html_into_chunks(previous_translation, MAX_CHUNK_SIZE)
+        chunks = split_html_into_chunks(previous_translation)
         total_chunks = len(chunks)
         logger.info(f"AI Layout stage: Split into {total_chunks} chunks")
 
-        processed_chunks = []
-        total_tokens = 0
-        all_changes = []
+        # Chunks run concurrently, paced by the API key's rate limiter; results stay in document order
+        results = await run_chunks_in_order([
+            process_layout_chunk(chunk, i, total_chunks, config, claude_api_key)
+            for i, chunk in enumerate(chunks, 1)
+        ])
 
-        for i, chunk in enumerate(chunks, 1):
-            logger.info(f"AI Layout stage: Processing chunk {i}/{total_chunks} ({len(chunk)} chars)")
-
-            result = await process_layout_chunk(chunk, i, total_chunks, config, claude_api_key)
-
-            processed_chunks.append(result["result"])
-            total_tokens += result.get("tokens_used", 0)
-            all_changes.extend(result.get("changes", []))
-
-            # Rate limiting: wait between chunks to avoid API rate limits
-            if i < total_chunks:
-                await asyncio.sleep(45)  # Wait 45 seconds between chunks (8K tokens/min limit)
+        processed_chunks = [result["result"] for result in results]
+        total_tokens = sum(result.get("tokens_used", 0) for result in results)
+        all_changes = [change for result in results for change in result.get("changes", [])]
 
         # Combine all chunks
         final_result = combine_layout_chunks(processed_chunks, config)
@@ -28522,6 +30227,7 @@ async def run_ai_layout_stage(pipeline: dict, previous_translation: str, claude_
             "success": True,
             "result": final_result,
             "tokens_used": total_tokens,
+            "prompt_cache": merge_prompt_cache_usage(*(result.get("prompt_cache") for result in results)),
             "changes_made": all_changes,
             "notes": f"Layout optimized for {page_size}. Processed {total_chunks} chunks. {len(all_changes)} adjustments made."
         }
@@ -28530,8 +30236,6 @@ async def run_ai_layout_stage(pipeline: dict, previous_translation: str, claude_
     system_prompt = get_ai_layout_prompt(config)
 
     try:
-        client = anthropic.Anthropic(api_key=claude_api_key)
-
         message_content = []
 
         # Add original image for visual comparison if available
@@ -28564,32 +30268,26 @@ TASK: Optimize CSS, fix page breaks, ensure print-ready output.
 OUTPUT: Complete corrected HTML document."""
         })
 
-        # Retry logic for rate limits
+        # Rate limits and overloads are retried (and paced per API key) by claude_create_message
         max_retries = 3
-        response = None
-        for attempt in range(max_retries):
-            try:
-                response = client.messages.create(
-                    model="claude-sonnet-4-5-20250929",
-                    max_tokens=16384,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": message_content}]
-                )
-                break  # Success, exit retry loop
-            except anthropic.RateLimitError as rate_error:
-                if attempt < max_retries - 1:
-                    wait_time = 60 * (attempt + 1)  # 60s, 120s, 180s
-                    logger.warning(f"AI Layout rate limit hit, waiting {wait_time}s before retry {attempt + 2}/{max_retries}")
-                    await asyncio.sleep(wait_time)
-                else:
-                    logger.warning(f"AI Layout rate limit exceeded after {max_retries} retries, skipping layout stage")
-                    return {
-                        "success": True,
-                        "result": previous_translation,
-                        "tokens_used": 0,
-                        "changes_made": [],
-                        "notes": "Layout skipped due to API rate limit. Translation preserved."
-                    }
+        try:
+            response = await claude_create_message(
+                claude_api_key, "layout",
+                max_attempts=max_retries,
+                model="claude-sonnet-4-5-20250929",
+                max_tokens=16384,
+                system=claude_cached_system(system_prompt),
+                messages=[{"role": "user", "content": message_content}]
+            )
+        except anthropic.RateLimitError:
+            logger.warning(f"AI Layout rate limit exceeded after {max_retries} retries, skipping layout stage")
+            return {
+                "success": True,
+                "result": previous_translation,
+                "tokens_used": 0,
+                "changes_made": [],
+                "notes": "Layout skipped due to API rate limit. Translation preserved."
+            }
 
         if not response:
             return {
@@ -28601,7 +30299,8 @@ OUTPUT: Complete corrected HTML document."""
             }
 
         result = response.content[0].text
-        tokens_used = response.usage.input_tokens + response.usage.output_tokens
+        tokens_used = claude_usage_tokens(response.usage)
+        prompt_cache = claude_prompt_cache_usage(response.usage)
 
         # Validate that we got a proper result
         if not result or len(result) < 100:
@@ -28610,6 +30309,7 @@ OUTPUT: Complete corrected HTML document."""
                 "success": True,
                 "result": previous_translation,  # Fall back to original translation
                 "tokens_used": tokens_used,
+                "prompt_cache": prompt_cache,
                 "changes_made": [],
                 "notes": "Layout stage returned incomplete result, using original translation."
             }
@@ -28629,6 +30329,7 @@ OUTPUT: Complete corrected HTML document."""
             "success": True,
             "result": result,
             "tokens_used": tokens_used,
+            "prompt_cache": prompt_cache,
             "changes_made": changes,
             "notes": f"Layout optimized for {page_size}. {len(changes)} adjustments made."
         }
@@ -28658,27 +30359,26 @@ OUTPUT: Complete corrected HTML document."""
 async def process_proofreader_chunk(chunk: str, chunk_num: int, total_chunks: int,
                                      config: dict, claude_api_key: str) -> dict:
     """Process a single chunk through proofreading - CRITICAL, will retry many times"""
-    import anthropic
-
     target_language = config["target_language"]
     document_type = config["document_type"]
     system_prompt = get_ai_proofreader_prompt(config)
 
     try:
-        client = anthropic.Anthropic(api_key=claude_api_key)
-
-        # PROOFREADER IS CRITICAL - retry up to 10 times
+        # PROOFREADER IS CRITICAL - retry up to 10 times (claude_create_message paces every chunk on this key after a 429)
         max_retries = 10
-        response = None
-        for attempt in range(max_retries):
-            try:
-                response = client.messages.create(
-                    model="claude-sonnet-4-5-20250929",
-                    max_tokens=16384,
-                    system=system_prompt,
-                    messages=[{
-                        "role": "user",
-                        "content": f"""Proofread this section (chunk {chunk_num}/{total_chunks}) of a translated {document_type} document:
+        chunk_tokens = estimate_claude_text_tokens(chunk)
+        try:
+            response = await claude_create_message(
+                claude_api_key, "proofreader",
+                input_tokens=estimate_claude_text_tokens(system_prompt) + chunk_tokens,
+                output_tokens=min(16384, chunk_tokens),
+                max_attempts=max_retries,
+                model="claude-sonnet-4-5-20250929",
+                max_tokens=16384,
+                system=claude_cached_system(system_prompt),
+                messages=[{
+                    "role": "user",
+                    "content": f"""Proofread this section (chunk {chunk_num}/{total_chunks}) of a translated {document_type} document:
 
 {chunk}
 
@@ -28686,15 +30386,9 @@ TASK: Verify terminology, consistency, and natural language flow for {target_lan
 TARGET: United States official use (if English)
 IMPORTANT: Return ONLY the proofread HTML content. Preserve all structure.
 OUTPUT: Complete corrected HTML section."""
-                    }]
-                )
-                break  # Success
-            except anthropic.RateLimitError:
-                wait_time = 90 * (attempt + 1)  # 90s, 180s, 270s...
-                logger.warning(f"Proofreader chunk {chunk_num} rate limit, waiting {wait_time}s (attempt {attempt + 2}/{max_retries})")
-                await asyncio.sleep(wait_time)
-
-        if not response:
+                }]
+            )
+        except anthropic.RateLimitError:
             # Even after all retries, return original to not block pipeline
             logger.error(f"Proofreader chunk {chunk_num} failed after {max_retries} attempts")
             return {"success": True, "result": chunk, "tokens_used": 0, "corrections": []}
@@ -28710,7 +30404,8 @@ OUTPUT: Complete corrected HTML section."""
             }
 
         result = response.content[0].text
-        tokens_used = response.usage.input_tokens + response.usage.output_tokens
+        tokens_used = claude_usage_tokens(response.usage)
+        prompt_cache = claude_prompt_cache_usage(response.usage)
 
         # Extract corrections if present
         corrections = []
@@ -28728,6 +30423,7 @@ OUTPUT: Complete corrected HTML section."""
             "success": True,
             "result": result,
             "tokens_used": tokens_used,
+            "prompt_cache": prompt_cache,
             "corrections": corrections
         }
 
@@ -28751,8 +30447,6 @@ async def run_ai_proofreader_stage(pipeline: dict, previous_translation: str, cl
     - Ensures natural language flow
     - Processes large documents in chunks
     """
-    import anthropic
-
     config = pipeline["config"]
     target_language = config["target_language"]
     document_type = config["document_type"]
@@ -28780,35 +30474,32 @@ async def run_ai_proofreader_stage(pipeline: dict, previous_translation: str, cl
         }
 
     translation_size = len(previous_translation)
-    logger.info(f"AI Proofreader stage: Processing translation of {translation_size} characters")
-
-    # Threshold for chunking (50KB per chunk)
-    MAX_CHUNK_SIZE = 50000
+    translation_tokens = estimate_claude_text_tokens(previous_translation)
+    logger.info(f"AI Proofreader stage: Processing translation of {translation_size} characters (~{translation_tokens} tokens)")
 
-    # If document is large, use chunking
-    if translation_size > MAX_CHUNK_SIZE:
+    # The stage returns the whole HTML, so chunk when it would not fit in one reply
+    if translation_tokens > AI_CHUNK_OUTPUT_TOKENS:
         logger.info(f"AI Proofreader stage: Large document detected, using chunking")
 
-        chunks = split_html_into_chunks(previous_translation, MAX_CHUNK_SIZE)
+        chunks = split_html_into_chunks(previous_translation)
         total_chunks = len(chunks)
         logger.info(f"AI Proofreader stage: Split into {total_chunks} chunks")
 
-        processed_chunks = []
-        total_tokens = 0
-        all_corrections = []
-
-        for i, chunk in enumerate(chunks, 1):
-            logger.info(f"AI Proofreader stage: Processing chunk {i}/{total_chunks} ({len(chunk)} chars)")
-
-            result = await process_proofreader_chunk(chunk, i, total_chunks, config, claude_api_key)
+        async def chunk_finished(index: int, result: dict, done_count: int):
+            await db.ai_pipelines.update_one(
+                {"id": pipeline["id"]},
+                {"$set": {"stages.ai_proofreader.notes": f"Revisando: {done_count} de {total_chunks} chunks concluídos..."}}
+            )
 
-            processed_chunks.append(result["result"])
-            total_tokens += result.get("tokens_used", 0)
-            all_corrections.extend(result.get("corrections", []))
+        # Chunks run concurrently, paced by the API key's rate limiter; results stay in document order
+        results = await run_chunks_in_order([
+            process_proofreader_chunk(chunk, i, total_chunks, config, claude_api_key)
+            for i, chunk in enumerate(chunks, 1)
+        ], on_result=chunk_finished)
 
-            # Rate limiting: wait between chunks to avoid API rate limits
-            if i < total_chunks:
-                await asyncio.sleep(45)  # Wait 45 seconds between chunks (8K tokens/min limit)
+        processed_chunks = [result["result"] for result in results]
+        total_tokens = sum(result.get("tokens_used", 0) for result in results)
+        all_corrections = [correction for result in results for correction in result.get("corrections", [])]
 
         # Combine all chunks using the same function as layout
         final_result = combine_layout_chunks(processed_chunks, config)
@@ -28817,6 +30508,7 @@ async def run_ai_proofreader_stage(pipeline: dict, previous_translation: str, cl
             "success": True,
             "result": final_result,
             "tokens_used": total_tokens,
+            "prompt_cache": merge_prompt_cache_usage(*(result.get("prompt_cache") for result in results)),
             "changes_made": all_corrections,
             "notes": f"Proofreading completed for {target_language}. Processed {total_chunks} chunks. {len(all_corrections)} corrections made.",
             "quality_score": "good"
@@ -28826,44 +30518,39 @@ async def run_ai_proofreader_stage(pipeline: dict, previous_translation: str, cl
     system_prompt = get_ai_proofreader_prompt(config)
 
     try:
-        client = anthropic.Anthropic(api_key=claude_api_key)
-
-        # PROOFREADER IS CRITICAL - retry up to 10 times with longer waits
+        # PROOFREADER IS CRITICAL - retry up to 10 times
         max_retries = 10
-        response = None
-        for attempt in range(max_retries):
-            try:
-                response = client.messages.create(
-                    model="claude-sonnet-4-5-20250929",
-                    max_tokens=16384,
-                    system=system_prompt,
-                    messages=[{
-                        "role": "user",
-                        "content": f"""Proofread this translated {document_type} document:
 
-{previous_translation}
-
-TASK: Verify terminology, consistency, and natural language flow for {target_language}.
-TARGET: United States official use (if English)
-OUTPUT: Complete corrected HTML with proofreading report."""
-                    }]
-                )
-                break  # Success
-            except anthropic.RateLimitError as rate_error:
-                # Wait longer for proofreader - it's critical
-                wait_time = 90 * (attempt + 1)  # 90s, 180s, 270s, etc.
-                logger.warning(f"AI Proofreader rate limit hit, waiting {wait_time}s before retry {attempt + 2}/{max_retries}")
-
-                # Update pipeline status to show waiting
+        async def show_rate_limit_wait(attempt, wait_time, error):
+            # Update pipeline status to show waiting
+            if isinstance(error, anthropic.RateLimitError):
                 await db.ai_pipelines.update_one(
                     {"id": pipeline["id"]},
                     {"$set": {
-                        "stages.ai_proofreader.notes": f"Rate limit - aguardando {wait_time}s (tentativa {attempt + 2}/{max_retries})..."
+                        "stages.ai_proofreader.notes": f"Rate limit - aguardando {wait_time:.0f}s (tentativa {attempt + 1}/{max_retries})..."
                     }}
                 )
-                await asyncio.sleep(wait_time)
 
-        if not response:
+        try:
+            response = await claude_create_message(
+                claude_api_key, "proofreader",
+                max_attempts=max_retries,
+                on_retry=show_rate_limit_wait,
+                model="claude-sonnet-4-5-20250929",
+                max_tokens=16384,
+                system=claude_cached_system(system_prompt),
+                messages=[{
+                    "role": "user",
+                    "content": f"""Proofread this translated {document_type} document:
+
+{previous_translation}
+
+TASK: Verify terminology, consistency, and natural language flow for {target_language}.
+TARGET: United States official use (if English)
+OUTPUT: Complete corrected HTML with proofreading report."""
+                }]
+            )
+        except anthropic.RateLimitError:
             # Last resort - fail the stage so user can retry manually
             return {
                 "success": False,
@@ -28872,7 +30559,8 @@ OUTPUT: Complete corrected HTML with proofreading report."""
             }
 
         result = response.content[0].text
-        tokens_used = response.usage.input_tokens + response.usage.output_tokens
+        tokens_used = claude_usage_tokens(response.usage)
+        prompt_cache = claude_prompt_cache_usage(response.usage)
 
         # Validate result
         if not result or len(result) < 100:
@@ -28881,6 +30569,7 @@ OUTPUT: Complete corrected HTML with proofreading report."""
                 "success": True,
                 "result": previous_translation,
                 "tokens_used": tokens_used,
+                "prompt_cache": prompt_cache,
                 "changes_made": [],
                 "notes": "Proofreading returned incomplete result, using previous translation.",
                 "quality_score": "not_evaluated"
@@ -28891,53 +30580,441 @@ OUTPUT: Complete corrected HTML with proofreading report."""
         notes = ""
         quality_score = "good"
 
-        if "<!-- PROOFREADING_REPORT:" in result:
-            try:
-                report_match = re.search(r'<!-- PROOFREADING_REPORT: (\{.*?\}) -->', result, re.DOTALL)
-                if report_match:
-                    report = json.loads(report_match.group(1))
-                    corrections = report.get("corrections", [])
-                    quality_score = report.get("quality_score", "good")
-                    terminology_notes = report.get("terminology_notes", [])
-                    notes = f"Quality: {quality_score}. Found {report.get('issues_found', 0)} issues. " + "; ".join(terminology_notes[:3])
-                    result = re.sub(r'<!-- PROOFREADING_REPORT: \{.*?\} -->', '', result, flags=re.DOTALL).strip()
-            except Exception as parse_error:
-                logger.warning(f"Failed to parse proofreading report: {parse_error}")
+        if "<!-- PROOFREADING_REPORT:" in result:
+            try:
+                report_match = re.search(r'<!-- PROOFREADING_REPORT: (\{.*?\}) -->', result, re.DOTALL)
+                if report_match:
+                    report = json.loads(report_match.group(1))
+                    corrections = report.get("corrections", [])
+                    quality_score = report.get("quality_score", "good")
+                    terminology_notes = report.get("terminology_notes", [])
+                    notes = f"Quality: {quality_score}. Found {report.get('issues_found', 0)} issues. " + "; ".join(terminology_notes[:3])
+                    result = re.sub(r'<!-- PROOFREADING_REPORT: \{.*?\} -->', '', result, flags=re.DOTALL).strip()
+            except Exception as parse_error:
+                logger.warning(f"Failed to parse proofreading report: {parse_error}")
+
+        return {
+            "success": True,
+            "result": result,
+            "tokens_used": tokens_used,
+            "prompt_cache": prompt_cache,
+            "changes_made": corrections,
+            "notes": notes or f"Proofreading completed for {target_language}.",
+            "quality_score": quality_score
+        }
+
+    except anthropic.APIError as api_error:
+        error_msg = parse_claude_api_error(str(api_error), getattr(api_error, 'status_code', None))
+        logger.error(f"AI Proofreader stage API error: {error_msg}")
+        return {
+            "success": True,  # Mark as success to continue pipeline
+            "result": previous_translation,
+            "tokens_used": 0,
+            "changes_made": [],
+            "notes": f"Revisão pulada por erro na API: {error_msg}",
+            "quality_score": "not_evaluated"
+        }
+
+    except Exception as e:
+        error_msg = str(e) if str(e) else "Unknown error occurred"
+        logger.error(f"AI Proofreader stage failed: {error_msg}")
+        return {
+            "success": False,
+            "error": error_msg,
+            "result": previous_translation
+        }
+
+
+# ==================== AI PIPELINE JOBS ====================
+# Pipeline stages run as durable background jobs (job_queue.py): the HTTP endpoints only create
+# the pipeline and enqueue the first stage; progress is read from ai_pipelines.
+
+job_queue = JobQueue(db.jobs)
+job_worker: Optional[JobWorker] = None
+# Serverless functions are frozen after the response, so Vercel deployments need `python worker.py` elsewhere
+JOB_WORKER_IN_PROCESS = os.environ.get("JOB_WORKER_IN_PROCESS", "0" if os.environ.get("VERCEL") else "1") == "1"
+
+AI_PIPELINE_STAGE_JOBS = {
+    "ai_translator": "ai_pipeline.translate",
+    "ai_proofreader": "ai_pipeline.proofread"
+}
+
+
+# Orders often carry several separate scans (IDs, certificates); they are extracted concurrently
+DOCUMENT_OCR_MAX_CONCURRENCY = int(os.environ.get("DOCUMENT_OCR_MAX_CONCURRENCY", "4"))
+
+
+def order_document_media_type(filename: str) -> str:
+    filename = (filename or "").lower()
+    if filename.endswith(".pdf"):
+        return "application/pdf"
+    if filename.endswith(".jpg") or filename.endswith(".jpeg"):
+        return "image/jpeg"
+    return "image/png"  # Default
+
+
+async def extract_order_documents(order_docs: list, extract_document, limit: int = None) -> list:
+    """
+    Extract the text of an order's documents, at most `limit` (DOCUMENT_OCR_MAX_CONCURRENCY) at a time.
+    extract_document(file_bytes, file_data, media_type, file_hash) returns the text of one document;
+    documents with identical bytes are extracted once. Returns [{"doc", "file_data", "text", "error"}]
+    in document order, skipping documents without stored data.
+    """
+    extractions = {}
+
+    async def extract(doc: dict):
+        stored_data = await get_document_file_base64(doc)
+        if not stored_data:
+            return None
+        # Clean base64 data
+        file_data = stored_data.split(",")[1] if "," in stored_data else stored_data
+        media_type = order_document_media_type(doc.get("filename"))
+        try:
+            file_bytes = base64.b64decode(file_data)
+            file_hash = file_sha256(file_bytes)
+            if (file_hash, media_type) not in extractions:
+                extractions[(file_hash, media_type)] = asyncio.ensure_future(
+                    extract_document(file_bytes, file_data, media_type, file_hash)
+                )
+            text = await asyncio.shield(extractions[(file_hash, media_type)])
+            return {"doc": doc, "file_data": file_data, "text": text, "error": None}
+        except Exception as e:
+            return {"doc": doc, "file_data": file_data, "text": None, "error": e}
+
+    results = await run_chunks_in_order([extract(doc) for doc in order_docs], limit=limit or DOCUMENT_OCR_MAX_CONCURRENCY)
+    return [result for result in results if result]
+
+
+async def extract_quick_start_text(order_docs: list, claude_api_key: str) -> dict:
+    """Extract text from an order's original documents with Claude Vision (quick_start pipelines)"""
+
+    ocr_prompt = build_claude_ocr_prompt()
+
+    async def extract_document(file_bytes: bytes, file_data: str, media_type: str, file_hash: str) -> str:
+        # Reuse a previous extraction of the same bytes (also by workspace OCR or a Tradux run)
+        cache_params = claude_ocr_cache_params(ocr_prompt)
+        cached = await ocr_result_cache.get(file_hash, "claude", cache_params)
+        if cached is not None:
+            return cached["text"]
+
+        response = await claude_create_message(
+            claude_api_key, "quick_start",
+            model=CLAUDE_OCR_MODEL,
+            max_tokens=8000,
+            messages=[{
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": media_type,
+                            "data": file_data
+                        }
+                    },
+                    {
+                        "type": "text",
+                        "text": ocr_prompt
+                    }
+                ]
+            }]
+        )
+        await ocr_result_cache.put(file_hash, "claude", cache_params, {"text": response.content[0].text})
+        return response.content[0].text
+
+    extracted_texts = []
+    original_document_base64 = None
+    original_filename = None
+    for extraction in await extract_order_documents(order_docs, extract_document):
+        doc = extraction["doc"]
+        if extraction["error"] is not None:
+            e = extraction["error"]
+            friendly_msg = parse_claude_api_error(str(e), getattr(e, 'status_code', None))
+            logger.error(f"Error extracting text from document: {friendly_msg}")
+            extracted_texts.append(f"--- Document: {doc.get('filename', 'unknown')} ---\n[Erro ao extrair texto: {friendly_msg}]")
+            continue
+
+        extracted_texts.append(f"--- Document: {doc.get('filename', 'unknown')} ---\n{extraction['text']}")
+        if not original_document_base64:
+            original_document_base64 = extraction["file_data"]
+            original_filename = doc.get("filename")
+
+    return {
+        "text": "\n\n".join(extracted_texts),
+        "original_document_base64": original_document_base64,
+        "original_filename": original_filename
+    }
+
+
+async def load_job_pipeline(job: dict) -> dict:
+    pipeline = await db.ai_pipelines.find_one({"id": job["payload"]["pipeline_id"]})
+    if not pipeline:
+        raise JobFailed(f"Pipeline {job['payload']['pipeline_id']} not found")
+    return pipeline
+
+
+async def enqueue_ai_pipeline_stage(pipeline_id: str, stage_name: str, claude_api_key: str,
+                                    continue_pipeline: bool = True, job_type: str = None) -> str:
+    """Queue one pipeline stage and point the pipeline at the job"""
+    job_id = await job_queue.enqueue(
+        job_type or AI_PIPELINE_STAGE_JOBS[stage_name],
+        payload={"pipeline_id": pipeline_id, "stage": stage_name, "continue_pipeline": continue_pipeline},
+        secrets={"claude_api_key": claude_api_key}
+    )
+    await db.ai_pipelines.update_one(
+        {"id": pipeline_id},
+        {"$set": {"job_id": job_id, "updated_at": datetime.utcnow()}}
+    )
+    return job_id
+
+
+async def fail_ai_pipeline_stage(job: dict, error: str):
+    """on_failure hook: the stage's last attempt failed"""
+    stage_name = job["payload"].get("stage", "ai_translator")
+    await db.ai_pipelines.update_one(
+        {"id": job["payload"]["pipeline_id"]},
+        {"$set": {
+            f"stages.{stage_name}.status": "failed",
+            f"stages.{stage_name}.error_message": error,
+            "overall_status": "failed",
+            "updated_at": datetime.utcnow()
+        }}
+    )
+
+
+async def start_ai_pipeline_stage(pipeline_id: str, stage_name: str, job: dict):
+    await db.ai_pipelines.update_one(
+        {"id": pipeline_id},
+        {"$set": {
+            f"stages.{stage_name}.status": "in_progress",
+            f"stages.{stage_name}.started_at": datetime.utcnow(),
+            f"stages.{stage_name}.attempts": job["attempts"],
+            "current_stage": stage_name,
+            "updated_at": datetime.utcnow()
+        }}
+    )
+
+
+@job_queue.register("ai_pipeline.extract", on_failure=fail_ai_pipeline_stage)
+async def run_ai_pipeline_extract_job(job: dict):
+    """quick_start: extract the original text from the order's documents, then queue the translator"""
+    pipeline = await load_job_pipeline(job)
+    claude_api_key = job["secrets"]["claude_api_key"]
+    await start_ai_pipeline_stage(pipeline["id"], "ai_translator", job)
+
+    order_docs = await db.documents.find({"order_id": pipeline["order_id"], "document_type": "original"}).to_list(100)
+    if not order_docs:
+        raise JobFailed("No documents found for this order. Please upload documents first.")
+
+    extracted = await extract_quick_start_text(order_docs, claude_api_key)
+    if not extracted["text"]:
+        raise JobFailed("Could not extract text from any documents. Please check document format.")
+
+    await db.ai_pipelines.update_one(
+        {"id": pipeline["id"]},
+        {"$set": {
+            "original_text": extracted["text"],
+            "original_document_base64": pipeline.get("original_document_base64") or extracted["original_document_base64"],
+            "original_filename": pipeline.get("original_filename") or extracted["original_filename"],
+            "updated_at": datetime.utcnow()
+        }}
+    )
+    job_id = await enqueue_ai_pipeline_stage(pipeline["id"], "ai_translator", claude_api_key)
+    return {"next_job_id": job_id, "characters": len(extracted["text"])}
+
+
+@job_queue.register("ai_pipeline.translate", on_failure=fail_ai_pipeline_stage)
+async def run_ai_pipeline_translate_job(job: dict):
+    """Stage 1: AI Translator. Retried by the queue when the stage reports a failure."""
+    pipeline = await load_job_pipeline(job)
+    claude_api_key = job["secrets"]["claude_api_key"]
+    await start_ai_pipeline_stage(pipeline["id"], "ai_translator", job)
+
+    result = await run_ai_translator_stage(pipeline, claude_api_key)
+    if not result["success"]:
+        raise RuntimeError(result.get("error") or "AI translation failed")
+
+    if not job["payload"].get("continue_pipeline", True):
+        # Retry of a single stage: record the new result and leave the pipeline where it is
+        await db.ai_pipelines.update_one(
+            {"id": pipeline["id"]},
+            {"$set": {
+                "stages.ai_translator.status": "completed",
+                "stages.ai_translator.completed_at": datetime.utcnow(),
+                "stages.ai_translator.result": result["result"],
+                "stages.ai_translator.notes": result.get("notes"),
+                "overall_status": "in_progress",
+                "updated_at": datetime.utcnow()
+            },
+            "$unset": {"stages.ai_translator.stream": ""}}
+        )
+        await chunk_checkpoints.clear(ai_translator_checkpoint_scope(pipeline["id"]))
+        return {"tokens_used": result.get("tokens_used", 0)}
+
+    # Skip Layout stage - go directly to Proofreader
+    # Layout preservation is now handled in the translator prompt
+    await db.ai_pipelines.update_one(
+        {"id": pipeline["id"]},
+        {"$set": {
+            "stages.ai_translator.status": "completed",
+            "stages.ai_translator.completed_at": datetime.utcnow(),
+            "stages.ai_translator.result": result["result"],
+            "stages.ai_translator.notes": result.get("notes"),
+            "total_tokens_used": result.get("tokens_used", 0),
+            "prompt_cache": result.get("prompt_cache") or {},
+            # Skip ai_layout - mark as skipped and go to proofreader
+            "stages.ai_layout.status": "skipped",
+            "stages.ai_layout.notes": "Layout preservation handled in translator stage",
+            "current_stage": "ai_proofreader",
+            "stages.ai_proofreader.status": "pending",
+            "updated_at": datetime.utcnow()
+        },
+        # The streamed partial outputs are only kept until the stage result is saved
+        "$unset": {"stages.ai_translator.stream": ""}}
+    )
+    await chunk_checkpoints.clear(ai_translator_checkpoint_scope(pipeline["id"]))
+    job_id = await enqueue_ai_pipeline_stage(pipeline["id"], "ai_proofreader", claude_api_key)
+    return {"tokens_used": result.get("tokens_used", 0), "next_job_id": job_id}
+
+
+@job_queue.register("ai_pipeline.proofread", on_failure=fail_ai_pipeline_stage)
+async def run_ai_pipeline_proofread_job(job: dict):
+    """Stage 3: AI Proofreader, then hand the pipeline over to human review"""
+    pipeline = await load_job_pipeline(job)
+    claude_api_key = job["secrets"]["claude_api_key"]
+    await start_ai_pipeline_stage(pipeline["id"], "ai_proofreader", job)
+
+    previous_translation = pipeline["stages"]["ai_translator"].get("result") or pipeline["original_text"]
+    proofread_result = await run_ai_proofreader_stage(pipeline, previous_translation, claude_api_key)
+    if not proofread_result["success"]:
+        raise RuntimeError(proofread_result.get("error") or "AI proofreading failed")
+
+    if not job["payload"].get("continue_pipeline", True):
+        await db.ai_pipelines.update_one(
+            {"id": pipeline["id"]},
+            {"$set": {
+                "stages.ai_proofreader.status": "completed",
+                "stages.ai_proofreader.completed_at": datetime.utcnow(),
+                "stages.ai_proofreader.result": proofread_result["result"],
+                "stages.ai_proofreader.notes": proofread_result.get("notes"),
+                "overall_status": "in_progress",
+                "updated_at": datetime.utcnow()
+            }}
+        )
+        return {"tokens_used": proofread_result.get("tokens_used", 0)}
+
+    total_tokens = pipeline.get("total_tokens_used", 0) + proofread_result.get("tokens_used", 0)
+    prompt_cache = merge_prompt_cache_usage(pipeline.get("prompt_cache"), proofread_result.get("prompt_cache"))
+    await db.ai_pipelines.update_one(
+        {"id": pipeline["id"]},
+        {"$set": {
+            "stages.ai_proofreader.status": "completed",
+            "stages.ai_proofreader.completed_at": datetime.utcnow(),
+            "stages.ai_proofreader.result": proofread_result["result"],
+            "stages.ai_proofreader.notes": proofread_result.get("notes"),
+            "stages.ai_proofreader.changes_made": proofread_result.get("changes_made", []),
+            "total_tokens_used": total_tokens,
+            "prompt_cache": prompt_cache,
+            "current_stage": "human_review",
+            "stages.human_review.status": "pending",
+            "stages.human_review.result": proofread_result["result"],
+            "overall_status": "awaiting_review",
+            "updated_at": datetime.utcnow()
+        }}
+    )
+
+    # Update order to show it's ready for human review
+    await db.translation_orders.update_one(
+        {"id": pipeline["order_id"]},
+        {"$set": {
+            "translation_status": "review",
+            "ai_pipeline_status": "awaiting_review"
+        }}
+    )
+
+    # Create notification for PM
+    order = await db.translation_orders.find_one({"id": pipeline["order_id"]})
+    if order and order.get("assigned_pm_id"):
+        notification = Notification(
+            user_id=order["assigned_pm_id"],
+            type="ai_translation_ready",
+            title="AI Translation Ready for Review",
+            message=f"Order {order.get('order_number')} has completed AI translation and is ready for human review.",
+            order_id=pipeline["order_id"],
+            order_number=order.get("order_number")
+        )
+        await db.notifications.insert_one(notification.dict())
+
+    return {"tokens_used": proofread_result.get("tokens_used", 0), "total_tokens_used": total_tokens}
 
-        return {
-            "success": True,
-            "result": result,
-            "tokens_used": tokens_used,
-            "changes_made": corrections,
-            "notes": notes or f"Proofreading completed for {target_language}.",
-            "quality_score": quality_score
-        }
 
-    except anthropic.APIError as api_error:
-        error_msg = parse_claude_api_error(str(api_error), getattr(api_error, 'status_code', None))
-        logger.error(f"AI Proofreader stage API error: {error_msg}")
-        return {
-            "success": True,  # Mark as success to continue pipeline
-            "result": previous_translation,
-            "tokens_used": 0,
-            "changes_made": [],
-            "notes": f"Revisão pulada por erro na API: {error_msg}",
-            "quality_score": "not_evaluated"
-        }
+# ==================== TM AND GLOSSARY IMPORT JOBS ====================
+# Large uploads (see TM AND GLOSSARY IMPORT): the file waits in GridFS until a worker imports it;
+# job.progress holds the running counts and job.result the same response as an inline upload.
 
+
+async def discard_import_file(job: dict, error: str = None):
+    """Remove the uploaded file once the import finished (or failed for good)"""
+    try:
+        from bson import ObjectId
+        await fs_bucket.delete(ObjectId(job["payload"]["file_id"]))
     except Exception as e:
-        error_msg = str(e) if str(e) else "Unknown error occurred"
-        logger.error(f"AI Proofreader stage failed: {error_msg}")
-        return {
-            "success": False,
-            "error": error_msg,
-            "result": previous_translation
-        }
+        logger.warning(f"Failed to delete import file {job['payload'].get('file_id')}: {e}")
+
+
+async def run_file_import_job(job: dict, kind: str) -> dict:
+    payload = job["payload"]
+    path = await download_gridfs_file_to_disk(payload["file_id"], suffix=os.path.splitext(payload["filename"])[1])
+
+    async def progress(counts: dict):
+        await job_queue.report_progress(job, counts)
+
+    try:
+        if kind == "translation_memory":
+            result = await import_translation_memory_rows(
+                read_rows(path, payload["filename"]), payload["sourceLang"], payload["targetLang"],
+                payload["field"], payload.get("user_id"), progress=progress
+            )
+        else:
+            rows = read_rows(path, payload["filename"], glossary=True,
+                             sdltm_notes="from Trados TM", sdltm_limit=GLOSSARY_SDLTM_MAX_TERMS)
+            result = await import_glossary_rows(
+                rows, payload["name"], payload["sourceLang"], payload["targetLang"], payload["field"],
+                payload["bidirectional"], payload.get("user_id"), progress=progress
+            )
+    except ImportFileError as e:
+        raise JobFailed(str(e))
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    if not result["total_entries"]:
+        raise JobFailed("No valid entries found in the file" if kind == "translation_memory" else "No valid terms found in the file")
+    await discard_import_file(job)
+    return file_import_response(kind, result)
+
+
+@job_queue.register("translation_memory.import", on_failure=discard_import_file)
+async def run_translation_memory_import_job(job: dict):
+    """Import a large TM upload"""
+    return await run_file_import_job(job, "translation_memory")
+
+
+@job_queue.register("glossary.import", on_failure=discard_import_file)
+async def run_glossary_import_job(job: dict):
+    """Import a large glossary upload"""
+    return await run_file_import_job(job, "glossary")
 
 
 @api_router.post("/admin/ai-pipeline/start")
 async def start_ai_pipeline(request: AIPipelineCreate, admin_key: str):
-    """Start a new AI translation pipeline for an order"""
+    """
+    Start a new AI translation pipeline for an order.
+    Returns as soon as the first stage is queued; follow GET /admin/ai-pipeline/{pipeline_id}/stream
+    for the translation as it is written (the workspace does), or poll GET /admin/ai-pipeline/{pipeline_id}.
+    """
     user = await validate_admin_or_user_token(admin_key)
 
     # Verify order exists
@@ -28953,86 +31030,18 @@ async def start_ai_pipeline(request: AIPipelineCreate, admin_key: str):
     # Get Claude API key - use shared key if not provided
     claude_api_key = request.claude_api_key
     if not claude_api_key:
-        settings = await db.app_settings.find_one({"key": "shared_claude_api_key"})
+        settings = await reference_cache.find_one("app_settings", {"key": "shared_claude_api_key"})
         if settings and settings.get("value"):
             claude_api_key = settings["value"]
         else:
             raise HTTPException(status_code=400, detail="No Claude API key provided and no shared key configured. Please configure the shared API key in Settings.")
 
-    # Handle quick_start - fetch documents from order
-    original_text = request.original_text
-    original_document_base64 = request.original_document_base64
-    original_filename = request.original_filename
-
-    if request.quick_start and not original_text:
-        # Fetch documents for this order
-        order_docs = await db.documents.find({"order_id": request.order_id, "document_type": "original"}).to_list(100)
-
-        if not order_docs:
+    # quick_start extracts the text from the order's documents in the first job
+    needs_extraction = request.quick_start and not request.original_text
+    if needs_extraction:
+        if not await db.documents.count_documents({"order_id": request.order_id, "document_type": "original"}, limit=1):
             raise HTTPException(status_code=400, detail="No documents found for this order. Please upload documents first.")
 
-        # Extract text from documents using Claude Vision
-        extracted_texts = []
-        for doc in order_docs:
-            if doc.get("file_data"):
-                # Use Claude to extract text from the document
-                try:
-                    client = anthropic.Anthropic(api_key=claude_api_key)
-
-                    # Determine media type
-                    filename = doc.get("filename", "").lower()
-                    if filename.endswith(".pdf"):
-                        media_type = "application/pdf"
-                    elif filename.endswith(".png"):
-                        media_type = "image/png"
-                    elif filename.endswith(".jpg") or filename.endswith(".jpeg"):
-                        media_type = "image/jpeg"
-                    else:
-                        media_type = "image/png"  # Default
-
-                    # Clean base64 data
-                    file_data = doc["file_data"]
-                    if "," in file_data:
-                        file_data = file_data.split(",")[1]
-
-                    response = client.messages.create(
-                        model="claude-sonnet-4-5-20250929",
-                        max_tokens=8000,
-                        messages=[{
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image",
-                                    "source": {
-                                        "type": "base64",
-                                        "media_type": media_type,
-                                        "data": file_data
-                                    }
-                                },
-                                {
-                                    "type": "text",
-                                    "text": "Extract ALL text from this document exactly as it appears. Preserve the layout and formatting. Include all visible text."
-                                }
-                            ]
-                        }]
-                    )
-
-                    extracted_texts.append(f"--- Document: {doc.get('filename', 'unknown')} ---\n{response.content[0].text}")
-
-                    if not original_document_base64:
-                        original_document_base64 = file_data
-                        original_filename = doc.get("filename")
-
-                except Exception as e:
-                    friendly_msg = parse_claude_api_error(str(e), getattr(e, 'status_code', None))
-                    logger.error(f"Error extracting text from document: {friendly_msg}")
-                    extracted_texts.append(f"--- Document: {doc.get('filename', 'unknown')} ---\n[Erro ao extrair texto: {friendly_msg}]")
-
-        if extracted_texts:
-            original_text = "\n\n".join(extracted_texts)
-        else:
-            raise HTTPException(status_code=400, detail="Could not extract text from any documents. Please check document format.")
-
     # Create pipeline configuration
     config = AIPipelineConfig(
         source_language=request.source_language,
@@ -29054,9 +31063,9 @@ async def start_ai_pipeline(request: AIPipelineCreate, admin_key: str):
         order_id=request.order_id,
         order_number=order.get("order_number"),
         config=config,
-        original_text=original_text,
-        original_document_base64=original_document_base64,
-        original_filename=original_filename,
+        original_text=request.original_text or "",
+        original_document_base64=request.original_document_base64,
+        original_filename=request.original_filename,
         started_by_id=user.get("id"),
         started_by_name=user.get("name"),
         started_at=datetime.utcnow(),
@@ -29064,10 +31073,8 @@ async def start_ai_pipeline(request: AIPipelineCreate, admin_key: str):
         claude_api_key_used=claude_api_key[:10] + "..." if claude_api_key else None
     )
 
-    pipeline_dict = pipeline.dict()
-
     # Save pipeline
-    await db.ai_pipelines.insert_one(pipeline_dict)
+    await db.ai_pipelines.insert_one(pipeline.dict())
 
     # Update order status
     await db.translation_orders.update_one(
@@ -29079,132 +31086,34 @@ async def start_ai_pipeline(request: AIPipelineCreate, admin_key: str):
         }}
     )
 
-    # Start Stage 1: AI Translator
-    pipeline_dict["stages"]["ai_translator"]["status"] = "in_progress"
-    pipeline_dict["stages"]["ai_translator"]["started_at"] = datetime.utcnow().isoformat()
-
-    await db.ai_pipelines.update_one(
-        {"id": pipeline.id},
-        {"$set": {
-            "stages.ai_translator.status": "in_progress",
-            "stages.ai_translator.started_at": datetime.utcnow(),
-            "current_stage": "ai_translator"
-        }}
+    # Stage 1 (preceded by document extraction for quick_start) runs in a background job
+    job_id = await enqueue_ai_pipeline_stage(
+        pipeline.id, "ai_translator", claude_api_key,
+        job_type="ai_pipeline.extract" if needs_extraction else None
     )
 
-    # Run Stage 1
-    result = await run_ai_translator_stage(pipeline_dict, claude_api_key)
-
-    if result["success"]:
-        # Skip Layout stage - go directly to Proofreader
-        # Layout preservation is now handled in the translator prompt
-        await db.ai_pipelines.update_one(
-            {"id": pipeline.id},
-            {"$set": {
-                "stages.ai_translator.status": "completed",
-                "stages.ai_translator.completed_at": datetime.utcnow(),
-                "stages.ai_translator.result": result["result"],
-                "stages.ai_translator.notes": result.get("notes"),
-                "total_tokens_used": result.get("tokens_used", 0),
-                # Skip ai_layout - mark as skipped and go to proofreader
-                "stages.ai_layout.status": "skipped",
-                "stages.ai_layout.notes": "Layout preservation handled in translator stage",
-                "current_stage": "ai_proofreader",
-                "stages.ai_proofreader.status": "in_progress",
-                "stages.ai_proofreader.started_at": datetime.utcnow()
-            }}
-        )
-
-        # Skip Stage 2 (Layout) - Run Stage 3: Proofreading directly
-        proofread_result = await run_ai_proofreader_stage(pipeline_dict, result["result"], claude_api_key)
-
-        if proofread_result["success"]:
-            total_tokens = result.get("tokens_used", 0) + proofread_result.get("tokens_used", 0)
-
-            await db.ai_pipelines.update_one(
-                {"id": pipeline.id},
-                {"$set": {
-                    "stages.ai_proofreader.status": "completed",
-                    "stages.ai_proofreader.completed_at": datetime.utcnow(),
-                    "stages.ai_proofreader.result": proofread_result["result"],
-                    "stages.ai_proofreader.notes": proofread_result.get("notes"),
-                    "stages.ai_proofreader.changes_made": proofread_result.get("changes_made", []),
-                    "total_tokens_used": total_tokens,
-                    "current_stage": "human_review",
-                    "stages.human_review.status": "pending",
-                    "stages.human_review.result": proofread_result["result"],
-                    "overall_status": "awaiting_review",
-                    "updated_at": datetime.utcnow()
-                }}
-            )
-
-            # Update order to show it's ready for human review
-            await db.translation_orders.update_one(
-                {"id": request.order_id},
-                {"$set": {
-                    "translation_status": "review",
-                    "ai_pipeline_status": "awaiting_review"
-                }}
-            )
-
-            # Create notification for PM
-            if order.get("assigned_pm_id"):
-                notification = Notification(
-                    user_id=order["assigned_pm_id"],
-                    type="ai_translation_ready",
-                    title="AI Translation Ready for Review",
-                    message=f"Order {order.get('order_number')} has completed AI translation and is ready for human review.",
-                    order_id=request.order_id,
-                    order_number=order.get("order_number")
-                )
-                await db.notifications.insert_one(notification.dict())
-
-            return {
-                "status": "success",
-                "pipeline_id": pipeline.id,
-                "message": "AI translation completed. Ready for human review.",
-                "current_stage": "human_review",
-                "total_tokens_used": total_tokens
-            }
-        else:
-            # Proofreader failed
-            await db.ai_pipelines.update_one(
-                {"id": pipeline.id},
-                {"$set": {
-                    "stages.ai_proofreader.status": "failed",
-                    "stages.ai_proofreader.error_message": proofread_result.get("error"),
-                    "overall_status": "failed",
-                    "updated_at": datetime.utcnow()
-                }}
-            )
-    else:
-        await db.ai_pipelines.update_one(
-            {"id": pipeline.id},
-            {"$set": {
-                "stages.ai_translator.status": "failed",
-                "stages.ai_translator.error_message": result.get("error"),
-                "overall_status": "failed",
-                "updated_at": datetime.utcnow()
-            }}
-        )
-
-        return {
-            "status": "error",
-            "pipeline_id": pipeline.id,
-            "message": f"AI translation failed: {result.get('error')}",
-            "current_stage": "ai_translator"
-        }
-
-    # Return final status
-    final_pipeline = await db.ai_pipelines.find_one({"id": pipeline.id})
     return {
-        "status": final_pipeline.get("overall_status"),
+        "status": "queued",
         "pipeline_id": pipeline.id,
-        "current_stage": final_pipeline.get("current_stage"),
-        "total_tokens_used": final_pipeline.get("total_tokens_used", 0)
+        "job_id": job_id,
+        "message": "AI translation started. Follow stream_url for progress.",
+        "current_stage": "ai_translator",
+        "status_url": f"/admin/ai-pipeline/{pipeline.id}",
+        "stream_url": f"/admin/ai-pipeline/{pipeline.id}/stream"
     }
 
 
+@api_router.get("/admin/jobs/{job_id}")
+async def get_background_job(job_id: str, admin_key: str):
+    """Status of a background job (attempts, lease, last error, result)"""
+    await validate_admin_or_user_token(admin_key)
+
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @api_router.get("/admin/ai-pipeline/{pipeline_id}")
 async def get_ai_pipeline(pipeline_id: str, admin_key: str):
     """Get AI pipeline status and details"""
@@ -29220,6 +31129,82 @@ async def get_ai_pipeline(pipeline_id: str, admin_key: str):
     return pipeline
 
 
+@api_router.get("/admin/ai-pipeline/{pipeline_id}/stream")
+async def stream_ai_pipeline(pipeline_id: str, admin_key: str, request: Request):
+    """
+    Server-sent events with the translator output as it is written (see ChunkStreamBuffer).
+    Events: "stage" {current_stage, overall_status, status, notes} whenever one of them changes;
+    "chunk" {chunk, total_chunks, offset, text, status, reset} with the text appended at offset
+    (reset: the stored text no longer extends what was sent - a new input, or trailing whitespace
+    trimmed for a resume - and text replaces everything received before);
+    "done" {status, overall_status} once the translator stage is no longer pending or in progress,
+    after which the full result is read from GET /admin/ai-pipeline/{pipeline_id}.
+    """
+    await validate_admin_or_user_token(admin_key)
+
+    projection = {"current_stage": 1, "overall_status": 1, "stages.ai_translator.status": 1,
+                  "stages.ai_translator.notes": 1, "stages.ai_translator.stream": 1}
+    if not await db.ai_pipelines.find_one({"id": pipeline_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Pipeline not found")
+
+    def sse(event: str, data: dict) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    async def events():
+        sent = {}  # chunk key -> (text sent, characters sent, status)
+        last_stage = None
+        last_write = time.monotonic()
+        while not await request.is_disconnected():
+            pipeline = await db.ai_pipelines.find_one({"id": pipeline_id}, projection)
+            if not pipeline:
+                yield sse("done", {"status": "deleted", "overall_status": None})
+                return
+            translator = (pipeline.get("stages") or {}).get("ai_translator") or {}
+            stage = {
+                "current_stage": pipeline.get("current_stage"),
+                "overall_status": pipeline.get("overall_status"),
+                "status": translator.get("status"),
+                "notes": translator.get("notes")
+            }
+            if stage != last_stage:
+                last_stage = stage
+                yield sse("stage", stage)
+                last_write = time.monotonic()
+
+            stream = translator.get("stream") or {}
+            for key in sorted(stream, key=lambda name: int(name.rsplit("_", 1)[-1])):
+                chunk = stream[key]
+                text = chunk.get("text") or ""
+                sent_text, offset, status = sent.get(key, (None, 0, None))
+                # Retries continue the streamed text, so only a text that stopped extending it is resent
+                reset = sent_text is not None and not text.startswith(sent_text)
+                if reset:
+                    offset = 0
+                if len(text) > offset or reset or status != chunk.get("status"):
+                    yield sse("chunk", {
+                        "chunk": int(key.rsplit("_", 1)[-1]),
+                        "total_chunks": chunk.get("total_chunks"),
+                        "offset": offset,
+                        "text": text[offset:],
+                        "status": chunk.get("status"),
+                        "reset": reset
+                    })
+                    last_write = time.monotonic()
+                sent[key] = (text, len(text), chunk.get("status"))
+
+            if stage["status"] not in ("pending", "in_progress") or stage["overall_status"] == "failed":
+                yield sse("done", {"status": stage["status"], "overall_status": stage["overall_status"]})
+                return
+
+            if time.monotonic() - last_write >= AI_STREAM_HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_write = time.monotonic()
+            await asyncio.sleep(AI_STREAM_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @api_router.get("/admin/ai-pipeline/order/{order_id}")
 async def get_ai_pipeline_by_order(order_id: str, admin_key: str):
     """Get AI pipeline for a specific order"""
@@ -29364,7 +31349,10 @@ async def list_ai_pipelines(admin_key: str, status: Optional[str] = None, limit:
 
 @api_router.post("/admin/ai-pipeline/{pipeline_id}/retry")
 async def retry_ai_pipeline_stage(pipeline_id: str, admin_key: str, claude_api_key: str):
-    """Retry a failed pipeline stage"""
+    """
+    Retry a failed pipeline stage (queued as a background job; poll the pipeline for the result).
+    A translator retry only re-translates the chunks that failed, are missing or whose input changed.
+    """
     await validate_admin_or_user_token(admin_key)
 
     pipeline = await db.ai_pipelines.find_one({"id": pipeline_id})
@@ -29377,68 +31365,43 @@ async def retry_ai_pipeline_stage(pipeline_id: str, admin_key: str, claude_api_k
     if stage_data.get("status") not in ["failed", "rejected"]:
         raise HTTPException(status_code=400, detail=f"Stage '{current_stage}' is not in a retryable state")
 
-    # Get the previous stage result (or original text for first stage)
-    stage_order = ["ai_translator", "ai_proofreader", "human_review"]
-    current_index = stage_order.index(current_stage)
-
-    if current_index == 0:
-        previous_result = pipeline["original_text"]
-    else:
-        previous_stage = stage_order[current_index - 1]
-        previous_result = pipeline["stages"][previous_stage].get("result", pipeline["original_text"])
+    # ai_layout removed - handled in translator
+    if current_stage not in AI_PIPELINE_STAGE_JOBS:
+        raise HTTPException(status_code=400, detail="Cannot retry human review stage")
 
-    # Mark as in progress
+    # Mark as queued
     await db.ai_pipelines.update_one(
         {"id": pipeline_id},
         {"$set": {
-            f"stages.{current_stage}.status": "in_progress",
-            f"stages.{current_stage}.started_at": datetime.utcnow(),
+            f"stages.{current_stage}.status": "pending",
             f"stages.{current_stage}.error_message": None,
             "overall_status": "in_progress",
             "updated_at": datetime.utcnow()
         }}
     )
 
-    # Run the appropriate stage (ai_layout removed - handled in translator)
-    if current_stage == "ai_translator":
-        result = await run_ai_translator_stage(pipeline, claude_api_key)
-    elif current_stage == "ai_proofreader":
-        result = await run_ai_proofreader_stage(pipeline, previous_result, claude_api_key)
+    if current_stage == "ai_translator" and not pipeline.get("original_text"):
+        # quick_start pipeline whose document extraction failed: extract again, then translate
+        job_id = await enqueue_ai_pipeline_stage(pipeline_id, current_stage, claude_api_key, job_type="ai_pipeline.extract")
     else:
-        raise HTTPException(status_code=400, detail="Cannot retry human review stage")
-
-    if result["success"]:
-        await db.ai_pipelines.update_one(
-            {"id": pipeline_id},
-            {"$set": {
-                f"stages.{current_stage}.status": "completed",
-                f"stages.{current_stage}.completed_at": datetime.utcnow(),
-                f"stages.{current_stage}.result": result["result"],
-                f"stages.{current_stage}.notes": result.get("notes"),
-                "updated_at": datetime.utcnow()
-            }}
-        )
+        job_id = await enqueue_ai_pipeline_stage(pipeline_id, current_stage, claude_api_key, continue_pipeline=False)
 
-        return {
-            "status": "success",
-            "message": f"Stage '{current_stage}' completed successfully",
-            "result": result["result"][:500] + "..." if len(result.get("result", "")) > 500 else result.get("result")
-        }
-    else:
-        await db.ai_pipelines.update_one(
-            {"id": pipeline_id},
-            {"$set": {
-                f"stages.{current_stage}.status": "failed",
-                f"stages.{current_stage}.error_message": result.get("error"),
-                "overall_status": "failed",
-                "updated_at": datetime.utcnow()
-            }}
-        )
+    # Translator chunks completed by the failed attempt are reused when their input is unchanged
+    checkpoints = {}
+    if current_stage == "ai_translator":
+        try:
+            checkpoints = await chunk_checkpoints.summary(ai_translator_checkpoint_scope(pipeline_id))
+        except Exception as e:
+            logger.warning(f"Could not read checkpoints of pipeline {pipeline_id}: {e}")
 
-        return {
-            "status": "error",
-            "message": f"Stage '{current_stage}' failed: {result.get('error')}"
-        }
+    return {
+        "status": "queued",
+        "message": f"Stage '{current_stage}' queued for retry",
+        "job_id": job_id,
+        "checkpoints": checkpoints,
+        "status_url": f"/admin/ai-pipeline/{pipeline_id}",
+        "stream_url": f"/admin/ai-pipeline/{pipeline_id}/stream"
+    }
 
 
 # ==================== TRADUX AUTO-TRANSLATION SYSTEM ====================
@@ -29458,6 +31421,7 @@ async def tradux_auto_translate(request: TraduxAutoTranslateRequest, admin_key:
 
     Returns immediately with a status tracking ID.
     Use GET /admin/tradux/status/{order_id} to check progress.
+    Starting it again after a failed run resumes from that run's checkpoints.
     """
     user = await validate_admin_or_user_token(admin_key)
 
@@ -29469,7 +31433,7 @@ async def tradux_auto_translate(request: TraduxAutoTranslateRequest, admin_key:
     # Get Claude API key
     claude_api_key = request.claude_api_key
     if not claude_api_key:
-        settings = await db.app_settings.find_one({"key": "shared_claude_api_key"})
+        settings = await reference_cache.find_one("app_settings", {"key": "shared_claude_api_key"})
         if settings and settings.get("value"):
             claude_api_key = settings["value"]
         else:
@@ -29532,11 +31496,11 @@ async def _run_tradux_pipeline(
     """
     Internal function to run the complete TRADUX pipeline asynchronously.
     Updates status at each step for real-time progress tracking.
+    Every Claude call is checkpointed per order: running the pipeline again after a failure
+    only repeats the OCR pages and steps that failed or whose input changed.
     """
+    checkpoint_scope = f"tradux:{request.order_id}"
     try:
-        import anthropic
-        client = anthropic.Anthropic(api_key=claude_api_key)
-
         # Helper to update status
         async def update_status(step: str, progress: int, step_status: str = "in_progress", message: str = "", **kwargs):
             update_data = {
@@ -29566,91 +31530,67 @@ async def _run_tradux_pipeline(
                 await update_status("ocr", 10, "failed", "No documents found for this order", has_error=True, error_message="No documents found")
                 return
 
-            extracted_texts = []
-            for doc in order_docs:
-                if doc.get("file_data"):
-                    try:
-                        # Clean base64 data
-                        file_data = doc["file_data"]
-                        if "," in file_data:
-                            file_data = file_data.split(",")[1]
-
-                        # Determine media type
-                        filename = doc.get("filename", "").lower()
-                        if filename.endswith(".pdf"):
-                            media_type = "application/pdf"
-                        elif filename.endswith(".png"):
-                            media_type = "image/png"
-                        elif filename.endswith(".jpg") or filename.endswith(".jpeg"):
-                            media_type = "image/jpeg"
-                        else:
-                            media_type = "image/png"
-
-                        # Use Claude for OCR with layout preservation
-                        ocr_prompt = """Extract ALL text from this document image.
-
-CRITICAL INSTRUCTIONS:
-1. Maintain the EXACT original layout, structure, and formatting
-2. Preserve all line breaks, spacing, and indentation
-3. Keep tables in their original format using markdown table syntax
-4. Preserve headers, titles, and sections exactly as they appear
-5. Include ALL text, even small print, stamps, and signatures
-6. Use ** for bold text and * for italic text where visible
-7. For handwritten text, use [handwritten: text] notation
-8. For stamps/seals, use [stamp: text] notation
-9. For signatures, use [signature: name if readable, or "illegible"]
-
-Extract the complete text now, preserving the original layout:"""
-
-                        # Handle PDF conversion if needed
-                        if media_type == "application/pdf":
-                            import fitz
-                            pdf_content = base64.b64decode(file_data)
-                            pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-                            page_texts = []
-
-                            for page_num in range(min(pdf_document.page_count, 15)):
-                                page = pdf_document[page_num]
-                                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                                img_data = pix.tobytes("png")
-                                image_data = base64.b64encode(img_data).decode('utf-8')
-
-                                response = client.messages.create(
-                                    model="claude-sonnet-4-5-20250929",
-                                    max_tokens=4096,
-                                    messages=[{
-                                        "role": "user",
-                                        "content": [
-                                            {"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": image_data}},
-                                            {"type": "text", "text": ocr_prompt}
-                                        ]
-                                    }]
-                                )
-                                page_texts.append(f"--- Page {page_num + 1} ---\n{response.content[0].text}")
+            # Same prompt as workspace OCR, so extractions are shared through the OCR result cache
+            ocr_prompt = build_claude_ocr_prompt()
+
+            async def extract_document(file_bytes: bytes, file_data: str, media_type: str, file_hash: str) -> str:
+                # Reuse a previous extraction of the same bytes (re-runs, retries, workspace or quick start OCR)
+                cache_params = claude_ocr_cache_params(ocr_prompt)
+                cached = await ocr_result_cache.get(file_hash, "claude", cache_params)
+                if cached is not None:
+                    return cached["text"]
+
+                # Handle PDF conversion if needed
+                if media_type == "application/pdf":
+                    pages = await page_render_cache.get_pdf_pages(file_bytes, image_format="png", max_pages=15)
+
+                    async def extract_page(page: dict) -> tuple:
+                        page_text = await checkpointed_claude_text(
+                            checkpoint_scope, f"ocr:{file_hash}:page_{page['page']}", claude_api_key, "tradux",
+                            model=CLAUDE_OCR_MODEL,
+                            max_tokens=4096,
+                            messages=[{
+                                "role": "user",
+                                "content": [
+                                    {"type": "image", "source": {"type": "base64", "media_type": page["media_type"], "data": page["data"]}},
+                                    {"type": "text", "text": ocr_prompt}
+                                ]
+                            }]
+                        )
+                        return page['page'], page_text
 
-                            pdf_document.close()
-                            extracted_texts.append(f"--- Document: {doc.get('filename', 'unknown')} ---\n" + "\n\n".join(page_texts))
-                        else:
-                            # Direct image OCR
-                            response = client.messages.create(
-                                model="claude-sonnet-4-5-20250929",
-                                max_tokens=4096,
-                                messages=[{
-                                    "role": "user",
-                                    "content": [
-                                        {"type": "image", "source": {"type": "base64", "media_type": media_type, "data": file_data}},
-                                        {"type": "text", "text": ocr_prompt}
-                                    ]
-                                }]
-                            )
-                            extracted_texts.append(f"--- Document: {doc.get('filename', 'unknown')} ---\n{response.content[0].text}")
+                    # Pages run concurrently too; the per-key rate limiter sets the pace
+                    page_texts = await run_chunks_in_order([extract_page(page) for page in pages], limit=CLAUDE_OCR_MAX_CONCURRENCY)
+                    document_text = assemble_claude_ocr_pages(dict(page_texts))
+                else:
+                    # Direct image OCR
+                    document_text = await checkpointed_claude_text(
+                        checkpoint_scope, f"ocr:{file_hash}", claude_api_key, "tradux",
+                        model=CLAUDE_OCR_MODEL,
+                        max_tokens=4096,
+                        messages=[{
+                            "role": "user",
+                            "content": [
+                                {"type": "image", "source": {"type": "base64", "media_type": media_type, "data": file_data}},
+                                {"type": "text", "text": ocr_prompt}
+                            ]
+                        }]
+                    )
 
-                        if not original_document_base64:
-                            original_document_base64 = file_data
+                await ocr_result_cache.put(file_hash, "claude", cache_params, {"text": document_text})
+                return document_text
 
-                    except Exception as e:
-                        logger.error(f"OCR failed for document: {e}")
-                        extracted_texts.append(f"--- Document: {doc.get('filename', 'unknown')} ---\n[OCR Error: {str(e)}]")
+            # Documents are extracted concurrently and assembled in order
+            extracted_texts = []
+            for extraction in await extract_order_documents(order_docs, extract_document):
+                doc = extraction["doc"]
+                if extraction["error"] is not None:
+                    logger.error(f"OCR failed for document: {extraction['error']}")
+                    extracted_texts.append(f"--- Document: {doc.get('filename', 'unknown')} ---\n[OCR Error: {str(extraction['error'])}]")
+                    continue
+                extracted_texts.append(f"--- Document: {doc.get('filename', 'unknown')} ---\n{extraction['text']}")
+                if not original_document_base64:
+                    original_document_base64 = extraction["file_data"]
 
             if extracted_texts:
                 original_text = "\n\n".join(extracted_texts)
@@ -29666,20 +31606,25 @@ Extract the complete text now, preserving the original layout:"""
         # Fetch glossaries
         glossary_text = ""
         if request.use_glossary:
-            glossaries = await db.glossaries.find({
+            # Terms occurring in the extracted text; bidirectional glossaries of the opposite pair
+            # are matched target → source
+            glossary_automaton = await glossary_matchers.get({
                 "$or": [
                     {"sourceLang": request.source_language, "targetLang": request.target_language},
                     {"sourceLang": request.target_language, "targetLang": request.source_language, "bidirectional": True},
                     {"sourceLang": "All Languages"},
                     {"targetLang": "All Languages"}
                 ]
-            }).to_list(50)
-
-            if glossaries:
-                terms = []
-                for g in glossaries:
-                    for term in g.get("terms", []):
-                        terms.append(f"- {term.get('source')} → {term.get('target')}")
+            }, limit=50, reverse_when=(
+                {"sourceLang": request.target_language, "targetLang": request.source_language}
+                if request.source_language != request.target_language else None
+            ))
+
+            if glossary_automaton:
+                terms = [
+                    f"- {term.get('source')} → {term.get('target')}"
+                    for term in glossary_matchers.terms_in(glossary_automaton, original_text, 100)
+                ]
                 if terms:
                     glossary_text = f"\n\n🔹 MANDATORY GLOSSARY TERMS (MUST USE THESE EXACT TRANSLATIONS):\n" + "\n".join(terms[:100])
 
@@ -29739,13 +31684,12 @@ Example: R$ 1.000,00 (USD $184.50 at exchange rate of {request.exchange_rate} as
 """
             translation_prompt = translation_prompt.replace("ORIGINAL DOCUMENT TEXT:", currency_note + "\nORIGINAL DOCUMENT TEXT:")
 
-        response = client.messages.create(
+        translated_text = await checkpointed_claude_text(
+            checkpoint_scope, "translation", claude_api_key, "tradux",
             model="claude-sonnet-4-5-20250929",
             max_tokens=16384,
             messages=[{"role": "user", "content": translation_prompt}]
         )
-
-        translated_text = response.content[0].text
         await update_status("translation", 50, "completed", f"Translation completed ({len(translated_text)} chars)", translated_text=translated_text)
 
         # ========== STEP 3: LAYOUT OPTIMIZATION ==========
@@ -29768,13 +31712,12 @@ TRANSLATION TO OPTIMIZE:
 
 Return the optimized HTML with proper CSS for printing:"""
 
-        response = client.messages.create(
+        optimized_text = await checkpointed_claude_text(
+            checkpoint_scope, "layout", claude_api_key, "tradux",
             model="claude-sonnet-4-5-20250929",
             max_tokens=16384,
             messages=[{"role": "user", "content": layout_prompt}]
         )
-
-        optimized_text = response.content[0].text
         await update_status("layout", 70, "completed", "Layout optimized for printing")
 
         # ========== STEP 4: PROOFREADING ==========
@@ -29858,14 +31801,13 @@ Return a JSON object with this EXACT structure:
 
 If there are no errors, return an empty errors array and quality as "APPROVED"."""
 
-        response = client.messages.create(
+        proofread_result = await checkpointed_claude_text(
+            checkpoint_scope, "proofreading", claude_api_key, "tradux",
             model="claude-sonnet-4-5-20250929",
             max_tokens=8192,
             messages=[{"role": "user", "content": proofread_prompt}]
         )
 
-        proofread_result = response.content[0].text
-
         # Parse proofreading result
         import json
         try:
@@ -29911,13 +31853,12 @@ TRANSLATION TO CORRECT:
 
 Return the corrected HTML translation. Make ONLY the corrections listed above, do not change anything else."""
 
-            response = client.messages.create(
+            final_translation = await checkpointed_claude_text(
+                checkpoint_scope, "auto_correction", claude_api_key, "tradux",
                 model="claude-sonnet-4-5-20250929",
                 max_tokens=16384,
                 messages=[{"role": "user", "content": correction_prompt}]
             )
-
-            final_translation = response.content[0].text
             corrections_applied = [f"{e.get('type')}: {e.get('correction')}" for e in errors[:10]]
 
             await update_status("auto_correction", 92, "completed",
@@ -29933,6 +31874,9 @@ Return the corrected HTML translation. Make ONLY the corrections listed above, d
             final_translation=final_translation
         )
 
+        # Finished: a later run for this order translates from scratch
+        await chunk_checkpoints.clear(checkpoint_scope)
+
         # Update final status
         await db.tradux_translations.update_one(
             {"id": status_id},
@@ -32145,6 +34089,29 @@ async def aws_diagnostic():
 
     return result
 
+# OCR engine metrics (queue depth / latency per pool, for sizing workers per container)
+@api_router.get("/admin/ocr-engine/metrics")
+async def get_ocr_engine_metrics(admin_key: str):
+    """Report OCR worker pool sizes, queue depth, latency and the Tesseract PSM winners per document type"""
+    user_info = await validate_admin_or_user_token(admin_key)
+    if not user_info or user_info.get("role") not in ["admin", "pm"]:
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+    return {
+        "pools": ocr_executor.metrics(),
+        "tesseract_psm_winners": tesseract_psm_cache.snapshot(),
+        "ocr_cache": ocr_result_cache.metrics(),
+        "page_render_cache": page_render_cache.metrics(),
+        "chunk_checkpoints": chunk_checkpoints.metrics(),
+        "translation_memory_index": translation_memory_index.metrics(),
+        "glossary_matchers": glossary_matchers.metrics(),
+        "reference_cache": reference_cache.metrics(),
+        "page_counter": page_counter.metrics(),
+        "jobs": await job_queue.metrics(),
+        "claude_rate_limits": claude_rate_limiter_metrics(),
+        "claude_clients": claude_clients.metrics()
+    }
+
 # ==================== SALES CONTROL ENDPOINTS ====================
 
 class Salesperson(BaseModel):
@@ -34453,6 +36420,81 @@ async def start_auto_followup_scheduler():
     """Launch the auto follow-up background scheduler"""
     asyncio.create_task(_auto_followup_scheduler())
 
+_job_worker_task = None
+
+@app.on_event("startup")
+async def start_job_worker():
+    """Job indexes, plus an in-process worker unless jobs run only in separate worker processes"""
+    global job_worker, _job_worker_task
+    try:
+        await job_queue.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating job queue indexes: {str(e)}")
+    if JOB_WORKER_IN_PROCESS:
+        job_worker = JobWorker(job_queue)
+        _job_worker_task = asyncio.create_task(job_worker.run())
+
+@app.on_event("shutdown")
+async def stop_job_worker():
+    """Running jobs are handed back to the queue for another worker"""
+    if job_worker and _job_worker_task:
+        job_worker.stop()
+        try:
+            await asyncio.wait_for(_job_worker_task, timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning("Job worker did not stop in time; its leases will expire and be re-claimed")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    client.close()
+
+@app.on_event("startup")
+async def create_ocr_cache_indexes():
+    """Unique key, LRU and TTL indexes for the OCR result cache"""
+    try:
+        await ocr_result_cache.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating OCR cache indexes: {str(e)}")
+
+@app.on_event("startup")
+async def create_page_render_cache_indexes():
+    try:
+        await page_render_cache.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating page render cache indexes: {str(e)}")
+
+@app.on_event("startup")
+async def create_chunk_checkpoint_indexes():
+    try:
+        await chunk_checkpoints.ensure_indexes()
+    except Exception as e:
+        logger.error(f"Error creating chunk checkpoint indexes: {str(e)}")
+
+@app.on_event("startup")
+async def start_reference_cache():
+    """Load glossaries, instructions, templates and settings, then follow their changes"""
+    await reference_cache.warm()
+    reference_cache.start()
+
+@app.on_event("shutdown")
+async def stop_reference_cache():
+    await reference_cache.stop()
+
+@app.on_event("startup")
+async def create_translation_memory_indexes():
+    """source_hash backfill, the unique (sourceLang, targetLang, source_hash) index used by TM imports and the export sort index"""
+    try:
+        await ensure_translation_memory_indexes()
+    except Exception as e:
+        logger.error(f"Error creating translation memory indexes: {str(e)}")
+
+@app.on_event("startup")
+async def warm_translation_memory_index():
+    """Build the fuzzy TM index in the background so the first translation does not wait for it"""
+    asyncio.create_task(translation_memory_index.warm())
+
+@app.on_event("shutdown")
+async def shutdown_ocr_engine():
+    ocr_executor.shutdown()
+    await page_counter.close_http_client()
+    await claude_clients.close()
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+Translation Memory / Glossary File Import
+Streaming readers for the TM and glossary upload formats, so a file on disk is parsed row by row
+and written in fixed-size batches instead of being decoded and parsed whole in memory:
+- TMX/XML: iterparse, each <tu> is dropped from the tree once read
+- CSV: csv reader over the file (UTF-8, BOM allowed); header keywords pick the columns
+- Excel (.xlsx): openpyxl read-only rows; header keywords pick the columns
+- SDL Trados TM (.sdltm): SQLite cursor read with fetchmany
+- every reader yields {source, target, notes} rows; batches() groups them and drops duplicate
+  sources inside a batch
+- source_hash() is the fixed-length key of a TM source text used by the unique
+  (sourceLang, targetLang, source_hash) index, since source texts can outgrow an index key
+
+Column keywords and TMX language handling are those of the original upload endpoints. Pure
+Python, no MongoDB access.
+"""
+
+import csv
+import sqlite3
+import hashlib
+import xml.etree.ElementTree as ET
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+SOURCE_KEYWORDS = ("source", "original", "origem")
+TARGET_KEYWORDS = ("target", "translation", "destino", "tradução")
+NOTES_KEYWORDS = ("note", "comment", "observação")
+EXCEL_SOURCE_KEYWORDS = ("português",)
+EXCEL_TARGET_KEYWORDS = ("english", "inglês")
+GLOSSARY_SOURCE_KEYWORDS = ("term",)
+
+SDLTM_FETCH_ROWS = 500
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+
+class ImportFileError(ValueError):
+    """The uploaded file cannot be read (bad format, encoding or contents); retrying will not help"""
+
+
+class UnsupportedFormat(ImportFileError):
+    """The file extension is not one of the import formats"""
+
+
+def import_format(filename: str) -> Optional[str]:
+    """'tmx', 'csv', 'excel' or 'sdltm' by file extension, None when unsupported"""
+    name = (filename or "").lower()
+    if name.endswith(".tmx") or name.endswith(".xml"):
+        return "tmx"
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".xlsx") or name.endswith(".xls"):
+        return "excel"
+    if name.endswith(".sdltm"):
+        return "sdltm"
+    return None
+
+
+def source_hash(source: str) -> str:
+    return hashlib.sha256((source or "").encode("utf-8")).hexdigest()
+
+
+def detect_columns(header: Iterable, glossary: bool = False, excel: bool = False) -> Tuple[int, int, int]:
+    """(source, target, notes) column positions from a header row; notes is -1 when absent"""
+    source_keywords = SOURCE_KEYWORDS + (GLOSSARY_SOURCE_KEYWORDS if glossary else ()) + (EXCEL_SOURCE_KEYWORDS if excel else ())
+    target_keywords = TARGET_KEYWORDS + (EXCEL_TARGET_KEYWORDS if excel else ())
+    source_col, target_col, notes_col = 0, 1, -1
+    for i, cell in enumerate(header or []):
+        name = str(cell).lower().strip() if cell else ""
+        if any(keyword in name for keyword in source_keywords):
+            source_col = i
+        elif any(keyword in name for keyword in target_keywords):
+            target_col = i
+        elif glossary and any(keyword in name for keyword in NOTES_KEYWORDS):
+            notes_col = i
+    return source_col, target_col, notes_col
+
+
+def _tu_row(tu: ET.Element) -> Optional[dict]:
+    """Source/target of a <tu>: Portuguese is the source and English the target, else tuv order"""
+    tuvs = tu.findall("tuv")
+    if len(tuvs) < 2:
+        return None
+    source_text = ""
+    target_text = ""
+    for tuv in tuvs:
+        lang = (tuv.get(XML_LANG, "") or tuv.get("lang", "")).lower()
+        seg = tuv.find("seg")
+        if seg is None or not seg.text:
+            continue
+        if lang.startswith("pt") or lang.startswith("por"):
+            source_text = seg.text.strip()
+        elif lang.startswith("en"):
+            target_text = seg.text.strip()
+        elif not source_text:
+            source_text = seg.text.strip()
+        else:
+            target_text = seg.text.strip()
+    if source_text and target_text:
+        return {"source": source_text, "target": target_text, "notes": ""}
+    return None
+
+
+def read_tmx(path: str) -> Iterator[dict]:
+    stack = []
+    for event, element in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            stack.append(element)
+            continue
+        stack.pop()
+        if element.tag != "tu":
+            continue
+        row = _tu_row(element)
+        # Detach the finished unit so the tree never holds more than the one being read
+        if stack:
+            stack[-1].remove(element)
+        element.clear()
+        if row:
+            yield row
+
+
+def read_csv(path: str, glossary: bool = False) -> Iterator[dict]:
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        reader = csv.reader(handle)
+        source_col, target_col, notes_col = detect_columns(next(reader, None), glossary=glossary)
+        for row in reader:
+            if len(row) <= max(source_col, target_col):
+                continue
+            source_text = row[source_col].strip()
+            target_text = row[target_col].strip()
+            if source_text and target_text:
+                notes = row[notes_col].strip() if notes_col >= 0 and len(row) > notes_col else ""
+                yield {"source": source_text, "target": target_text, "notes": notes}
+
+
+def read_excel(path: str, glossary: bool = False) -> Iterator[dict]:
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        source_col, target_col, notes_col = detect_columns(next(rows, None), glossary=glossary, excel=True)
+        for row in rows:
+            if len(row) <= max(source_col, target_col):
+                continue
+            source_text = str(row[source_col]).strip() if row[source_col] else ""
+            target_text = str(row[target_col]).strip() if row[target_col] else ""
+            if source_text and target_text and source_text != "None" and target_text != "None":
+                notes = str(row[notes_col]).strip() if notes_col >= 0 and len(row) > notes_col and row[notes_col] else ""
+                yield {"source": source_text, "target": target_text, "notes": notes}
+    finally:
+        workbook.close()
+
+
+def read_sdltm(path: str, notes: str = "", limit: int = None) -> Iterator[dict]:
+    # Readers may be advanced from worker threads (asyncio.to_thread), one call at a time
+    conn = sqlite3.connect(path, check_same_thread=False)
+    try:
+        cursor = conn.cursor()
+        query = """
+            SELECT source_segment, target_segment
+            FROM translation_units
+            WHERE source_segment IS NOT NULL AND target_segment IS NOT NULL
+        """
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        cursor.execute(query)
+        while True:
+            fetched = cursor.fetchmany(SDLTM_FETCH_ROWS)
+            if not fetched:
+                break
+            for source_segment, target_segment in fetched:
+                source_text = source_segment.strip() if source_segment else ""
+                target_text = target_segment.strip() if target_segment else ""
+                if source_text and target_text:
+                    yield {"source": source_text, "target": target_text, "notes": notes}
+    finally:
+        conn.close()
+
+
+def _reading(file_format: str, rows: Iterator[dict]) -> Iterator[dict]:
+    """Re-raise reader errors as ImportFileError, with the messages of the original upload endpoints"""
+    try:
+        yield from rows
+    except ImportError as e:
+        if file_format == "excel":
+            raise ImportFileError("Excel support not available. Please use CSV or TMX format.") from e
+        raise
+    except Exception as e:
+        if file_format == "sdltm":
+            raise ImportFileError(f"Error parsing Trados TM file: {e}") from e
+        raise ImportFileError(f"Error processing file: {e}") from e
+
+
+def read_rows(path: str, filename: str, glossary: bool = False, sdltm_notes: str = "", sdltm_limit: int = None) -> Iterator[dict]:
+    """Rows of an uploaded TM or glossary file, picking the reader by the original file name"""
+    file_format = import_format(filename)
+    if file_format == "tmx":
+        rows = read_tmx(path)
+    elif file_format == "csv":
+        rows = read_csv(path, glossary=glossary)
+    elif file_format == "excel":
+        rows = read_excel(path, glossary=glossary)
+    elif file_format == "sdltm":
+        rows = read_sdltm(path, notes=sdltm_notes, limit=sdltm_limit)
+    else:
+        raise UnsupportedFormat(f"Unsupported file format: {filename}")
+    return _reading(file_format, rows)
+
+
+def batches(rows: Iterable[dict], size: int, key: Callable[[dict], str] = None, keep: str = "last") -> Iterator[Tuple[List[dict], int]]:
+    """
+    (batch, rows read) for consecutive groups of up to `size` rows, without duplicate keys inside
+    a batch: keep="last" keeps the last row of a key (where it first appeared), keep="first" the first.
+    """
+    key = key or (lambda row: row["source"])
+    batch = {}
+    read = 0
+    for row in rows:
+        read += 1
+        row_key = key(row)
+        if row_key in batch:
+            if keep == "last":
+                batch[row_key] = row
+        else:
+            batch[row_key] = row
+        if read >= size:
+            yield list(batch.values()), read
+            batch = {}
+            read = 0
+    if batch:
+        yield list(batch.values()), read
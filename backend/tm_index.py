@@ -0,0 +1,230 @@
+"""
+Translation Memory Fuzzy Index
+In-memory lookup of translation memory (TM) entries similar to the segments of a source text:
+- every TM source segment is normalized (case, whitespace, surrounding punctuation) and split
+  into word bigrams, padded at both ends so one-word segments and segment edges count too; an
+  inverted index maps each bigram to the entries containing it
+- entries are added and removed incrementally, so inserts and uploads never rebuild the index
+  (removed entries are tombstoned and compacted away once they pile up)
+- a lookup sorts the query bigrams by rarity and only reads the postings of the rarest ones
+  (prefix filtering): any entry reaching the candidate overlap must share at least one of them,
+  so very common bigrams ("certidão de", "of the") are rarely scanned
+- candidates are ranked by bigram Dice overlap and the best ones scored with a character
+  edit-distance ratio, which is the match percentage reported (100 = identical after
+  normalization)
+
+The index is pure Python and independent of MongoDB; server.py keeps one TMPairIndex per
+(sourceLang, targetLang) pair and feeds it from the translation_memory collection.
+"""
+
+import re
+import sys
+import html
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+COMPACT_RATIO = 0.25          # compact postings once this share of the entries is tombstoned
+MAX_SEGMENT_CHARS = 200       # longer lines are split into sentences before matching
+CANDIDATE_SLACK = 0.6         # bigram Dice a candidate needs, relative to the requested match
+
+_WORD = re.compile(r"\w+")
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\W_]+|[\W_]+$")
+_BLOCK_TAG = re.compile(r"<\s*(?:br|/p|/div|/li|/tr|/td|/th|/h[1-6]|/table|/section|/header|/footer)\b[^>]*>", re.IGNORECASE)
+_ANY_TAG = re.compile(r"<[^>]+>")
+_STYLE_OR_SCRIPT = re.compile(r"<(style|script)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+(?=\S)")
+
+
+def normalize_segment(text: str) -> str:
+    """Lowercased, NFC, single-spaced text without surrounding punctuation"""
+    text = unicodedata.normalize("NFC", text or "").lower()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return _EDGE_PUNCTUATION.sub("", text)
+
+
+def segment_bigrams(normalized: str) -> set:
+    """Word bigrams of a normalized segment, with start/end markers ("\\x02 w1" ... "wn \\x03")"""
+    words = ["\x02"] + _WORD.findall(normalized) + ["\x03"]
+    return {sys.intern(f"{words[i]} {words[i + 1]}") for i in range(len(words) - 1)}
+
+
+def split_source_segments(text: str, max_chars: int = MAX_SEGMENT_CHARS) -> List[str]:
+    """
+    Segments of a source text (plain text or HTML) in document order, without duplicates:
+    one per line, with lines longer than max_chars split into sentences.
+    """
+    if "<" in text and ">" in text:
+        text = _STYLE_OR_SCRIPT.sub(" ", text)
+        text = _BLOCK_TAG.sub("\n", text)
+        text = html.unescape(_ANY_TAG.sub(" ", text))
+
+    segments = []
+    seen = set()
+    for line in text.splitlines():
+        line = _WHITESPACE.sub(" ", line).strip()
+        if not line:
+            continue
+        parts = _SENTENCE_END.split(line) if len(line) > max_chars else [line]
+        for part in parts:
+            key = normalize_segment(part)
+            if key and key not in seen:
+                seen.add(key)
+                segments.append(part)
+    return segments
+
+
+def match_percent(a: str, b: str) -> int:
+    """Character edit-distance similarity of two normalized segments, in percent (100 = identical)"""
+    if a == b:
+        return 100
+    return min(99, int(SequenceMatcher(None, a, b, autojunk=False).ratio() * 100))
+
+
+class TMPairIndex:
+    """Word-bigram inverted index over the TM entries of one language pair"""
+
+    def __init__(self):
+        self._entries: List[Optional[dict]] = []    # slot -> entry (None once removed)
+        self._slots: Dict[str, int] = {}            # entry id -> slot
+        self._exact: Dict[str, List[int]] = {}      # normalized source -> slots
+        self._postings: Dict[str, List[int]] = {}   # bigram -> slots (may hold tombstoned slots)
+        self._removed = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self._slots
+
+    def add(self, entry_id: str, source: str, target: str, score: float = 0, is_uploaded: bool = False):
+        """Add an entry, replacing the one with the same id"""
+        if entry_id in self._slots:
+            self.remove(entry_id)
+        normalized = normalize_segment(source)
+        if not normalized or not target:
+            return
+
+        grams = segment_bigrams(normalized)
+        slot = len(self._entries)
+        self._entries.append({
+            "id": entry_id,
+            "source": source,
+            "target": target,
+            "score": score or 0,
+            "is_uploaded": bool(is_uploaded),
+            "normalized": normalized,
+            "grams": len(grams),
+        })
+        self._slots[entry_id] = slot
+        self._exact.setdefault(normalized, []).append(slot)
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                self._postings[gram] = [slot]
+            else:
+                postings.append(slot)
+
+    def remove(self, entry_id: str) -> bool:
+        slot = self._slots.pop(entry_id, None)
+        if slot is None:
+            return False
+        entry = self._entries[slot]
+        self._entries[slot] = None
+        exact = self._exact.get(entry["normalized"], [])
+        if slot in exact:
+            exact.remove(slot)
+            if not exact:
+                del self._exact[entry["normalized"]]
+        self._removed += 1
+        if self._removed > COMPACT_RATIO * len(self._entries):
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Rebuild the postings without tombstoned slots"""
+        entries = [entry for entry in self._entries if entry is not None]
+        self._entries = []
+        self._slots = {}
+        self._exact = {}
+        self._postings = {}
+        self._removed = 0
+        for entry in entries:
+            self.add(entry["id"], entry["source"], entry["target"], entry["score"], entry["is_uploaded"])
+
+    def lookup(self, segment: str, limit: int = 3, min_match: int = 70, max_candidates: int = 50) -> List[dict]:
+        """
+        Best entries for one source segment: [{id, source, target, score, is_uploaded, match}],
+        match in percent, best first (ties: higher entry score first).
+        """
+        query = normalize_segment(segment)
+        if not query:
+            return []
+        results = {slot: 100 for slot in self._exact.get(query, ())}
+
+        # One changed word breaks two bigrams, so the bigram Dice of a 70% match can be well
+        # under 0.7; candidates only need CANDIDATE_SLACK of it
+        floor = max(0.1, min_match / 100.0 * CANDIDATE_SLACK)
+        grams = segment_bigrams(query)
+        size = len(grams)
+        # Dice >= floor with overlap <= |candidate| means overlap >= floor*|q| / (2 - floor); a
+        # candidate reaching it must share one of the (|q| - overlap + 1) rarest query bigrams
+        min_overlap = max(1, int(floor * size / (2 - floor)))
+        max_size = size * (2 - floor) / floor
+        ranked = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+        prefix = ranked[:size - min_overlap + 1]
+        unread = size - len(prefix)
+
+        candidates = Counter()
+        for gram in prefix:
+            postings = self._postings.get(gram)
+            if postings:
+                candidates.update(postings)
+
+        scored = []
+        for slot, count in candidates.most_common():
+            # count + unread bounds the overlap, and counts only go down from here
+            if 2.0 * (count + unread) < floor * (size + min_overlap):
+                break
+            entry = self._entries[slot]
+            if entry is None or slot in results or not (min_overlap <= entry["grams"] <= max_size):
+                continue
+            if 2.0 * (count + unread) < floor * (size + entry["grams"]):
+                continue
+            shared = count + len(set(ranked[len(prefix):]) & segment_bigrams(entry["normalized"])) if unread else count
+            dice = 2.0 * shared / (size + entry["grams"])
+            if dice >= floor:
+                scored.append((dice, slot))
+                if len(scored) >= max_candidates:
+                    break
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        threshold = min_match / 100.0
+        for _, slot in scored[:max(limit * 4, 8)]:
+            entry = self._entries[slot]
+            # quick_ratio() bounds ratio() from above, so hopeless candidates skip the full diff
+            matcher = SequenceMatcher(None, query, entry["normalized"], autojunk=False)
+            if matcher.quick_ratio() < threshold:
+                continue
+            match = min(99, int(matcher.ratio() * 100))
+            if match >= min_match:
+                results[slot] = match
+
+        ordered = sorted(results.items(), key=lambda item: (-item[1], -self._entries[item[0]]["score"], item[0]))
+        matches = []
+        for slot, match in ordered[:limit]:
+            entry = self._entries[slot]
+            matches.append({
+                "id": entry["id"],
+                "source": entry["source"],
+                "target": entry["target"],
+                "score": entry["score"],
+                "is_uploaded": entry["is_uploaded"],
+                "match": match,
+            })
+        return matches
+
+    def stats(self) -> dict:
+        return {"entries": len(self._slots), "ngrams": len(self._postings), "tombstones": self._removed}
@@ -0,0 +1,47 @@
+"""
+Standalone job worker
+Runs queued background jobs (AI pipeline stages, TM and glossary imports) from the MongoDB
+`jobs` collection in its own process, so translation throughput scales independently of the API
+replicas. Any number of workers can run at once, on any host that reaches the same MONGO_URL / DB_NAME.
+
+Run from the backend directory:
+    python worker.py
+    JOB_WORKER_CONCURRENCY=4 python worker.py
+
+Set JOB_WORKER_IN_PROCESS=0 on the API (e.g. on serverless deployments, where a request
+cannot outlive its response) so that jobs only run here.
+"""
+
+import signal
+import asyncio
+import logging
+
+import server
+import page_counter
+from job_queue import JobWorker
+
+logger = logging.getLogger("worker")
+
+
+async def main():
+    await server.job_queue.ensure_indexes()
+    await server.reference_cache.warm()
+    server.reference_cache.start()
+    worker = JobWorker(server.job_queue)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await server.reference_cache.stop()
+        server.ocr_executor.shutdown()
+        await page_counter.close_http_client()
+        await server.claude_clients.close()
+        server.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
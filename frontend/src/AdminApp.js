@@ -3934,6 +3934,11 @@ const TranslationWorkspace = ({ adminKey, selectedOrder, onBack, user }) => {
   // Proofreading view mode: 'preview' shows highlighted errors, 'edit' allows editing
   const [proofreadingViewMode, setProofreadingViewMode] = useState('preview');
 
+  // AI pipeline run of the selected order; the translator output is streamed from /admin/ai-pipeline/{id}/stream
+  const [aiPipeline, setAiPipeline] = useState(null); // { id, stage, chunks: { [chunk]: html }, totalChunks, done }
+  const aiPipelineStreamRef = useRef(null);
+  useEffect(() => () => aiPipelineStreamRef.current?.close(), []);
+
   // Bulk upload state for glossary
   const [bulkTermsText, setBulkTermsText] = useState('');
 
@@ -6887,6 +6892,122 @@ const TranslationWorkspace = ({ adminKey, selectedOrder, onBack, user }) => {
     return `data:${type};base64,${img.data}`;
   };
 
+  // Follow an AI pipeline over server-sent events: the translation shows up chunk by chunk while it is written,
+  // and the finished translator result is loaded once the stream reports it done
+  const followAiPipeline = (pipelineId) => {
+    aiPipelineStreamRef.current?.close();
+    const source = new EventSource(`${API}/admin/ai-pipeline/${pipelineId}/stream?admin_key=${adminKey}`);
+    aiPipelineStreamRef.current = source;
+
+    source.addEventListener('stage', (e) => {
+      const stage = JSON.parse(e.data);
+      setAiPipeline(prev => prev && prev.id === pipelineId ? { ...prev, stage } : prev);
+    });
+    source.addEventListener('chunk', (e) => {
+      const chunk = JSON.parse(e.data);
+      setAiPipeline(prev => {
+        if (!prev || prev.id !== pipelineId) return prev;
+        // text continues the chunk at offset; a reset (or a reconnect, offset 0) replaces it
+        const received = chunk.reset ? '' : (prev.chunks[chunk.chunk] || '').slice(0, chunk.offset);
+        return {
+          ...prev,
+          chunks: { ...prev.chunks, [chunk.chunk]: received + chunk.text },
+          totalChunks: chunk.total_chunks || prev.totalChunks
+        };
+      });
+    });
+    source.addEventListener('done', async (e) => {
+      source.close();
+      if (aiPipelineStreamRef.current === source) aiPipelineStreamRef.current = null;
+      const done = JSON.parse(e.data);
+      setAiPipeline(prev => prev && prev.id === pipelineId ? { ...prev, done: true } : prev);
+      try {
+        const response = await axios.get(`${API}/admin/ai-pipeline/${pipelineId}?admin_key=${adminKey}`);
+        const result = response.data.stages?.ai_translator?.result;
+        if (done.status === 'completed' && result) {
+          setTranslationResults([{ translatedText: result, originalText: response.data.original_text || '', filename: response.data.original_filename || 'AI translation' }]);
+          setProcessingStatus('✅ AI translation ready - review it in the REVIEW tab');
+        } else {
+          setProcessingStatus(`❌ AI pipeline ${done.status || 'failed'}: ${response.data.stages?.ai_translator?.error_message || 'no translation returned'}`);
+        }
+      } catch (error) {
+        setProcessingStatus(`❌ Could not load the AI pipeline result: ${error.response?.data?.detail || error.message}`);
+      }
+    });
+    source.onerror = () => {
+      // EventSource reconnects by itself; it only gives up when the endpoint refuses the stream
+      if (source.readyState === EventSource.CLOSED) {
+        setAiPipeline(prev => prev && prev.id === pipelineId ? { ...prev, done: true } : prev);
+        setProcessingStatus('❌ Lost the AI pipeline stream');
+      }
+    };
+  };
+
+  const startAiPipeline = async () => {
+    if (!selectedOrderId) return;
+    setProcessingStatus('🤖 Starting AI translation...');
+    try {
+      const originalText = ocrResults.map(r => r.text).filter(Boolean).join('\n\n');
+      const response = await axios.post(`${API}/admin/ai-pipeline/start?admin_key=${adminKey}`, {
+        order_id: selectedOrderId,
+        source_language: sourceLanguage,
+        target_language: targetLanguage,
+        document_type: documentType,
+        original_text: originalText,
+        claude_api_key: claudeApiKey || null,
+        page_format: pageFormat,
+        quick_start: !originalText
+      });
+      const pipelineId = response.data.pipeline_id;
+      setAiPipeline({ id: pipelineId, stage: null, chunks: {}, totalChunks: null, done: false });
+      setProcessingStatus('🤖 AI translation in progress...');
+      followAiPipeline(pipelineId);
+    } catch (error) {
+      setProcessingStatus(`❌ ${error.response?.data?.detail || error.message}`);
+    }
+  };
+
+  // Claude OCR of a PDF via /admin/ocr/stream; resolves with the final /admin/ocr-shaped result
+  const streamClaudeOcr = async (payload, fileName, fileIndex, fileCount) => {
+    const res = await fetch(`${API}/admin/ocr/stream?admin_key=${adminKey}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(payload)
+    });
+    if (!res.ok || !res.body) {
+      const errorData = await res.json().catch(() => ({}));
+      throw new Error(errorData.detail || `OCR failed (${res.status})`);
+    }
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let totalPages = 0;
+    let pagesDone = 0;
+    while (true) {
+      const { value, done } = await reader.read();
+      if (value) buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = done ? '' : lines.pop();
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const event = JSON.parse(line);
+        if (event.type === 'start') {
+          totalPages = event.pages;
+        } else if (event.type === 'page') {
+          pagesDone += 1;
+          setProcessingStatus(`Processing ${fileName} (${fileIndex + 1}/${fileCount}) with Claude AI... page ${pagesDone}/${totalPages || '?'}`);
+        } else if (event.type === 'done') {
+          return event;
+        } else if (event.type === 'error') {
+          throw new Error(event.detail || 'OCR failed');
+        }
+      }
+      if (done) break;
+    }
+    throw new Error('OCR stream ended without a result');
+  };
+
   // OCR with backend (supports regular OCR or Claude OCR)
   const handleOCR = async () => {
     if (files.length === 0) {
@@ -6909,18 +7030,30 @@ const TranslationWorkspace = ({ adminKey, selectedOrder, onBack, user }) => {
         setProcessingStatus(`Processing ${file.name} (${i + 1}/${files.length})${useClaudeOcr ? ' with Claude AI' : ''}...`);
 
         const fileBase64 = await fileToBase64(file);
-
-        const response = await axios.post(`${API}/admin/ocr?admin_key=${adminKey}`, {
+        const ocrPayload = {
           file_base64: fileBase64,
           file_type: file.type,
           filename: file.name,
           use_claude: useClaudeOcr,
           claude_api_key: useClaudeOcr ? claudeApiKey : null,
           special_commands: ocrSpecialCommands || null,
-          preserve_layout: true
-        });
+          preserve_layout: true,
+          source_language: sourceLanguage
+        };
+        const isPdf = file.type === 'application/pdf' || file.name.toLowerCase().endsWith('.pdf');
+
+        let response;
+        if (useClaudeOcr && isPdf) {
+          // Claude OCR of PDFs streams page-by-page progress (NDJSON) before the final result
+          response = { data: await streamClaudeOcr(ocrPayload, file.name, i, files.length) };
+        } else {
+          response = await axios.post(`${API}/admin/ocr?admin_key=${adminKey}`, ocrPayload);
+        }
 
         if (response.data.status === 'success' || response.data.text) {
+          if (response.data.failed_pages?.length) {
+            showToast(`${file.name}: pages ${response.data.failed_pages.join(', ')} could not be read by Claude`);
+          }
           setOcrResults(prev => [...prev, {
             filename: file.name,
             text: response.data.text,
@@ -12097,6 +12230,39 @@ const TranslationWorkspace = ({ adminKey, selectedOrder, onBack, user }) => {
                 )}
               </div>
 
+              {/* AI Pipeline run - the translation streams in while Claude writes it */}
+              <div className="border border-purple-200 rounded-lg p-4 mb-4">
+                <div className="flex items-center justify-between">
+                  <h3 className="text-xs font-bold text-purple-800">🤖 AI Translation</h3>
+                  <button
+                    onClick={startAiPipeline}
+                    disabled={aiPipeline && !aiPipeline.done}
+                    className="px-4 py-2 bg-purple-600 text-white text-sm rounded hover:bg-purple-700 disabled:opacity-50"
+                  >
+                    {aiPipeline && !aiPipeline.done ? 'Translating...' : 'Run AI Pipeline'}
+                  </button>
+                </div>
+                {aiPipeline && (
+                  <div className="mt-3">
+                    <div className="text-xs text-gray-500 mb-2">
+                      {aiPipeline.stage?.notes || aiPipeline.stage?.status || 'Queued'}
+                      {aiPipeline.totalChunks > 1 && ` - ${Object.keys(aiPipeline.chunks).length}/${aiPipeline.totalChunks} chunks`}
+                    </div>
+                    {Object.keys(aiPipeline.chunks).length > 0 && (
+                      <div
+                        className="max-h-96 overflow-y-auto border rounded p-3 bg-gray-50 text-sm"
+                        dangerouslySetInnerHTML={{
+                          __html: Object.keys(aiPipeline.chunks)
+                            .sort((a, b) => Number(a) - Number(b))
+                            .map(key => aiPipeline.chunks[key])
+                            .join('')
+                        }}
+                      />
+                    )}
+                  </div>
+                )}
+              </div>
+
               {/* Processing Status */}
               {processingStatus && (
                 <div className={`mt-3 p-2 rounded text-xs ${
@@ -13478,7 +13644,8 @@ const TranslationWorkspace = ({ adminKey, selectedOrder, onBack, user }) => {
                             filename: file.name,
                             use_claude: claudeApiKey ? true : false,
                             claude_api_key: claudeApiKey || null,
-                            preserve_layout: true
+                            preserve_layout: true,
+                            source_language: sourceLanguage
                           }
                         );
                         if (response.data.text) {
@@ -15053,38 +15220,22 @@ const TranslationWorkspace = ({ adminKey, selectedOrder, onBack, user }) => {
                 📤 Upload TM
               </label>
               <button
-                onClick={async () => {
-                  try {
-                    const response = await axios.get(`${API}/admin/translation-memory/download?admin_key=${adminKey}&format=csv`);
-                    const blob = new Blob([response.data.content], { type: 'text/csv' });
-                    const url = window.URL.createObjectURL(blob);
-                    const a = document.createElement('a');
-                    a.href = url;
-                    a.download = response.data.filename;
-                    a.click();
-                    window.URL.revokeObjectURL(url);
-                  } catch (err) {
-                    showToast('Failed to download: ' + err.message);
-                  }
+                onClick={() => {
+                  // Streamed attachment: the browser saves it as it arrives
+                  const a = document.createElement('a');
+                  a.href = `${API}/admin/translation-memory/download?admin_key=${adminKey}&format=csv`;
+                  a.click();
                 }}
                 className="px-3 py-1.5 bg-green-600 text-white text-xs rounded hover:bg-green-700 flex items-center"
               >
                 📥 Download CSV
               </button>
               <button
-                onClick={async () => {
-                  try {
-                    const response = await axios.get(`${API}/admin/translation-memory/download?admin_key=${adminKey}&format=tmx`);
-                    const blob = new Blob([response.data.content], { type: 'application/xml' });
-                    const url = window.URL.createObjectURL(blob);
-                    const a = document.createElement('a');
-                    a.href = url;
-                    a.download = response.data.filename;
-                    a.click();
-                    window.URL.revokeObjectURL(url);
-                  } catch (err) {
-                    showToast('Failed to download: ' + err.message);
-                  }
+                onClick={() => {
+                  // Streamed attachment: the browser saves it as it arrives
+                  const a = document.createElement('a');
+                  a.href = `${API}/admin/translation-memory/download?admin_key=${adminKey}&format=tmx`;
+                  a.click();
                 }}
                 className="px-3 py-1.5 bg-blue-600 text-white text-xs rounded hover:bg-blue-700 flex items-center"
               >
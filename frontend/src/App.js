@@ -2024,6 +2024,7 @@ const NewOrderPage = ({ partner, token, onOrderCreated, t, currency, refreshPart
         try {
           const formDataUpload = new FormData();
           formDataUpload.append('file', file);
+          formDataUpload.append('source_language', formData.translate_from);
 
           const response = await axios.post(`${API}/upload-document?token=${token}`, formDataUpload, {
             headers: { 'Content-Type': 'multipart/form-data' },
@@ -2074,7 +2075,7 @@ const NewOrderPage = ({ partner, token, onOrderCreated, t, currency, refreshPart
       setIsProcessing(false);
       setProcessingStatus('');
     }
-  }, [token]);
+  }, [token, formData.translate_from]);
 
   const { getRootProps, getInputProps, isDragActive } = useDropzone({
     onDrop,
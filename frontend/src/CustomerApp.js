@@ -1616,6 +1616,7 @@ const CustomerNewOrderPage = ({ customer, token, onOrderCreated, t }) => {
 
           const formDataUpload = new FormData();
           formDataUpload.append('file', file);
+          formDataUpload.append('source_language', formData.translate_from);
 
           const response = await axios.post(`${API}/upload-document`, formDataUpload, {
             headers: { 'Content-Type': 'multipart/form-data' },
@@ -1690,7 +1691,7 @@ const CustomerNewOrderPage = ({ customer, token, onOrderCreated, t }) => {
       setIsProcessing(false);
       setProcessingStatus('');
     }
-  }, []);
+  }, [formData.translate_from]);
 
   const { getRootProps, getInputProps, isDragActive } = useDropzone({
     onDrop,
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The backend modules import each other as top-level modules (the server runs from backend/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+# server.py needs these at import time; the tests never touch MongoDB
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
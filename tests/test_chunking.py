@@ -0,0 +1,190 @@
+import re
+
+import pytest
+
+import server
+
+PAGE_BREAK = "<div class='page-break' style='page-break-before: always;'></div>"
+
+
+def page_image(number: int) -> dict:
+    return {"page": number, "data": "x" * 100, "media_type": "image/jpeg", "width": 800, "height": 1000}
+
+
+def marked_text(pages: dict) -> str:
+    return "\n\n".join(f"--- Page {number} ---\n{text}" for number, text in pages.items())
+
+
+def table_html(rows: int) -> str:
+    body = "".join(f"<tr><td>row {row}</td><td>{'valor ' * 20}</td></tr>\n" for row in range(rows))
+    return f"<table>\n{body}</table>"
+
+
+def marker_pages(text: str) -> list:
+    return [int(number) for number in re.findall(r"^--- Page (\d+) ---$", text, re.MULTILINE)]
+
+
+# ---- split_html_blocks / split_html_into_chunks ----
+
+def test_split_html_blocks_round_trips_and_keeps_tables_whole():
+    html = f"<p>intro</p>\n{table_html(5)}\n<p>middle</p><br><p>end</p>"
+    blocks = server.split_html_blocks(html)
+
+    assert "".join(blocks) == html
+    assert len(blocks) > 1
+    for block in blocks:
+        assert block.count("<table") == block.count("</table>")
+
+
+def test_split_html_blocks_does_not_cut_inside_style_or_script():
+    html = "<style>\np { margin: 0; }\n\ntd { padding: 0; }\n</style><p>one</p><script>\n\nvar a = '</p>';\n</script><p>two</p>"
+    blocks = server.split_html_blocks(html)
+
+    assert "".join(blocks) == html
+    for block in blocks:
+        assert block.count("<style>") == block.count("</style>")
+        assert block.count("<script>") == block.count("</script>")
+
+
+def test_split_html_blocks_without_boundaries_returns_input():
+    assert server.split_html_blocks("plain text on one line") == ["plain text on one line"]
+
+
+def test_split_html_into_chunks_cuts_after_page_breaks():
+    sections = [f"<h1>Page {number}</h1><p>{'texto ' * 200}</p>{PAGE_BREAK}" for number in range(1, 5)]
+    html = "".join(sections) + "<p>last page</p>"
+    section_tokens = server.estimate_claude_text_tokens(sections[0])
+
+    chunks = server.split_html_into_chunks(html, max_tokens=section_tokens + 10)
+
+    assert "".join(chunks) == html
+    assert len(chunks) == 4
+    for chunk in chunks[:-1]:
+        assert chunk.endswith(PAGE_BREAK)
+
+
+def test_split_html_into_chunks_keeps_tables_whole_when_a_page_is_over_budget():
+    html = f"<p>{'intro ' * 50}</p>\n{table_html(30)}\n<p>{'outro ' * 50}</p>\n{table_html(30)}\n<p>end</p>"
+
+    chunks = server.split_html_into_chunks(html, max_tokens=300)
+
+    assert "".join(chunks) == html
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.count("<table") == chunk.count("</table>")
+
+
+def test_split_html_into_chunks_small_document_is_one_chunk():
+    html = f"<p>short</p>{PAGE_BREAK}<p>document</p>"
+    assert server.split_html_into_chunks(html, max_tokens=1000) == [html]
+
+
+# ---- plan_translation_chunks: text/image alignment ----
+
+def test_plan_translation_chunks_aligns_text_with_page_images():
+    images = [page_image(number) for number in range(1, 7)]
+    text = marked_text({number: f"texto da página {number} " * 150 for number in range(1, 7)})
+
+    chunks = server.plan_translation_chunks(images, text, max_output_tokens=3000)
+
+    assert len(chunks) > 1
+    assert [page for chunk in chunks for page in chunk["pages"]] == list(range(1, 7))
+    for chunk in chunks:
+        assert [image["page"] for image in chunk["images"]] == chunk["pages"]
+        assert marker_pages(chunk["text"]) == chunk["pages"]
+        assert chunk["total_chunks"] == len(chunks)
+    assert "".join(chunk["text"] for chunk in chunks) == text
+
+
+def test_plan_translation_chunks_aligns_by_page_number_when_some_pages_have_no_text():
+    images = [page_image(number) for number in range(1, 5)]
+    text = marked_text({2: "segunda " * 300, 4: "quarta " * 300})
+
+    chunks = server.plan_translation_chunks(images, text, max_output_tokens=2000)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert marker_pages(chunk["text"]) == [page for page in chunk["pages"] if page in (2, 4)]
+
+
+def test_plan_translation_chunks_drops_unaligned_text_when_split():
+    images = [page_image(number) for number in range(1, 5)]
+    text = "texto sem marcadores de página " * 200
+
+    chunks = server.plan_translation_chunks(images, text, max_output_tokens=server.TRANSLATION_IMAGE_PAGE_TOKENS * 2)
+
+    assert len(chunks) == 2
+    assert all(chunk["text"] == "" for chunk in chunks)
+
+
+def test_plan_translation_chunks_single_chunk_keeps_all_text():
+    images = [page_image(1), page_image(2)]
+    text = "texto sem marcadores"
+
+    chunks = server.plan_translation_chunks(images, text)
+
+    assert len(chunks) == 1
+    assert chunks[0]["text"] == text
+    assert chunks[0]["page_range"] == "1-2"
+
+
+def test_plan_translation_chunks_respects_max_pages():
+    images = [page_image(number) for number in range(1, 8)]
+
+    chunks = server.plan_translation_chunks(images, "", max_output_tokens=100000, max_pages=3)
+
+    assert len(chunks) == 3
+    assert max(len(chunk["images"]) for chunk in chunks) <= 3
+
+
+def test_plan_translation_chunks_text_only_splits_long_pages():
+    text = "<p>" + "</p>\n<p>".join("parágrafo " * 40 for _ in range(60)) + "</p>"
+
+    chunks = server.plan_translation_chunks([], text, max_output_tokens=2000)
+
+    assert len(chunks) > 1
+    assert "".join(chunk["text"] for chunk in chunks) == text
+    for chunk in chunks:
+        assert chunk["estimated_output_tokens"] <= 2000
+
+
+# ---- balance_chunks: token budget edge cases ----
+
+def test_balance_chunks_empty():
+    assert server.balance_chunks([], 100) == []
+
+
+def test_balance_chunks_exact_budget_fits_in_one_chunk():
+    assert server.balance_chunks([40, 60], 100) == [(0, 2)]
+
+
+def test_balance_chunks_unit_over_budget_is_its_own_chunk():
+    assert server.balance_chunks([10, 500, 10, 10], 100) == [(0, 1), (1, 2), (2, 4)]
+
+
+def test_balance_chunks_lowers_the_heaviest_chunk():
+    # Greedy filling gives [6, 1, 1] + [6]; the same two chunks can be [6, 1] + [1, 6]
+    assert server.balance_chunks([6, 1, 1, 6], 8) == [(0, 2), (2, 4)]
+
+
+@pytest.mark.parametrize("weights,budget", [
+    ([1] * 50, 7),
+    ([5, 9, 2, 7, 3, 8, 1, 6], 15),
+    ([100, 1, 1, 1, 100], 100),
+])
+def test_balance_chunks_covers_every_unit_within_budget(weights, budget):
+    groups = server.balance_chunks(weights, budget)
+
+    assert [index for start, end in groups for index in range(start, end)] == list(range(len(weights)))
+    for start, end in groups:
+        assert end - start == 1 or sum(weights[start:end]) <= budget
+
+
+def test_balance_chunks_respects_max_items_and_input_budget():
+    groups = server.balance_chunks([1] * 10, 100, max_items=4)
+    assert max(end - start for start, end in groups) <= 4
+
+    input_weights = [30] * 6
+    groups = server.balance_chunks([1] * 6, 100, input_weights=input_weights, input_budget=60)
+    for start, end in groups:
+        assert sum(input_weights[start:end]) <= 60
@@ -0,0 +1,108 @@
+from glossary_matcher import GlossaryAutomaton, normalize_term_text
+
+
+def term(source: str, target: str = None) -> dict:
+    return {"source": source, "target": target or f"<{source}>"}
+
+
+def sources(matches: list) -> list:
+    return [match["source"] for match in matches]
+
+
+def test_normalize_term_text():
+    assert normalize_term_text("  Certidão\n de \t Nascimento ") == "certidão de nascimento"
+    assert normalize_term_text(None) == ""
+
+
+# ---- overlapping matches ----
+
+def test_overlap_prefers_the_longest_term():
+    automaton = GlossaryAutomaton([term("certidão"), term("certidão de nascimento"), term("nascimento")])
+
+    assert sources(automaton.find("Segue a certidão de nascimento do requerente.")) == ["certidão de nascimento"]
+
+
+def test_overlap_resolves_to_the_leftmost_term():
+    automaton = GlossaryAutomaton([term("registro civil"), term("civil das pessoas naturais")])
+
+    assert sources(automaton.find("registro civil das pessoas naturais")) == ["registro civil"]
+
+
+def test_shorter_term_still_matches_outside_the_longer_one():
+    automaton = GlossaryAutomaton([term("certidão"), term("certidão de nascimento")])
+
+    found = automaton.find("Certidão de nascimento anexa; a certidão foi emitida ontem.")
+    assert sources(found) == ["certidão de nascimento", "certidão"]
+
+
+def test_terms_sharing_a_suffix_are_found_through_failure_links():
+    automaton = GlossaryAutomaton([term("tabelião de notas"), term("notas")])
+
+    assert sources(automaton.find("notas do tabelião de notas")) == ["notas", "tabelião de notas"]
+
+
+def test_terms_are_reported_once_in_order_of_first_occurrence():
+    automaton = GlossaryAutomaton([term("cartório"), term("cidade"), term("escrevente")])
+
+    found = automaton.find("Escrevente do cartório da cidade; o cartório e o escrevente assinam.")
+    assert sources(found) == ["escrevente", "cartório", "cidade"]
+
+
+# ---- case and whitespace ----
+
+def test_matching_ignores_case():
+    automaton = GlossaryAutomaton([term("Registro Geral")])
+
+    assert sources(automaton.find("REGISTRO GERAL nº 12.345")) == ["Registro Geral"]
+    assert sources(automaton.find("registro geral")) == ["Registro Geral"]
+
+
+def test_matching_collapses_whitespace_and_line_breaks():
+    automaton = GlossaryAutomaton([term("certidão de casamento")])
+
+    assert sources(automaton.find("a certidão\nde   casamento")) == ["certidão de casamento"]
+
+
+def test_duplicate_sources_keep_the_first_term():
+    automaton = GlossaryAutomaton([
+        term("Cartório", "Registry office"),
+        term("cartório ", "Notary"),
+        {"source": "sem tradução", "target": ""},
+        {"source": "", "target": "orphan target"},
+    ])
+
+    assert len(automaton) == 1
+    assert automaton.find("cartório")[0]["target"] == "Registry office"
+
+
+# ---- word boundaries ----
+
+def test_term_does_not_match_inside_a_word():
+    automaton = GlossaryAutomaton([term("ato")])
+
+    assert automaton.find("contato, atores e mandatos") == []
+    assert sources(automaton.find("o ato foi lavrado")) == ["ato"]
+
+
+def test_word_boundaries_respect_accents_and_underscores():
+    automaton = GlossaryAutomaton([term("são")])
+
+    assert automaton.find("certidãosão e são_paulo") == []
+    assert sources(automaton.find("São Paulo")) == ["são"]
+
+
+def test_term_matches_next_to_punctuation_and_at_text_edges():
+    automaton = GlossaryAutomaton([term("CPF"), term("RG")])
+
+    assert sources(automaton.find("RG: 12.345.678-9 (CPF)")) == ["RG", "CPF"]
+
+
+def test_term_ending_in_punctuation_matches_before_a_letter():
+    automaton = GlossaryAutomaton([term("Sr.")])
+
+    assert sources(automaton.find("o sr.joão")) == ["Sr."]
+
+
+def test_empty_automaton_or_text():
+    assert GlossaryAutomaton([]).find("qualquer texto") == []
+    assert GlossaryAutomaton([term("ato")]).find("") == []
@@ -0,0 +1,198 @@
+import pytest
+
+from tm_import import (
+    ImportFileError,
+    UnsupportedFormat,
+    batches,
+    detect_columns,
+    import_format,
+    read_rows,
+    source_hash,
+)
+
+TMX = """<?xml version="1.0" encoding="UTF-8"?>
+<tmx version="1.4">
+  <header srclang="pt-BR" />
+  <body>
+    <tu>
+      <tuv xml:lang="en-US"><seg>Birth certificate</seg></tuv>
+      <tuv xml:lang="pt-BR"><seg> Certidão de nascimento </seg></tuv>
+    </tu>
+    <tu>
+      <tuv lang="por"><seg>Cartório</seg></tuv>
+      <tuv lang="eng"><seg>Registry office</seg></tuv>
+    </tu>
+    <tu>
+      <tuv xml:lang="es"><seg>Acta</seg></tuv>
+      <tuv xml:lang="fr"><seg>Acte</seg></tuv>
+    </tu>
+    <tu>
+      <tuv xml:lang="pt-BR"><seg>Só uma língua</seg></tuv>
+    </tu>
+    <tu>
+      <tuv xml:lang="pt-BR"><seg>Sem tradução</seg></tuv>
+      <tuv xml:lang="en-US"><seg></seg></tuv>
+    </tu>
+    <tu>
+      <tuv xml:lang="pt-BR"></tuv>
+      <tuv xml:lang="en-US"><seg>No source segment</seg></tuv>
+    </tu>
+  </body>
+</tmx>
+"""
+
+
+def write(tmp_path, name: str, content: str, encoding: str = "utf-8"):
+    path = tmp_path / name
+    path.write_text(content, encoding=encoding)
+    return str(path)
+
+
+# ---- formats ----
+
+@pytest.mark.parametrize("filename,expected", [
+    ("memory.tmx", "tmx"),
+    ("MEMORY.XML", "tmx"),
+    ("pairs.csv", "csv"),
+    ("sheet.xlsx", "excel"),
+    ("old.xls", "excel"),
+    ("trados.sdltm", "sdltm"),
+    ("notes.txt", None),
+    (None, None),
+])
+def test_import_format(filename, expected):
+    assert import_format(filename) == expected
+
+
+def test_unsupported_extension_raises(tmp_path):
+    path = write(tmp_path, "memory.txt", "source,target\n")
+
+    with pytest.raises(UnsupportedFormat, match="memory.txt"):
+        read_rows(path, "memory.txt")
+    assert issubclass(UnsupportedFormat, ImportFileError)
+
+
+# ---- TMX ----
+
+def test_read_tmx_uses_portuguese_as_source_and_english_as_target(tmp_path):
+    path = write(tmp_path, "memory.tmx", TMX)
+
+    assert list(read_rows(path, "memory.tmx")) == [
+        {"source": "Certidão de nascimento", "target": "Birth certificate", "notes": ""},
+        {"source": "Cartório", "target": "Registry office", "notes": ""},
+        # Other languages fall back to tuv order
+        {"source": "Acta", "target": "Acte", "notes": ""},
+    ]
+
+
+def test_malformed_tmx_raises_import_file_error(tmp_path):
+    path = write(tmp_path, "broken.tmx", "<tmx><body><tu><tuv><seg>Aberto</seg></tuv></body></tmx>")
+
+    with pytest.raises(ImportFileError, match="Error processing file"):
+        list(read_rows(path, "broken.tmx"))
+
+
+# ---- CSV ----
+
+def test_read_csv_picks_columns_from_the_header(tmp_path):
+    path = write(tmp_path, "pairs.csv", "id,Tradução,Origem\n1,Birth certificate,Certidão de nascimento\n2, Registry office , Cartório \n")
+
+    assert list(read_rows(path, "pairs.csv")) == [
+        {"source": "Certidão de nascimento", "target": "Birth certificate", "notes": ""},
+        {"source": "Cartório", "target": "Registry office", "notes": ""},
+    ]
+
+
+def test_read_csv_defaults_to_first_two_columns_and_accepts_bom(tmp_path):
+    path = write(tmp_path, "pairs.csv", "pt,en\nAverbação,Annotation\n", encoding="utf-8-sig")
+
+    assert list(read_rows(path, "pairs.csv")) == [{"source": "Averbação", "target": "Annotation", "notes": ""}]
+
+
+def test_read_csv_glossary_reads_term_and_notes_columns(tmp_path):
+    path = write(tmp_path, "glossary.csv", "Term,Translation,Comment\nRG,ID card,Brazilian identity document\nCPF,Taxpayer ID\n")
+
+    assert list(read_rows(path, "glossary.csv", glossary=True)) == [
+        {"source": "RG", "target": "ID card", "notes": "Brazilian identity document"},
+        {"source": "CPF", "target": "Taxpayer ID", "notes": ""},
+    ]
+
+
+def test_read_csv_skips_malformed_rows(tmp_path):
+    path = write(tmp_path, "pairs.csv", "\n".join([
+        "source,target",
+        "Certidão,Certificate",
+        "only one cell",
+        "",
+        "Sem tradução,",
+        ",No source",
+        "   ,   ",
+        "Cartório,Registry office,extra cell",
+    ]) + "\n")
+
+    assert [row["source"] for row in read_rows(path, "pairs.csv")] == ["Certidão", "Cartório"]
+
+
+def test_undecodable_csv_raises_import_file_error(tmp_path):
+    path = tmp_path / "latin1.csv"
+    path.write_bytes("source,target\nCertidão,Certificate\n".encode("latin-1"))
+
+    with pytest.raises(ImportFileError, match="Error processing file"):
+        list(read_rows(str(path), "latin1.csv"))
+
+
+def test_detect_columns():
+    assert detect_columns(["Original", "Translation", "Notes"]) == (0, 1, -1)
+    assert detect_columns(["Target", "Source"]) == (1, 0, -1)
+    assert detect_columns(["Term", "Translation", "Observação"], glossary=True) == (0, 1, 2)
+    assert detect_columns(["English", "Português"], excel=True) == (1, 0, -1)
+    assert detect_columns(None) == (0, 1, -1)
+
+
+# ---- source_hash and batch deduplication ----
+
+def test_source_hash_is_a_fixed_length_deterministic_key():
+    long_source = "Certidão de nascimento " * 1000
+
+    assert source_hash(long_source) == source_hash(long_source)
+    assert len(source_hash(long_source)) == 64
+    assert int(source_hash(long_source), 16) >= 0
+    assert source_hash("Certidão") != source_hash("certidão")
+    assert source_hash(None) == source_hash("")
+
+
+def rows(*pairs):
+    return [{"source": source, "target": target, "notes": ""} for source, target in pairs]
+
+
+def test_batches_deduplicate_by_source_hash_keeping_the_last_row():
+    data = rows(("Cartório", "Registry office"), ("Certidão", "Certificate"), ("Cartório", "Notary office"))
+
+    result = list(batches(data, 10, key=lambda row: source_hash(row["source"])))
+
+    assert result == [(rows(("Cartório", "Notary office"), ("Certidão", "Certificate")), 3)]
+
+
+def test_batches_deduplicate_keeping_the_first_row():
+    data = rows(("Cartório", "Registry office"), ("Cartório", "Notary office"))
+
+    assert list(batches(data, 10, key=lambda row: source_hash(row["source"]), keep="first")) == [
+        (rows(("Cartório", "Registry office")), 2),
+    ]
+
+
+def test_batches_split_by_rows_read_and_only_dedupe_within_a_batch():
+    data = rows(("a", "1"), ("a", "2"), ("b", "3"), ("a", "4"), ("c", "5"))
+
+    result = list(batches(data, 2))
+
+    assert result == [
+        (rows(("a", "2")), 2),
+        (rows(("b", "3"), ("a", "4")), 2),
+        (rows(("c", "5")), 1),
+    ]
+    assert sum(read for _, read in result) == len(data)
+
+
+def test_batches_of_no_rows():
+    assert list(batches([], 5)) == []
@@ -0,0 +1,132 @@
+import pytest
+
+from tm_index import TMPairIndex, match_percent, normalize_segment, segment_bigrams, split_source_segments
+
+
+@pytest.fixture
+def index():
+    index = TMPairIndex()
+    index.add("birth", "Certidão de nascimento", "Birth certificate", score=5)
+    index.add("marriage", "Certidão de casamento", "Marriage certificate", score=3)
+    index.add("registry", "Registro civil das pessoas naturais", "Civil registry of natural persons")
+    index.add("clerk", "O oficial de registro civil", "The civil registry clerk")
+    return index
+
+
+# ---- n-gram scoring ----
+
+def test_normalize_segment_ignores_case_whitespace_and_edge_punctuation():
+    assert normalize_segment("  Certidão   de\tNascimento. ") == "certidão de nascimento"
+    assert normalize_segment("«Olá»") == "olá"
+    assert normalize_segment("...") == ""
+
+
+def test_segment_bigrams_are_padded_at_both_ends():
+    assert segment_bigrams("certidão de nascimento") == {
+        "\x02 certidão", "certidão de", "de nascimento", "nascimento \x03",
+    }
+    assert segment_bigrams("assinatura") == {"\x02 assinatura", "assinatura \x03"}
+
+
+def test_match_percent():
+    assert match_percent("certidão de nascimento", "certidão de nascimento") == 100
+    assert match_percent("certidão de nascimento", "certidão de nascimentos") == 97
+    # A near-identical pair never rounds up to 100
+    assert match_percent("a" * 200, "a" * 199 + "b") == 99
+    assert match_percent("certidão de nascimento", "procuração") < 50
+
+
+def test_split_source_segments_strips_html_and_drops_duplicates():
+    text = "<style>p { color: red }</style><p>Certidão de nascimento</p><p>certidão de  nascimento.</p><br>Nome: Maria"
+    assert split_source_segments(text) == ["Certidão de nascimento", "Nome: Maria"]
+
+
+def test_split_source_segments_splits_long_lines_into_sentences():
+    line = "Primeira frase do documento. " + "Segunda frase " * 20 + "termina aqui."
+    assert split_source_segments(line, max_chars=50) == ["Primeira frase do documento.", line.split(". ", 1)[1]]
+
+
+# ---- lookup: fuzzy matches, threshold and ordering ----
+
+def test_exact_match_after_normalization_is_100(index):
+    matches = index.lookup("CERTIDÃO DE NASCIMENTO.")
+
+    assert matches[0]["id"] == "birth"
+    assert matches[0]["match"] == 100
+    assert matches[0]["target"] == "Birth certificate"
+
+
+def test_fuzzy_match_is_found_and_scored_below_100(index):
+    matches = index.lookup("Certidão de nascimentos", min_match=70)
+
+    assert [match["id"] for match in matches][:1] == ["birth"]
+    assert 70 <= matches[0]["match"] < 100
+    assert matches[0]["match"] == match_percent("certidão de nascimentos", "certidão de nascimento")
+
+
+def test_min_match_threshold_filters_results(index):
+    segment = "Certidão de batismo"
+    loose = index.lookup(segment, min_match=50)
+    strict = index.lookup(segment, min_match=95)
+
+    assert loose
+    assert all(match["match"] >= 50 for match in loose)
+    assert strict == []
+
+
+def test_unrelated_segment_has_no_matches(index):
+    assert index.lookup("Procuração pública lavrada em cartório") == []
+    assert index.lookup("   ") == []
+
+
+def test_results_are_ordered_best_first_and_limited(index):
+    matches = index.lookup("Certidão de nascimento", limit=5, min_match=50)
+
+    assert [match["id"] for match in matches][:2] == ["birth", "marriage"]
+    assert [match["match"] for match in matches] == sorted((match["match"] for match in matches), reverse=True)
+    assert len(index.lookup("Certidão de nascimento", limit=1, min_match=50)) == 1
+
+
+def test_ties_are_broken_by_entry_score():
+    index = TMPairIndex()
+    index.add("low", "Cartório de notas", "Notary office", score=1)
+    index.add("high", "cartório de notas", "Notary's office", score=9)
+    index.add("mid", "Cartório de Notas.", "Notarial office", score=4)
+
+    assert [match["id"] for match in index.lookup("cartório de notas")] == ["high", "mid", "low"]
+
+
+# ---- incremental updates ----
+
+def test_add_replaces_entry_with_same_id(index):
+    index.add("birth", "Certidão de óbito", "Death certificate")
+
+    assert len(index) == 4
+    assert index.lookup("Certidão de óbito")[0]["target"] == "Death certificate"
+    assert all(match["id"] != "birth" for match in index.lookup("Certidão de nascimento", min_match=90))
+
+
+def test_add_ignores_entries_without_source_or_target():
+    index = TMPairIndex()
+    index.add("empty-source", "...", "Something")
+    index.add("empty-target", "Algo", "")
+
+    assert len(index) == 0
+
+
+def test_remove_and_compaction_keep_lookups_correct():
+    index = TMPairIndex()
+    for number in range(20):
+        index.add(f"entry-{number}", f"Folha número {number} do livro", f"Page {number} of the book")
+
+    for number in range(10):
+        assert index.remove(f"entry-{number}")
+    assert not index.remove("entry-0")
+
+    assert len(index) == 10
+    assert "entry-3" not in index
+    assert index.stats()["tombstones"] < 10
+    matches = index.lookup("Folha número 3 do livro", limit=20, min_match=50)
+    assert matches
+    assert all(int(match["id"].split("-")[1]) >= 10 for match in matches)
+    assert index.lookup("Folha número 15 do livro")[0]["match"] == 100